@@ -0,0 +1,144 @@
+# Benchmark Azure page blob uploads of a xz compressed sparse disk image.
+#
+# Compares the previous upload path (decompress once to get the size,
+# then stream the whole file and retry it from the start on error)
+# with the single pass page range upload. A stand-in page blob service
+# adds a fixed latency per request and fails one range request.
+#
+# Usage: python benchmark_azure_upload.py [image_mb] [data_mb] [latency_ms]
+import lzma
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mash.utils.azure import PAGE_RANGE_SIZE, upload_page_blob_from_stream
+from mash.utils.filetype import get_xz_uncompressed_size
+
+
+class StandInPageBlobService(object):
+    """Page blob service with request latency and one failed request."""
+    def __init__(self, latency, fail_request):
+        self.latency = latency
+        self.fail_request = fail_request
+        self.requests = 0
+        self.uploaded = 0
+        self.lock = threading.Lock()
+
+    def create_blob(self, container, blob_name, content_length):
+        time.sleep(self.latency)
+
+    def update_page(self, container, blob_name, page, start, end):
+        time.sleep(self.latency)
+
+        with self.lock:
+            self.requests += 1
+
+            if self.requests == self.fail_request:
+                raise Exception('Request timed out')
+
+            self.uploaded += len(page)
+
+    def create_blob_from_stream(
+        self, container, blob_name, stream, count, max_connections
+    ):
+        """Chunked upload as done by the storage SDK, no range retry."""
+        self.create_blob(container, blob_name, count)
+
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            uploads = []
+            start = 0
+
+            while start < count:
+                page = stream.read(PAGE_RANGE_SIZE)
+
+                if page.count(0) < len(page):
+                    uploads.append(executor.submit(
+                        self.update_page, container, blob_name, page,
+                        start, start + len(page) - 1
+                    ))
+
+                start += len(page)
+
+            for upload in uploads:
+                upload.result()
+
+
+def create_image(file_name, image_mb, data_mb):
+    """Write a xz compressed sparse image with data_mb of random data."""
+    mb = 1024 * 1024
+    step = image_mb // data_mb
+
+    with lzma.open(file_name, 'wb', preset=0) as image:
+        for index in range(image_mb):
+            if index % step == 0:
+                image.write(os.urandom(mb))
+            else:
+                image.write(bytes(mb))
+
+
+def upload_previous(file_name, blob_service, max_retry_attempts, workers):
+    with lzma.open(file_name) as lzma_stream:
+        lzma_stream.seek(0, os.SEEK_END)
+        size = lzma_stream.tell()
+
+    while max_retry_attempts > 0:
+        with lzma.LZMAFile(file_name, 'rb') as image_stream:
+            try:
+                blob_service.create_blob_from_stream(
+                    'container', 'image.vhd', image_stream, size,
+                    max_connections=workers
+                )
+                return
+            except Exception:
+                max_retry_attempts -= 1
+
+
+def upload_ranges(file_name, blob_service, max_retry_attempts, workers):
+    size = get_xz_uncompressed_size(file_name)
+
+    with lzma.LZMAFile(file_name, 'rb') as image_stream:
+        upload_page_blob_from_stream(
+            blob_service, 'container', 'image.vhd', image_stream, size,
+            max_retry_attempts, workers
+        )
+
+
+def main():
+    image_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    data_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    with tempfile.TemporaryDirectory() as image_dir:
+        file_name = os.path.join(image_dir, 'image.vhdfixed.xz')
+        create_image(file_name, image_mb, data_mb)
+
+        print('image_mb={0} data_mb={1} xz_mb={2:.1f} latency_ms={3}'.format(
+            image_mb, data_mb,
+            os.path.getsize(file_name) / (1024 * 1024), latency_ms
+        ))
+
+        for name, upload in (
+            ('previous', upload_previous),
+            ('ranges', upload_ranges)
+        ):
+            blob_service = StandInPageBlobService(latency_ms / 1000, 4)
+
+            start = time.time()
+            upload(file_name, blob_service, 3, 8)
+            elapsed = time.time() - start
+
+            print(
+                '{0:>8}: {1:6.2f}s, {2} page requests, '
+                '{3:.0f} MB uploaded'.format(
+                    name, elapsed, blob_service.requests,
+                    blob_service.uploaded / (1024 * 1024)
+                )
+            )
+
+
+if __name__ == '__main__':
+    main()
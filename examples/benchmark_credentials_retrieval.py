@@ -0,0 +1,69 @@
+# Benchmark credentials retrieval from the credentials datastore.
+#
+# Stores credentials for 50 accounts in a temporary directory and
+# reports retrieve_credentials requests per second for all accounts:
+# reading the keys file on every decrypt (as before the key ring was
+# kept in memory), with the in memory key ring and with the decrypted
+# credentials cache enabled.
+#
+# Usage: python benchmark_credentials_retrieval.py [requests]
+import logging
+import os
+import sys
+import time
+
+from tempfile import TemporaryDirectory
+
+from mash.services.credentials.datastore import CredentialsDatastore
+
+ACCOUNTS = ['account{0}'.format(index) for index in range(50)]
+
+
+class UncachedKeysDatastore(CredentialsDatastore):
+    def _get_fernet(self):
+        self._reset_fernet()
+        return super(UncachedKeysDatastore, self)._get_fernet()
+
+
+def run(datastore, requests):
+    start = time.time()
+
+    for _ in range(requests):
+        datastore.retrieve_credentials(ACCOUNTS, 'ec2', 'user1')
+
+    return requests / (time.time() - start)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    log = logging.getLogger('benchmark')
+
+    with TemporaryDirectory() as test_dir:
+        keys_file = os.path.join(test_dir, 'keys')
+
+        for name, datastore_class, cache_ttl in (
+            ('keys file', UncachedKeysDatastore, 0),
+            ('key ring', CredentialsDatastore, 0),
+            ('cached', CredentialsDatastore, 60)
+        ):
+            datastore = datastore_class(
+                os.path.join(test_dir, 'creds'),
+                keys_file,
+                log,
+                cache_ttl=cache_ttl
+            )
+
+            for account in ACCOUNTS:
+                datastore.save_credentials(
+                    'ec2', account, 'user1',
+                    {'access_key_id': 'key', 'secret_access_key': 'secret'}
+                )
+
+            print('{0:>10}: {1:10.1f} requests/s'.format(
+                name, run(datastore, requests)
+            ))
+            datastore.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Benchmark boto3 client construction with and without the client cache.
+#
+# Creates clients for a few accounts and regions the way the create,
+# replicate and test services do in their loops and reports the time
+# per get_client call. No requests are sent to AWS.
+#
+# Usage: python benchmark_ec2_client.py [calls]
+import sys
+import time
+
+import boto3
+
+from mash.utils.ec2 import ClientCache
+
+ACCOUNTS = [('AKIA{0:016d}'.format(index), 'secret') for index in range(3)]
+REGIONS = ['us-east-1', 'us-east-2', 'us-west-1', 'eu-central-1']
+
+
+def uncached_client(service_name, access_key_id, secret_access_key, region):
+    session = boto3.session.Session()
+    return session.client(
+        service_name=service_name,
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name=region,
+    )
+
+
+def run(get_client, calls):
+    start = time.time()
+
+    for index in range(calls):
+        access_key_id, secret_access_key = ACCOUNTS[index % len(ACCOUNTS)]
+        region = REGIONS[index % len(REGIONS)]
+        get_client('ec2', access_key_id, secret_access_key, region)
+
+    return (time.time() - start) / calls * 1000
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print('calls={0} keys={1}'.format(calls, len(ACCOUNTS) * len(REGIONS)))
+
+    for name, get_client in (
+        ('uncached', uncached_client),
+        ('cached', ClientCache().get_client)
+    ):
+        print('{0:>9}: {1:8.3f} ms per client'.format(
+            name, run(get_client, calls)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# Benchmark listener service job throughput at different prefetch values.
+#
+# Pushes synthetic listener_msg messages through an in-process stand-in
+# broker that honours the consumer prefetch window the same way RabbitMQ
+# does (no more than prefetch_count unacked deliveries per channel).
+#
+# Usage: python benchmark_listener_prefetch.py [messages] [job_seconds]
+import logging
+import sys
+import threading
+import time
+
+from apscheduler import events
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from pytz import utc
+
+from mash.services.listener_service import ListenerService
+from mash.services.status_levels import SUCCESS
+from mash.utils.json_format import JsonFormat
+
+
+class StandInMessage(object):
+    def __init__(self, channel, body):
+        self.channel = channel
+        self.body = body
+
+    def ack(self):
+        self.channel.ack()
+
+
+class StandInBasic(object):
+    def __init__(self, channel):
+        self.channel = channel
+
+    def qos(self, prefetch_count=0):
+        self.channel.prefetch_count = prefetch_count
+
+    def consume(self, callback, queue):
+        self.channel.callback = callback
+
+    def publish(self, **kwargs):
+        pass
+
+
+class StandInChannel(object):
+    """Channel delivering queued messages within the prefetch window."""
+    def __init__(self, messages=None):
+        self.basic = StandInBasic(self)
+        self.prefetch_count = 0
+        self.callback = None
+        self.messages = list(messages or [])
+        self.unacked = 0
+        self.acked = 0
+        self.is_open = True
+        self.condition = threading.Condition()
+
+    def ack(self):
+        with self.condition:
+            self.unacked -= 1
+            self.acked += 1
+            self.condition.notify_all()
+
+    def _can_deliver(self):
+        if not self.messages:
+            return False
+
+        if not self.prefetch_count:
+            return True
+
+        return self.unacked < self.prefetch_count
+
+    def start_consuming(self):
+        while self.is_open:
+            with self.condition:
+                while self.is_open and not self._can_deliver():
+                    self.condition.wait(0.1)
+
+                if not self.is_open:
+                    return
+
+                body = self.messages.pop(0)
+                self.unacked += 1
+
+            self.callback(StandInMessage(self, body))
+
+    def stop_consuming(self):
+        pass
+
+    def close(self):
+        with self.condition:
+            self.is_open = False
+            self.condition.notify_all()
+
+
+class StandInJob(object):
+    def __init__(self, job_id, duration):
+        self.id = job_id
+        self.duration = duration
+        self.job_file = '/nonexistent/job-{0}.json'.format(job_id)
+        self.status = SUCCESS
+
+    def get_job_id(self):
+        return {'job_id': self.id}
+
+    def set_status_message(self, message):
+        pass
+
+    def get_status_message(self):
+        return {'id': self.id, 'status': self.status}
+
+    def process_job(self):
+        time.sleep(self.duration)
+
+
+def build_service(thread_pool_count):
+    service = ListenerService.__new__(ListenerService)
+    service.service_exchange = 'upload'
+    service.prev_service = 'obs'
+    service.listener_msg_key = 'listener_msg'
+    service.channel = StandInChannel()
+    service.channel_lock = threading.Lock()
+    service.consumers = []
+    service.jobs = {}
+    service.log = logging.getLogger('benchmark')
+    service.log.addHandler(logging.NullHandler())
+    service.log.propagate = False
+
+    service.scheduler = BackgroundScheduler(
+        executors={'default': ThreadPoolExecutor(thread_pool_count)},
+        timezone=utc
+    )
+    service.scheduler.add_listener(
+        service._process_job_result,
+        events.EVENT_JOB_EXECUTED | events.EVENT_JOB_ERROR
+    )
+    return service
+
+
+def run(messages, prefetch_count, job_seconds, thread_pool_count=10):
+    service = build_service(thread_pool_count)
+    bodies = []
+
+    for index in range(messages):
+        job_id = str(index)
+        service.jobs[job_id] = StandInJob(job_id, job_seconds)
+        bodies.append(JsonFormat.json_message(
+            {'obs_result': {'id': job_id, 'status': SUCCESS}}
+        ))
+
+    channel = StandInChannel(bodies)
+    channel.basic.qos(prefetch_count=prefetch_count)
+    channel.basic.consume(service._handle_listener_message, 'obs.listener')
+
+    consumer = threading.Thread(target=channel.start_consuming, daemon=True)
+    service.scheduler.start()
+
+    start = time.time()
+    consumer.start()
+
+    with channel.condition:
+        while channel.acked < messages:
+            channel.condition.wait(0.1)
+
+    elapsed = time.time() - start
+    channel.close()
+    service.scheduler.shutdown()
+
+    return messages / elapsed
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    job_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    print('messages={0} job_seconds={1} thread_pool_count=10'.format(
+        messages, job_seconds
+    ))
+    for prefetch_count in (1, 2, 5, 10, 20):
+        jobs_per_second = run(messages, prefetch_count, job_seconds)
+        print('prefetch={0:>3}: {1:8.1f} jobs/sec'.format(
+            prefetch_count, jobs_per_second
+        ))
+
+
+if __name__ == '__main__':
+    main()
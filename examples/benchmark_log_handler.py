@@ -0,0 +1,92 @@
+# Benchmark the synchronous and buffered RabbitMQ log handlers.
+#
+# Logs a tight loop of records through each handler against a stand-in
+# connection that simulates the cost of a broker publish and reports
+# the records/sec seen by the logging thread and the time to drain.
+#
+# Usage: python benchmark_log_handler.py [records] [publish_ms]
+import logging
+import sys
+import time
+
+from unittest.mock import patch
+
+from mash.log.handler import BufferedRabbitMQHandler, RabbitMQHandler
+
+
+class StandInChannel(object):
+    def __init__(self, publish_seconds):
+        self.publish_seconds = publish_seconds
+        self.published = 0
+        self.is_closed = False
+        self.basic = self
+        self.exchange = self
+
+    def declare(self, **kwargs):
+        pass
+
+    def publish(self, **kwargs):
+        time.sleep(self.publish_seconds)
+        self.published += 1
+
+
+class StandInConnection(object):
+    channel_instance = None
+
+    def __init__(self, *args, **kwargs):
+        self.is_open = True
+        self.is_closed = False
+
+    def channel(self):
+        return self.channel_instance
+
+    def close(self):
+        self.is_open = False
+        self.is_closed = True
+
+
+def run(handler, records, channel):
+    log = logging.getLogger('benchmark-{0}'.format(type(handler).__name__))
+    log.handlers = [handler]
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+
+    start = time.time()
+    for index in range(records):
+        log.info('Uploaded {0} bytes'.format(index), extra={'job_id': '1'})
+    logged = time.time() - start
+
+    handler.flush()
+    drained = time.time() - start
+    handler.close()
+
+    return records / logged, drained, channel.published
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    publish_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    print('records={0} publish_ms={1}'.format(records, publish_ms))
+
+    for name, handler_class, kwargs in (
+        ('sync', RabbitMQHandler, {}),
+        ('buffered', BufferedRabbitMQHandler, {'capacity': records})
+    ):
+        channel = StandInChannel(publish_ms / 1000)
+        StandInConnection.channel_instance = channel
+
+        with patch('mash.utils.amqp.Connection', StandInConnection):
+            handler = handler_class(**kwargs)
+            rate, drained, published = run(handler, records, channel)
+
+        print(
+            '{0:>8}: {1:10.1f} records/sec in logging thread, '
+            'drained in {2:.2f}s, published {3}'.format(
+                name, rate, drained, published
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Benchmark job log writes in the logger service.
+#
+# Compares opening, appending and closing the job log file for every
+# log line against the buffered JobLogWriter with cached file handles.
+#
+# Usage: python benchmark_logger_writer.py [lines] [jobs]
+import os
+import sys
+import tempfile
+import time
+
+from mash.services.logger.writer import JobLogWriter
+
+LINE = 'INFO 2020-01-01 00:00:00.000000 UploadService Uploaded image\n'
+
+
+def write_unbuffered(paths, lines):
+    for index in range(lines):
+        with open(paths[index % len(paths)], 'a') as job_log:
+            job_log.write(LINE)
+
+
+def write_buffered(paths, lines):
+    writer = JobLogWriter()
+
+    for index in range(lines):
+        writer.write(paths[index % len(paths)], LINE)
+
+    writer.close()
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print('lines={0} jobs={1}'.format(lines, jobs))
+
+    for name, write in (
+        ('open/close', write_unbuffered),
+        ('buffered', write_buffered)
+    ):
+        with tempfile.TemporaryDirectory() as log_dir:
+            paths = [
+                os.path.join(log_dir, '{0}.log'.format(job))
+                for job in range(jobs)
+            ]
+
+            start = time.time()
+            write(paths, lines)
+            elapsed = time.time() - start
+
+        print('{0:>10}: {1:10.1f} lines/sec'.format(name, lines / elapsed))
+
+
+if __name__ == '__main__':
+    main()
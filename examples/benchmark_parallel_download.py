@@ -0,0 +1,89 @@
+# Benchmark single stream and parallel range image downloads.
+#
+# Serves a random image from a local HTTP server which limits the
+# throughput of every connection, like a distant mirror, and downloads
+# it with 1 and N connections.
+#
+# Usage: python benchmark_parallel_download.py [size_mb] [connections]
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mash.utils.download import ParallelDownload
+
+# Bytes per second of a single connection
+CONNECTION_RATE = 8 * 1024 * 1024
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.server.data)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        data = self.server.data
+        start, end = 0, len(data) - 1
+        requested = self.headers.get('Range')
+
+        if requested:
+            start, end = map(int, requested[len('bytes='):].split('-'))
+
+        self.send_response(206 if requested else 200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        block = 65536
+        for offset in range(start, end + 1, block):
+            self.wfile.write(data[offset:min(offset + block, end + 1)])
+            time.sleep(block / CONNECTION_RATE)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottledHandler)
+    server.daemon_threads = True
+    server.data = os.urandom(size * 1024 * 1024)
+    checksum = hashlib.sha256(server.data).hexdigest()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{0}/image.raw.xz'.format(server.server_port)
+
+    print('size_mb={0} connection_rate_mb={1}'.format(
+        size, CONNECTION_RATE // (1024 * 1024)
+    ))
+
+    for count in (1, connections):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            download = ParallelDownload(
+                url,
+                os.path.join(temp_dir, 'image.raw.xz'),
+                checksum,
+                connections=count,
+                chunk_size=4 * 1024 * 1024
+            )
+            start = time.time()
+            download.download()
+            elapsed = time.time() - start
+
+        print('{0:>3} connections: {1:6.2f}s {2:8.1f} MB/s'.format(
+            count, elapsed, size / elapsed
+        ))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
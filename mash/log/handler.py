@@ -16,12 +16,15 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+import collections
 import json
-
-from amqpstorm import Connection
+import threading
+import time
 
 from logging.handlers import SocketHandler
 
+from mash.utils.amqp import get_publisher, release_publisher
+
 
 class RabbitMQHandler(SocketHandler):
     """
@@ -58,8 +61,12 @@ class RabbitMQHandler(SocketHandler):
     def makePickle(self, record):
         """
         Format the log message to a json string.
+
+        Job logs also carry the unformatted message, level, logger name
+        and creation time for the structured job log store.
         """
         rabbit_attrs = ['msg', 'job_id']
+        job_attrs = ['message', 'levelname', 'name', 'created']
 
         data = {}
         record.msg = self.format(record)
@@ -68,15 +75,191 @@ class RabbitMQHandler(SocketHandler):
             if hasattr(record, attr):
                 data[attr] = getattr(record, attr)
 
+        if 'job_id' in data:
+            for attr in job_attrs:
+                data[attr] = getattr(record, attr)
+
         return json.dumps(data, sort_keys=True)
 
 
+class BufferedRabbitMQHandler(RabbitMQHandler):
+    """
+    Log handler that ships messages to RabbitMQ in the background.
+
+    Records are formatted in the logging thread and pushed onto a
+    bounded buffer. A worker thread publishes the buffer in batches of
+    up to batch_size messages at least every flush_interval seconds so
+    logging never waits on the broker.
+
+    When the buffer is full the oldest message is dropped, or if block
+    is set the logging thread waits for free space.
+    """
+    def __init__(
+        self, host='localhost', port=5672, exchange='logger',
+        username='guest', password='guest',
+        routing_key='mash.logger', capacity=10000, batch_size=100,
+        flush_interval=1, block=False
+    ):
+        """
+        Initialize the handler instance and start the worker thread.
+        """
+        super(BufferedRabbitMQHandler, self).__init__(
+            host, port, exchange, username, password, routing_key
+        )
+
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = block
+
+        self.buffer = collections.deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.flushing = False
+        self.sending = 0
+        self.metrics = {
+            'published': 0,
+            'dropped': 0,
+            'failed': 0
+        }
+
+        self.worker = threading.Thread(
+            target=self._ship_logs,
+            name='log-shipper',
+            daemon=True
+        )
+        self.worker.start()
+
+    def emit(self, record):
+        """
+        Format the record and add it to the buffer.
+        """
+        try:
+            msg = self.makePickle(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self.condition:
+            while self.block and len(self.buffer) >= self.capacity:
+                self.condition.wait()
+
+            if len(self.buffer) >= self.capacity:
+                self.metrics['dropped'] += 1
+
+            self.buffer.append(msg)
+
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify_all()
+
+    def _next_batch(self):
+        """
+        Wait for a full batch or the flush interval and return batch.
+        """
+        with self.condition:
+            deadline = time.time() + self.flush_interval
+
+            while len(self.buffer) < self.batch_size and not (
+                self.closed or self.flushing
+            ):
+                remaining = deadline - time.time()
+
+                if remaining <= 0:
+                    break
+
+                self.condition.wait(remaining)
+
+            count = min(self.batch_size, len(self.buffer))
+            batch = [self.buffer.popleft() for _ in range(count)]
+            self.sending = count
+            self.condition.notify_all()
+
+        return batch
+
+    def _send_batch(self, batch):
+        """
+        Publish the batch, counting the messages lost on failure.
+        """
+        result = 'published'
+
+        try:
+            if self.sock is None:
+                self.sock = self.makeSocket()
+
+            self.sock.send_batch(batch)
+        except Exception:
+            result = 'failed'
+
+            if self.sock:
+                self.sock.close()
+                self.sock = None
+
+        with self.condition:
+            self.metrics[result] += len(batch)
+            self.sending = 0
+            self.condition.notify_all()
+
+    def _ship_logs(self):
+        """
+        Worker thread loop publishing batches until the handler closes.
+        """
+        while True:
+            batch = self._next_batch()
+
+            if batch:
+                self._send_batch(batch)
+            elif self.closed:
+                break
+
+    def flush(self, timeout=10):
+        """
+        Wait until all buffered messages have been sent.
+        """
+        deadline = time.time() + timeout
+
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+
+            while (self.buffer or self.sending) and self.worker.is_alive():
+                remaining = deadline - time.time()
+
+                if remaining <= 0:
+                    break
+
+                self.condition.wait(remaining)
+
+            self.flushing = False
+
+    def close(self):
+        """
+        Flush buffered messages, stop the worker and close the socket.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        self.worker.join(self.flush_interval + 10)
+        super(BufferedRabbitMQHandler, self).close()
+
+    def get_metrics(self):
+        """
+        Return the published, dropped, failed and buffered counts.
+        """
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['buffered'] = len(self.buffer)
+
+        return metrics
+
+
 class RabbitMQSocket(object):
     """
     RabbitMQ socket class.
 
-    Maintains a connection for logging and publishing
-    logs to exchange.
+    Publishes logs to exchange on the publisher pool shared by the
+    log handlers of the process. Log messages are not confirmed by
+    the broker so logging does not wait for a confirm round trip.
     """
     def __init__(
         self, host, port, username, password, exchange, routing_key
@@ -90,55 +273,61 @@ class RabbitMQSocket(object):
         self.password = password
         self.exchange = exchange
         self.routing_key = routing_key
-        self.connection = None
-        self.channel = None
+        self.publisher = None
         self.open()
         self.declare_exchange()
 
     def close(self):
         """
-        Close socket connection.
-        """
-        if self.channel and self.channel.is_open:
-            self.channel.close()
+        Release the publisher pool.
 
-        if self.connection and self.connection.is_open:
-            self.connection.close()
+        The pool is shared with the other log handlers of the process
+        and closed when the last handler released it.
+        """
+        if self.publisher:
+            release_publisher(self.publisher)
+            self.publisher = None
 
     def declare_exchange(self):
-        self.channel.exchange.declare(
-            exchange=self.exchange,
-            exchange_type='direct',
-            durable=True
-        )
+        with self.publisher.channel() as channel:
+            channel.exchange.declare(
+                exchange=self.exchange,
+                exchange_type='direct',
+                durable=True
+            )
 
     def open(self):
         """"
-        Create/open connection and declare logging exchange.
+        Get the publisher pool of the process for the broker.
         """
-        if not self.connection or self.connection.is_closed:
-            self.connection = Connection(
+        if not self.publisher:
+            self.publisher = get_publisher(
                 self.host,
                 self.username,
                 self.password,
                 port=self.port,
-                kwargs={'heartbeat': 600}
+                confirm=False
             )
 
-        if not self.channel or self.channel.is_closed:
-            self.channel = self.connection.channel()
+    def send_batch(self, msgs):
+        """
+        Publish a list of messages to exchange.
+        """
+        self.open()
+        self.publisher.publish_batch(
+            self.exchange,
+            [(self.routing_key, msg) for msg in msgs],
+            mandatory=False
+        )
 
     def sendall(self, msg):
         """
         Override socket sendall method to publish message to exchange.
         """
         self.open()
-        self.channel.basic.publish(
-            body=msg,
-            routing_key=self.routing_key,
-            exchange=self.exchange,
-            properties={
-                'content_type': 'application/json',
-                'delivery_mode': 2
-            }
+        self.publisher.publish(
+            self.exchange,
+            self.routing_key,
+            msg,
+            mandatory=False
         )
@@ -27,6 +27,7 @@ from mash.log.filter import BaseServiceFilter
 from mash.utils.mash_utils import setup_logfile, setup_rabbitmq_log_handler
 from mash.utils.email_notification import EmailNotification
 
+from mash.services.api.utils.amqp import connect
 from mash.services.api.utils.tokens import is_token_revoked
 
 from mash.services.api.routes.api_spec import spec_api
@@ -60,11 +61,21 @@ def create_app(config_object):
     app.config.from_object(config_object)
     register_extensions(app)
     register_namespaces()
+    configure_publisher(app)
     configure_logger(app)
     configure_mailer(app)
     return app
 
 
+def configure_publisher(app):
+    """
+    Create the publisher pool before any request or log uses it.
+
+    The app holds one reference on the pool for its lifetime.
+    """
+    app.extensions['publisher'] = connect(app.config)
+
+
 def configure_logger(app):
     """Configure loggers."""
     app.logger.removeHandler(default_handler)
@@ -40,10 +40,18 @@ class Config(object):
     def AMQP_PASS(self):
         return self.config.get_amqp_pass()
 
+    @property
+    def AMQP_PUBLISHER_CHANNELS(self):
+        return self.config.get_publisher_channel_count()
+
     @property
     def LOG_FILE(self):
         return self.config.get_log_file('api')
 
+    @property
+    def JOB_LOG_STORE_DIRECTORY(self):
+        return self.config.get_job_log_store_directory()
+
     @property
     def CLOUD_DATA(self):
         return self.config.get_cloud_data()
@@ -17,14 +17,20 @@
 #
 
 from flask import jsonify, make_response, current_app
-from flask_restplus import Namespace, Resource
+from flask_restplus import Namespace, Resource, inputs
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from mash.services.api.schema import (
     default_response,
     validation_error
 )
-from mash.services.api.utils.jobs import delete_job, get_job, get_jobs
+from mash.services.api.schema.jobs import job_log, job_logs_response
+from mash.services.api.utils.jobs import (
+    delete_job,
+    get_job,
+    get_job_logs,
+    get_jobs
+)
 from mash.services.database.routes.jobs import job_response, job_data
 
 
@@ -35,6 +41,31 @@ api = Namespace(
 
 api.models['job_data'] = job_data
 api.models['job_response'] = job_response
+api.models['job_log'] = job_log
+api.models['job_logs_response'] = job_logs_response
+
+job_logs_parser = api.parser()
+job_logs_parser.add_argument(
+    'start', type=inputs.natural, default=0, location='args',
+    help='Position of the first log to return.'
+)
+job_logs_parser.add_argument(
+    'limit', type=inputs.int_range(1, 1000), default=100, location='args',
+    help='Max number of logs to return.'
+)
+job_logs_parser.add_argument(
+    'level', type=str, location='args',
+    choices=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'),
+    help='Only return logs of this level or higher.'
+)
+job_logs_parser.add_argument(
+    'service', type=str, location='args',
+    help='Only return logs from this service.'
+)
+job_logs_parser.add_argument(
+    'tail', type=inputs.boolean, default=False, location='args',
+    help='Return the last logs instead of reading from start.'
+)
 
 validation_error_response = api.schema_model(
     'validation_error', validation_error
@@ -108,3 +139,35 @@ class Job(Resource):
             return make_response(jsonify(job), 200)
         else:
             return make_response(jsonify({'msg': 'Job not found'}), 404)
+
+
+@api.route('/<string:job_id>/logs')
+@api.doc(security='apiKey')
+@api.response(400, 'Validation error', default_response)
+@api.response(401, 'Unauthorized', default_response)
+@api.response(422, 'Not processable', default_response)
+class JobLogs(Resource):
+    @api.doc('get_job_logs')
+    @jwt_required
+    @api.expect(job_logs_parser)
+    @api.response(200, 'Success', job_logs_response)
+    @api.response(404, 'Not found', default_response)
+    def get(self, job_id):
+        """
+        Get a page of structured logs for job.
+        """
+        args = job_logs_parser.parse_args()
+
+        try:
+            logs = get_job_logs(job_id, get_jwt_identity(), **args)
+        except Exception as error:
+            current_app.logger.warning(error)
+            return make_response(
+                jsonify({'msg': str(error)}),
+                400
+            )
+
+        if logs is None:
+            return make_response(jsonify({'msg': 'Job not found'}), 404)
+
+        return make_response(jsonify(logs), 200)
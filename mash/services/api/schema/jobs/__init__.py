@@ -16,6 +16,8 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+from flask_restplus import fields, Model
+
 from mash.services.api.schema import (
     email,
     non_empty_string,
@@ -294,3 +296,26 @@ base_job_message = {
         'download_url'
     ]
 }
+
+job_log = Model(
+    'job_log', {
+        'timestamp': fields.String(example='2020-01-01T12:00:00.123456'),
+        'created': fields.Float(example=1577880000.123456),
+        'level': fields.String(example='ERROR'),
+        'service': fields.String(example='test'),
+        'job_id': fields.String(
+            example='12345678-1234-1234-1234-123456789012'
+        ),
+        'message': fields.String(example='Image tests failed.')
+    }
+)
+
+job_logs_response = Model(
+    'job_logs_response', {
+        'logs': fields.List(fields.Nested(job_log)),
+        'next': fields.Integer(
+            example=100,
+            description='Position to use as start for the next page.'
+        )
+    }
+)
@@ -16,42 +16,35 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
-import sys
-
-from amqpstorm import Connection
 from flask import current_app
 
-module = sys.modules[__name__]
+from mash.utils.amqp import get_publisher
 
-connection = None
-channel = None
 
+def connect(config=None):
+    """
+    Return the publisher pool of the process for the configured broker.
 
-def connect():
-    module.connection = Connection(
-        current_app.config['AMQP_HOST'],
-        current_app.config['AMQP_USER'],
-        current_app.config['AMQP_PASS'],
-        kwargs={'heartbeat': 600}
+    Every call takes a reference on the pool, the app gets the pool
+    once when it is created and shares it with all request threads.
+    """
+    config = config or current_app.config
+
+    return get_publisher(
+        config['AMQP_HOST'],
+        config['AMQP_USER'],
+        config['AMQP_PASS'],
+        channel_count=config['AMQP_PUBLISHER_CHANNELS']
     )
-    module.channel = connection.channel()
-    channel.confirm_deliveries()
 
 
 def publish(exchange, routing_key, message):
     """
     Publish message to the provided exchange with the routing key.
+
+    Messages are published on a shared pool of channels so concurrent
+    requests do not wait on a single channel.
     """
-    if not channel or channel.is_closed:
-        connect()
-
-    channel.basic.publish(
-        body=message,
-        routing_key=routing_key,
-        exchange=exchange,
-        properties={
-            'content_type': 'application/json',
-            'delivery_mode': 2
-        },
-        mandatory=True
+    current_app.extensions['publisher'].publish(
+        exchange, routing_key, message
     )
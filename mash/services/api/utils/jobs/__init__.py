@@ -28,6 +28,7 @@ from mash.utils.mash_utils import normalize_dictionary
 from mash.services.status_levels import RUNNING
 from mash.utils.mash_utils import handle_request
 from mash.services.api.utils.users import get_user_by_id
+from mash.services.logger.store import JobLogReader
 
 
 def get_new_job_id():
@@ -216,3 +217,26 @@ def delete_job(job_id, user_id):
         raise MashJobException('Delete job failed')
 
     return rows_deleted
+
+
+def get_job_logs(
+    job_id, user_id, start=0, limit=100, level=None, service=None,
+    tail=False
+):
+    """
+    Get a page of structured logs for the given user's job.
+
+    Returns None if the job does not exist for the user.
+    """
+    if not get_job(job_id, user_id):
+        return None
+
+    reader = JobLogReader(current_app.config['JOB_LOG_STORE_DIRECTORY'])
+    return reader.read(
+        job_id,
+        start=start,
+        limit=limit,
+        level=level,
+        service=service,
+        tail=tail
+    )
@@ -93,6 +93,50 @@ class BaseConfig(object):
         log_dir = self._get_attribute(attribute='log_dir')
         return log_dir or Defaults.get_log_directory()
 
+    def get_log_queue_capacity(self):
+        """
+        Return the capacity of the in-memory log shipping buffer.
+
+        If 0 (the default) logs are published synchronously.
+
+        :rtype: int
+        """
+        log_queue_capacity = self._get_attribute(
+            attribute='log_queue_capacity'
+        )
+        return log_queue_capacity or Defaults.get_log_queue_capacity()
+
+    def get_log_batch_size(self):
+        """
+        Return the max number of logs published in one batch.
+
+        :rtype: int
+        """
+        log_batch_size = self._get_attribute(attribute='log_batch_size')
+        return log_batch_size or Defaults.get_log_batch_size()
+
+    def get_log_flush_interval(self):
+        """
+        Return the max seconds buffered logs wait before publishing.
+
+        :rtype: int
+        """
+        log_flush_interval = self._get_attribute(
+            attribute='log_flush_interval'
+        )
+        return log_flush_interval or Defaults.get_log_flush_interval()
+
+    def get_log_queue_block(self):
+        """
+        Return True if logging blocks when the log buffer is full.
+
+        Otherwise the oldest buffered log is dropped.
+
+        :rtype: bool
+        """
+        log_queue_block = self._get_attribute(attribute='log_queue_block')
+        return log_queue_block or Defaults.get_log_queue_block()
+
     def get_job_directory(self, service_name):
         """
         Return job directory path based on service name attribute.
@@ -125,6 +169,15 @@ class BaseConfig(object):
         )
         return os.path.expanduser(os.path.normpath(log_file))
 
+    def get_job_log_store_directory(self):
+        """
+        Return the directory of the structured job log store.
+
+        :rtype: string
+        """
+        store_dir = os.path.join(self.get_log_directory(), 'job_store')
+        return os.path.expanduser(os.path.normpath(store_dir))
+
     def get_cloud_data(self):
         """
         Return the cloud data from config.
@@ -210,6 +263,19 @@ class BaseConfig(object):
 
         return amqp_pass or Defaults.get_amqp_pass()
 
+    def get_publisher_channel_count(self):
+        """
+        Return the number of channels in the amqp publisher pool.
+
+        :rtype: int
+        """
+        publisher_channel_count = self._get_attribute(
+            attribute='publisher_channel_count'
+        )
+
+        return publisher_channel_count or \
+            Defaults.get_publisher_channel_count()
+
     def get_smtp_host(self):
         """
         Return the smtp hostname.
@@ -302,6 +368,24 @@ class BaseConfig(object):
 
         return credentials_url or Defaults.get_credentials_url()
 
+    def get_job_credentials_ttl(self):
+        """
+        Return the seconds credentials are cached by the job services.
+
+        job_credentials_ttl: 60
+
+        A value of 0 disables the cache.
+
+        :rtype: int
+        """
+        job_credentials_ttl = self._get_attribute(
+            attribute='job_credentials_ttl'
+        )
+        if job_credentials_ttl is None:
+            job_credentials_ttl = Defaults.get_job_credentials_ttl()
+
+        return job_credentials_ttl
+
     def get_database_uri(self):
         """
         Return the database uri.
@@ -402,6 +486,113 @@ class BaseConfig(object):
         )
         return base_thread_pool_count or Defaults.get_base_thread_pool_count()
 
+    def get_service_prefetch_count(self):
+        """
+        Return the prefetch count for listener services job document queue.
+
+        :return: int
+        """
+        service_prefetch_count = self._get_attribute(
+            attribute='service_prefetch_count'
+        )
+        return service_prefetch_count or Defaults.get_service_prefetch_count()
+
+    def get_listener_prefetch_count(self):
+        """
+        Return the prefetch count for listener services listener queue.
+
+        If not configured the listener service uses the thread pool count
+        to keep every worker thread busy.
+
+        :return: int
+        """
+        return self._get_attribute(attribute='listener_prefetch_count')
+
+    def get_service_instance_count(self, service):
+        """
+        Return the number of instances sharing the work of a service.
+
+        Jobs are partitioned across instances by job id. Instances
+        must share the job directory, e.g. on a network file system,
+        so a job file added before a change of the instance count is
+        loaded by the new owner. An instance does not start before it
+        finds the other instances in the job directory:
+
+        upload:
+          instance_count: 3
+          instance_index: 0
+
+        :return: int
+        """
+        instance_count = self._get_attribute(
+            attribute='instance_count',
+            element=service
+        )
+        return instance_count or Defaults.get_service_instance_count()
+
+    def get_service_instance_index(self, service):
+        """
+        Return the index of this instance of the service.
+
+        :return: int
+        """
+        instance_index = self._get_attribute(
+            attribute='instance_index',
+            element=service
+        )
+        return instance_index or Defaults.get_service_instance_index()
+
+    def get_region_max_workers(self, service):
+        """
+        Return the max number of regions a job works on at once.
+
+        publish:
+          region_max_workers: 8
+
+        :return: int
+        """
+        region_max_workers = self._get_attribute(
+            attribute='region_max_workers',
+            element=service
+        )
+        return region_max_workers or Defaults.get_region_max_workers()
+
+    def get_max_concurrent_regions(self, service):
+        """
+        Return the max number of regions all jobs of the service
+        work on at once.
+
+        create:
+          max_concurrent_regions: 8
+
+        :return: int
+        """
+        max_concurrent_regions = self._get_attribute(
+            attribute='max_concurrent_regions',
+            element=service
+        )
+        return max_concurrent_regions or \
+            Defaults.get_max_concurrent_regions()
+
+    def get_continue_on_region_error(self, service):
+        """
+        Return True if jobs continue in other regions after a failure.
+
+        The failed regions are reported as errors of the job once all
+        regions finished.
+
+        publish:
+          continue_on_region_error: true
+
+        :return: bool
+        """
+        continue_on_region_error = self._get_attribute(
+            attribute='continue_on_region_error',
+            element=service
+        )
+        return continue_on_region_error or \
+            Defaults.get_continue_on_region_error()
+
     def get_publish_thread_pool_count(self):
         """
         Return the thread pool count for publish background scheduler.
@@ -45,6 +45,22 @@ class Defaults(object):
     def get_log_directory(self):
         return '/var/log/mash/'
 
+    @staticmethod
+    def get_log_queue_capacity():
+        return 0
+
+    @staticmethod
+    def get_log_batch_size():
+        return 100
+
+    @staticmethod
+    def get_log_flush_interval():
+        return 1
+
+    @staticmethod
+    def get_log_queue_block():
+        return False
+
     @classmethod
     def get_service_names(self):
         return [
@@ -64,6 +80,10 @@ class Defaults(object):
     def get_amqp_pass():
         return 'guest'
 
+    @staticmethod
+    def get_publisher_channel_count():
+        return 4
+
     @classmethod
     def get_non_credential_service_names(self):
         return ['obs']
@@ -76,6 +96,18 @@ class Defaults(object):
     def get_azure_max_workers():
         return 5
 
+    @staticmethod
+    def get_upload_part_size():
+        return 67108864
+
+    @staticmethod
+    def get_upload_max_workers():
+        return 4
+
+    @staticmethod
+    def get_upload_max_retry_attempts():
+        return 3
+
     @staticmethod
     def get_smtp_host():
         return 'localhost'
@@ -96,6 +128,10 @@ class Defaults(object):
     def get_credentials_url():
         return 'http://localhost:8080/'
 
+    @staticmethod
+    def get_job_credentials_ttl():
+        return 60
+
     @staticmethod
     def get_email_whitelist():
         return []
@@ -120,6 +156,34 @@ class Defaults(object):
     def get_base_thread_pool_count():
         return 10
 
+    @staticmethod
+    def get_service_prefetch_count():
+        return 10
+
+    @staticmethod
+    def get_service_instance_count():
+        return 1
+
+    @staticmethod
+    def get_service_instance_index():
+        return 0
+
+    @staticmethod
+    def get_service_instance_wait_time():
+        return 300
+
+    @staticmethod
+    def get_region_max_workers():
+        return 8
+
+    @staticmethod
+    def get_max_concurrent_regions():
+        return 8
+
+    @staticmethod
+    def get_continue_on_region_error():
+        return False
+
     @staticmethod
     def get_publish_thread_pool_count():
         return 50
@@ -49,3 +49,23 @@ class CleanupConfig(BaseConfig):
         )
         return max_image_age if max_image_age else \
             CleanupDefaults.get_max_image_age()
+
+    def get_max_image_cache_size(self):
+        """
+        Return maximum size of the image cache (in bytes):
+
+        cleanup:
+          max_image_cache_size: 107374182400
+
+        Least recently used images which are no longer linked by
+        a job are evicted until the cache is below this size.
+        if no configuration exists the size from the Defaults class
+        is returned, 0 disables the size limit.
+
+        :rtype: int
+        """
+        max_image_cache_size = self._get_attribute(
+            attribute='max_image_cache_size', element='cleanup'
+        )
+        return max_image_cache_size if max_image_cache_size else \
+            CleanupDefaults.get_max_image_cache_size()
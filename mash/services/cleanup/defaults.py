@@ -24,3 +24,7 @@ class Defaults(object):
     @classmethod
     def get_max_image_age(self):
         return 90
+
+    @staticmethod
+    def get_max_image_cache_size():
+        return 0
@@ -24,6 +24,7 @@ from apscheduler.schedulers.background import BlockingScheduler
 from pytz import utc
 
 from mash.services.mash_service import MashService
+from mash.utils.image_cache import CACHE_DIRECTORY, ImageCache
 from mash.utils.mash_utils import setup_logfile
 
 
@@ -67,7 +68,18 @@ class CleanupService(MashService):
 
         with os.scandir(download_dir) as scanner:
             for entry in scanner:
+                if entry.name == CACHE_DIRECTORY:
+                    continue
+
                 if entry.is_dir(follow_symlinks=False):
                     if entry.stat().st_mtime < cutoff:
                         self.log.info('Purging {}'.format(entry.name))
                         shutil.rmtree(entry.path)
+
+        # Job directories are purged first so their cached images
+        # are no longer referenced and can be evicted.
+        ImageCache(download_dir).purge(
+            max_size=self.config.get_max_image_cache_size(),
+            max_age=max_image_age * 86400,
+            log_callback=self.log
+        )
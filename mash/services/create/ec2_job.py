@@ -16,6 +16,9 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tempfile import NamedTemporaryFile
 from collections import namedtuple
 from ec2imgutils.ec2uploadimg import EC2ImageUploader
@@ -29,15 +32,38 @@ from mash.utils.ec2 import (
     get_vpc_id_from_subnet,
     cleanup_ec2_image,
     image_exists,
+    image_name_cache,
     cleanup_all_ec2_images
 )
 from mash.utils.mash_utils import (
     format_string_with_date,
     generate_name,
-    timestamp_from_epoch
+    timestamp_from_epoch,
+    ResizableSemaphore
 )
 from mash.services.status_levels import SUCCESS, FAILED
 
+_region_slots = None
+_region_slots_lock = threading.Lock()
+
+
+def get_region_slots(count):
+    """
+    Return the semaphore limiting regions created at once in the service.
+
+    The semaphore is shared by all jobs of the service process and is
+    resized to the count of the latest job.
+    """
+    global _region_slots
+
+    with _region_slots_lock:
+        if _region_slots is None:
+            _region_slots = ResizableSemaphore(count)
+        else:
+            _region_slots.resize(count)
+
+    return _region_slots
+
 
 class EC2CreateJob(MashJob):
     """
@@ -127,29 +153,122 @@ class EC2CreateJob(MashJob):
 
         self.request_credentials(accounts)
 
-        for region, info in self.target_regions.items():
+        for region in self.target_regions:
             self.status_msg['source_regions'][region] = None
-            ssh_key_pair = None
-            account = info['account']
-            credentials = self.credentials[account]
 
-            use_root_swap = info['use_root_swap']
-            self.ec2_upload_parameters['launch_ami'] = info['helper_image']
-            self.ec2_upload_parameters['billing_codes'] = \
-                info['billing_codes']
+        max_workers = min(
+            self.config.get_region_max_workers('create'),
+            len(self.target_regions)
+        ) or 1
+        region_slots = get_region_slots(
+            self.config.get_max_concurrent_regions('create')
+        )
+        errors = {}
+        failed_region = None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._create_region_image, region, info, region_slots
+                ): region for region, info in self.target_regions.items()
+            }
+
+            for future in as_completed(futures):
+                region = futures[future]
+
+                if future.cancelled():
+                    continue
+
+                try:
+                    self.status_msg['source_regions'][region] = \
+                        future.result()
+                except Exception as error:
+                    errors[region] = error
+                    failed_region = failed_region or region
+
+                    # Unlike the sequential loop the other regions are
+                    # not all attempted. Regions not started yet are
+                    # cancelled as their images would be cleaned up.
+                    for pending in futures:
+                        pending.cancel()
 
-            self.ec2_upload_parameters['access_key'] = \
-                credentials['access_key_id']
-            self.ec2_upload_parameters['secret_key'] = \
-                credentials['secret_access_key']
+        for region, info in self.target_regions.items():
+            error = errors.get(region)
 
-            try:
-                ec2_client = get_client(
-                    'ec2', credentials['access_key_id'],
-                    credentials['secret_access_key'], region
+            if error:
+                self.status = FAILED
+                msg = 'Image creation in account {0} failed with: {1}'.format(
+                    info['account'],
+                    error
                 )
+                self.add_error_msg(msg)
+                self.log_callback.error(msg)
+            elif not self.status_msg['source_regions'][region]:
+                self.status = FAILED
+                msg = (
+                    'Image creation in region {0} cancelled after '
+                    'failure in region {1}.'.format(region, failed_region)
+                )
+                self.add_error_msg(msg)
+                self.log_callback.warning(msg)
 
-                exists = image_exists(ec2_client, self.cloud_image_name)
+        if self.status != SUCCESS:
+            for region, info in self.target_regions.items():
+                credentials = self.credentials[info['account']]
+
+                if self.status_msg['source_regions'].get(region):
+                    # Only cleanup regions that passed
+
+                    try:
+                        cleanup_ec2_image(
+                            credentials['access_key_id'],
+                            credentials['secret_access_key'],
+                            self.log_callback,
+                            region,
+                            image_id=self.status_msg['source_regions'][region]
+                        )
+                    except Exception as error:
+                        self.log_callback.warning(
+                            'Failed to cleanup image: {0} in region {1}.'
+                            ' {2}'.format(
+                                self.status_msg['source_regions'][region],
+                                region,
+                                error
+                            )
+                        )
+
+    def _create_region_image(self, region, info, region_slots):
+        """
+        Create the image in region and return the image id.
+
+        Runs in a worker thread of the job. The number of regions created
+        at once by all jobs of the service is limited by region_slots.
+        The temporary key pair and network setup of the region are
+        always cleaned up.
+        """
+        ssh_key_pair = None
+        ec2_setup = None
+        credentials = self.credentials[info['account']]
+
+        ec2_upload_parameters = dict(self.ec2_upload_parameters)
+        ec2_upload_parameters['launch_ami'] = info['helper_image']
+        ec2_upload_parameters['billing_codes'] = info['billing_codes']
+        ec2_upload_parameters['access_key'] = credentials['access_key_id']
+        ec2_upload_parameters['secret_key'] = \
+            credentials['secret_access_key']
+
+        with region_slots:
+            ec2_client = get_client(
+                'ec2', credentials['access_key_id'],
+                credentials['secret_access_key'], region
+            )
+
+            try:
+                exists = image_exists(
+                    ec2_client,
+                    self.cloud_image_name,
+                    (credentials['access_key_id'], region)
+                )
                 if exists and not self.force_replace_image:
                     raise MashUploadException(
                         '{image_name} already exists. '
@@ -178,9 +297,9 @@ class EC2CreateJob(MashJob):
                 # concept in the near future.
                 ssh_key_pair = self._create_key_pair(ec2_client)
 
-                self.ec2_upload_parameters['ssh_key_pair_name'] = \
+                ec2_upload_parameters['ssh_key_pair_name'] = \
                     ssh_key_pair.name
-                self.ec2_upload_parameters['ssh_key_private_key_file'] = \
+                ec2_upload_parameters['ssh_key_private_key_file'] = \
                     ssh_key_pair.private_key_file.name
 
                 # Create a temporary vpc, subnet and security group for the
@@ -202,70 +321,56 @@ class EC2CreateJob(MashJob):
                     subnet_id = ec2_setup.create_vpc_subnet()
                     security_group_id = ec2_setup.create_security_group()
 
-                self.ec2_upload_parameters['vpc_subnet_id'] = subnet_id
-                self.ec2_upload_parameters['security_group_ids'] = \
+                ec2_upload_parameters['vpc_subnet_id'] = subnet_id
+                ec2_upload_parameters['security_group_ids'] = \
                     security_group_id
 
-                ec2_upload = EC2ImageUploader(
-                    **self.ec2_upload_parameters
-                )
-
+                ec2_upload = EC2ImageUploader(**ec2_upload_parameters)
                 ec2_upload.set_region(region)
 
-                if use_root_swap:
-                    ami_id = ec2_upload.create_image_use_root_swap(
-                        self.status_msg['image_file']
-                    )
-                else:
-                    ami_id = ec2_upload.create_image(
-                        self.status_msg['image_file']
+                try:
+                    if info['use_root_swap']:
+                        ami_id = ec2_upload.create_image_use_root_swap(
+                            self.status_msg['image_file']
+                        )
+                    else:
+                        ami_id = ec2_upload.create_image(
+                            self.status_msg['image_file']
+                        )
+                finally:
+                    image_name_cache.invalidate(
+                        (credentials['access_key_id'], region)
                     )
 
-                self.status_msg['source_regions'][region] = ami_id
                 self.log_callback.info(
                     'Created image has ID: {0} in region {1}'.format(
                         ami_id, region
                     )
                 )
-            except Exception as error:
-                self.status = FAILED
-                msg = 'Image creation in account {0} failed with: {1}'.format(
-                    account,
-                    error
-                )
-                self.add_error_msg(msg)
-                self.log_callback.error(msg)
+                return ami_id
             finally:
-                if ssh_key_pair:
-                    self._delete_key_pair(
-                        ec2_client, ssh_key_pair
-                    )
-                    ec2_setup.clean_up()
-
-        if self.status != SUCCESS:
-            for region, info in self.target_regions.items():
-                credentials = self.credentials[info['account']]
+                self._clean_up_region(
+                    region, ec2_client, ssh_key_pair, ec2_setup
+                )
 
-                if self.status_msg['source_regions'].get(region):
-                    # Only cleanup regions that passed
+    def _clean_up_region(self, region, ec2_client, ssh_key_pair, ec2_setup):
+        """
+        Remove the temporary key pair and network setup of region.
 
-                    try:
-                        cleanup_ec2_image(
-                            credentials['access_key_id'],
-                            credentials['secret_access_key'],
-                            self.log_callback,
-                            region,
-                            image_id=self.status_msg['source_regions'][region]
-                        )
-                    except Exception as error:
-                        self.log_callback.warning(
-                            'Failed to cleanup image: {0} in region {1}.'
-                            ' {2}'.format(
-                                self.status_msg['source_regions'][region],
-                                region,
-                                error
-                            )
-                        )
+        Cleanup errors are logged so they do not hide the result of
+        the image creation.
+        """
+        try:
+            if ssh_key_pair:
+                self._delete_key_pair(ec2_client, ssh_key_pair)
+
+            if ec2_setup:
+                ec2_setup.clean_up()
+        except Exception as error:
+            self.log_callback.warning(
+                'Failed to cleanup temporary resources in region {0}.'
+                ' {1}'.format(region, error)
+            )
 
     def _create_key_pair(self, ec2_client):
         ssh_key_pair_type = namedtuple(
@@ -24,8 +24,10 @@ from flask.logging import default_handler
 
 from mash.utils.mash_utils import setup_logfile, setup_rabbitmq_log_handler
 from mash.log.filter import BaseServiceFilter
+from mash.services.credentials.commands import credentials_cli
 from mash.services.credentials.datastore import CredentialsDatastore
 from mash.services.credentials.routes import credentials
+from mash.services.credentials.stores import get_credentials_store
 
 
 def setup_app(app):
@@ -33,7 +35,15 @@ def setup_app(app):
     app.credentials_datastore = CredentialsDatastore(
         app.config['CREDS_DIR'],
         app.config['ENC_KEYS_FILE'],
-        app.logger
+        app.logger,
+        cache_ttl=app.config['CREDS_CACHE_TTL'],
+        cache_size=app.config['CREDS_CACHE_SIZE'],
+        rotation_workers=app.config['CREDS_ROTATION_WORKERS'],
+        store=get_credentials_store(
+            app.config['CREDS_STORAGE_BACKEND'],
+            app.config['CREDS_DIR'],
+            app.config['CREDS_DATABASE_FILE']
+        )
     )
     atexit.register(app.credentials_datastore.shutdown)
 
@@ -45,6 +55,7 @@ def create_app(config_object):
     app = Flask('CredentialsService', static_url_path='/static')
     app.config.from_object(config_object)
     register_blueprints(app)
+    register_commands(app)
     configure_logger(app)
     setup_app(app)
     return app
@@ -73,3 +84,8 @@ def configure_logger(app):
 def register_blueprints(app):
     """Register Flask blueprints."""
     app.register_blueprint(credentials.blueprint)
+
+
+def register_commands(app):
+    """Register Click commands."""
+    app.cli.add_command(credentials_cli)
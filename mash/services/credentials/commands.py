@@ -0,0 +1,59 @@
+# Copyright (c) 2026 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import click
+
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from mash.services.credentials.stores import (
+    FileCredentialsStore,
+    SQLiteCredentialsStore
+)
+
+credentials_cli = AppGroup('credentials')
+
+
+@credentials_cli.command(name='migrate')
+@with_appcontext
+def migrate_credentials():
+    """
+    Copy credentials files to the sqlite storage backend.
+
+    The encrypted credentials are copied as is in one transaction.
+    """
+    try:
+        source = FileCredentialsStore(current_app.config['CREDS_DIR'])
+        target = SQLiteCredentialsStore(
+            current_app.config['CREDS_DATABASE_FILE']
+        )
+
+        records = list(source.read_records())
+        target.write_many(records)
+        target.close()
+    except Exception as error:
+        raise click.ClickException(
+            'Unable to migrate credentials: {error}'.format(
+                error=error
+            )
+        )
+
+    click.echo(
+        'Migrated credentials of {count} account(s).'.format(
+            count=len(records)
+        )
+    )
@@ -51,3 +51,76 @@ class CredentialsConfig(BaseConfig):
         )
         return credentials_directory if credentials_directory else \
             Defaults.get_credentials_dir()
+
+    def get_credentials_cache_ttl(self):
+        """
+        Return the seconds decrypted credentials are cached.
+
+        credentials:
+          cache_ttl: 30
+
+        A value of 0 disables the cache.
+
+        :rtype: int
+        """
+        cache_ttl = self._get_attribute(
+            attribute='cache_ttl', element='credentials'
+        )
+        return cache_ttl or Defaults.get_credentials_cache_ttl()
+
+    def get_credentials_cache_size(self):
+        """
+        Return the max number of accounts with cached credentials.
+
+        credentials:
+          cache_size: 1024
+
+        :rtype: int
+        """
+        cache_size = self._get_attribute(
+            attribute='cache_size', element='credentials'
+        )
+        return cache_size or Defaults.get_credentials_cache_size()
+
+    def get_credentials_rotation_workers(self):
+        """
+        Return the number of credentials files rotated at once.
+
+        credentials:
+          rotation_workers: 8
+
+        :rtype: int
+        """
+        rotation_workers = self._get_attribute(
+            attribute='rotation_workers', element='credentials'
+        )
+        return rotation_workers or \
+            Defaults.get_credentials_rotation_workers()
+
+    def get_credentials_storage_backend(self):
+        """
+        Return the storage backend for credentials, file or sqlite.
+
+        credentials:
+          storage_backend: sqlite
+
+        :rtype: string
+        """
+        storage_backend = self._get_attribute(
+            attribute='storage_backend', element='credentials'
+        )
+        return storage_backend or Defaults.get_credentials_storage_backend()
+
+    def get_credentials_database_file(self):
+        """
+        Return the database file of the sqlite storage backend.
+
+        credentials:
+          database_file: /var/lib/mash/credentials.db
+
+        :rtype: string
+        """
+        database_file = self._get_attribute(
+            attribute='database_file', element='credentials'
+        )
+        return database_file or Defaults.get_credentials_database_file()
@@ -16,29 +16,141 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+import copy
 import json
 import os
-import shutil
+import threading
+import time
 
 from apscheduler import events
 from apscheduler.schedulers.background import BackgroundScheduler
-from contextlib import suppress
+from collections import OrderedDict
 from cryptography.fernet import Fernet, MultiFernet
 from pytz import utc
 
 from mash.mash_exceptions import MashCredentialsDatastoreException
+from mash.services.credentials.stores import (
+    FileCredentialsStore,
+    write_file_atomic
+)
+
+
+class CredentialsCache(object):
+    """
+    Size bounded cache of decrypted credentials.
+
+    Entries are kept per (user, cloud, account) for ttl seconds and
+    the least recently used entry is dropped once max_size is reached.
+    A ttl of 0 disables the cache.
+
+    The generation is increased whenever entries are invalidated.
+    Credentials read from the store before an invalidation are not
+    cached, they may be older than the invalidating write.
+    """
+    def __init__(self, ttl=0, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get_generation(self):
+        with self.lock:
+            return self.generation
+
+    def get(self, key):
+        """
+        Return a copy of the cached credentials or None.
+        """
+        if not self.ttl:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if not entry:
+                return None
+
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+
+        return copy.deepcopy(entry[1])
+
+    def set(self, key, credentials, generation=None):
+        """
+        Cache the credentials unless invalidated since generation.
+        """
+        if not self.ttl:
+            return
+
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self.entries[key] = (time.monotonic(), copy.deepcopy(credentials))
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user, cloud=None, account=None):
+        """
+        Remove the entries of the user, optionally of one cloud account.
+        """
+        with self.lock:
+            self.generation += 1
+
+            for key in list(self.entries):
+                if key[0] != user:
+                    continue
+                if cloud and account and key[1:] != (cloud, account):
+                    continue
+
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
 
 
 class CredentialsDatastore(object):
-    """Class for handling credentials files."""
+    """
+    Class for handling credentials.
+
+    Encrypted credentials are kept in a credentials store, by default
+    one file per account in the credentials directory.
+    """
 
     def __init__(
         self, credentials_directory,
-        encryption_keys_file, log_callback
+        encryption_keys_file, log_callback,
+        cache_ttl=0, cache_size=1024, rotation_workers=8, store=None
     ):
         self.credentials_directory = credentials_directory
         self.encryption_keys_file = encryption_keys_file
         self.log_callback = log_callback
+        self.credentials_cache = CredentialsCache(cache_ttl, cache_size)
+        self.store = store or FileCredentialsStore(credentials_directory)
+
+        self._fernet = None
+        self._keys_file_stat = None
+        self._keys_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        self.rotation_workers = rotation_workers
+        self.rotation_metrics = {
+            'state': 'idle',
+            'total': 0,
+            'rotated': 0,
+            'failed': 0,
+            'started': None,
+            'duration': None
+        }
+        self._metrics_lock = threading.Lock()
 
         if not os.path.exists(self.encryption_keys_file):
             self._create_encryption_keys_file()
@@ -58,26 +170,37 @@ class CredentialsDatastore(object):
             minute='0'
         )
 
+        if os.path.exists(self._get_rotation_journal_path()):
+            # Resume rotation interrupted by a restart
+            self.scheduler.add_job(self._rotate_key)
+
     def save_credentials(
         self, cloud, account_name, requesting_user, credentials
     ):
         """
         Add new cloud account credentials.
+
+        The credentials are encrypted and stored under the save lock,
+        a key rotation waits for saves encrypted with the previous key.
         """
-        credentials = self._encrypt_credentials(
-            json.dumps(credentials)
-        )
+        with self._save_lock:
+            credentials = self._encrypt_credentials(
+                json.dumps(credentials)
+            )
+
+            self._store_encrypted_credentials(
+                account_name, credentials, cloud, requesting_user
+            )
 
-        self._store_encrypted_credentials(
-            account_name, credentials, cloud, requesting_user
+        self.credentials_cache.invalidate(
+            requesting_user, cloud, account_name
         )
 
     def _check_credentials_exist(self, account, cloud, user):
         """
-        Return True if the credentials file exists.
+        Return True if the credentials exist.
         """
-        path = self._get_credentials_file_path(account, cloud, user)
-        return os.path.exists(path)
+        return self.store.exists(user, cloud, account)
 
     def _clean_old_keys(self):
         """
@@ -89,6 +212,8 @@ class CredentialsDatastore(object):
             with open(self.encryption_keys_file, 'r+') as f:
                 f.readline()
                 f.truncate(f.tell())
+
+            self._reset_fernet()
         except Exception as error:
             self.log_callback.error(
                 'Unable to clean old keys from {0}: {1}.'.format(
@@ -106,9 +231,12 @@ class CredentialsDatastore(object):
 
     def delete_credentials(self, requesting_user, account_name, cloud):
         """Delete account for requesting user."""
-        self._remove_credentials_file(
+        self._remove_credentials(
             account_name, cloud, requesting_user
         )
+        self.credentials_cache.invalidate(
+            requesting_user, cloud, account_name
+        )
 
     def _encrypt_credentials(self, credentials):
         """
@@ -116,10 +244,7 @@ class CredentialsDatastore(object):
 
         Returns: Encrypted and decoded string.
         """
-        encryption_keys = self._get_encryption_keys_from_file(
-            self.encryption_keys_file
-        )
-        fernet = MultiFernet(encryption_keys)
+        fernet = self._get_fernet()
 
         try:
             # Ensure creds string is encoded as bytes
@@ -133,10 +258,7 @@ class CredentialsDatastore(object):
         """
         Decrypt credentials string.
         """
-        encryption_keys = self._get_encryption_keys_from_file(
-            self.encryption_keys_file
-        )
-        fernet = MultiFernet(encryption_keys)
+        fernet = self._get_fernet()
 
         try:
             # Ensure string is encoded as bytes before decrypting.
@@ -152,32 +274,45 @@ class CredentialsDatastore(object):
         """
         return Fernet.generate_key().decode()
 
-    def _get_credentials_file_path(self, account, cloud, user):
+    def _get_decrypted_credentials(self, accounts, cloud, user):
         """
-        Return the string path to the credentials file.
-
-        Based on user, cloud and account name.
+        Return dictionary of decrypted credentials for the accounts.
         """
-        path = os.path.join(
-            self.credentials_directory, str(user), cloud, account
-        )
-        return path
+        tokens = self.store.read_many(user, cloud, accounts)
+
+        return {
+            account: json.loads(self._decrypt_credentials(token))
+            for account, token in tokens.items()
+        }
 
-    def _get_user_credentials_path(self, user):
+    def _get_fernet(self):
         """
-        Return the string path to the user's credentials dir.
+        Return the MultiFernet for the keys in the encryption keys file.
+
+        The key ring is kept in memory and only read again when the
+        keys file changed on disk or keys were rotated.
         """
-        return os.path.join(self.credentials_directory, user)
+        stat = os.stat(self.encryption_keys_file)
+        file_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        with self._keys_lock:
+            if self._fernet is None or file_stat != self._keys_file_stat:
+                self._fernet = MultiFernet(
+                    self._get_encryption_keys_from_file(
+                        self.encryption_keys_file
+                    )
+                )
+                self._keys_file_stat = file_stat
 
-    def _get_decrypted_credentials(self, account, cloud, user):
+            return self._fernet
+
+    def _reset_fernet(self):
         """
-        Return decrypted credentials string from file.
+        Drop the in memory key ring after the keys file was changed.
         """
-        path = self._get_credentials_file_path(account, cloud, user)
-        with open(path, 'r') as credentials_file:
-            credentials = credentials_file.read()
-
-        return json.loads(self._decrypt_credentials(credentials.strip()))
+        with self._keys_lock:
+            self._fernet = None
+            self._keys_file_stat = None
 
     def _get_encryption_keys_from_file(self, encryption_keys_file):
         """
@@ -206,9 +341,9 @@ class CredentialsDatastore(object):
             self._clean_old_keys()
             self.log_callback.info('Key rotation finished.')
 
-    def _remove_credentials_file(self, account_name, cloud, user):
+    def _remove_credentials(self, account_name, cloud, user):
         """
-        Attempt to remove the credentials file for account.
+        Attempt to remove the credentials for account.
         """
         self.log_callback.info(
             'Deleting credentials for account: '
@@ -217,43 +352,63 @@ class CredentialsDatastore(object):
             )
         )
 
-        path = self._get_credentials_file_path(account_name, cloud, user)
-
-        with suppress(Exception):
-            os.remove(path)
+        self.store.delete(user, cloud, account_name)
 
     def remove_user(self, user):
         """
-        Attempt to remove the user's credentials dir.
+        Attempt to remove all credentials of the user.
         """
         self.log_callback.info(
             'Deleting credentials for user: {0}'.format(user)
         )
 
-        path = self._get_user_credentials_path(user)
-
-        with suppress(Exception):
-            shutil.rmtree(path)
+        self.store.delete_user(user)
+        self.credentials_cache.invalidate(user)
 
     def retrieve_credentials(self, cloud_accounts, cloud, requesting_user):
         """
         Retrieve the encrypted credentials strings for the requested accounts.
         """
         credentials = {}
+        missing = []
+        generation = self.credentials_cache.get_generation()
 
         for account in cloud_accounts:
-            credentials[account] = self._get_decrypted_credentials(
-                account, cloud, requesting_user
+            account_credentials = self.credentials_cache.get(
+                (requesting_user, cloud, account)
+            )
+
+            if account_credentials is None:
+                missing.append(account)
+            else:
+                credentials[account] = account_credentials
+
+        if missing:
+            decrypted = self._get_decrypted_credentials(
+                missing, cloud, requesting_user
             )
 
-        return credentials
+            for account, account_credentials in decrypted.items():
+                self.credentials_cache.set(
+                    (requesting_user, cloud, account),
+                    account_credentials,
+                    generation
+                )
+
+            credentials.update(decrypted)
+
+        return {account: credentials[account] for account in cloud_accounts}
 
     def _rotate_key(self):
         """
-        create a new encryption key and rotate all credentials files.
+        create a new encryption key and rotate all credentials.
 
-        Will attempt to rotate credentials files to the new key . If
+        Will attempt to rotate credentials to the new key . If
         any fail an exception is raised prior to return.
+
+        Rotated credentials are recorded in a journal next to the keys
+        file, if the journal exists a previous rotation did not finish
+        and is resumed with the keys already in the keys file.
         """
         self.log_callback.info(
             'Starting key rotation with keys file {0} in directory {1}.'.format(
@@ -261,60 +416,137 @@ class CredentialsDatastore(object):
             )
         )
 
-        success = True
+        journal_file = self._get_rotation_journal_path()
+
+        if os.path.exists(journal_file):
+            with open(journal_file, 'r') as journal:
+                rotated = set(line.strip() for line in journal)
+
+            with open(self.encryption_keys_file, 'r') as f:
+                keys = [key.strip() for key in f.readlines() if key.strip()]
+
+            self.log_callback.info(
+                'Resuming key rotation, {0} files already rotated.'.format(
+                    len(rotated)
+                )
+            )
+        else:
+            rotated = set()
+
+            # Create new key
+            keys = [Fernet.generate_key().decode()]
+
+            with open(self.encryption_keys_file, 'r') as f:
+                keys += [key.strip() for key in f.readlines() if key.strip()]
+
+            # The journal is created first, a restart after the new key
+            # is written resumes instead of adding another key.
+            open(journal_file, 'w').close()
+
+            # Write both keys to file, new key is first
+            write_file_atomic(
+                self.encryption_keys_file,
+                '\n'.join(keys).encode()
+            )
 
-        # Create new key
-        keys = [Fernet.generate_key().decode()]
+        self._reset_fernet()
 
-        # Write both keys to file, new key is first
-        with open(self.encryption_keys_file, 'r+') as f:
-            keys += [key.strip() for key in f.readlines()]
-            f.seek(0)
-            f.write('\n'.join(keys))
+        # Saves encrypted with the previous key are stored before the
+        # records are listed, later saves use the new key.
+        with self._save_lock:
+            self.credentials_cache.clear()
 
         fernet_keys = [Fernet(key) for key in keys]
         fernet = MultiFernet(fernet_keys)
 
-        # Rotate all credentials files
-        for root, dirs, files in os.walk(self.credentials_directory):
-            for credentials_file in files:
-                if credentials_file == 'wsgi.py':
-                    continue
+        records = [
+            record for record in self.store.list_records()
+            if '/'.join(record) not in rotated
+        ]
+
+        self._start_rotation_metrics(
+            len(records) + len(rotated), len(rotated)
+        )
 
-                path = os.path.join(root, credentials_file)
-                with open(path, 'r+b') as f:
-                    credentials = f.read().strip()
-
-                    try:
-                        credentials = fernet.rotate(credentials)
-                    except Exception as error:
-                        self.log_callback.error(
-                            'Failed key rotation on credential file {0}:'
-                            ' {1}: {2}'.format(
-                                path, type(error).__name__, error
-                            )
+        with open(journal_file, 'a') as journal:
+            def rotated_record(record, error):
+                if error:
+                    self.log_callback.error(
+                        'Failed key rotation on credential file {0}:'
+                        ' {1}: {2}'.format(
+                            os.path.join(self.credentials_directory, *record),
+                            type(error).__name__,
+                            error
                         )
-                        success = False
-                    else:
-                        f.seek(0)
-                        f.write(credentials)
+                    )
+                    self._update_rotation_metrics(failed=1)
+                else:
+                    journal.write('/'.join(record) + '\n')
+                    journal.flush()
+                    self._update_rotation_metrics(rotated=1)
+
+            self.store.rotate(
+                records,
+                fernet.rotate,
+                rotated_record,
+                workers=self.rotation_workers
+            )
+            os.fsync(journal.fileno())
+
+        success = not self.rotation_metrics['failed']
+        self._finish_rotation_metrics(success)
 
         if not success:
             raise MashCredentialsDatastoreException(
                 'All credentials files have not been rotated.'
             )
 
+        os.remove(journal_file)
+
+    def _get_rotation_journal_path(self):
+        return self.encryption_keys_file + '.rotation'
+
+    def _start_rotation_metrics(self, total, rotated):
+        with self._metrics_lock:
+            self.rotation_metrics.update({
+                'state': 'running',
+                'total': total,
+                'rotated': rotated,
+                'failed': 0,
+                'started': time.time(),
+                'duration': None
+            })
+
+    def _update_rotation_metrics(self, rotated=0, failed=0):
+        with self._metrics_lock:
+            self.rotation_metrics['rotated'] += rotated
+            self.rotation_metrics['failed'] += failed
+
+    def _finish_rotation_metrics(self, success):
+        with self._metrics_lock:
+            self.rotation_metrics['state'] = 'finished' if success \
+                else 'failed'
+            self.rotation_metrics['duration'] = \
+                time.time() - self.rotation_metrics['started']
+
+    def get_rotation_status(self):
+        """
+        Return the progress and duration of the last key rotation.
+        """
+        with self._metrics_lock:
+            return dict(self.rotation_metrics)
+
     def _store_encrypted_credentials(
         self, account, credentials, cloud, user
     ):
         """
-        Store the provided credentials encrypted on disk.
+        Store the provided credentials encrypted in the store.
 
         Expected credentials as a json string.
 
         Example: {"access_key_id": "key123", "secret_access_key": "123456"}
 
-        Path is based on the user, cloud and account.
+        Stored per user, cloud and account.
         """
         self.log_callback.info(
             'Storing credentials for account: '
@@ -323,15 +555,8 @@ class CredentialsDatastore(object):
             )
         )
 
-        path = self._get_credentials_file_path(account, cloud, user)
-
-        credentials_dir = os.path.dirname(path)
-        if not os.path.isdir(credentials_dir):
-            os.makedirs(credentials_dir)
-
         try:
-            with open(path, 'w') as creds_file:
-                creds_file.write(credentials)
+            self.store.write(user, cloud, account, credentials)
         except Exception as error:
             self.log_callback.error(
                 'Unable to store credentials: {0}.'.format(error)
@@ -339,5 +564,6 @@ class CredentialsDatastore(object):
             raise
 
     def shutdown(self):
-        """Shutdown scheduler."""
+        """Shutdown scheduler and close the store."""
         self.scheduler.shutdown()
+        self.store.close()
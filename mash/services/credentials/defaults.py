@@ -25,3 +25,23 @@ class Defaults(object):
     @classmethod
     def get_credentials_dir(self):
         return '/var/lib/mash/credentials/'
+
+    @classmethod
+    def get_credentials_cache_ttl(self):
+        return 0
+
+    @classmethod
+    def get_credentials_cache_size(self):
+        return 1024
+
+    @classmethod
+    def get_credentials_rotation_workers(self):
+        return 8
+
+    @classmethod
+    def get_credentials_storage_backend(self):
+        return 'file'
+
+    @classmethod
+    def get_credentials_database_file(self):
+        return '/var/lib/mash/credentials.db'
@@ -45,6 +45,26 @@ class Config(object):
     def CREDS_DIR(self):
         return self.config.get_credentials_dir()
 
+    @property
+    def CREDS_CACHE_TTL(self):
+        return self.config.get_credentials_cache_ttl()
+
+    @property
+    def CREDS_CACHE_SIZE(self):
+        return self.config.get_credentials_cache_size()
+
+    @property
+    def CREDS_ROTATION_WORKERS(self):
+        return self.config.get_credentials_rotation_workers()
+
+    @property
+    def CREDS_STORAGE_BACKEND(self):
+        return self.config.get_credentials_storage_backend()
+
+    @property
+    def CREDS_DATABASE_FILE(self):
+        return self.config.get_credentials_database_file()
+
     @property
     def ENC_KEYS_FILE(self):
         return self.config.get_encryption_keys_file()
@@ -78,6 +78,12 @@ def delete_credentials():
     return make_response(jsonify({'msg': 'Credentials deleted'}), 200)
 
 
+@blueprint.route('/rotation', methods=['GET'])
+def get_rotation_status():
+    status = current_app.credentials_datastore.get_rotation_status()
+    return make_response(jsonify(status), 200)
+
+
 @blueprint.route('/<string:user>', methods=['DELETE'])
 def remove_user(user):
     try:
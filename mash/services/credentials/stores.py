@@ -0,0 +1,418 @@
+# Copyright (c) 2026 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import suppress
+
+from mash.mash_exceptions import MashCredentialsDatastoreException
+
+
+class CredentialsStore(ABC):
+    """
+    Interface for storage of encrypted credentials.
+
+    Credentials are stored as encrypted tokens per user, cloud and
+    account. A record is the (user, cloud, account) tuple of a token.
+    """
+    @abstractmethod
+    def read_many(self, user, cloud, accounts):
+        """
+        Return a dictionary of the tokens for the accounts.
+        """
+
+    @abstractmethod
+    def write(self, user, cloud, account, token):
+        """
+        Store the token of the account.
+        """
+
+    def write_many(self, records):
+        """
+        Store a list of (user, cloud, account, token) tuples.
+        """
+        for user, cloud, account, token in records:
+            self.write(user, cloud, account, token)
+
+    @abstractmethod
+    def delete(self, user, cloud, account):
+        """
+        Delete the token of the account if it exists.
+        """
+
+    @abstractmethod
+    def delete_user(self, user):
+        """
+        Delete all tokens of the user.
+        """
+
+    @abstractmethod
+    def exists(self, user, cloud, account):
+        """
+        Return True if a token is stored for the account.
+        """
+
+    @abstractmethod
+    def list_records(self):
+        """
+        Return the records of all stored tokens.
+        """
+
+    def read_records(self):
+        """
+        Return (user, cloud, account, token) tuples of all stored tokens.
+        """
+        for record in self.list_records():
+            if len(record) != 3:
+                continue
+
+            user, cloud, account = record
+            token = self.read_many(user, cloud, [account])[account]
+            yield user, cloud, account, token
+
+    @abstractmethod
+    def rotate(self, records, rotate_func, callback, workers=8):
+        """
+        Replace the tokens of records with rotate_func(token).
+
+        callback(record, error) is called for each record once it is
+        stored, error is None for rotated records.
+        """
+
+    def close(self):
+        pass
+
+
+class FileCredentialsStore(CredentialsStore):
+    """
+    Store each token in a file at <directory>/<user>/<cloud>/<account>.
+    """
+    def __init__(self, credentials_directory):
+        self.credentials_directory = credentials_directory
+        self.lock = threading.Lock()
+
+    def get_path(self, *record):
+        return os.path.join(self.credentials_directory, *map(str, record))
+
+    def read_many(self, user, cloud, accounts):
+        tokens = {}
+
+        for account in accounts:
+            with open(self.get_path(user, cloud, account), 'r') as f:
+                tokens[account] = f.read().strip()
+
+        return tokens
+
+    def write(self, user, cloud, account, token):
+        path = self.get_path(user, cloud, account)
+
+        credentials_dir = os.path.dirname(path)
+        if not os.path.isdir(credentials_dir):
+            os.makedirs(credentials_dir)
+
+        with self.lock:
+            with open(path, 'w') as creds_file:
+                creds_file.write(token)
+
+    def delete(self, user, cloud, account):
+        with self.lock, suppress(Exception):
+            os.remove(self.get_path(user, cloud, account))
+
+    def delete_user(self, user):
+        with self.lock, suppress(Exception):
+            shutil.rmtree(self.get_path(user))
+
+    def exists(self, user, cloud, account):
+        return os.path.exists(self.get_path(user, cloud, account))
+
+    def list_records(self):
+        records = []
+
+        for root, dirs, files in os.walk(self.credentials_directory):
+            for credentials_file in files:
+                if credentials_file == 'wsgi.py':
+                    continue
+
+                if credentials_file.startswith('.') and \
+                        credentials_file.endswith('.tmp'):
+                    # Left over from an interrupted atomic write
+                    continue
+
+                path = os.path.relpath(
+                    os.path.join(root, credentials_file),
+                    self.credentials_directory
+                )
+                records.append(tuple(path.split(os.sep)))
+
+        return records
+
+    def rotate(self, records, rotate_func, callback, workers=8):
+        """
+        Rotate the files of records on a pool of workers.
+
+        Each file is replaced atomically. A file saved while it was
+        rotated is rotated again, the save may have used the old key.
+        A file deleted while rotating is done and not written again.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._rotate_file, record, rotate_func):
+                record for record in records
+            }
+
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    callback(futures[future], error)
+                else:
+                    callback(futures[future], None)
+
+    def _rotate_file(self, record, rotate_func):
+        path = self.get_path(*record)
+
+        try:
+            with open(path, 'rb') as f:
+                token = f.read().strip()
+        except FileNotFoundError:
+            # Deleted since the records were listed
+            return
+
+        rotated = rotate_func(token)
+
+        with self.lock:
+            try:
+                with open(path, 'rb') as f:
+                    current = f.read().strip()
+            except FileNotFoundError:
+                # Deleted while rotating
+                return
+
+            if current != token:
+                # Saved while rotating, rotate the saved token
+                rotated = rotate_func(current)
+
+            write_file_atomic(path, rotated)
+
+
+class SQLiteCredentialsStore(CredentialsStore):
+    """
+    Store all tokens in one SQLite database in WAL mode.
+
+    Each thread uses its own connection.
+    """
+    def __init__(self, database_file):
+        self.database_file = database_file
+        self.local = threading.local()
+
+        database_dir = os.path.dirname(database_file)
+        if database_dir and not os.path.isdir(database_dir):
+            os.makedirs(database_dir)
+
+        with self.connection as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS credentials ('
+                'user TEXT NOT NULL, '
+                'cloud TEXT NOT NULL, '
+                'account TEXT NOT NULL, '
+                'token TEXT NOT NULL, '
+                'PRIMARY KEY (user, cloud, account))'
+            )
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.database_file, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+
+        return connection
+
+    def read_many(self, user, cloud, accounts):
+        accounts = list(accounts)
+        rows = self.connection.execute(
+            'SELECT account, token FROM credentials '
+            'WHERE user = ? AND cloud = ? AND account IN ({0})'.format(
+                ', '.join('?' * len(accounts))
+            ),
+            [str(user), cloud] + accounts
+        ).fetchall()
+        tokens = dict(rows)
+
+        for account in accounts:
+            if account not in tokens:
+                raise MashCredentialsDatastoreException(
+                    'No credentials for account: {0}.'.format(account)
+                )
+
+        return tokens
+
+    def write(self, user, cloud, account, token):
+        self.write_many([(user, cloud, account, token)])
+
+    def write_many(self, records):
+        with self.connection as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO credentials '
+                '(user, cloud, account, token) VALUES (?, ?, ?, ?)',
+                [
+                    (str(user), cloud, account, token)
+                    for user, cloud, account, token in records
+                ]
+            )
+
+    def delete(self, user, cloud, account):
+        with self.connection as connection:
+            connection.execute(
+                'DELETE FROM credentials '
+                'WHERE user = ? AND cloud = ? AND account = ?',
+                (str(user), cloud, account)
+            )
+
+    def delete_user(self, user):
+        with self.connection as connection:
+            connection.execute(
+                'DELETE FROM credentials WHERE user = ?', (str(user),)
+            )
+
+    def exists(self, user, cloud, account):
+        row = self.connection.execute(
+            'SELECT 1 FROM credentials '
+            'WHERE user = ? AND cloud = ? AND account = ?',
+            (str(user), cloud, account)
+        ).fetchone()
+        return row is not None
+
+    def list_records(self):
+        return self.connection.execute(
+            'SELECT user, cloud, account FROM credentials'
+        ).fetchall()
+
+    def read_records(self):
+        return self.connection.execute(
+            'SELECT user, cloud, account, token FROM credentials'
+        ).fetchall()
+
+    def rotate(self, records, rotate_func, callback, workers=8):
+        """
+        Rotate the tokens of records in one transaction.
+
+        Saves wait for the rotation to finish. Records that fail to
+        rotate keep their token, all others are committed together.
+        Records deleted before the rotation started are done.
+        """
+        records = set(tuple(record) for record in records)
+        results = []
+        updates = []
+
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            rows = connection.execute(
+                'SELECT user, cloud, account, token FROM credentials'
+            ).fetchall()
+
+            for user, cloud, account, token in rows:
+                record = (user, cloud, account)
+
+                if record not in records:
+                    continue
+
+                records.remove(record)
+
+                try:
+                    rotated = rotate_func(token.encode())
+                except Exception as error:
+                    results.append((record, error))
+                else:
+                    updates.append((rotated.decode(), user, cloud, account))
+                    results.append((record, None))
+
+            # Deleted since the records were listed
+            results += [(record, None) for record in records]
+
+            connection.executemany(
+                'UPDATE credentials SET token = ? '
+                'WHERE user = ? AND cloud = ? AND account = ?',
+                updates
+            )
+        except Exception:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+
+        for record, error in results:
+            callback(record, error)
+
+    def close(self):
+        connection = getattr(self.local, 'connection', None)
+
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+def get_credentials_store(backend, credentials_directory, database_file):
+    """
+    Return the credentials store for the storage backend name.
+    """
+    if backend == 'file':
+        return FileCredentialsStore(credentials_directory)
+    elif backend == 'sqlite':
+        return SQLiteCredentialsStore(database_file)
+
+    raise MashCredentialsDatastoreException(
+        'Unknown credentials storage backend: {0}.'.format(backend)
+    )
+
+
+def write_file_atomic(path, data):
+    """
+    Write data to a temp file and rename it over path.
+    """
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or '.',
+        prefix='.' + os.path.basename(path),
+        suffix='.tmp'
+    )
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with suppress(Exception):
+            shutil.copymode(path, temp_path)
+
+        os.replace(temp_path, path)
+    except Exception:
+        with suppress(Exception):
+            os.remove(temp_path)
+        raise
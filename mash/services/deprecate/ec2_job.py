@@ -16,11 +16,10 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
-from ec2imgutils.ec2deprecateimg import EC2DeprecateImg
-
 from mash.mash_exceptions import MashDeprecateException
 from mash.services.mash_job import MashJob
-from mash.services.status_levels import SUCCESS
+from mash.services.status_levels import FAILED, SUCCESS
+from mash.utils.ec2 import CachedEC2DeprecateImg, fan_out_regions
 
 
 class EC2DeprecateJob(MashJob):
@@ -45,6 +44,9 @@ class EC2DeprecateJob(MashJob):
         self.old_cloud_image_name = self.job_config.get(
             'old_cloud_image_name'
         )
+        self.continue_on_error = self.config.get_continue_on_region_error(
+            'deprecate'
+        )
 
     def run_job(self):
         """
@@ -64,29 +66,62 @@ class EC2DeprecateJob(MashJob):
         self.request_credentials(accounts)
         self.cloud_image_name = self.status_msg['cloud_image_name']
 
+        regions = []
         for region_info in self.deprecate_regions:
             credential = self.credentials[region_info['account']]
 
-            deprecator = EC2DeprecateImg(
-                access_key=credential['access_key_id'],
-                secret_key=credential['secret_access_key'],
-                deprecation_image_name=self.old_cloud_image_name,
-                replacement_image_name=self.cloud_image_name,
-                log_callback=self.log_callback
-            )
-
             for region in region_info['target_regions']:
-                deprecator.set_region(region)
-                try:
-                    result = deprecator.deprecate_images()
-                    if result is False:
-                        self.log_callback.warning(
-                            'Unable to deprecate image in {region}, '
-                            'no image found.'.format(region=region)
-                        )
-                except Exception as error:
-                    raise MashDeprecateException(
-                        'Error deprecating image {0} in {1}. {2}'.format(
-                            self.old_cloud_image_name, region, error
-                        )
+                regions.append((region, credential))
+
+        results = fan_out_regions(
+            self._deprecate_region,
+            regions,
+            max_workers=self.config.get_region_max_workers('deprecate'),
+            continue_on_error=self.continue_on_error
+        )
+
+        for (region, credential), status, result in results:
+            if status == SUCCESS and result is not False:
+                self.log_callback.info(
+                    'Deprecated image {0} in {1}.'.format(
+                        self.old_cloud_image_name, region
                     )
+                )
+            elif status == FAILED:
+                msg = 'Error deprecating image {0} in {1}. {2}'.format(
+                    self.old_cloud_image_name, region, result
+                )
+
+                if not self.continue_on_error:
+                    raise MashDeprecateException(msg)
+
+                self.status = FAILED
+                self.add_error_msg(msg)
+                self.log_callback.error(msg)
+
+    def _deprecate_region(self, region_credential):
+        """
+        Deprecate image in one region.
+
+        A deprecator is created per region since it is bound to the
+        region it is set to. Returns False if no image was found.
+        """
+        region, credential = region_credential
+
+        deprecator = CachedEC2DeprecateImg(
+            access_key=credential['access_key_id'],
+            secret_key=credential['secret_access_key'],
+            deprecation_image_name=self.old_cloud_image_name,
+            replacement_image_name=self.cloud_image_name,
+            log_callback=self.log_callback
+        )
+        deprecator.set_region(region)
+
+        result = deprecator.deprecate_images()
+        if result is False:
+            self.log_callback.warning(
+                'Unable to deprecate image in {region}, '
+                'no image found.'.format(region=region)
+            )
+
+        return result
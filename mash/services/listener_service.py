@@ -19,6 +19,7 @@
 import json
 import os
 import signal
+import time
 
 from amqpstorm import AMQPError
 
@@ -30,12 +31,15 @@ from apscheduler.executors.pool import ThreadPoolExecutor
 from pytz import utc
 
 from mash.mash_exceptions import MashListenerServiceException
+from mash.services.base_defaults import Defaults
 from mash.services.mash_service import MashService
 from mash.services.status_levels import EXCEPTION, SUCCESS
 from mash.utils.json_format import JsonFormat
 from mash.utils.mash_utils import (
+    get_job_owner,
     remove_file,
     persist_json,
+    restart_job,
     restart_jobs,
     setup_logfile
 )
@@ -79,6 +83,20 @@ class ListenerService(MashService):
         )
         self.log.addHandler(logfile_handler)
 
+        self.instance_count = self.config.get_service_instance_count(
+            self.service_exchange
+        )
+        self.instance_index = self.config.get_service_instance_index(
+            self.service_exchange
+        )
+
+        if self.instance_index >= self.instance_count:
+            raise MashListenerServiceException(
+                'Instance index {0} is invalid for {1} instances.'.format(
+                    self.instance_index, self.instance_count
+                )
+            )
+
         self.bind_queue(
             self.service_exchange, self.job_document_key, self.service_queue
         )
@@ -86,10 +104,31 @@ class ListenerService(MashService):
             self.prev_service, self.listener_msg_key, self.listener_queue
         )
 
+        if self.instance_count > 1:
+            # Instance queues receive the jobs owned by this instance
+            self.bind_queue(
+                self.service_exchange,
+                self._get_instance_name(self.job_document_key),
+                self._get_instance_name(self.service_queue)
+            )
+            self.bind_queue(
+                self.prev_service,
+                self._get_instance_name(self.listener_msg_key),
+                self._get_instance_name(self.listener_queue)
+            )
+
         thread_pool_count = self.custom_args.get(
             'thread_pool_count',
             self.config.get_base_thread_pool_count()
         )
+        self.service_prefetch_count = self.custom_args.get(
+            'service_prefetch_count',
+            self.config.get_service_prefetch_count()
+        )
+        self.listener_prefetch_count = self.custom_args.get(
+            'listener_prefetch_count',
+            self.config.get_listener_prefetch_count() or thread_pool_count
+        )
         executors = {
             'default': ThreadPoolExecutor(thread_pool_count)
         }
@@ -106,7 +145,10 @@ class ListenerService(MashService):
         signal.signal(signal.SIGINT, self.stop)
         signal.signal(signal.SIGTERM, self.stop)
 
-        restart_jobs(self.job_directory, self._add_job)
+        if self.instance_count > 1:
+            self._register_instance()
+
+        restart_jobs(self.job_directory, self._restart_job)
         self.start()
 
     def _add_job(self, job_config):
@@ -147,19 +189,88 @@ class ListenerService(MashService):
                 extra={'job_id': job_id}
             )
 
+    def _register_instance(self):
+        """
+        Register the instance in the shared job directory.
+
+        Instances must share the job directory as jobs move to another
+        instance when the instance count changes. Every instance
+        writes a marker file and waits for the markers of all other
+        instances, instances that do not share the job directory
+        never find each other and fail to start.
+        """
+        with open(self._get_instance_file(self.instance_index), 'w'):
+            pass
+
+        deadline = time.monotonic() + \
+            Defaults.get_service_instance_wait_time()
+
+        while True:
+            missing = [
+                str(index) for index in range(self.instance_count)
+                if not os.path.exists(self._get_instance_file(index))
+            ]
+
+            if not missing:
+                return
+
+            if time.monotonic() >= deadline:
+                raise MashListenerServiceException(
+                    'Instances {0} not found in job directory {1}, '
+                    'instances must share the job directory.'.format(
+                        ', '.join(missing), self.job_directory
+                    )
+                )
+
+            time.sleep(1)
+
+    def _get_instance_file(self, index):
+        """
+        Return the marker file of the instance in the job directory.
+        """
+        return '{0}instance-{1}'.format(self.job_directory, index)
+
+    def _restart_job(self, job_config):
+        """
+        Restart the job if it is owned by this instance.
+
+        Instances share the job directory, jobs owned by another
+        instance are restarted by their owner.
+        """
+        if get_job_owner(job_config['id'], self.instance_count) == \
+                self.instance_index:
+            self._add_job(job_config)
+
+    def _load_job(self, job_id):
+        """
+        Load the job from the job directory if it is not queued.
+
+        When the instance count changes a job may have been added by
+        its previous owner, the job file is loaded by the new owner
+        when the listener message arrives.
+        """
+        job_file = '{0}job-{1}.json'.format(self.job_directory, job_id)
+
+        if job_id not in self.jobs and os.path.exists(job_file):
+            try:
+                restart_job(job_file, self._add_job)
+            except Exception as error:
+                self.log.warning(
+                    'Unable to load job file: {0}.'.format(error),
+                    extra={'job_id': job_id}
+                )
+
+        return job_id in self.jobs
+
     def _cleanup_job(self, job_id):
         """
         Job failed upstream.
 
-        Delete job and notify the next service.
+        Runs in place of the job on the scheduler, the job is deleted
+        and the next service notified when the result is processed.
         """
         job = self.jobs[job_id]
-
         self.log.warning('Failed upstream.', extra=job.get_job_id())
-        self._delete_job(job.id)
-
-        message = self._get_status_message(job)
-        self._publish_message(message, job.id)
 
     def _delete_job(self, job_id):
         """
@@ -175,6 +286,15 @@ class ListenerService(MashService):
             )
 
             del self.jobs[job_id]
+
+            try:
+                job.cleanup()
+            except Exception as error:
+                self.log.warning(
+                    'Job cleanup failed: {0}.'.format(error),
+                    extra=job.get_job_id()
+                )
+
             remove_file(job.job_file)
         else:
             self.log.warning(
@@ -182,6 +302,27 @@ class ListenerService(MashService):
                 extra={'job_id': job_id}
             )
 
+    def _forward_message(self, exchange, routing_key, message, owner):
+        """
+        Forward message to the instance queue of the job owner.
+        """
+        self._publish(
+            exchange,
+            self._get_instance_name(routing_key, owner),
+            message
+        )
+
+    def _get_instance_name(self, name, index=None):
+        """
+        Return name suffixed with the instance index.
+
+        Example: listener_msg.2
+        """
+        if index is None:
+            index = self.instance_index
+
+        return '{0}.{1}'.format(name, index)
+
     def _get_previous_service(self):
         """
         Return the previous service based on the current exchange.
@@ -225,18 +366,36 @@ class ListenerService(MashService):
             status = listener_msg['status']
             job_id = listener_msg['id']
 
-        if job_id and job_id in self.jobs:
+        owner = get_job_owner(job_id, self.instance_count) \
+            if job_id else self.instance_index
+
+        if owner != self.instance_index:
+            try:
+                self._forward_message(
+                    self.prev_service,
+                    self.listener_msg_key,
+                    message.body,
+                    owner
+                )
+            except Exception as error:
+                self.log.error(
+                    'Error forwarding listener message: {0}.'.format(error)
+                )
+                self.nack_message(message)
+                return
+        elif job_id and self._load_job(job_id):
             job = self.jobs[listener_msg['id']]
             job.listener_msg = message
             job.set_status_message(listener_msg)
 
-            if status == SUCCESS:
-                self._schedule_job(job.id)
-                return  # Don't ack message until job finishes
-            else:
-                self._cleanup_job(job_id)
+            # Failed jobs are cleaned up on the scheduler as well
+            self._schedule_job(
+                job.id,
+                self._start_job if status == SUCCESS else self._cleanup_job
+            )
+            return  # Don't ack message until job finishes
 
-        message.ack()
+        self.ack_message(message)
 
     def _handle_service_message(self, message):
         """
@@ -244,12 +403,29 @@ class ListenerService(MashService):
         """
         job_key = '{0}_job'.format(self.service_exchange)
         try:
-            job_desc = json.loads(message.body)
-            self._add_job(job_desc[job_key])
+            job_config = json.loads(message.body)[job_key]
+            owner = get_job_owner(job_config['id'], self.instance_count)
+
+            if owner == self.instance_index:
+                self._add_job(job_config)
+            else:
+                try:
+                    self._forward_message(
+                        self.service_exchange,
+                        self.job_document_key,
+                        message.body,
+                        owner
+                    )
+                except Exception as error:
+                    self.log.error(
+                        'Error forwarding job: {0}.'.format(error)
+                    )
+                    self.nack_message(message)
+                    return
         except Exception as e:
             self.log.error('Error adding job: {0}.'.format(e))
 
-        message.ack()
+        self.ack_message(message)
 
     def _process_job_result(self, event):
         """
@@ -291,7 +467,7 @@ class ListenerService(MashService):
 
         message = self._get_status_message(job)
         self._publish_message(message, job.id)
-        job.listener_msg.ack()
+        self.ack_message(job.listener_msg)
 
     def _process_job_missed(self, event):
         """
@@ -322,13 +498,15 @@ class ListenerService(MashService):
                 extra={'job_id': job_id}
             )
 
-    def _schedule_job(self, job_id):
+    def _schedule_job(self, job_id, func=None):
         """
         Schedule new job in background scheduler for job based on id.
+
+        Runs _start_job for the job unless another func is given.
         """
         try:
             self.scheduler.add_job(
-                self._start_job,
+                func or self._start_job,
                 args=(job_id,),
                 id=job_id,
                 max_instances=1,
@@ -374,21 +552,46 @@ class ListenerService(MashService):
     def start(self):
         """
         Start listener service.
+
+        Each queue is consumed in a dedicated thread on its own channel.
+        The listener queue prefetch window defaults to the thread pool
+        count so the scheduler stays saturated with jobs.
+
+        When multiple instances share the service the instance queues
+        are consumed as well. Messages for jobs owned by another
+        instance are forwarded to that instance's queue.
         """
         self.scheduler.start()
-        self.consume_queue(
-            self._handle_service_message,
-            self.service_queue,
-            self.service_exchange
-        )
-        self.consume_queue(
-            self._handle_listener_message,
-            self.listener_queue,
-            self.prev_service
-        )
 
         try:
-            self.channel.start_consuming()
+            self.start_consumer(
+                self._handle_service_message,
+                self.service_queue,
+                self.service_exchange,
+                prefetch_count=self.service_prefetch_count
+            )
+            self.start_consumer(
+                self._handle_listener_message,
+                self.listener_queue,
+                self.prev_service,
+                prefetch_count=self.listener_prefetch_count
+            )
+
+            if self.instance_count > 1:
+                self.start_consumer(
+                    self._handle_service_message,
+                    self._get_instance_name(self.service_queue),
+                    self.service_exchange,
+                    prefetch_count=self.service_prefetch_count
+                )
+                self.start_consumer(
+                    self._handle_listener_message,
+                    self._get_instance_name(self.listener_queue),
+                    self.prev_service,
+                    prefetch_count=self.listener_prefetch_count
+                )
+
+            self.wait_for_consumers()
         except Exception:
             self.stop()
             raise
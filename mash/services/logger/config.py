@@ -0,0 +1,126 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+from mash.services.base_config import BaseConfig
+from mash.services.logger.defaults import Defaults as LoggerDefaults
+
+
+class LoggerConfig(BaseConfig):
+    """
+    Implements reading of logger configuration from mash configuration file:
+
+    * /etc/mash/mash_config.yaml
+
+    The mash configuration file is a yaml formatted file containing
+    information to control the behavior of the mash services.
+
+    logger:
+      # max number of job log files kept open
+      max_open_files: 256
+      # seconds before an unused job log file is closed
+      idle_timeout: 300
+      # seconds between flushes of buffered log lines
+      flush_interval: 1
+      # bytes buffered per job log before it is flushed
+      flush_size: 65536
+      # max number of log messages waiting for a flush to be acked
+      prefetch_count: 1000
+      # also write structured records to the job log store
+      job_log_store: false
+      # max size in bytes of a job log store segment
+      segment_size: 8388608
+    """
+    def __init__(self, config_file=None):
+        super(LoggerConfig, self).__init__(config_file)
+
+    def get_max_open_files(self):
+        """
+        Return the max number of job log files kept open.
+
+        :rtype: int
+        """
+        max_open_files = self._get_attribute(
+            attribute='max_open_files', element='logger'
+        )
+        return max_open_files or LoggerDefaults.get_max_open_files()
+
+    def get_file_idle_timeout(self):
+        """
+        Return the seconds before an unused job log file is closed.
+
+        :rtype: int
+        """
+        idle_timeout = self._get_attribute(
+            attribute='idle_timeout', element='logger'
+        )
+        return idle_timeout or LoggerDefaults.get_file_idle_timeout()
+
+    def get_file_flush_interval(self):
+        """
+        Return the seconds between flushes of buffered log lines.
+
+        :rtype: int
+        """
+        flush_interval = self._get_attribute(
+            attribute='flush_interval', element='logger'
+        )
+        return flush_interval or LoggerDefaults.get_file_flush_interval()
+
+    def get_file_flush_size(self):
+        """
+        Return the bytes buffered per job log before it is flushed.
+
+        :rtype: int
+        """
+        flush_size = self._get_attribute(
+            attribute='flush_size', element='logger'
+        )
+        return flush_size or LoggerDefaults.get_file_flush_size()
+
+    def get_prefetch_count(self):
+        """
+        Return the max number of unacknowledged log messages.
+
+        :rtype: int
+        """
+        prefetch_count = self._get_attribute(
+            attribute='prefetch_count', element='logger'
+        )
+        return prefetch_count or LoggerDefaults.get_prefetch_count()
+
+    def get_job_log_store(self):
+        """
+        Return True if records are written to the job log store.
+
+        :rtype: bool
+        """
+        job_log_store = self._get_attribute(
+            attribute='job_log_store', element='logger'
+        )
+        return job_log_store or LoggerDefaults.get_job_log_store()
+
+    def get_segment_size(self):
+        """
+        Return the max size in bytes of a job log store segment.
+
+        :rtype: int
+        """
+        segment_size = self._get_attribute(
+            attribute='segment_size', element='logger'
+        )
+        return segment_size or LoggerDefaults.get_segment_size()
@@ -0,0 +1,49 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+class Defaults(object):
+    """
+    Default values
+    """
+    @staticmethod
+    def get_max_open_files():
+        return 256
+
+    @staticmethod
+    def get_file_idle_timeout():
+        return 300
+
+    @staticmethod
+    def get_file_flush_interval():
+        return 1
+
+    @staticmethod
+    def get_file_flush_size():
+        return 65536
+
+    @staticmethod
+    def get_prefetch_count():
+        return 1000
+
+    @staticmethod
+    def get_job_log_store():
+        return False
+
+    @staticmethod
+    def get_segment_size():
+        return 8388608
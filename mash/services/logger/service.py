@@ -17,8 +17,17 @@
 #
 
 import json
+import threading
+import time
+
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from pytz import utc
 
 from mash.mash_exceptions import MashLoggerException
+from mash.services.logger.store import JobLogStore
+from mash.services.logger.writer import JobLogWriter
 from mash.services.mash_service import MashService
 from mash.utils.mash_utils import setup_logfile
 
@@ -42,6 +51,26 @@ class LoggerService(MashService):
         )
         self.log.addHandler(logfile_handler)
 
+        self.writer = JobLogWriter(
+            max_open_files=self.config.get_max_open_files(),
+            idle_timeout=self.config.get_file_idle_timeout(),
+            flush_size=self.config.get_file_flush_size()
+        )
+
+        self.unacked = []
+        self.unacked_lock = threading.Lock()
+        self.prefetch_count = self.config.get_prefetch_count()
+
+        self.store = None
+        if self.config.get_job_log_store():
+            self.store = JobLogStore(
+                self.config.get_job_log_store_directory(),
+                segment_size=self.config.get_segment_size(),
+                max_open_files=self.config.get_max_open_files(),
+                idle_timeout=self.config.get_file_idle_timeout(),
+                flush_size=self.config.get_file_flush_size()
+            )
+
         self.bind_queue(self.service_exchange, 'mash.logger', 'logging')
         self.start()
 
@@ -51,37 +80,126 @@ class LoggerService(MashService):
 
         1. Attempt to de-serialize the log message.
         2. Determine log file name based on job_id.
-        3. Write or append to log file.
-        """
-        message.ack()
+        3. Buffer the log line for the job log file.
+        4. If enabled add a structured record to the job log store.
 
+        Buffered messages are acked once their lines are flushed, the
+        buffer is flushed early when the prefetch count is reached.
+        Messages that cannot be written to the log file and the job
+        log store are requeued.
+        """
         try:
             data = json.loads(message.body)
         except Exception:
+            self.ack_message(message)
             raise MashLoggerException(
                 'Could not de-serialize log message.'
             )
 
-        if 'job_id' in data:
-            file_name = data.get('job_id')
-            log_file = self.config.get_job_log_file(file_name)
+        if 'job_id' not in data:
+            self.ack_message(message)
+            return
+
+        file_name = data.get('job_id')
+        log_file = self.config.get_job_log_file(file_name)
+
+        try:
+            self.writer.write(
+                log_file,
+                data['msg'].replace(
+                    'Job[{0}]: '.format(data['job_id']), ''
+                )
+            )
+
+            if self.store:
+                self.store.write(file_name, self._get_record(data))
+        except Exception as e:
+            self.nack_message(message)
+            raise MashLoggerException(
+                'Could not write to log file: {0}'.format(e)
+            )
+
+        with self.unacked_lock:
+            self.unacked.append(message)
+            full = len(self.unacked) >= self.prefetch_count
+
+        if full:
+            self._flush_logs()
 
+    @staticmethod
+    def _get_record(data):
+        """
+        Return the job log store record for a log message.
+
+        The service is derived from the logger name, for example
+        UploadService is stored as upload.
+        """
+        created = data.get('created') or time.time()
+        service = data.get('name', '')
+
+        if service.endswith('Service'):
+            service = service[:-len('Service')]
+
+        return {
+            'created': created,
+            'timestamp': datetime.utcfromtimestamp(created).isoformat(),
+            'level': data.get('levelname', 'NOTSET'),
+            'service': service.lower(),
+            'job_id': data['job_id'],
+            'message': data.get('message', data['msg'])
+        }
+
+    def _flush_logs(self):
+        """
+        Write buffered log lines and close idle job log files.
+
+        The messages of the flushed lines are acked if all writes
+        succeed, otherwise they stay unacked until the next flush.
+        """
+        with self.unacked_lock:
+            messages = self.unacked
+            self.unacked = []
+
+        writers = [self.writer]
+        if self.store:
+            writers.append(self.store)
+
+        failed = False
+        for writer in writers:
             try:
-                with open(log_file, 'a') as job_log:
-                    job_log.write(
-                        data['msg'].replace(
-                            'Job[{0}]: '.format(data['job_id']), ''
-                        )
-                    )
-            except Exception as e:
-                raise MashLoggerException(
-                    'Could not write to log file: {0}'.format(e)
+                writer.flush()
+                writer.evict_idle()
+            except Exception as error:
+                failed = True
+                self.log.error(
+                    'Could not write to log file: {0}'.format(error)
                 )
 
+        if failed:
+            with self.unacked_lock:
+                self.unacked = messages + self.unacked
+        else:
+            for message in messages:
+                self.ack_message(message)
+
     def start(self):
         """
         Start logger service.
+
+        Buffered log lines are flushed by the scheduler at the
+        configured interval.
         """
+        self.scheduler = BackgroundScheduler(timezone=utc)
+        self.scheduler.add_job(
+            self._flush_logs,
+            'interval',
+            seconds=self.config.get_file_flush_interval()
+        )
+        self.scheduler.start()
+
+        self.channel.basic.qos(
+            prefetch_count=self.config.get_prefetch_count()
+        )
         self.consume_queue(
             self._process_log,
             'logging',
@@ -95,4 +213,10 @@ class LoggerService(MashService):
         except Exception:
             raise
         finally:
+            self.scheduler.shutdown()
+            self.writer.close()
+
+            if self.store:
+                self.store.close()
+
             self.close_connection()
@@ -0,0 +1,291 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import json
+import logging
+import os
+import struct
+import time
+
+from contextlib import suppress
+
+from mash.mash_exceptions import MashLoggerException
+from mash.services.logger.writer import JobLogWriter
+
+# segment number, offset, length, created, level number, service
+INDEX_ENTRY = struct.Struct('<IIIdB32s')
+INDEX_FILE = 'index'
+READ_ENTRIES = 1024
+
+
+def get_job_directory(directory, job_id):
+    """
+    Return the store directory for job_id.
+    """
+    if not job_id or os.sep in job_id or job_id.startswith('.'):
+        raise MashLoggerException(
+            'Invalid job id: {0}'.format(job_id)
+        )
+
+    return os.path.join(directory, job_id)
+
+
+def get_segment_path(job_directory, segment):
+    """
+    Return the path of a segment file.
+    """
+    return os.path.join(job_directory, '{0:08d}.log'.format(segment))
+
+
+class JobLogSegments(object):
+    """
+    Append-only segmented log and offset index for a single job.
+
+    Records are stored as json lines in segment files of up to
+    segment_size bytes. Every record has a fixed size entry in the
+    index file with the location, timestamp, level and service of the
+    record so readers can page and filter without reading segments.
+
+    Segment data is always written before the index entries that
+    point to it so a reader never sees an entry for missing data.
+    """
+    def __init__(self, job_directory, segment_size):
+        self.job_directory = job_directory
+        self.segment_size = segment_size
+        self.pending = []
+        self.pending_entries = []
+        self.pending_size = 0
+        self.last_used = time.time()
+
+        os.makedirs(job_directory, exist_ok=True)
+        self.index = open(os.path.join(job_directory, INDEX_FILE), 'ab')
+
+        segments = [
+            int(name[:-4]) for name in os.listdir(job_directory)
+            if name.endswith('.log')
+        ]
+        self._open_segment(max(segments, default=0))
+
+    def _open_segment(self, segment):
+        self.segment_number = segment
+        self.segment = open(
+            get_segment_path(self.job_directory, segment), 'ab'
+        )
+        self.offset = self.segment.tell()
+
+    def write(self, record):
+        """
+        Buffer the record and its index entry.
+        """
+        data = (json.dumps(record, sort_keys=True) + '\n').encode()
+
+        if self.offset and self.offset + len(data) > self.segment_size:
+            self.flush()
+            self.segment.close()
+            self._open_segment(self.segment_number + 1)
+
+        level = logging.getLevelName(record['level'])
+
+        self.pending.append(data)
+        self.pending_entries.append(INDEX_ENTRY.pack(
+            self.segment_number,
+            self.offset,
+            len(data),
+            record['created'],
+            level if isinstance(level, int) else 0,
+            record['service'].encode()[:32]
+        ))
+        self.offset += len(data)
+        self.pending_size += len(data)
+        self.last_used = time.time()
+
+    def flush(self):
+        if self.pending:
+            self.segment.write(b''.join(self.pending))
+            self.segment.flush()
+            self.index.write(b''.join(self.pending_entries))
+            self.index.flush()
+            self.pending = []
+            self.pending_entries = []
+            self.pending_size = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.segment.close()
+            self.index.close()
+
+    def discard(self):
+        """
+        Drop the pending records and close the files without writing.
+        """
+        self.pending = []
+        self.pending_entries = []
+        self.pending_size = 0
+
+        with suppress(Exception):
+            self.segment.close()
+
+        with suppress(Exception):
+            self.index.close()
+
+
+class JobLogStore(JobLogWriter):
+    """
+    Buffered writer for the structured job log store.
+
+    Open segments are cached per job with the same LRU, size and idle
+    policies as :class:`JobLogWriter`.
+    """
+    def __init__(
+        self, directory, segment_size=8388608, max_open_files=256,
+        idle_timeout=300, flush_size=65536
+    ):
+        super(JobLogStore, self).__init__(
+            max_open_files, idle_timeout, flush_size
+        )
+        self.directory = directory
+        self.segment_size = segment_size
+
+    def _open_log_file(self, job_id):
+        return JobLogSegments(
+            get_job_directory(self.directory, job_id),
+            self.segment_size
+        )
+
+
+class JobLogReader(object):
+    """
+    Read records from the structured job log store.
+
+    Records are addressed by their position in the job index. Only the
+    index is scanned to apply the level and service filters, segment
+    data is read for matching records only.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _match(self, entry, level, service):
+        if level and entry[4] < level:
+            return False
+
+        if service and entry[5].rstrip(b'\0') != service:
+            return False
+
+        return True
+
+    def _read_entries(self, index, position, count):
+        index.seek(position * INDEX_ENTRY.size)
+        data = index.read(count * INDEX_ENTRY.size)
+        data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+        return list(INDEX_ENTRY.iter_unpack(data))
+
+    def _read_records(self, job_directory, entries):
+        records = []
+        segments = {}
+
+        try:
+            for entry in entries:
+                segment = segments.get(entry[0])
+
+                if not segment:
+                    segment = open(
+                        get_segment_path(job_directory, entry[0]), 'rb'
+                    )
+                    segments[entry[0]] = segment
+
+                segment.seek(entry[1])
+                records.append(json.loads(segment.read(entry[2])))
+        finally:
+            for segment in segments.values():
+                segment.close()
+
+        return records
+
+    def read(
+        self, job_id, start=0, limit=100, level=None, service=None,
+        tail=False
+    ):
+        """
+        Return up to limit matching records and the next position.
+
+        Records are read forward from the start position, or if tail is
+        set the last limit matching records are returned. The returned
+        position can be used as start to page or follow the log.
+
+        :param str level: Min level name such as ERROR.
+        :param str service: Only records from this service.
+        :rtype: dict
+        """
+        job_directory = get_job_directory(self.directory, job_id)
+        index_path = os.path.join(job_directory, INDEX_FILE)
+
+        if level:
+            level = logging.getLevelName(level.upper())
+
+            if not isinstance(level, int):
+                raise MashLoggerException('Invalid log level.')
+
+        if service:
+            service = service.encode()
+
+        if not os.path.exists(index_path):
+            return {'logs': [], 'next': 0}
+
+        matches = []
+
+        with open(index_path, 'rb') as index:
+            total = os.fstat(index.fileno()).st_size // INDEX_ENTRY.size
+
+            if tail:
+                position = total
+
+                while position > start and len(matches) < limit:
+                    count = min(READ_ENTRIES, position - start)
+                    position -= count
+                    entries = self._read_entries(index, position, count)
+                    matches = [
+                        entry for entry in entries
+                        if self._match(entry, level, service)
+                    ][-(limit - len(matches)):] + matches
+
+                next_position = total
+            else:
+                position = start
+
+                while position < total and len(matches) < limit:
+                    entries = self._read_entries(
+                        index, position, min(READ_ENTRIES, total - position)
+                    )
+
+                    for entry in entries:
+                        position += 1
+
+                        if self._match(entry, level, service):
+                            matches.append(entry)
+
+                            if len(matches) == limit:
+                                break
+
+                next_position = position
+
+        return {
+            'logs': self._read_records(job_directory, matches),
+            'next': next_position
+        }
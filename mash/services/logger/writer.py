@@ -0,0 +1,199 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import collections
+import threading
+import time
+
+from contextlib import suppress
+
+from mash.mash_exceptions import MashLoggerException
+
+
+class JobLogFile(object):
+    """
+    Open job log file and the lines waiting to be written.
+    """
+    def __init__(self, path):
+        self.handle = open(path, 'a')
+        self.pending = []
+        self.pending_size = 0
+        self.last_used = time.time()
+
+    def write(self, data):
+        self.pending.append(data)
+        self.pending_size += len(data)
+        self.last_used = time.time()
+
+    def flush(self):
+        if self.pending:
+            self.handle.write(''.join(self.pending))
+            self.handle.flush()
+            self.pending = []
+            self.pending_size = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.handle.close()
+
+    def discard(self):
+        """
+        Drop the pending lines and close the file without writing.
+        """
+        self.pending = []
+        self.pending_size = 0
+
+        with suppress(Exception):
+            self.handle.close()
+
+
+class JobLogWriter(object):
+    """
+    Buffered writer for job log files.
+
+    Keeps an LRU cache of up to max_open_files open job log files so
+    each log line does not cost an open and close. Lines are buffered
+    per job and written once flush_size bytes are pending or when
+    :meth:`flush` is called. Files unused for idle_timeout seconds are
+    closed by :meth:`evict_idle`. A file is only evicted once its
+    pending lines are written.
+
+    If flushing a file keeps failing its pending lines are dropped
+    once more than max_pending_size bytes are buffered, the number of
+    dropped lines is counted in :attr:`dropped`.
+    """
+    def __init__(
+        self, max_open_files=256, idle_timeout=300, flush_size=65536,
+        max_pending_size=16777216
+    ):
+        self.max_open_files = max_open_files
+        self.idle_timeout = idle_timeout
+        self.flush_size = flush_size
+        self.max_pending_size = max_pending_size
+        self.dropped = 0
+        self.files = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _open_log_file(self, path):
+        """
+        Return a new log file for path.
+        """
+        return JobLogFile(path)
+
+    def _get_log_file(self, path):
+        """
+        Return cached log file, opening it and evicting the least
+        recently used file if required.
+
+        Files that cannot be written are skipped, if no file can be
+        evicted MashLoggerException is raised as max_open_files
+        would be exceeded.
+        """
+        log_file = self.files.get(path)
+
+        if log_file:
+            self.files.move_to_end(path)
+            return log_file
+
+        if len(self.files) >= self.max_open_files and not any(
+            self._evict(candidate) for candidate in list(self.files)
+        ):
+            raise MashLoggerException(
+                'Could not close any of {0} open log files.'.format(
+                    len(self.files)
+                )
+            )
+
+        log_file = self._open_log_file(path)
+        self.files[path] = log_file
+        return log_file
+
+    def _evict(self, path):
+        """
+        Close the log file at path once its pending lines are written.
+
+        If the lines cannot be written the file stays cached, the lines
+        are retried and the error is raised by the next :meth:`flush`.
+        Returns True if the file was closed.
+        """
+        log_file = self.files[path]
+
+        try:
+            log_file.flush()
+        except Exception:
+            return False
+
+        del self.files[path]
+        log_file.close()
+        return True
+
+    def write(self, path, data):
+        """
+        Buffer data for the log file at path.
+        """
+        with self.lock:
+            log_file = self._get_log_file(path)
+            log_file.write(data)
+
+            if log_file.pending_size >= self.flush_size:
+                log_file.flush()
+
+    def flush(self):
+        """
+        Write all buffered lines to the log files.
+
+        A failed write does not prevent the other files from being
+        flushed, the first error is raised once all files are done.
+        """
+        error = None
+
+        with self.lock:
+            for path, log_file in list(self.files.items()):
+                try:
+                    log_file.flush()
+                except Exception as flush_error:
+                    error = error or flush_error
+
+                    if log_file.pending_size > self.max_pending_size:
+                        self.dropped += len(log_file.pending)
+                        self.files.pop(path).discard()
+
+        if error:
+            raise error
+
+    def evict_idle(self):
+        """
+        Close log files that have not been used within idle timeout.
+        """
+        cutoff = time.time() - self.idle_timeout
+
+        with self.lock:
+            for path in list(self.files):
+                if self.files[path].last_used < cutoff:
+                    self._evict(path)
+
+    def close(self):
+        """
+        Flush and close all log files.
+        """
+        with self.lock:
+            while self.files:
+                _, log_file = self.files.popitem()
+                log_file.close()
@@ -22,7 +22,7 @@ import traceback
 
 # project
 from mash.mash_exceptions import MashException
-from mash.services.base_config import BaseConfig
+from mash.services.logger.config import LoggerConfig
 from mash.services.logger.service import LoggerService
 
 
@@ -37,7 +37,7 @@ def main():
         # run service, enter main loop
         LoggerService(
             service_exchange='logger',
-            config=BaseConfig()
+            config=LoggerConfig()
         )
     except MashException as e:
         # known exception
@@ -16,12 +16,179 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+import json
 import logging
+import threading
+import time
+
+import requests
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from cryptography.fernet import Fernet
 
 from mash.mash_exceptions import MashJobException
+from mash.services.base_defaults import Defaults
 from mash.services.status_levels import UNKOWN
 from mash.utils.mash_utils import handle_request
 
+_credentials_clients = {}
+_credentials_clients_lock = threading.Lock()
+
+
+class CredentialsClient(object):
+    """
+    Client for the credentials service shared by the jobs of a service.
+
+    Requests reuse the connections of one requests session per thread.
+    Retrieved credentials are kept for ttl seconds per (user, cloud,
+    account), encrypted with a key that only exists in memory, and the
+    least recently used entry is dropped once max_size is reached.
+    Accounts already requested by another job are waited for instead
+    of requested again.
+    """
+    def __init__(self, url, ttl=None, max_size=1024):
+        self.url = url
+        self.ttl = Defaults.get_job_credentials_ttl() if ttl is None \
+            else ttl
+        self.max_size = max_size
+        self.sessions = threading.local()
+        self.fernet = Fernet(Fernet.generate_key())
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _get_session(self):
+        if not hasattr(self.sessions, 'session'):
+            self.sessions.session = requests.Session()
+
+        return self.sessions.session
+
+    def get_credentials(self, accounts, cloud, user):
+        """
+        Return a dictionary of the credentials for the accounts.
+        """
+        credentials = {}
+        futures = {}
+        missing = []
+
+        with self.lock:
+            for account in accounts:
+                key = (user, cloud, account)
+                cached = self._get_cached(key)
+
+                if cached is not None:
+                    credentials[account] = cached
+                elif key in self.pending:
+                    futures[account] = self.pending[key]
+                else:
+                    future = Future()
+                    self.pending[key] = future
+                    futures[account] = future
+                    missing.append(account)
+
+        if missing:
+            self._request_credentials(missing, cloud, user)
+
+        for account, future in futures.items():
+            credentials[account] = future.result()
+
+        return credentials
+
+    def _request_credentials(self, accounts, cloud, user):
+        """
+        Request credentials and resolve the pending futures of accounts.
+        """
+        data = {
+            'cloud': cloud,
+            'cloud_accounts': accounts,
+            'requesting_user': user
+        }
+
+        try:
+            response = handle_request(
+                self.url,
+                'credentials/',
+                'get',
+                job_data=data,
+                session=self._get_session()
+            )
+            credentials = response.json()
+        except Exception as error:
+            credentials = {}
+            request_error = error
+        else:
+            request_error = None
+
+        try:
+            with self.lock:
+                for account in accounts:
+                    key = (user, cloud, account)
+
+                    if account in credentials:
+                        self._set_cached(key, credentials[account])
+                        self.pending.pop(key).set_result(
+                            credentials[account]
+                        )
+                    else:
+                        self.pending.pop(key).set_exception(
+                            request_error or MashJobException(
+                                'No credentials for account: {0}'.format(
+                                    account
+                                )
+                            )
+                        )
+        finally:
+            # Never leave waiting jobs with a future that is not resolved
+            with self.lock:
+                for account in accounts:
+                    future = self.pending.pop((user, cloud, account), None)
+
+                    if future:
+                        future.set_exception(
+                            MashJobException(
+                                'Unable to retrieve credentials for '
+                                'account: {0}'.format(account)
+                            )
+                        )
+
+    def _get_cached(self, key):
+        entry = self.cache.get(key)
+
+        if not entry:
+            return None
+
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self.cache[key]
+            return None
+
+        self.cache.move_to_end(key)
+        return json.loads(self.fernet.decrypt(entry[1]).decode())
+
+    def _set_cached(self, key, credentials):
+        if not self.ttl:
+            return
+
+        self.cache[key] = (
+            time.monotonic(),
+            self.fernet.encrypt(json.dumps(credentials).encode())
+        )
+        self.cache.move_to_end(key)
+
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+
+def get_credentials_client(url, ttl):
+    """
+    Return the credentials client for url shared by all jobs of a service.
+    """
+    with _credentials_clients_lock:
+        if url not in _credentials_clients:
+            _credentials_clients[url] = CredentialsClient(url, ttl)
+
+        return _credentials_clients[url]
+
 
 class MashJob(object):
     """
@@ -54,6 +221,12 @@ class MashJob(object):
 
         self.post_init()
 
+    def cleanup(self):
+        """
+        Release resources the job left behind, called on job deletion.
+        """
+        pass
+
     def get_job_id(self):
         """
         Return dictionary with job id.
@@ -69,20 +242,17 @@ class MashJob(object):
         if self.credentials:
             return
 
-        data = {
-            'cloud': cloud or self.cloud,
-            'cloud_accounts': accounts,
-            'requesting_user': self.requesting_user
-        }
+        client = get_credentials_client(
+            self.config.get_credentials_url(),
+            self.config.get_job_credentials_ttl()
+        )
 
         try:
-            response = handle_request(
-                self.config.get_credentials_url(),
-                'credentials/',
-                'get',
-                job_data=data
+            self.credentials = client.get_credentials(
+                accounts,
+                cloud or self.cloud,
+                self.requesting_user
             )
-            self.credentials = response.json()
         except Exception:
             raise MashJobException(
                 'Credentials request failed for accounts: {accounts}'.format(
@@ -167,6 +337,15 @@ class MashJob(object):
         """
         self.status_msg = message
 
+    def get_image_metadata(self):
+        """
+        Return the image metadata from the obs result.
+
+        The metadata is computed while the image is downloaded, jobs
+        created before it existed get an empty dictionary.
+        """
+        return self.status_msg.get('image_metadata') or {}
+
     def add_error_msg(self, message):
         """
         Append error message to job status_msg dictionary.
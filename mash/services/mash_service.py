@@ -17,12 +17,18 @@
 #
 
 import logging
+import threading
 
 from amqpstorm import Connection
 
 # project
 from mash.log.filter import BaseServiceFilter
 from mash.mash_exceptions import MashRabbitConnectionException
+from mash.utils.amqp import (
+    QueueConsumer,
+    get_publisher,
+    release_publisher
+)
 from mash.utils.mash_utils import setup_rabbitmq_log_handler
 
 
@@ -41,6 +47,8 @@ class MashService(object):
     def __init__(self, service_exchange, config, custom_args=None):
         self.channel = None
         self.connection = None
+        self.consumers = []
+        self.channel_lock = threading.Lock()
 
         self.service_exchange = service_exchange
         self.custom_args = custom_args
@@ -52,6 +60,12 @@ class MashService(object):
         self.amqp_pass = self.config.get_amqp_pass()
 
         self._open_connection()
+        self.publisher = get_publisher(
+            self.amqp_host,
+            self.amqp_user,
+            self.amqp_pass,
+            channel_count=self.config.get_publisher_channel_count()
+        )
 
         logging.basicConfig()
         self.log = logging.getLogger(
@@ -63,7 +77,11 @@ class MashService(object):
         rabbit_handler = setup_rabbitmq_log_handler(
             self.amqp_host,
             self.amqp_user,
-            self.amqp_pass
+            self.amqp_pass,
+            queue_capacity=self.config.get_log_queue_capacity(),
+            batch_size=self.config.get_log_batch_size(),
+            flush_interval=self.config.get_log_flush_interval(),
+            block=self.config.get_log_queue_block()
         )
         self.log.addHandler(rabbit_handler)
         self.log.addFilter(BaseServiceFilter())
@@ -124,22 +142,30 @@ class MashService(object):
 
         if not self.channel or self.channel.is_closed:
             self.channel = self.connection.channel()
-            self.channel.confirm_deliveries()
 
     def _publish(self, exchange, routing_key, message):
         """
         Publish message to the provided exchange with the routing key.
+
+        Messages are published and confirmed on the publisher pool
+        shared by the process so results sent from job threads are not
+        serialized.
         """
-        self.channel.basic.publish(
-            body=message,
-            routing_key=routing_key,
-            exchange=exchange,
-            properties={
-                'content_type': 'application/json',
-                'delivery_mode': 2
-            },
-            mandatory=True
-        )
+        self.publisher.publish(exchange, routing_key, message)
+
+    def ack_message(self, message):
+        """
+        Ack the message from any thread.
+        """
+        with self.channel_lock:
+            message.ack()
+
+    def nack_message(self, message):
+        """
+        Reject and requeue the message from any thread.
+        """
+        with self.channel_lock:
+            message.nack(requeue=True)
 
     def bind_queue(self, exchange, routing_key, name):
         """
@@ -159,6 +185,11 @@ class MashService(object):
         """
         If channel or connection open, stop consuming and close.
         """
+        for consumer in self.consumers:
+            consumer.stop()
+
+        release_publisher(self.publisher)
+
         if self.channel and self.channel.is_open:
             self.channel.stop_consuming()
             self.channel.close()
@@ -166,16 +197,61 @@ class MashService(object):
         if self.connection and self.connection.is_open:
             self.connection.close()
 
-    def consume_queue(self, callback, queue_name, exchange):
+    def consume_queue(self, callback, queue_name, exchange, channel=None):
         """
         Declare and consume queue.
+
+        The queue is consumed on the service channel unless a
+        dedicated channel is provided.
         """
         queue = self._get_queue_name(exchange, queue_name)
         self._declare_queue(queue)
-        self.channel.basic.consume(
+
+        channel = channel or self.channel
+        channel.basic.consume(
             callback=callback, queue=queue
         )
 
+    def start_consumer(
+        self, callback, queue_name, exchange, prefetch_count=None
+    ):
+        """
+        Consume queue on a new channel in a dedicated consumer thread.
+
+        If prefetch_count is set the broker delivers at most that many
+        unacknowledged messages to the consumer at any time.
+        """
+        channel = self.connection.channel()
+
+        if prefetch_count:
+            channel.basic.qos(prefetch_count=prefetch_count)
+
+        self.consume_queue(callback, queue_name, exchange, channel=channel)
+
+        consumer = QueueConsumer(
+            channel,
+            name=self._get_queue_name(exchange, queue_name)
+        )
+        consumer.start()
+        self.consumers.append(consumer)
+
+        return consumer
+
+    def wait_for_consumers(self, timeout=1):
+        """
+        Block until any consumer thread stops.
+
+        Raise the consumer exception if it stopped due to an error.
+        """
+        while self.consumers and all(
+            consumer.is_alive() for consumer in self.consumers
+        ):
+            self.consumers[0].join(timeout)
+
+        for consumer in self.consumers:
+            if consumer.error:
+                raise consumer.error
+
     def unbind_queue(self, queue, exchange, routing_key):
         """
         Unbind the routing_key from the queue on given exchange.
@@ -17,18 +17,24 @@
 #
 
 import os
-import threading
 import logging
+import threading
+import time
 
-from datetime import datetime
-from pytz import utc
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.events import EVENT_JOB_SUBMITTED
+from datetime import datetime, timedelta
+from urllib.error import ContentTooShortError, URLError
 
 from obs_img_utils.api import OBSImageUtil
+from obs_img_utils.exceptions import OBSImageConditionsException
+from obs_img_utils.utils import get_checksum_from_file, retry
+from requests.exceptions import RequestException
 
 # project
+from mash.mash_exceptions import MashImageDownloadException
 from mash.services.base_defaults import Defaults
+from mash.utils.download import ParallelDownload
+from mash.utils.filetype import get_image_metadata
+from mash.utils.image_cache import ImageCache
 
 
 class OBSImageBuildResult(object):
@@ -72,7 +78,9 @@ class OBSImageBuildResult(object):
       Buildservice package architecture, defaults to: x86_64
 
     * :attr:`download_directory`
-      Download directory name, defaults to: /tmp
+      Download directory name, defaults to: /var/lib/mash/images/.
+      Images are downloaded once per build into the image cache in
+      this directory and linked into a directory per job.
 
     * :attr:`notification_email`
       Email to send job notifications.
@@ -81,13 +89,25 @@ class OBSImageBuildResult(object):
       The multibuild profile name for the image.
 
     * :attr:`conditions_wait_time`
-      Time to wait for conditions in image to be met.
+      Time to wait for conditions in image to be met. The conditions
+      are checked again by rescheduling the job.
 
     * :attr:`disallow_licenses`
       A list of licenses to disallow in the image.
 
     * :attr:`disallow_packages`
       A list of packages to disallow in the image.
+
+    * :attr:`poll_coordinator`
+      Shares the build service content polled by jobs
+      watching the same download url.
+
+    * :attr:`download_connections`
+      Number of connections used to download the image with range
+      requests.
+
+    * :attr:`download_chunk_size`
+      Size in bytes of the ranges for parallel downloads.
     """
     def __init__(
         self, job_id, job_file, download_url, image_name, last_service,
@@ -95,12 +115,16 @@ class OBSImageBuildResult(object):
         download_directory=Defaults.get_download_dir(),
         notification_email=None,
         profile=None, conditions_wait_time=900, disallow_licenses=None,
-        disallow_packages=None
+        disallow_packages=None, poll_coordinator=None,
+        download_connections=1, download_chunk_size=16777216
     ):
         self.arch = arch
         self.job_id = job_id
         self.job_file = job_file
         self.download_directory = os.path.join(download_directory, job_id)
+        self.image_cache = ImageCache(download_directory)
+        self.image_file = None
+        self.image_metadata = None
         self.download_url = download_url
         self.image_name = image_name
         self.last_service = last_service
@@ -109,6 +133,7 @@ class OBSImageBuildResult(object):
         self.scheduler = None
         self.job = None
         self.job_deleted = False
+        self.job_lock = threading.Lock()
         self.log_callback = None
         self.result_callback = None
         self.notification_email = notification_email
@@ -116,8 +141,11 @@ class OBSImageBuildResult(object):
         self.job_status = 'prepared'
         self.progress_log = {}
         self.conditions_wait_time = conditions_wait_time
+        self.conditions_deadline = None
         self.disallow_licenses = disallow_licenses
         self.disallow_packages = disallow_packages
+        self.download_connections = download_connections
+        self.download_chunk_size = download_chunk_size
         self.log_callback = logging.LoggerAdapter(
             log_callback,
             {'job_id': self.job_id}
@@ -152,15 +180,21 @@ class OBSImageBuildResult(object):
             **kwargs
         )
 
-    def start_watchdog(self, isotime=None):
+        if poll_coordinator:
+            self.downloader.remote = poll_coordinator.get_remote(
+                self.download_url
+            )
+
+    def start_watchdog(self, scheduler, isotime=None):
         """
-        Start a background job which triggers the update
+        Schedule a job on the shared scheduler which triggers the update
         of the image build data and image fetched from the obs project.
 
         The job is started at a given data/time which must
         be the result of a isoformat() call. If no data/time is
         specified the job runs immediately.
 
+        :param scheduler: OBSJobScheduler instance
         :param string isotime: data and time by isoformat()
         """
         job_time = None
@@ -168,28 +202,25 @@ class OBSImageBuildResult(object):
         if isotime:
             job_time = datetime.strptime(isotime[:19], '%Y-%m-%dT%H:%M:%S')
 
-        self.scheduler = BackgroundScheduler(timezone=utc)
-
+        self.scheduler = scheduler
         self.job = self.scheduler.add_job(
-            self._update_image_status, 'date',
-            run_date=job_time, timezone='utc'
+            self.job_id,
+            self._update_image_status,
+            run_date=job_time
         )
-        self.scheduler.add_listener(
-            self._job_submit_event, EVENT_JOB_SUBMITTED
-        )
-        self.scheduler.start()
 
     def stop_watchdog(self):
         """
-        Remove active job from scheduler
+        Remove pending job from scheduler
 
-        Current image status is retained
+        Current image status is retained. A running job is not
+        rescheduled after the watchdog is stopped.
         """
-        try:
-            self.job.remove()
+        with self.job_lock:
             self.job_deleted = True
-        except Exception:
-            pass
+
+            if self.scheduler:
+                self.scheduler.remove_job(self.job_id)
 
     def set_result_handler(self, function):
         self.result_callback = function
@@ -203,35 +234,17 @@ class OBSImageBuildResult(object):
                 self.job_id, {
                     'obs_result': {
                         'id': self.job_id,
-                        'image_file':
-                            self.downloader.image_status['image_source'],
+                        'image_file': self.image_file,
+                        'image_metadata': self.image_metadata,
                         'status': self.job_status,
                         'errors': self.errors,
                         'notification_email': self.notification_email,
                         'last_service': self.last_service,
-                        'build_time':
-                            self.downloader.image_status['buildtime'],
+                        'build_time': self.downloader.build_time,
                     }
                 }
             )
 
-    def _job_submit_event(self, event):
-        self.log_callback.info('Oneshot Job submitted')
-
-    def _job_skipped_event(self, event):
-        # Job is still active while the next _update_image_status
-        # event was scheduled. In this case we just skip the event
-        # and keep the active job waiting for an obs change
-        pass
-
-    def _wait_for_new_image(self):
-        osc_result_thread = threading.Thread(
-            target=self.downloader.wait_for_new_image
-        )
-        osc_result_thread.start()
-        osc_result_thread.join()
-        self._update_image_status()
-
     def _update_image_status(self):
         self.log_callback.extra = {
             'job_id': self.job_id
@@ -239,10 +252,11 @@ class OBSImageBuildResult(object):
         self.log_callback.info('Job running')
 
         try:
-            image_source = self.downloader.get_image()
-            self.log_callback.info(
-                'Downloaded: {0}'.format(image_source)
-            )
+            if self.downloader.has_conditions and \
+                    not self._check_image_conditions():
+                return
+
+            self.image_file = self._get_image()
 
             self.job_status = 'success'
             self.log_callback.info(
@@ -258,6 +272,150 @@ class OBSImageBuildResult(object):
             self.log_callback.error(msg)
             self._result_callback()
 
+    def _get_image(self):
+        """
+        Return the image file for the job from the image cache.
+
+        The build checksum is fetched before downloading. The first job
+        for a build downloads the image into the cache, jobs for the
+        same build wait on the cache entry and link the cached image.
+        Downloads are limited by the download slots of the scheduler.
+
+        The image metadata, sizes and digests, is computed when the image
+        is downloaded and stored with the cache entry.
+        """
+        image_name = self.downloader.base_file_name
+        checksum = self._get_image_checksum(image_name)
+
+        with self.image_cache.get_entry(image_name, checksum) as entry:
+            if entry.get_image_file():
+                self.log_callback.info(
+                    'Using cached image: {0}'.format(image_name)
+                )
+            else:
+                with self.scheduler.download_slot():
+                    image_source, sha256, md5 = self._download_image(
+                        entry.path,
+                        image_name,
+                        checksum
+                    )
+
+                entry.commit(
+                    image_source,
+                    image_name,
+                    checksum,
+                    get_image_metadata(image_source, sha256, md5)
+                )
+                self.log_callback.info(
+                    'Downloaded: {0}'.format(image_source)
+                )
+
+            self.image_metadata = entry.get_metadata()
+            return self.image_cache.link(entry, self.download_directory)
+
+    def _check_image_conditions(self):
+        """
+        Return True if the image conditions are met.
+
+        Otherwise the job is scheduled to check the conditions again
+        and False is returned, waiting jobs do not hold a scheduler
+        thread. The image file name is looked up again before every
+        retry as a new build may be published while waiting. Raises
+        OBSImageConditionsException if the conditions are not met
+        within conditions_wait_time.
+        """
+        if self.conditions_deadline is None:
+            self.conditions_deadline = \
+                time.time() + self.conditions_wait_time
+
+        try:
+            self.downloader.check_all_conditions()
+        except OBSImageConditionsException as error:
+            if time.time() >= self.conditions_deadline:
+                self.conditions_deadline = None
+                raise
+
+            with self.job_lock:
+                if not self.job_deleted:
+                    wait = min(150, self.conditions_wait_time)
+                    self.log_callback.warning(
+                        '{0}, retrying in {1} seconds...'.format(error, wait)
+                    )
+                    self.downloader.reset_base_file_name()
+                    self.job = self.scheduler.add_job(
+                        self.job_id,
+                        self._update_image_status,
+                        run_date=datetime.utcnow() + timedelta(seconds=wait)
+                    )
+
+            return False
+
+        self.conditions_deadline = None
+        return True
+
+    @retry((ContentTooShortError, URLError, MashImageDownloadException))
+    def _get_image_checksum(self, image_name):
+        """
+        Return the sha256 checksum of the image build from the checksum
+        file published next to the image.
+
+        The signature file of the checksum is fetched too if the build
+        publishes one.
+        """
+        checksum_file = self.downloader.remote.fetch_to_dir(
+            image_name,
+            self.downloader.base_regex,
+            self.download_directory,
+            self.downloader.checksum_extensions
+        )
+
+        self.downloader.remote.fetch_to_dir(
+            image_name,
+            self.downloader.base_regex,
+            self.download_directory,
+            self.downloader.signature_extensions
+        )
+
+        if not checksum_file:
+            raise MashImageDownloadException(
+                'No checksum found that matches image {0} at {1}.'.format(
+                    image_name,
+                    self.download_url
+                )
+            )
+
+        return get_checksum_from_file(checksum_file)
+
+    @retry((RequestException, MashImageDownloadException))
+    def _download_image(self, target_directory, image_name, checksum):
+        """
+        Download the image build into target_directory.
+
+        Returns the image file and its sha256 and md5 digests which are
+        computed while downloading. With more than one download
+        connection the image is fetched with parallel range requests.
+
+        A failed download is retried with the backoff obs-img-utils uses
+        for its downloads. Interrupted range downloads resume from their
+        checkpoint.
+        """
+        file_name = ''.join([image_name, self.downloader.image_ext])
+        download = ParallelDownload(
+            '/'.join([self.download_url, file_name]),
+            os.path.join(target_directory, file_name),
+            checksum,
+            connections=self.download_connections,
+            chunk_size=self.download_chunk_size,
+            progress_callback=self.progress_callback
+        )
+        image_source = download.download()
+
+        return (
+            image_source,
+            download.image_hash.hexdigest(),
+            download.image_md5.hexdigest()
+        )
+
     def progress_callback(self, block_num, read_size, total_size, done=False):
         """
         Update progress in log callback
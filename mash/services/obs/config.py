@@ -0,0 +1,107 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+from mash.services.base_config import BaseConfig
+from mash.services.obs.defaults import Defaults as OBSDefaults
+
+
+class OBSConfig(BaseConfig):
+    """
+    Implements reading of obs configuration from mash configuration file:
+
+    * /etc/mash/mash_config.yaml
+
+    The mash configuration file is a yaml formatted file containing
+    information to control the behavior of the mash services.
+
+    obs:
+      # max number of images downloaded at the same time
+      max_downloads: 4
+      # seconds between logging the job scheduler metrics, 0 disables it
+      metrics_interval: 300
+      # seconds build service listings and checksums are cached
+      poll_ttl: 60
+      # connections for image range downloads
+      download_connections: 1
+      # size in bytes of each download range
+      download_chunk_size: 16777216
+    """
+    def __init__(self, config_file=None):
+        super(OBSConfig, self).__init__(config_file)
+
+    def get_max_downloads(self):
+        """
+        Return the max number of simultaneous image downloads.
+
+        :rtype: int
+        """
+        max_downloads = self._get_attribute(
+            attribute='max_downloads', element='obs'
+        )
+        return max_downloads or OBSDefaults.get_max_downloads()
+
+    def get_metrics_interval(self):
+        """
+        Return the seconds between logging the job scheduler metrics.
+
+        If 0 the metrics are not logged.
+
+        :rtype: int
+        """
+        metrics_interval = self._get_attribute(
+            attribute='metrics_interval', element='obs'
+        )
+
+        if metrics_interval is None:
+            metrics_interval = OBSDefaults.get_metrics_interval()
+
+        return metrics_interval
+
+    def get_poll_ttl(self):
+        """
+        Return the seconds build service content is shared between jobs.
+
+        :rtype: int
+        """
+        poll_ttl = self._get_attribute(
+            attribute='poll_ttl', element='obs'
+        )
+        return poll_ttl or OBSDefaults.get_poll_ttl()
+
+    def get_download_connections(self):
+        """
+        Return the number of connections used to download an image.
+
+        :rtype: int
+        """
+        download_connections = self._get_attribute(
+            attribute='download_connections', element='obs'
+        )
+        return download_connections or \
+            OBSDefaults.get_download_connections()
+
+    def get_download_chunk_size(self):
+        """
+        Return the size in bytes of the parallel download ranges.
+
+        :rtype: int
+        """
+        download_chunk_size = self._get_attribute(
+            attribute='download_chunk_size', element='obs'
+        )
+        return download_chunk_size or OBSDefaults.get_download_chunk_size()
@@ -0,0 +1,42 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+
+class Defaults(object):
+    """
+    Default values
+    """
+    @staticmethod
+    def get_max_downloads():
+        return 4
+
+    @staticmethod
+    def get_metrics_interval():
+        return 300
+
+    @staticmethod
+    def get_poll_ttl():
+        return 60
+
+    @staticmethod
+    def get_download_connections():
+        return 1
+
+    @staticmethod
+    def get_download_chunk_size():
+        return 16777216
@@ -0,0 +1,212 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import os
+import tempfile
+import threading
+import time
+
+from obs_img_utils.web_content import WebContent
+
+
+class CachedWebContent(WebContent):
+    """
+    Build service content listing shared by all jobs of a download url.
+
+    Index listings and small metadata files, such as checksums, are
+    fetched once and cached for ttl seconds. Concurrent requests for
+    the same content wait for the first fetch instead of requesting
+    it again. Downloads with a progress callback, the images, are not
+    cached.
+    """
+    def __init__(self, uri, ttl):
+        super(CachedWebContent, self).__init__(uri)
+        self.ttl = ttl
+        self.cache = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.metrics = {
+            'fetches': 0,
+            'hits': 0
+        }
+
+    def _get_lock(self, key):
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def _get(self, key, fetch):
+        """
+        Return the cached value for key or fetch and cache it.
+
+        Failed fetches are not cached.
+        """
+        with self._get_lock(key):
+            expires, value = self.cache.get(key, (0, None))
+
+            if expires > time.monotonic():
+                with self.lock:
+                    self.metrics['hits'] += 1
+                return value
+
+            value = fetch()
+            self.cache[key] = (time.monotonic() + self.ttl, value)
+
+            with self.lock:
+                self.metrics['fetches'] += 1
+
+        return value
+
+    def _fetch_file(self, base_name, regex, extensions):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_file = super(CachedWebContent, self).fetch_to_dir(
+                base_name,
+                regex,
+                temp_dir,
+                extensions
+            )
+
+            if not target_file:
+                return None, None
+
+            with open(target_file, 'rb') as content_file:
+                return os.path.basename(target_file), content_file.read()
+
+    def fetch_index_list(self, base_name):
+        return list(self._get(
+            ('index', base_name),
+            lambda: super(CachedWebContent, self).fetch_index_list(base_name)
+        ))
+
+    def fetch_json_list(self, base_name):
+        return list(self._get(
+            ('json', base_name),
+            lambda: super(CachedWebContent, self).fetch_json_list(base_name)
+        ))
+
+    def fetch_to_dir(
+        self, base_name, regex, target_dir, extensions, callback=None
+    ):
+        if callback:
+            return super(CachedWebContent, self).fetch_to_dir(
+                base_name,
+                regex,
+                target_dir,
+                extensions,
+                callback
+            )
+
+        name, content = self._get(
+            ('file', base_name, regex, tuple(extensions)),
+            lambda: self._fetch_file(base_name, regex, extensions)
+        )
+
+        if not name:
+            return None
+
+        target_file = os.sep.join([target_dir, name])
+
+        with open(target_file, 'wb') as content_file:
+            content_file.write(content)
+
+        return target_file
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(self.metrics)
+
+    def clear(self):
+        """
+        Drop the cached content and the locks of its keys.
+        """
+        with self.lock:
+            self.cache = {}
+            self.locks = {}
+
+
+class OBSPollCoordinator(object):
+    """
+    Coalesces the build service polling of all OBS jobs.
+
+    Jobs watching the same download url share one CachedWebContent,
+    so the project listing and checksums of an image are fetched once
+    per ttl no matter how many jobs wait on it. The image name, arch
+    and profile of a job only filter the shared listing. The shared
+    content is dropped when the last job for the download url
+    releases it.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.remotes = {}
+        self.references = {}
+        self.lock = threading.Lock()
+        self.metrics = {
+            'fetches': 0,
+            'hits': 0
+        }
+
+    def get_remote(self, download_url):
+        """
+        Return the shared web content instance for download_url.
+
+        Every call must be matched by a call to release_remote.
+        """
+        with self.lock:
+            if download_url not in self.remotes:
+                self.remotes[download_url] = CachedWebContent(
+                    download_url,
+                    self.ttl
+                )
+                self.references[download_url] = 0
+
+            self.references[download_url] += 1
+            return self.remotes[download_url]
+
+    def release_remote(self, download_url):
+        """
+        Release the shared web content instance for download_url.
+
+        The instance, its cached content and key locks are dropped if
+        no other job uses it.
+        """
+        with self.lock:
+            if download_url not in self.remotes:
+                return
+
+            self.references[download_url] -= 1
+
+            if self.references[download_url] == 0:
+                remote = self.remotes.pop(download_url)
+                del self.references[download_url]
+                remote.clear()
+
+                for name, value in remote.get_metrics().items():
+                    self.metrics[name] += value
+
+    def get_metrics(self):
+        """
+        Return the number of remote fetches and cache hits.
+        """
+        with self.lock:
+            metrics = dict(self.metrics)
+            remotes = list(self.remotes.values())
+
+        for remote in remotes:
+            for name, value in remote.get_metrics().items():
+                metrics[name] += value
+
+        return metrics
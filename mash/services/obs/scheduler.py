@@ -0,0 +1,142 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import threading
+
+from contextlib import contextmanager
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from pytz import utc
+
+
+class OBSJobScheduler(object):
+    """
+    Shared scheduler for the OBS image build result jobs.
+
+    All jobs run on one background scheduler with a bounded thread
+    pool. Jobs for a future utctime wait in the scheduler job store
+    and do not hold a thread. Image downloads are limited to
+    max_downloads at the same time.
+
+    Metrics
+
+    * queued: Jobs scheduled or waiting for a free thread
+    * running: Jobs currently running
+    * waiting: Running jobs waiting for a download slot
+    * downloading: Jobs currently downloading an image
+    """
+    def __init__(self, thread_pool_count, max_downloads):
+        self.scheduler = BackgroundScheduler(
+            executors={'default': ThreadPoolExecutor(thread_pool_count)},
+            timezone=utc
+        )
+        self.download_slots = threading.BoundedSemaphore(max_downloads)
+        self.lock = threading.Lock()
+        self.metrics = {
+            'queued': 0,
+            'running': 0,
+            'waiting': 0,
+            'downloading': 0
+        }
+
+    def _update_metrics(self, **changes):
+        with self.lock:
+            for name, change in changes.items():
+                self.metrics[name] += change
+
+    def _run_job(self, func):
+        self._update_metrics(queued=-1, running=1)
+
+        try:
+            func()
+        finally:
+            self._update_metrics(running=-1)
+
+    def start(self):
+        self.scheduler.start()
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+    def add_job(self, job_id, func, run_date=None):
+        """
+        Run func once at run_date, or as soon as possible if None.
+
+        Jobs run regardless of how late they are, for example after
+        a service restart or when all threads are busy. A pending job
+        with the same id is replaced.
+        """
+        self.remove_job(job_id)
+        self._update_metrics(queued=1)
+
+        return self.scheduler.add_job(
+            self._run_job,
+            'date',
+            args=[func],
+            id=job_id,
+            run_date=run_date,
+            misfire_grace_time=None
+        )
+
+    def add_interval_job(self, func, seconds):
+        """
+        Run func every given seconds, not included in the job metrics.
+        """
+        return self.scheduler.add_job(
+            func,
+            'interval',
+            seconds=seconds
+        )
+
+    def remove_job(self, job_id):
+        """
+        Remove the job if it has not started yet.
+
+        Returns True if the job was removed.
+        """
+        try:
+            self.scheduler.remove_job(job_id)
+        except JobLookupError:
+            return False
+
+        self._update_metrics(queued=-1)
+        return True
+
+    @contextmanager
+    def download_slot(self):
+        """
+        Block until a download slot is free and hold it.
+        """
+        self._update_metrics(waiting=1)
+
+        with self.download_slots:
+            self._update_metrics(waiting=-1, downloading=1)
+
+            try:
+                yield
+            finally:
+                self._update_metrics(downloading=-1)
+
+    def get_metrics(self):
+        """
+        Return a copy of the job metrics.
+        """
+        with self.lock:
+            return dict(self.metrics)
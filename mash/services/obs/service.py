@@ -22,6 +22,8 @@ import dateutil.parser
 # project
 from mash.services.mash_service import MashService
 from mash.services.obs.build_result import OBSImageBuildResult
+from mash.services.obs.poll import OBSPollCoordinator
+from mash.services.obs.scheduler import OBSJobScheduler
 from mash.utils.json_format import JsonFormat
 from mash.utils.mash_utils import persist_json, restart_jobs, setup_logfile
 
@@ -59,6 +61,26 @@ class OBSImageBuildResultService(MashService):
             self.service_exchange, self.job_document_key, self.service_queue
         )
 
+        # shared scheduler for all jobs
+        self.scheduler = OBSJobScheduler(
+            self.config.get_base_thread_pool_count(),
+            self.config.get_max_downloads()
+        )
+        metrics_interval = self.config.get_metrics_interval()
+
+        if metrics_interval:
+            self.scheduler.add_interval_job(
+                self._log_metrics,
+                metrics_interval
+            )
+
+        self.scheduler.start()
+
+        # shared build service polling for all jobs
+        self.poll_coordinator = OBSPollCoordinator(
+            self.config.get_poll_ttl()
+        )
+
         # read and launch open jobs
         restart_jobs(self.job_directory, self._start_job)
 
@@ -77,8 +99,22 @@ class OBSImageBuildResultService(MashService):
         except Exception:
             raise
         finally:
+            self.scheduler.shutdown()
             self.close_connection()
 
+    def _log_metrics(self):
+        metrics = self.scheduler.get_metrics()
+
+        if any(metrics.values()):
+            metrics.update(self.poll_coordinator.get_metrics())
+            self.log.info(
+                'Jobs queued: {queued}, running: {running}, waiting for '
+                'download: {waiting}, downloading: {downloading}, '
+                'build service fetches: {fetches}, cached: {hits}'.format(
+                    **metrics
+                )
+            )
+
     def _send_job_result_for_upload(self, job_id, trigger_info):
         self._publish(
             self.service_exchange,
@@ -193,17 +229,17 @@ class OBSImageBuildResultService(MashService):
                     'message': 'Job deletion failed: {0}'.format(e)
                 }
             else:
-                # stop running job
-                if job_worker:
-                    job_worker.stop_watchdog()
-
-                # delete obs job instance
-                del self.jobs[job_id]
-
                 return {
                     'ok': True,
                     'message': 'Job Deleted'
                 }
+            finally:
+                # stop running job and delete obs job instance
+                job_worker.stop_watchdog()
+                del self.jobs[job_id]
+                self.poll_coordinator.release_remote(
+                    job_worker.download_url
+                )
 
     def _start_job(self, job):
         job_id = job['id']
@@ -221,7 +257,10 @@ class OBSImageBuildResultService(MashService):
             'image_name': job['image'],
             'last_service': job['last_service'],
             'download_directory': self.download_directory,
-            'log_callback': self.log
+            'log_callback': self.log,
+            'poll_coordinator': self.poll_coordinator,
+            'download_connections': self.config.get_download_connections(),
+            'download_chunk_size': self.config.get_download_chunk_size()
         }
 
         if 'conditions' in job:
@@ -247,7 +286,7 @@ class OBSImageBuildResultService(MashService):
 
         job_worker = OBSImageBuildResult(**kwargs)
         job_worker.set_result_handler(self._send_job_result_for_upload)
-        job_worker.start_watchdog(isotime=time)
+        job_worker.start_watchdog(self.scheduler, isotime=time)
         self.jobs[job_id] = job_worker
         return {
             'ok': True,
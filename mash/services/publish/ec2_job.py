@@ -16,11 +16,10 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
-from ec2imgutils.ec2publishimg import EC2PublishImage
-
 from mash.mash_exceptions import MashPublishException
 from mash.services.mash_job import MashJob
-from mash.services.status_levels import SUCCESS
+from mash.services.status_levels import FAILED, SUCCESS
+from mash.utils.ec2 import CachedEC2PublishImage, fan_out_regions
 
 
 class EC2PublishJob(MashJob):
@@ -44,6 +43,9 @@ class EC2PublishJob(MashJob):
 
         self.allow_copy = self.job_config.get('allow_copy', 'none')
         self.share_with = self.job_config.get('share_with', 'all')
+        self.continue_on_error = self.config.get_continue_on_region_error(
+            'publish'
+        )
 
     def run_job(self):
         """
@@ -59,25 +61,55 @@ class EC2PublishJob(MashJob):
         self.request_credentials(accounts)
         self.cloud_image_name = self.status_msg['cloud_image_name']
 
+        regions = []
         for region_info in self.publish_regions:
             creds = self.credentials[region_info['account']]
 
-            publish = EC2PublishImage(
-                access_key=creds['access_key_id'],
-                allow_copy=self.allow_copy,
-                image_name=self.cloud_image_name,
-                secret_key=creds['secret_access_key'],
-                visibility=self.share_with,
-                log_callback=self.log_callback
-            )
-
             for region in region_info['target_regions']:
-                publish.set_region(region)
-                try:
-                    publish.publish_images()
-                except Exception as error:
-                    raise MashPublishException(
-                        'An error publishing image {0} in {1}. {2}'.format(
-                            self.cloud_image_name, region, error
-                        )
+                regions.append((region, creds))
+
+        results = fan_out_regions(
+            self._publish_region,
+            regions,
+            max_workers=self.config.get_region_max_workers('publish'),
+            continue_on_error=self.continue_on_error
+        )
+
+        for (region, creds), status, result in results:
+            if status == SUCCESS:
+                self.log_callback.info(
+                    'Published image {0} in {1}.'.format(
+                        self.cloud_image_name, region
                     )
+                )
+            elif status == FAILED:
+                msg = 'An error publishing image {0} in {1}. {2}'.format(
+                    self.cloud_image_name, region, result
+                )
+
+                if not self.continue_on_error:
+                    raise MashPublishException(msg)
+
+                self.status = FAILED
+                self.add_error_msg(msg)
+                self.log_callback.error(msg)
+
+    def _publish_region(self, region_creds):
+        """
+        Publish image in one region.
+
+        A publisher is created per region since it is bound to the
+        region it is set to.
+        """
+        region, creds = region_creds
+
+        publish = CachedEC2PublishImage(
+            access_key=creds['access_key_id'],
+            allow_copy=self.allow_copy,
+            image_name=self.cloud_image_name,
+            secret_key=creds['secret_access_key'],
+            visibility=self.share_with,
+            log_callback=self.log_callback
+        )
+        publish.set_region(region)
+        publish.publish_images()
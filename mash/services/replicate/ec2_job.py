@@ -16,15 +16,17 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
-import time
-
-from botocore.exceptions import ClientError
 from collections import defaultdict
 
 from mash.mash_exceptions import MashReplicateException
 from mash.services.mash_job import MashJob
 from mash.services.status_levels import FAILED, SUCCESS
-from mash.utils.ec2 import get_client, describe_images
+from mash.utils.ec2 import (
+    EC2ReplicationTracker,
+    get_client,
+    image_exists,
+    image_name_cache
+)
 
 
 class EC2ReplicateJob(MashJob):
@@ -92,30 +94,31 @@ class EC2ReplicateJob(MashJob):
                     self.source_region_results[target_region]['account'] = \
                         credential
 
-        if self.source_region_results:
-            # Wait for images to replicate, this will take time.
-            # Only wait if at least one region was replicated.
-            time.sleep(300)
+        # Wait for images to replicate, this will take time.
+        tracker = EC2ReplicationTracker()
 
         for target_region, reg_info in self.source_region_results.items():
             credential = reg_info['account']
 
             if reg_info['image_id']:
-                try:
-                    self._wait_on_image(
-                        credential['access_key_id'],
-                        credential['secret_access_key'],
-                        reg_info['image_id'],
-                        target_region
-                    )
-                except Exception as error:
-                    self.status = FAILED
-                    msg = 'Replicate to {0} region failed: {1}'.format(
-                        target_region,
-                        error
-                    )
-                    self.add_error_msg(msg)
-                    self.log_callback.warning(msg)
+                tracker.add_image(
+                    target_region,
+                    reg_info['image_id'],
+                    credential['access_key_id'],
+                    credential['secret_access_key']
+                )
+
+        errors = tracker.wait()
+
+        for target_region in self.source_region_results:
+            if target_region in errors:
+                self.status = FAILED
+                msg = 'Replicate to {0} region failed: {1}'.format(
+                    target_region,
+                    errors[target_region]
+                )
+                self.add_error_msg(msg)
+                self.log_callback.warning(msg)
 
     def _replicate_to_region(
         self, credential, image_id, source_region, target_region
@@ -128,8 +131,14 @@ class EC2ReplicateJob(MashJob):
             credential['secret_access_key'], target_region
         )
 
+        cache_key = (credential['access_key_id'], target_region)
+
         try:
-            exists = self.image_exists(client, self.cloud_image_name)
+            exists = self.image_exists(
+                client,
+                self.cloud_image_name,
+                cache_key
+            )
             if not exists:
                 new_image = client.copy_image(
                     Description=self.image_description,
@@ -137,6 +146,7 @@ class EC2ReplicateJob(MashJob):
                     SourceImageId=image_id,
                     SourceRegion=source_region,
                 )
+                image_name_cache.invalidate(cache_key)
             else:
                 new_image = {'ImageId': None}
         except Exception as e:
@@ -150,46 +160,8 @@ class EC2ReplicateJob(MashJob):
         return new_image['ImageId']
 
     @staticmethod
-    def _wait_on_image(access_key_id, secret_access_key, image_id, region):
-        """
-        Wait on image to finish replicating in the given region.
-        """
-        while True:
-            client = get_client(
-                'ec2',
-                access_key_id,
-                secret_access_key,
-                region
-            )
-
-            try:
-                images = describe_images(client, [image_id])
-                state = images[0]['State']
-            except (IndexError, KeyError, ClientError):
-                raise MashReplicateException(
-                    'The image with ID: {0} was not found.'.format(
-                        image_id
-                    )
-                )
-
-            if state == 'available':
-                break
-            elif state == 'failed':
-                raise MashReplicateException(
-                    'The image with ID: {0} reached a failed state.'.format(
-                        image_id
-                    )
-                )
-            elif state == 'pending':
-                time.sleep(60)
-
-    @staticmethod
-    def image_exists(client, cloud_image_name):
+    def image_exists(client, cloud_image_name, cache_key=None):
         """
         Determine if image exists given image name.
         """
-        images = describe_images(client)
-        for image in images:
-            if cloud_image_name == image.get('Name'):
-                return True
-        return False
+        return image_exists(client, cloud_image_name, cache_key)
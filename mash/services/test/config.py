@@ -29,11 +29,23 @@ class TestConfig(BaseConfig):
 
     The mash configuration file is a yaml formatted file containing
     information to control the behavior of the mash services.
+
+    test:
+      # max number of partitions an image is tested in at once per job
+      region_max_workers: 8
+      ec2:
+        # max number of test instances running at once per account
+        max_instances_per_account: 20
+      gce:
+        # number of fallback zones an image is tested in at once
+        zone_probes: 1
     """
     __test__ = False  # Used by pytest to ignore class in auto discovery
 
     def __init__(self, config_file=None):
         super(TestConfig, self).__init__(config_file)
+        self.ec2_test = self._get_attribute('ec2', 'test') or dict()
+        self.gce_test = self._get_attribute('gce', 'test') or dict()
 
     def get_img_proof_timeout(self):
         """
@@ -46,3 +58,29 @@ class TestConfig(BaseConfig):
             element='test'
         )
         return img_proof_timeout or Defaults.get_img_proof_timeout()
+
+    def get_ec2_max_instances_per_account(self):
+        """
+        Return the max number of test instances running at once per account.
+
+        The limit is shared by all jobs of the test service.
+
+        :rtype: int
+        """
+        return self.ec2_test.get('max_instances_per_account') or \
+            Defaults.get_ec2_max_instances_per_account()
+
+    def get_gce_zone_probes(self):
+        """
+        Return the number of fallback zones an image is tested in at once.
+
+        The result of the first zone with capacity is used. img-proof
+        cannot stop a running test, so the full test suite runs in
+        every probed zone and the job waits for all of them. Each probe
+        costs a test instance, a value above 1 trades instance usage for
+        less waiting on zones without capacity.
+
+        :rtype: int
+        """
+        return self.gce_test.get('zone_probes') or \
+            Defaults.get_gce_zone_probes()
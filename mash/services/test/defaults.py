@@ -25,3 +25,11 @@ class Defaults(object):
     @staticmethod
     def get_img_proof_timeout():
         return 600
+
+    @staticmethod
+    def get_ec2_max_instances_per_account():
+        return 20
+
+    @staticmethod
+    def get_gce_zone_probes():
+        return 1
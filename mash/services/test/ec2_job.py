@@ -18,17 +18,22 @@
 
 import os
 import random
+import threading
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack, suppress
+
 from mash.mash_exceptions import MashTestException
 from mash.services.mash_job import MashJob
-from mash.services.status_levels import EXCEPTION, SUCCESS
+from mash.services.status_levels import EXCEPTION, FAILED, SUCCESS
 from mash.services.test.utils import (
     get_testing_account,
     process_test_result
 )
-from mash.utils.mash_utils import create_ssh_key_pair
+from mash.utils.mash_utils import create_ssh_key_pair, ResizableSemaphore
 from mash.utils.ec2 import (
+    fan_out_regions,
     setup_ec2_networking,
     wait_for_instance_termination,
     cleanup_ec2_image
@@ -49,6 +54,53 @@ instance_types = {
     ]
 }
 
+_instance_slots = {}
+_cleanup_executor = None
+_slots_lock = threading.Lock()
+
+
+def get_instance_slots(account, count):
+    """
+    Return the semaphore limiting test instances running in the account.
+
+    The semaphore is shared by all jobs of the service process and is
+    resized to the count of the latest job.
+    """
+    with _slots_lock:
+        if account not in _instance_slots:
+            _instance_slots[account] = ResizableSemaphore(count)
+        else:
+            _instance_slots[account].resize(count)
+
+        return _instance_slots[account]
+
+
+def get_cleanup_executor():
+    """
+    Return the thread pool releasing networking of terminated instances.
+    """
+    global _cleanup_executor
+
+    with _slots_lock:
+        if _cleanup_executor is None:
+            _cleanup_executor = ThreadPoolExecutor(max_workers=16)
+
+    return _cleanup_executor
+
+
+def release_networking(stack, credentials, instance_id, region):
+    """
+    Wait until instance is terminated and cleanup the networking.
+    """
+    with stack:
+        with suppress(Exception):
+            wait_for_instance_termination(
+                credentials['access_key_id'],
+                instance_id,
+                region,
+                credentials['secret_access_key']
+            )
+
 
 class EC2TestJob(MashJob):
     """
@@ -84,6 +136,9 @@ class EC2TestJob(MashJob):
                 instance_types[self.cloud_architecture]
             )
 
+        self.cleanup_futures = []
+        self.region_results = {}
+        self.lock = threading.Lock()
         self.ssh_private_key_file = self.config.get_ssh_private_key_file()
         self.img_proof_timeout = self.config.get_img_proof_timeout()
 
@@ -93,8 +148,16 @@ class EC2TestJob(MashJob):
     def run_job(self):
         """
         Tests image with img-proof and update status and results.
+
+        The partitions are tested concurrently. The networking of a
+        partition is released in the background once the test instance
+        is terminated. Once all partitions are tested the test results
+        of the first failed partition in region order, or of the last
+        partition if all passed, are applied to the status message.
+        Images are cleaned up once the test instances are terminated.
         """
         self.status = SUCCESS
+        self.cleanup_futures = []
         self.log_callback.info(
             'Running img-proof tests against image with '
             'type: {inst_type}.'.format(
@@ -109,72 +172,46 @@ class EC2TestJob(MashJob):
 
         self.request_credentials(accounts)
 
+        regions = []
         for region, info in self.test_regions.items():
-            account = get_testing_account(info)
-            credentials = self.credentials[account]
-
             if info['partition'] in ('aws-cn', 'aws-us-gov') and \
                     self.cloud_architecture == 'aarch64':
                 # Skip test aarch64 images in China and GovCloud.
                 # There are no aarch64 based instance types available.
                 continue
 
-            with setup_ec2_networking(
-                credentials['access_key_id'],
-                region,
-                credentials['secret_access_key'],
-                self.ssh_private_key_file,
-                subnet_id=info.get('subnet')
-            ) as network_details:
-                try:
-                    result = img_proof_test(
-                        access_key_id=credentials['access_key_id'],
-                        cloud=self.cloud,
-                        description=self.description,
-                        distro=self.distro,
-                        image_id=self.status_msg['source_regions'][region],
-                        instance_type=self.instance_type,
-                        img_proof_timeout=self.img_proof_timeout,
-                        region=region,
-                        secret_access_key=credentials['secret_access_key'],
-                        security_group_id=network_details['security_group_id'],
-                        ssh_key_name=network_details['ssh_key_name'],
-                        ssh_private_key_file=self.ssh_private_key_file,
-                        ssh_user=self.ssh_user,
-                        subnet_id=network_details['subnet_id'],
-                        tests=self.tests,
-                        log_callback=self.log_callback
-                    )
-                except Exception as error:
-                    self.add_error_msg(str(error))
-                    result = {
-                        'status': EXCEPTION,
-                        'msg': str(traceback.format_exc())
-                    }
+            regions.append((region, info))
 
-                status = process_test_result(
-                    result,
-                    self.log_callback,
-                    region,
-                    self.status_msg
-                )
+        # A failed test does not stop the partitions tested concurrently,
+        # partitions not started yet are cancelled if one raised an error.
+        self.region_results = {}
+        results = fan_out_regions(
+            self._test_region,
+            regions,
+            max_workers=self.config.get_region_max_workers('test')
+        )
+
+        for (region, info), status, result in results:
+            if status == FAILED:
+                msg = 'Error testing image in {0}. {1}'.format(region, result)
+                self.add_error_msg(msg)
+                self.log_callback.error(msg)
+            elif status == SUCCESS:
+                # The partition was tested, result is the test status
+                status = result
+            else:
+                # Cancelled partitions follow a failed one
+                continue
 
-                instance_id = result.get('instance_id')
-                if instance_id:
-                    # Wait until instance is terminated to exit
-                    # context manager and cleanup resources.
-                    wait_for_instance_termination(
-                        credentials['access_key_id'],
-                        instance_id,
-                        region,
-                        credentials['secret_access_key']
-                    )
-
-                if status != SUCCESS:
-                    self.status = status
-                    break  # Fail eagerly, if the image fails in any partition.
+            if self.status == SUCCESS:
+                # The results of the first failed partition are kept
+                self.status_msg.update(self.region_results.get(region, {}))
+                self.status = status
 
         if self.cleanup_images or (self.status != SUCCESS and self.cleanup_images is not False):  # noqa
+            # The test instances are terminated before the image is removed
+            wait(self.cleanup_futures)
+
             for region, info in self.test_regions.items():
                 credentials = self.credentials[info['account']]
 
@@ -185,3 +222,100 @@ class EC2TestJob(MashJob):
                     region,
                     image_id=self.status_msg['source_regions'][region]
                 )
+
+    def _test_region(self, region_info):
+        """
+        Test image in one region with img-proof and return the status.
+
+        A slot of the account instance budget is held until the test
+        instance is terminated.
+        """
+        region, info = region_info
+        account = get_testing_account(info)
+        credentials = self.credentials[account]
+
+        instance_slots = get_instance_slots(
+            account,
+            self.config.get_ec2_max_instances_per_account()
+        )
+        instance_slots.acquire()
+
+        with ExitStack() as stack:
+            stack.callback(instance_slots.release)
+            network_details = stack.enter_context(
+                setup_ec2_networking(
+                    credentials['access_key_id'],
+                    region,
+                    credentials['secret_access_key'],
+                    self.ssh_private_key_file,
+                    subnet_id=info.get('subnet')
+                )
+            )
+
+            try:
+                result = img_proof_test(
+                    access_key_id=credentials['access_key_id'],
+                    cloud=self.cloud,
+                    description=self.description,
+                    distro=self.distro,
+                    image_id=self.status_msg['source_regions'][region],
+                    instance_type=self.instance_type,
+                    img_proof_timeout=self.img_proof_timeout,
+                    region=region,
+                    secret_access_key=credentials['secret_access_key'],
+                    security_group_id=network_details['security_group_id'],
+                    ssh_key_name=network_details['ssh_key_name'],
+                    ssh_private_key_file=self.ssh_private_key_file,
+                    ssh_user=self.ssh_user,
+                    subnet_id=network_details['subnet_id'],
+                    tests=self.tests,
+                    log_callback=self.log_callback
+                )
+            except Exception as error:
+                with self.lock:
+                    self.add_error_msg(str(error))
+
+                result = {
+                    'status': EXCEPTION,
+                    'msg': str(traceback.format_exc())
+                }
+
+            region_result = {}
+            status = process_test_result(
+                result,
+                self.log_callback,
+                region,
+                region_result
+            )
+
+            with self.lock:
+                self.region_results[region] = region_result
+
+            instance_id = result.get('instance_id')
+            if instance_id:
+                # Networking and the instance slot are released once
+                # the instance is terminated.
+                future = get_cleanup_executor().submit(
+                    release_networking,
+                    stack.pop_all(),
+                    credentials,
+                    instance_id,
+                    region
+                )
+                future.add_done_callback(self._log_cleanup_error)
+
+                with self.lock:
+                    self.cleanup_futures.append(future)
+
+        return status
+
+    def _log_cleanup_error(self, future):
+        """
+        Log a failed release of the test instance networking.
+        """
+        error = future.exception()
+
+        if error:
+            self.log_callback.warning(
+                'Failed to cleanup test networking: {0}'.format(error)
+            )
@@ -20,6 +20,8 @@ import os
 import random
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from mash.mash_exceptions import MashTestException
 from mash.services.mash_job import MashJob
 from mash.services.status_levels import EXCEPTION, SUCCESS
@@ -33,6 +35,7 @@ from mash.utils.gce import (
     get_gce_storage_driver
 )
 from mash.services.test.img_proof_helper import img_proof_test
+from mash.services.test.zone_health import zone_health
 
 from img_proof.ipa_exceptions import IpaRetryableError
 
@@ -93,6 +96,7 @@ class GCETestJob(MashJob):
 
         self.ssh_private_key_file = self.config.get_ssh_private_key_file()
         self.img_proof_timeout = self.config.get_img_proof_timeout()
+        self.zone_probes = self.config.get_gce_zone_probes()
 
         if not os.path.exists(self.ssh_private_key_file):
             create_ssh_key_pair(self.ssh_private_key_file)
@@ -117,7 +121,10 @@ class GCETestJob(MashJob):
             # fallback testing explicitly disabled
             fallback_regions = set()
         elif self.test_fallback_regions is None:
-            fallback_regions = get_region_list(compute_driver, project)
+            fallback_regions = zone_health.get_zones(
+                project,
+                lambda: get_region_list(compute_driver, project)
+            )
         else:
             fallback_regions = set(self.test_fallback_regions)
 
@@ -136,45 +143,29 @@ class GCETestJob(MashJob):
                     )
                 )
 
-                retry_region = self.region
-                while fallback_regions:
-                    try:
-                        result = img_proof_test(
-                            cloud=self.cloud,
-                            description=self.description,
-                            distro=self.distro,
-                            image_id=self.cloud_image_name,
-                            instance_type=self.instance_type,
-                            img_proof_timeout=self.img_proof_timeout,
-                            region=retry_region,
-                            service_account_file=auth_file,
-                            ssh_private_key_file=self.ssh_private_key_file,
-                            ssh_user=self.ssh_user,
-                            tests=self.tests,
-                            boot_firmware=firmware,
-                            image_project=self.image_project,
-                            log_callback=self.log_callback,
-                            sev_capable=self.sev_capable
-                        )
-                    except IpaRetryableError as error:
-                        result = {
-                            'status': EXCEPTION,
-                            'msg': str(error)
-                        }
-                        fallback_regions.remove(retry_region)
-
-                        if fallback_regions:
-                            retry_region = random.choice(fallback_regions)
-                    except Exception as error:
-                        self.add_error_msg(str(error))
-                        result = {
-                            'status': EXCEPTION,
-                            'msg': str(traceback.format_exc())
-                        }
-                        break
-                    else:
+                zones = zone_health.order(
+                    project,
+                    fallback_regions,
+                    self.instance_type,
+                    preferred=self.region
+                )
+                while zones:
+                    probes = zones[:self.zone_probes]
+                    zones = zones[self.zone_probes:]
+
+                    result, retry, error = self._probe_zones(
+                        probes,
+                        project,
+                        auth_file,
+                        firmware
+                    )
+
+                    if not retry:
                         break
 
+                if error:
+                    self.add_error_msg(error)
+
                 self.status = process_test_result(
                     result,
                     self.log_callback,
@@ -189,6 +180,74 @@ class GCETestJob(MashJob):
                 (self.status != SUCCESS and self.cleanup_images is not False):
             self.cleanup_image()
 
+    def _probe_zones(self, zones, project, auth_file, firmware):
+        """
+        Test image in the candidate zones concurrently.
+
+        Probing several zones at once saves the time of trying zones
+        without capacity one after another. img-proof cannot stop a
+        running test, so all probes are waited for and their instances
+        are gone before the image is cleaned up.
+
+        Return the result, whether all zones were rejected for capacity
+        reasons and the error of the returned result. A probe that
+        failed for another reason takes precedence over passing probes
+        so an image is never reported as passing when it failed in one
+        of the zones.
+        """
+        if len(zones) == 1:
+            return self._test_zone(zones[0], project, auth_file, firmware)
+
+        with ThreadPoolExecutor(max_workers=len(zones)) as executor:
+            futures = [
+                executor.submit(
+                    self._test_zone, zone, project, auth_file, firmware
+                ) for zone in zones
+            ]
+            probes = [future.result() for future in as_completed(futures)]
+
+        # Failed probes first, then passing ones, then capacity errors
+        probes.sort(key=lambda probe: (probe[1], probe[0]['status'] == SUCCESS))
+        return probes[0]
+
+    def _test_zone(self, zone, project, auth_file, firmware):
+        """
+        Test image in one zone and record the zone health.
+
+        Return the result, whether the zone was rejected for capacity
+        reasons and the error message of an unexpected error. Errors
+        are not added to the job as the result may be discarded.
+        """
+        try:
+            result = img_proof_test(
+                cloud=self.cloud,
+                description=self.description,
+                distro=self.distro,
+                image_id=self.cloud_image_name,
+                instance_type=self.instance_type,
+                img_proof_timeout=self.img_proof_timeout,
+                region=zone,
+                service_account_file=auth_file,
+                ssh_private_key_file=self.ssh_private_key_file,
+                ssh_user=self.ssh_user,
+                tests=self.tests,
+                boot_firmware=firmware,
+                image_project=self.image_project,
+                log_callback=self.log_callback,
+                sev_capable=self.sev_capable
+            )
+        except IpaRetryableError as error:
+            zone_health.record_failure(project, zone, self.instance_type)
+            return {'status': EXCEPTION, 'msg': str(error)}, True, None
+        except Exception as error:
+            return {
+                'status': EXCEPTION,
+                'msg': str(traceback.format_exc())
+            }, False, str(error)
+
+        zone_health.record_success(project, zone, self.instance_type)
+        return result, False, None
+
     def cleanup_image(self):
         credentials = self.credentials[self.account]
         project = credentials.get('project_id')
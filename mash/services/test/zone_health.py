@@ -0,0 +1,131 @@
+# Copyright (c) 2026 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import random
+import threading
+import time
+
+
+class ZoneHealthCache(object):
+    """
+    Remember recent test results of test zones.
+
+    The health of a zone is kept per (project, zone, instance type) as
+    a score that decays with the given half life in seconds. Capacity
+    failures raise the score, successful tests lower it below zero. A
+    success clears earlier failures and a failure clears earlier
+    successes. The zone list of a project is cached for zones_ttl
+    seconds.
+    """
+    def __init__(self, half_life=1800, zones_ttl=3600):
+        self.half_life = half_life
+        self.zones_ttl = zones_ttl
+        self.scores = {}
+        self.zones = {}
+        self.lock = threading.Lock()
+
+    def record_failure(self, project, zone, instance_type):
+        key = (project, zone, instance_type)
+
+        with self.lock:
+            score = max(self._score(key), 0) + 1
+            self.scores[key] = (time.monotonic(), score)
+
+    def record_success(self, project, zone, instance_type):
+        key = (project, zone, instance_type)
+
+        with self.lock:
+            score = min(self._score(key), 0) - 1
+            self.scores[key] = (time.monotonic(), score)
+
+    def score(self, project, zone, instance_type):
+        """
+        Return the decayed score of the zone.
+
+        Positive scores count recent failures, negative scores recent
+        successes and zones without recent results score 0.
+        """
+        with self.lock:
+            return self._score((project, zone, instance_type))
+
+    def _score(self, key):
+        entry = self.scores.get(key)
+
+        if not entry:
+            return 0
+
+        timestamp, score = entry
+        elapsed = time.monotonic() - timestamp
+        score *= 0.5 ** (elapsed / self.half_life)
+
+        if abs(score) < 0.01:
+            del self.scores[key]
+            return 0
+
+        return score
+
+    def order(self, project, zones, instance_type, preferred=None):
+        """
+        Return zones sorted from the most to the least healthy.
+
+        Zones without recent failures go first and the preferred zone
+        goes first among them. Recently healthy zones rank above zones
+        without recent results, zones with the same score are shuffled.
+        """
+        zones = list(zones)
+        random.shuffle(zones)
+
+        with self.lock:
+            scores = {
+                zone: self._score((project, zone, instance_type))
+                for zone in zones
+            }
+
+        return sorted(
+            zones,
+            key=lambda zone: (
+                scores[zone] > 0,
+                zone != preferred,
+                scores[zone]
+            )
+        )
+
+    def get_zones(self, project, loader):
+        """
+        Return the cached zone list of project, refreshed with loader.
+        """
+        with self.lock:
+            entry = self.zones.get(project)
+
+            if entry and time.monotonic() - entry[0] < self.zones_ttl:
+                return set(entry[1])
+
+        zones = set(loader())
+
+        with self.lock:
+            self.zones[project] = (time.monotonic(), zones)
+
+        return set(zones)
+
+    def clear(self):
+        with self.lock:
+            self.scores.clear()
+            self.zones.clear()
+
+
+zone_health = ZoneHealthCache()
@@ -22,14 +22,17 @@ from mash.mash_exceptions import MashUploadException
 from mash.utils.mash_utils import (
     format_string_with_date,
     timestamp_from_epoch,
-    create_json_file
+    create_json_file,
+    remove_file
 )
 from mash.services.status_levels import SUCCESS
 from mash.utils.azure import (
+    get_page_blob_checkpoint,
     upload_azure_file,
     blob_exists,
     delete_blob
 )
+from mash.utils.resumable_upload import get_checkpoint_file
 
 
 class AzureUploadJob(MashJob):
@@ -55,6 +58,15 @@ class AzureUploadJob(MashJob):
         self.use_build_time = self.job_config.get('use_build_time')
         self.force_replace_image = self.job_config.get('force_replace_image')
 
+    def cleanup(self):
+        """
+        Remove the checkpoint left by an interrupted job.
+        """
+        checkpoint_file = get_checkpoint_file(self.job_file)
+
+        if checkpoint_file:
+            remove_file(checkpoint_file)
+
     def run_job(self):
         self.status = SUCCESS
         self.log_callback.info('Uploading image.')
@@ -77,6 +89,7 @@ class AzureUploadJob(MashJob):
 
         self.request_credentials([self.account])
         credentials = self.credentials[self.account]
+        checkpoint_file = get_checkpoint_file(self.job_file)
 
         with create_json_file(credentials) as auth_file:
             exists = blob_exists(
@@ -88,7 +101,19 @@ class AzureUploadJob(MashJob):
                 is_page_blob=True
             )
 
-            if exists and not self.force_replace_image:
+            resume = exists and get_page_blob_checkpoint(
+                checkpoint_file,
+                self.status_msg['image_file'],
+                self.storage_account,
+                self.container,
+                blob_name
+            ).upload_id
+
+            if resume:
+                self.log_callback.info(
+                    'Resuming upload of blob: {0}.'.format(blob_name)
+                )
+            elif exists and not self.force_replace_image:
                 raise MashUploadException(
                     'Image tarball: {blob_name} already exists '
                     'in container: {container}. Use force_replace_image '
@@ -123,7 +148,11 @@ class AzureUploadJob(MashJob):
             self.storage_account,
             credentials=credentials,
             resource_group=self.resource_group,
-            is_page_blob=True
+            is_page_blob=True,
+            checkpoint_file=checkpoint_file,
+            uncompressed_size=self.get_image_metadata().get(
+                'uncompressed_size'
+            )
         )
 
         self.status_msg['cloud_image_name'] = self.cloud_image_name
@@ -21,9 +21,10 @@ import re
 # project
 from mash.services.mash_job import MashJob
 from mash.mash_exceptions import MashUploadException
-from mash.utils.mash_utils import format_string_with_date
+from mash.utils.mash_utils import format_string_with_date, remove_file
 from mash.services.status_levels import SUCCESS
 from mash.utils.azure import upload_azure_file
+from mash.utils.resumable_upload import get_checkpoint_file
 
 
 # https://[storage-account].[maangement-url]/[container]?[SAS token]
@@ -47,6 +48,15 @@ class AzureSASUploadJob(MashJob):
 
         self.cloud_image_name = self.job_config.get('cloud_image_name')
 
+    def cleanup(self):
+        """
+        Remove the checkpoint left by an interrupted job.
+        """
+        checkpoint_file = get_checkpoint_file(self.job_file)
+
+        if checkpoint_file:
+            remove_file(checkpoint_file)
+
     def run_job(self):
         self.status = SUCCESS
         self.log_callback.info('Uploading image.')
@@ -70,7 +80,11 @@ class AzureSASUploadJob(MashJob):
             self.config.get_azure_max_workers(),
             build.group(1),
             sas_token=build.group(3),
-            is_page_blob=True
+            is_page_blob=True,
+            checkpoint_file=get_checkpoint_file(self.job_file),
+            uncompressed_size=self.get_image_metadata().get(
+                'uncompressed_size'
+            )
         )
         self.log_callback.info(
             'Uploaded blob: {blob} using sas token.'.format(
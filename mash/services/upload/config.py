@@ -29,6 +29,12 @@ class UploadConfig(BaseConfig):
     information to control the behavior of the mash services.
 
     upload:
+      # size in bytes of the parts of resumable uploads
+      part_size: 67108864
+      # max number of parts uploaded in parallel
+      max_workers: 4
+      # max attempts for each part of an upload
+      max_retry_attempts: 3
       azure:
         # max retries on block upload error
         max_chunk_retry_attempts: 5
@@ -46,3 +52,17 @@ class UploadConfig(BaseConfig):
     def get_azure_max_workers(self):
         return self.azure_upload.get('max_workers') or \
             Defaults.get_azure_max_workers()
+
+    def get_part_size(self):
+        part_size = self._get_attribute('part_size', 'upload')
+        return part_size or Defaults.get_upload_part_size()
+
+    def get_max_workers(self):
+        max_workers = self._get_attribute('max_workers', 'upload')
+        return max_workers or Defaults.get_upload_max_workers()
+
+    def get_max_retry_attempts(self):
+        max_retry_attempts = self._get_attribute(
+            'max_retry_attempts', 'upload'
+        )
+        return max_retry_attempts or Defaults.get_upload_max_retry_attempts()
@@ -25,11 +25,13 @@ from mash.utils.mash_utils import (
 )
 from mash.services.status_levels import SUCCESS
 from mash.utils.gce import (
+    GCSComposeUploadBackend,
     get_gce_storage_driver,
     upload_image_tarball,
     delete_image_tarball,
     blob_exists
 )
+from mash.utils.resumable_upload import abort_upload, get_checkpoint_file
 
 
 class GCEUploadJob(MashJob):
@@ -61,6 +63,24 @@ class GCEUploadJob(MashJob):
                 'No SLES 11 support in mash for GCE.'
             )
 
+    def _get_upload_backend(self, target):
+        bucket, object_name = target.split('/', 1)
+
+        self.request_credentials([self.account])
+        storage_driver = get_gce_storage_driver(
+            self.credentials[self.account]
+        )
+        return GCSComposeUploadBackend(storage_driver, object_name, bucket)
+
+    def cleanup(self):
+        """
+        Delete the part objects left by an interrupted job.
+        """
+        abort_upload(
+            get_checkpoint_file(self.job_file),
+            self._get_upload_backend
+        )
+
     def run_job(self):
         self.status = SUCCESS
         self.log_callback.info('Uploading image.')
@@ -113,7 +133,12 @@ class GCEUploadJob(MashJob):
             storage_driver,
             object_name,
             self.status_msg['image_file'],
-            self.bucket
+            self.bucket,
+            self.config.get_part_size(),
+            checkpoint_file=get_checkpoint_file(self.job_file),
+            max_workers=self.config.get_max_workers(),
+            max_retry_attempts=self.config.get_max_retry_attempts(),
+            get_backend=self._get_upload_backend
         )
 
         self.status_msg['cloud_image_name'] = self.cloud_image_name
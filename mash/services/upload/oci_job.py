@@ -18,7 +18,7 @@
 
 from os import stat
 
-from oci.object_storage import ObjectStorageClient, UploadManager
+from oci.object_storage import ObjectStorageClient
 
 # project
 from mash.services.mash_job import MashJob
@@ -28,6 +28,13 @@ from mash.utils.mash_utils import (
     timestamp_from_epoch
 )
 from mash.services.status_levels import SUCCESS
+from mash.utils.filetype import get_digest_metadata
+from mash.utils.oci import OCIMultipartUploadBackend
+from mash.utils.resumable_upload import (
+    abort_upload,
+    get_checkpoint_file,
+    upload_file
+)
 
 
 class OCIUploadJob(MashJob):
@@ -58,6 +65,34 @@ class OCIUploadJob(MashJob):
         self.use_build_time = self.job_config.get('use_build_time')
         self.upload_process_count = self.config.get_oci_upload_process_count()
 
+    def _get_object_storage(self):
+        self.request_credentials([self.account])
+        credentials = self.credentials[self.account]
+
+        config = {
+            'user': self.oci_user_id,
+            'key_content': credentials['signing_key'],
+            'fingerprint': credentials['fingerprint'],
+            'tenancy': self.tenancy,
+            'region': self.region
+        }
+        return ObjectStorageClient(config)
+
+    def _get_upload_backend(self, target):
+        namespace, bucket, object_name = target.split('/', 2)
+        return OCIMultipartUploadBackend(
+            self._get_object_storage(), namespace, bucket, object_name
+        )
+
+    def cleanup(self):
+        """
+        Abort a multipart upload left by an interrupted job.
+        """
+        abort_upload(
+            get_checkpoint_file(self.job_file),
+            self._get_upload_backend
+        )
+
     def run_job(self):
         self.status = SUCCESS
         self.log_callback.info('Uploading image.')
@@ -77,35 +112,31 @@ class OCIUploadJob(MashJob):
             timestamp=timestamp
         )
 
-        self.request_credentials([self.account])
-        credentials = self.credentials[self.account]
-
-        config = {
-            'user': self.oci_user_id,
-            'key_content': credentials['signing_key'],
-            'fingerprint': credentials['fingerprint'],
-            'tenancy': self.tenancy,
-            'region': self.region
-        }
-        object_storage = ObjectStorageClient(config)
+        object_storage = self._get_object_storage()
         namespace = object_storage.get_namespace().data
-        upload_manager = UploadManager(
-            object_storage,
-            allow_parallel_uploads=True,
-            parallel_process_count=self.upload_process_count
-        )
 
         object_name = ''.join([self.cloud_image_name, '.qcow2'])
-        self._image_size = stat(self.status_msg['image_file']).st_size
+        image_metadata = self.get_image_metadata()
+        self._image_size = image_metadata.get('size') or \
+            stat(self.status_msg['image_file']).st_size
 
-        with open(self.status_msg['image_file'], 'rb') as image_stream:
-            upload_manager.upload_stream(
+        upload_file(
+            OCIMultipartUploadBackend(
+                object_storage,
                 namespace,
                 self.bucket,
                 object_name,
-                image_stream,
-                progress_callback=self._progress_callback
-            )
+                metadata=get_digest_metadata(image_metadata)
+            ),
+            self.status_msg['image_file'],
+            '/'.join([namespace, self.bucket, object_name]),
+            self.config.get_part_size(),
+            checkpoint_file=get_checkpoint_file(self.job_file),
+            max_workers=self.upload_process_count,
+            max_retry_attempts=self.config.get_max_retry_attempts(),
+            progress_callback=self._progress_callback,
+            get_backend=self._get_upload_backend
+        )
 
         self.status_msg['cloud_image_name'] = self.cloud_image_name
         self.status_msg['object_name'] = object_name
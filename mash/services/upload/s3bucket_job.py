@@ -21,7 +21,13 @@ from os import stat, path
 # project
 from mash.services.mash_job import MashJob
 from mash.mash_exceptions import MashUploadException
-from mash.utils.ec2 import get_client
+from mash.utils.ec2 import S3MultipartUploadBackend, get_client
+from mash.utils.filetype import get_digest_metadata
+from mash.utils.resumable_upload import (
+    abort_upload,
+    get_checkpoint_file,
+    upload_file
+)
 from mash.services.status_levels import SUCCESS
 
 
@@ -48,6 +54,30 @@ class S3BucketUploadJob(MashJob):
                 )
             )
 
+    def _get_client(self):
+        self.request_credentials([self.account])
+        credentials = self.credentials[self.account]
+
+        return get_client(
+            's3', credentials['access_key_id'],
+            credentials['secret_access_key'], None
+        )
+
+    def _get_upload_backend(self, target):
+        bucket_name, key_name = target.split('/', 1)
+        return S3MultipartUploadBackend(
+            self._get_client(), bucket_name, key_name
+        )
+
+    def cleanup(self):
+        """
+        Abort a multipart upload left by an interrupted job.
+        """
+        abort_upload(
+            get_checkpoint_file(self.job_file),
+            self._get_upload_backend
+        )
+
     def _log_progress(self, bytes_transferred):
         self._total_bytes_transferred += bytes_transferred
         percent_transferred = (self._total_bytes_transferred * 100) / self._image_size
@@ -65,7 +95,6 @@ class S3BucketUploadJob(MashJob):
         self.log_callback.info('Uploading raw image.')
 
         self.request_credentials([self.account])
-        credentials = self.credentials[self.account]
 
         # Possible values for location:
         # bucket
@@ -94,19 +123,25 @@ class S3BucketUploadJob(MashJob):
             key_name = bucket_path
 
         try:
-            statinfo = stat(self.status_msg['image_file'])
-            self._image_size = statinfo.st_size
-
-            client = get_client(
-                's3', credentials['access_key_id'],
-                credentials['secret_access_key'], None
-            )
-
-            client.upload_file(
+            image_metadata = self.get_image_metadata()
+            self._image_size = image_metadata.get('size') or \
+                stat(self.status_msg['image_file']).st_size
+
+            upload_file(
+                S3MultipartUploadBackend(
+                    self._get_client(),
+                    bucket_name,
+                    key_name,
+                    metadata=get_digest_metadata(image_metadata)
+                ),
                 self.status_msg['image_file'],
-                bucket_name,
-                key_name,
-                Callback=self._log_progress
+                '/'.join([bucket_name, key_name]),
+                self.config.get_part_size(),
+                checkpoint_file=get_checkpoint_file(self.job_file),
+                max_workers=self.config.get_max_workers(),
+                max_retry_attempts=self.config.get_max_retry_attempts(),
+                progress_callback=self._log_progress,
+                get_backend=self._get_upload_backend
             )
 
         except Exception as e:
@@ -0,0 +1,475 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import collections
+import threading
+import time
+
+from contextlib import contextmanager, suppress
+
+from amqpstorm import (
+    AMQPChannelError,
+    AMQPConnectionError,
+    AMQPMessageError,
+    Connection
+)
+from pamqp import commands
+from pamqp.body import ContentBody
+from pamqp.header import ContentHeader
+
+# Frame header and end octet added to each body frame
+FRAME_OVERHEAD = 8
+
+publishers = {}
+publishers_lock = threading.Lock()
+
+
+class QueueConsumer(threading.Thread):
+    """
+    Consume a single queue on a dedicated channel in a background thread.
+
+    Each consumer owns its channel so message callbacks for one queue
+    never block the delivery of messages from another queue. Any
+    exception raised while consuming is stored in :attr:`error` so the
+    owning service can surface it from the main thread.
+    """
+    def __init__(self, channel, name=None):
+        super(QueueConsumer, self).__init__(name=name, daemon=True)
+        self.channel = channel
+        self.error = None
+        self.stopped = False
+
+    def run(self):
+        """
+        Consume messages until the channel is closed or stopped.
+        """
+        try:
+            self.channel.start_consuming()
+        except Exception as error:
+            if not self.stopped:
+                self.error = error
+
+    def stop(self):
+        """
+        Stop consuming and close the channel.
+        """
+        self.stopped = True
+
+        if self.channel and self.channel.is_open:
+            self.channel.stop_consuming()
+            self.channel.close()
+
+
+class PublisherPool(object):
+    """
+    Long lived pool of publishing channels on a single connection.
+
+    Publishers check out one of up to :attr:`channel_count` channels so
+    concurrent threads do not serialize on a single channel round trip.
+    If confirm is set every channel is placed in confirm mode and a
+    batch is written in full before the broker confirms are read, so a
+    batch waits for one confirm round trip. Messages that were nacked
+    or returned as unroutable are raised to the caller in one
+    AMQPMessageError. A failed channel is discarded and the unconfirmed
+    rest of the batch retried once, the connection is only reopened
+    when it was closed.
+
+    Back-pressure is tracked in the metrics returned by
+    :meth:`get_metrics`: the number of publishers that had to wait for
+    a free channel and the total time spent waiting.
+    """
+    def __init__(
+        self, host, username, password, port=5672, channel_count=4,
+        confirm=True, heartbeat=600
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.channel_count = channel_count
+        self.confirm = confirm
+        self.heartbeat = heartbeat
+
+        self.connection = None
+        self.idle_channels = []
+        self.open_channels = 0
+        self.delivery_tags = {}
+        self.references = 0
+        self.condition = threading.Condition()
+        self.metrics = {
+            'published': 0,
+            'batches': 0,
+            'errors': 0,
+            'reconnects': 0,
+            'waits': 0,
+            'wait_seconds': 0.0
+        }
+
+    def _connect(self):
+        """
+        Open a new connection, called with the pool lock held.
+        """
+        if self.connection:
+            self.metrics['reconnects'] += 1
+
+        self.connection = Connection(
+            self.host,
+            self.username,
+            self.password,
+            port=self.port,
+            kwargs={'heartbeat': self.heartbeat}
+        )
+
+    def _open_channel(self):
+        """
+        Open a new publishing channel on the pool connection.
+        """
+        channel = self.connection.channel()
+
+        if self.confirm:
+            channel.confirm_deliveries()
+            self.delivery_tags[channel] = 0
+
+        return channel
+
+    def _checkout(self):
+        """
+        Return a free channel, waiting if all channels are in use.
+        """
+        with self.condition:
+            if not self.connection or self.connection.is_closed:
+                self._connect()
+
+            start = time.time()
+            waited = False
+            channel = None
+
+            while not channel:
+                if self.idle_channels:
+                    channel = self.idle_channels.pop()
+
+                    if channel.is_closed:
+                        self.open_channels -= 1
+                        self.delivery_tags.pop(channel, None)
+                        channel = None
+                elif self.open_channels < self.channel_count:
+                    channel = self._open_channel()
+                    self.open_channels += 1
+                else:
+                    waited = True
+                    self.condition.wait()
+
+            if waited:
+                self.metrics['waits'] += 1
+                self.metrics['wait_seconds'] += time.time() - start
+
+            return channel
+
+    def _checkin(self, channel):
+        """
+        Return channel to the pool, dropping it if it was closed.
+        """
+        with self.condition:
+            if channel.is_closed:
+                self.open_channels -= 1
+                self.delivery_tags.pop(channel, None)
+            else:
+                self.idle_channels.append(channel)
+
+            self.condition.notify()
+
+    @contextmanager
+    def channel(self):
+        """
+        Check out a pooled channel for the duration of the context.
+        """
+        channel = self._checkout()
+        failed = False
+
+        try:
+            yield channel
+        except (AMQPChannelError, AMQPConnectionError):
+            failed = True
+            raise
+        finally:
+            if failed:
+                self._discard(channel)
+            else:
+                self._checkin(channel)
+
+    def _discard(self, channel):
+        """
+        Close a failed channel and release its place in the pool.
+        """
+        with suppress(Exception):
+            if channel.is_open:
+                channel.close()
+
+        with self.condition:
+            self.open_channels -= 1
+            self.delivery_tags.pop(channel, None)
+            self.condition.notify()
+
+    def _get_frames(self, exchange, routing_key, body, mandatory):
+        """
+        Return the publish, header and body frames of a message.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        frame_size = self.connection.max_frame_size - FRAME_OVERHEAD
+        frames = [
+            commands.Basic.Publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                mandatory=mandatory
+            ),
+            ContentHeader(
+                body_size=len(body),
+                properties=commands.Basic.Properties(
+                    content_type='application/json',
+                    content_encoding='utf-8',
+                    delivery_mode=2
+                )
+            )
+        ]
+
+        for start in range(0, len(body), frame_size):
+            frames.append(ContentBody(body[start:start + frame_size]))
+
+        return frames
+
+    def _publish_confirmed(self, channel, exchange, pending, mandatory, errors):
+        """
+        Publish the pending messages and wait for the broker confirms.
+
+        All messages are written before the confirms are read, the
+        broker may confirm several delivery tags with one ack. Acked
+        and nacked messages are removed from pending, nacked and
+        returned messages are added to errors.
+        """
+        messages = dict(
+            enumerate(pending, start=self.delivery_tags[channel] + 1)
+        )
+        outstanding = set(messages)
+        acked = 0
+        returned = 0
+
+        with channel.rpc.lock:
+            uuid = channel.rpc.register_request(['Basic.Ack', 'Basic.Nack'])
+
+            try:
+                for tag, (routing_key, body) in messages.items():
+                    self.delivery_tags[channel] = tag
+                    channel.write_frames(
+                        self._get_frames(exchange, routing_key, body, mandatory)
+                    )
+
+                while outstanding:
+                    frame = channel.rpc.get_request(
+                        uuid, raw=True, multiple=True
+                    )
+
+                    if frame.multiple:
+                        confirmed = {
+                            tag for tag in outstanding
+                            if tag <= frame.delivery_tag
+                        }
+                    else:
+                        confirmed = {frame.delivery_tag} & outstanding
+
+                    outstanding -= confirmed
+
+                    if frame.name == 'Basic.Ack':
+                        acked += len(confirmed)
+                    else:
+                        errors.extend(
+                            'Message not confirmed: {0}'.format(
+                                messages[tag][0]
+                            ) for tag in sorted(confirmed)
+                        )
+
+                for _ in messages:
+                    # Returned messages are acked, the returns are raised
+                    # by the channel one at a time.
+                    try:
+                        channel.check_for_exceptions()
+                    except AMQPMessageError as error:
+                        errors.append(str(error))
+                        returned += 1
+                    else:
+                        break
+            finally:
+                channel.rpc.remove(uuid)
+                pending.clear()
+                pending.extend(messages[tag] for tag in sorted(outstanding))
+
+                with self.condition:
+                    self.metrics['published'] += acked - returned
+
+    def _publish_messages(self, exchange, pending, mandatory, errors):
+        """
+        Publish the pending messages on a pooled channel.
+
+        Without confirms a message is removed from pending once it was
+        written to the channel. If the channel or connection fails the
+        unpublished messages are left in pending.
+        """
+        with self.channel() as channel:
+            if self.confirm:
+                self._publish_confirmed(
+                    channel, exchange, pending, mandatory, errors
+                )
+                return
+
+            while pending:
+                routing_key, body = pending[0]
+                channel.basic.publish(
+                    body=body,
+                    routing_key=routing_key,
+                    exchange=exchange,
+                    properties={
+                        'content_type': 'application/json',
+                        'delivery_mode': 2
+                    },
+                    mandatory=mandatory
+                )
+                pending.popleft()
+
+                with self.condition:
+                    self.metrics['published'] += 1
+
+    def publish(self, exchange, routing_key, body, mandatory=True):
+        """
+        Publish message to the provided exchange with the routing key.
+        """
+        self.publish_batch(exchange, [(routing_key, body)], mandatory)
+
+    def publish_batch(self, exchange, messages, mandatory=True):
+        """
+        Publish a list of (routing_key, body) tuples to the exchange.
+
+        In confirm mode the whole batch is written before waiting for
+        the broker confirms.
+
+        If the connection or channel failed the batch is resumed once on
+        a new channel with the messages that were not yet confirmed, the
+        connection is only reopened if it was closed. The message in
+        flight when the channel failed may be delivered twice.
+        Nacked or returned (unroutable) messages are not retried.
+        """
+        pending = collections.deque(messages)
+        errors = []
+
+        try:
+            self._publish_messages(exchange, pending, mandatory, errors)
+        except (AMQPChannelError, AMQPConnectionError):
+            with self.condition:
+                self.metrics['errors'] += 1
+
+            self._publish_messages(exchange, pending, mandatory, errors)
+
+        with self.condition:
+            self.metrics['batches'] += 1
+
+            if errors:
+                self.metrics['errors'] += 1
+
+        if errors:
+            raise AMQPMessageError(
+                'Failed to publish {0} message(s): {1}'.format(
+                    len(errors), '; '.join(errors)
+                )
+            )
+
+    def get_metrics(self):
+        """
+        Return a copy of the publisher metrics.
+
+        in_use is the number of channels currently checked out.
+        """
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['in_use'] = self.open_channels - len(self.idle_channels)
+
+        return metrics
+
+    def close(self):
+        """
+        Close the pool connection and all channels.
+        """
+        with self.condition:
+            self.open_channels -= len(self.idle_channels)
+
+            for channel in self.idle_channels:
+                self.delivery_tags.pop(channel, None)
+
+            self.idle_channels = []
+
+            if self.connection and self.connection.is_open:
+                self.connection.close()
+
+
+def get_publisher(
+    host, username, password, port=5672, channel_count=4, confirm=True
+):
+    """
+    Return the publisher pool of this process for the broker.
+
+    The service and API publishers of a process share one confirming
+    pool and connection per broker, log handlers share one pool that
+    does not wait for confirms. The pool is created by the first
+    caller which also sets the channel count.
+
+    Every caller holds a reference on the pool which is released with
+    :func:`release_publisher`.
+    """
+    key = (host, port, username, confirm)
+
+    with publishers_lock:
+        if key not in publishers:
+            publishers[key] = PublisherPool(
+                host,
+                username,
+                password,
+                port=port,
+                channel_count=channel_count,
+                confirm=confirm
+            )
+
+        publishers[key].references += 1
+        return publishers[key]
+
+
+def release_publisher(publisher):
+    """
+    Release a reference on a publisher pool from get_publisher.
+
+    The pool is closed and removed once the last reference is released.
+    """
+    with publishers_lock:
+        publisher.references -= 1
+
+        if publisher.references > 0:
+            return
+
+        for key, pool in list(publishers.items()):
+            if pool is publisher:
+                del publishers[key]
+
+    publisher.close()
@@ -20,6 +20,7 @@ import adal
 import copy
 import json
 import lzma
+import os
 import re
 import requests
 import time
@@ -38,6 +39,14 @@ from azure.storage.blob import (
 from mash.mash_exceptions import MashAzureUtilsException
 from mash.utils.filetype import FileType
 from mash.utils.mash_utils import create_json_file
+from mash.utils.resumable_upload import (
+    ResumableUpload,
+    UploadCheckpoint,
+    get_checkpoint_key
+)
+
+PAGE_SIZE = 512
+PAGE_RANGE_SIZE = 4 * 1024 * 1024
 
 
 def acquire_access_token(credentials, cloud_partner=False):
@@ -707,6 +716,107 @@ def wait_on_cloud_partner_operation(
             time.sleep(wait_time)
 
 
+class PageBlobUploadBackend(object):
+    """
+    Resumable upload backend writing page ranges to a page blob.
+
+    Ranges of zeros are skipped as a new page blob is zero filled
+    which makes sparse disk images cheap to upload.
+    """
+    def __init__(self, blob_service, container, blob_name, image_size):
+        self.blob_service = blob_service
+        self.container = container
+        self.blob_name = blob_name
+        self.image_size = image_size
+
+    def start(self):
+        self.blob_service.create_blob(
+            self.container,
+            self.blob_name,
+            self.image_size
+        )
+        return self.blob_name
+
+    def resume(self, upload_id, parts):
+        return self.blob_service.exists(self.container, self.blob_name)
+
+    def upload_part(self, upload_id, number, offset, data):
+        if data.count(0) < len(data):
+            self.blob_service.update_page(
+                self.container,
+                self.blob_name,
+                data,
+                offset,
+                offset + len(data) - 1
+            )
+
+        return offset
+
+    def complete(self, upload_id, parts):
+        pass
+
+    def abort(self, upload_id):
+        """
+        Keep the partial blob, replacing it requires force_replace_image.
+        """
+        pass
+
+
+def get_page_blob_checkpoint(
+    checkpoint_file, file_name, storage_account, container, blob_name
+):
+    """
+    Return the checkpoint of a page blob upload of file_name.
+
+    The upload_id of the checkpoint is only set if checkpoint_file
+    records an upload of the same file to the same blob.
+    """
+    return UploadCheckpoint(
+        checkpoint_file,
+        get_checkpoint_key(
+            file_name,
+            '/'.join([storage_account, container, blob_name]),
+            PAGE_RANGE_SIZE
+        ) if checkpoint_file else None
+    )
+
+
+def upload_page_blob_from_stream(
+    blob_service,
+    container,
+    blob_name,
+    image_stream,
+    image_size,
+    max_retry_attempts,
+    max_workers,
+    checkpoint=None
+):
+    """
+    Upload the stream to a page blob in parallel page ranges.
+
+    The stream is read once, in order, so a compressed image is only
+    decompressed a single time. A failed range upload is retried on
+    its own and completed ranges are recorded in the checkpoint so a
+    later attempt only uploads the missing ranges.
+    """
+    if image_size % PAGE_SIZE:
+        raise MashAzureUtilsException(
+            'Page blob size must be a multiple of {0} bytes: {1}'.format(
+                PAGE_SIZE,
+                image_size
+            )
+        )
+
+    upload = ResumableUpload(
+        PageBlobUploadBackend(blob_service, container, blob_name, image_size),
+        checkpoint or UploadCheckpoint(),
+        PAGE_RANGE_SIZE,
+        max_workers=max_workers,
+        max_retry_attempts=max_retry_attempts
+    )
+    upload.upload(image_stream, image_size)
+
+
 def upload_azure_file(
     blob_name,
     container,
@@ -718,8 +828,18 @@ def upload_azure_file(
     resource_group=None,
     sas_token=None,
     is_page_blob=False,
-    expand_image=True
+    expand_image=True,
+    checkpoint_file=None,
+    uncompressed_size=None
 ):
+    """
+    Upload the image file to a page or block blob.
+
+    Page blob uploads record completed page ranges in checkpoint_file,
+    if provided, and resume from it on the next attempt. If the
+    uncompressed_size of an xz image is known it is used instead of
+    reading the xz index.
+    """
     if sas_token:
         blob_service = get_blob_service_with_sas_token(
             storage_account,
@@ -743,24 +863,51 @@ def upload_azure_file(
     system_image_file_type = FileType(file_name)
     if system_image_file_type.is_xz() and expand_image:
         open_image = lzma.LZMAFile
+        image_size = uncompressed_size or system_image_file_type.get_size()
     else:
         open_image = open
+        image_size = os.path.getsize(file_name)
+
+    if is_page_blob:
+        checkpoint = get_page_blob_checkpoint(
+            checkpoint_file,
+            file_name,
+            storage_account,
+            container,
+            blob_name
+        )
 
-    msg = ''
-    while max_retry_attempts > 0:
         with open_image(file_name, 'rb') as image_stream:
             try:
-                blob_service.create_blob_from_stream(
+                upload_page_blob_from_stream(
+                    blob_service,
                     container,
                     blob_name,
                     image_stream,
-                    system_image_file_type.get_size(),
-                    max_connections=max_workers
+                    image_size,
+                    max_retry_attempts,
+                    max_workers,
+                    checkpoint=checkpoint
                 )
                 return
             except Exception as error:
                 msg = error
-                max_retry_attempts -= 1
+    else:
+        msg = ''
+        while max_retry_attempts > 0:
+            with open_image(file_name, 'rb') as image_stream:
+                try:
+                    blob_service.create_blob_from_stream(
+                        container,
+                        blob_name,
+                        image_stream,
+                        image_size,
+                        max_connections=max_workers
+                    )
+                    return
+                except Exception as error:
+                    msg = error
+                    max_retry_attempts -= 1
 
     raise MashAzureUtilsException(
         'Unable to upload file: {0} to Azure: {1}'.format(
@@ -0,0 +1,308 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import hashlib
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from mash.mash_exceptions import MashImageDownloadException
+from mash.utils.resumable_upload import call_with_retries, UploadCheckpoint
+
+READ_SIZE = 1048576
+
+
+class ParallelDownload(object):
+    """
+    Download a file over HTTP with range requests on parallel connections.
+
+    The file is preallocated and every range is written in place. The
+    sha256 checksum and md5 are computed while downloading. The range
+    following the hashed ones is hashed as it is received, other ranges
+    are read back as soon as they and all ranges before them are
+    complete. With one connection the ranges arrive in order and the
+    file is never read back.
+
+    Completed ranges are recorded in a checkpoint next to the partial
+    file so an interrupted download, for example by a service restart,
+    only fetches the missing ranges.
+
+    Servers without range support are downloaded in a single stream.
+    """
+    def __init__(
+        self, url, target_file, checksum, connections=4,
+        chunk_size=16777216, max_retry_attempts=3, progress_callback=None,
+        timeout=60
+    ):
+        self.url = url
+        self.target_file = target_file
+        self.part_file = ''.join([target_file, '.part'])
+        self.checkpoint_file = ''.join([target_file, '.checkpoint'])
+        self.checksum = checksum
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.max_retry_attempts = max_retry_attempts
+        self.progress_callback = progress_callback
+        self.timeout = timeout
+
+        self.size = 0
+        self.downloaded = 0
+        self.image_hash = hashlib.sha256()
+        self.image_md5 = hashlib.md5()
+        self.hashed = 0
+        self.checkpoint = None
+        self.lock = threading.Lock()
+        self.hash_lock = threading.Lock()
+        self.sessions = threading.local()
+
+    def _get_session(self):
+        if not hasattr(self.sessions, 'session'):
+            self.sessions.session = requests.Session()
+
+        return self.sessions.session
+
+    def _progress(self, size, done=False):
+        if not self.progress_callback:
+            return
+
+        with self.lock:
+            self.downloaded += size
+            downloaded = self.downloaded
+
+        if done:
+            self.progress_callback(0, 0, 0, True)
+        elif self.size:
+            self.progress_callback(downloaded, 1, self.size)
+
+    def _get_file_info(self):
+        """
+        Return the download url, size and range support of the file.
+
+        Redirects, e.g. to a mirror, are resolved once so all ranges
+        are fetched from the same server.
+        """
+        response = self._get_session().head(
+            self.url,
+            allow_redirects=True,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+        size = int(response.headers.get('Content-Length', 0))
+        ranges = response.headers.get('Accept-Ranges') == 'bytes'
+
+        return response.url, size, ranges
+
+    def _get_range(self, number):
+        start = number * self.chunk_size
+        end = min(start + self.chunk_size, self.size)
+        return start, end
+
+    def _download_chunk(self, url, descriptor, number):
+        """
+        Download the range number into the file.
+
+        If all ranges before it are hashed, returns copies of the
+        digests updated with the range, otherwise None.
+        """
+        start, end = self._get_range(number)
+        hashes = None
+
+        with self.hash_lock:
+            if number == self.hashed:
+                hashes = (self.image_hash.copy(), self.image_md5.copy())
+
+        response = self._get_session().get(
+            url,
+            headers={'Range': 'bytes={0}-{1}'.format(start, end - 1)},
+            stream=True,
+            timeout=self.timeout
+        )
+
+        with response:
+            if response.status_code != 206:
+                raise MashImageDownloadException(
+                    'Range request for {0} failed with status {1}.'.format(
+                        url,
+                        response.status_code
+                    )
+                )
+
+            offset = start
+
+            for data in response.iter_content(READ_SIZE):
+                os.pwrite(descriptor, data, offset)
+
+                if hashes:
+                    hashes[0].update(data)
+                    hashes[1].update(data)
+
+                offset += len(data)
+                self._progress(len(data))
+
+        if offset != end:
+            raise MashImageDownloadException(
+                'Range {0}-{1} of {2} ended at {3}.'.format(
+                    start,
+                    end - 1,
+                    url,
+                    offset
+                )
+            )
+
+        return hashes
+
+    def _complete_chunk(self, url, descriptor, number):
+        hashes = call_with_retries(
+            self.max_retry_attempts,
+            self._download_chunk,
+            url,
+            descriptor,
+            number
+        )
+
+        # The range must be on disk before the checkpoint records it
+        os.fdatasync(descriptor)
+        self.checkpoint.add_part(number, True)
+        self._update_hash(descriptor, number, hashes)
+
+    def _update_hash(self, descriptor, number=None, hashes=None):
+        """
+        Hash all completed ranges following the already hashed ones.
+
+        The digests of range number hashed while downloading are used
+        if no other range was hashed in the meantime.
+        """
+        with self.hash_lock:
+            if hashes and number == self.hashed:
+                self.image_hash, self.image_md5 = hashes
+                self.hashed += 1
+
+            while self.hashed in self.checkpoint.parts:
+                offset, end = self._get_range(self.hashed)
+
+                while offset < end:
+                    data = os.pread(
+                        descriptor,
+                        min(READ_SIZE, end - offset),
+                        offset
+                    )
+                    self.image_hash.update(data)
+                    self.image_md5.update(data)
+                    offset += len(data)
+
+                self.hashed += 1
+
+    def _download_ranges(self, url):
+        chunks = max(-(-self.size // self.chunk_size), 1)
+        self.checkpoint = UploadCheckpoint(
+            self.checkpoint_file,
+            {
+                'url': self.url,
+                'size': self.size,
+                'checksum': self.checksum,
+                'chunk_size': self.chunk_size
+            }
+        )
+
+        if not self.checkpoint.upload_id or \
+                not os.path.exists(self.part_file):
+            self.checkpoint.start(self.url)
+
+        descriptor = os.open(self.part_file, os.O_RDWR | os.O_CREAT)
+
+        try:
+            os.ftruncate(descriptor, self.size)
+            pending = []
+
+            for number in range(chunks):
+                if number in self.checkpoint.parts:
+                    start, end = self._get_range(number)
+                    self._progress(end - start)
+                else:
+                    pending.append(number)
+
+            self._update_hash(descriptor)
+
+            with ThreadPoolExecutor(
+                max_workers=self.connections
+            ) as executor:
+                downloads = [
+                    executor.submit(
+                        self._complete_chunk, url, descriptor, number
+                    ) for number in pending
+                ]
+
+                for download in downloads:
+                    download.result()
+        finally:
+            os.close(descriptor)
+
+    def _download_stream(self, url):
+        response = self._get_session().get(
+            url,
+            stream=True,
+            timeout=self.timeout
+        )
+
+        with response:
+            response.raise_for_status()
+
+            with open(self.part_file, 'wb') as part_file:
+                for data in response.iter_content(READ_SIZE):
+                    part_file.write(data)
+                    self.image_hash.update(data)
+                    self.image_md5.update(data)
+                    self._progress(len(data))
+
+    def download(self):
+        """
+        Download the file, verify the checksum and return the file path.
+
+        If the checksum does not match the partial download is removed
+        and MashImageDownloadException is raised.
+        """
+        url, self.size, ranges = self._get_file_info()
+
+        if ranges and self.size:
+            self._download_ranges(url)
+        else:
+            self._download_stream(url)
+
+        self._progress(0, done=True)
+
+        if self.image_hash.hexdigest() != self.checksum:
+            os.remove(self.part_file)
+
+            if self.checkpoint:
+                self.checkpoint.remove()
+
+            raise MashImageDownloadException(
+                'Image checksum of {0} does not match expected '
+                'value.'.format(self.url)
+            )
+
+        os.replace(self.part_file, self.target_file)
+
+        if self.checkpoint:
+            self.checkpoint.remove()
+
+        return self.target_file
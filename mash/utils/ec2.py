@@ -17,44 +17,257 @@
 #
 
 import boto3
+import hashlib
+import threading
+import time
 
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import contextmanager, suppress
 from mash.utils.mash_utils import generate_name, get_key_from_file
 from mash.mash_exceptions import MashGCEUtilsException
+from mash.services.status_levels import FAILED, PENDING, SUCCESS
 
 from ec2imgutils.ec2setup import EC2Setup
+from ec2imgutils.ec2deprecateimg import EC2DeprecateImg
+from ec2imgutils.ec2publishimg import EC2PublishImage
 from ec2imgutils.ec2removeimg import EC2RemoveImage
+from ec2imgutils.ec2imgutilsExceptions import EC2ConnectionException
+
+
+class ClientCache(object):
+    """
+    Thread safe cache of boto3 clients by service, access key and region.
+
+    Clients are created from one shared session so the botocore models
+    and endpoint data are only loaded once. A cached client is replaced
+    when the secret of its access key changed, after a credential
+    rotation, and evicted when it was not used for ttl seconds.
+    """
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.clients = {}
+        self.session = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _get_secret_digest(secret_access_key):
+        return hashlib.sha256(
+            (secret_access_key or '').encode()
+        ).hexdigest()
+
+    def _evict(self, now):
+        for key, entry in list(self.clients.items()):
+            if now - entry['last_used'] >= self.ttl:
+                del self.clients[key]
+
+    def get_client(
+        self, service_name, access_key_id, secret_access_key, region_name
+    ):
+        key = (service_name, access_key_id, region_name)
+        secret_digest = self._get_secret_digest(secret_access_key)
+
+        with self.lock:
+            now = time.monotonic()
+            self._evict(now)
+            entry = self.clients.get(key)
+
+            if not entry or entry['secret_digest'] != secret_digest:
+                if not self.session:
+                    self.session = boto3.session.Session()
+
+                entry = {
+                    'client': self.session.client(
+                        service_name=service_name,
+                        aws_access_key_id=access_key_id,
+                        aws_secret_access_key=secret_access_key,
+                        region_name=region_name,
+                    ),
+                    'secret_digest': secret_digest
+                }
+                self.clients[key] = entry
+
+            entry['last_used'] = now
+
+        return entry['client']
+
+    def clear(self):
+        with self.lock:
+            self.clients = {}
+
+
+client_cache = ClientCache()
 
 
 def get_client(service_name, access_key_id, secret_access_key, region_name):
     """
     Return client session given credentials and region_name.
+
+    Clients are reused from the client cache.
     """
-    session = boto3.session.Session()
-    return session.client(
-        service_name=service_name,
-        aws_access_key_id=access_key_id,
-        aws_secret_access_key=secret_access_key,
-        region_name=region_name,
+    return client_cache.get_client(
+        service_name, access_key_id, secret_access_key, region_name
     )
 
 
+class CachedClientMixin(object):
+    """
+    Connect an ec2imgutils image utility with a cached client.
+
+    ec2imgutils creates a new session and client on every connect,
+    the image utilities call connect for each API request.
+    """
+    def _connect(self):
+        if not self.region:
+            raise EC2ConnectionException(
+                'Could not connect to region: {0}'.format(self.region)
+            )
+
+        return get_client(
+            'ec2', self.access_key, self.secret_key, self.region
+        )
+
+
+class CachedEC2PublishImage(CachedClientMixin, EC2PublishImage):
+    """
+    Image publisher using the cached EC2 clients.
+    """
+
+
+class CachedEC2DeprecateImg(CachedClientMixin, EC2DeprecateImg):
+    """
+    Image deprecator using the cached EC2 clients.
+    """
+
+
+class CachedEC2RemoveImage(CachedClientMixin, EC2RemoveImage):
+    """
+    Image remover using the cached EC2 clients.
+    """
+
+
+class ImageNameCache(object):
+    """
+    Short lived cache of image name lookups per account and region.
+
+    Found images are cached for ttl seconds, missing images are not
+    cached as they may be created at any time. Entries of an account
+    and region are invalidated when mash creates or removes images
+    there.
+    """
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.images = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, name):
+        """
+        Return the cached image, None if not cached or expired.
+        """
+        with self.lock:
+            entry = self.images.get((key, name))
+
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+
+            self.images.pop((key, name), None)
+
+        return None
+
+    def set(self, key, name, image):
+        with self.lock:
+            self.images[(key, name)] = (time.monotonic(), image)
+
+    def invalidate(self, key):
+        """
+        Remove all cached lookups of the account and region key.
+        """
+        with self.lock:
+            for cache_key in list(self.images):
+                if cache_key[0] == key:
+                    del self.images[cache_key]
+
+
+image_name_cache = ImageNameCache()
+
+
+class S3MultipartUploadBackend(object):
+    """
+    Resumable upload backend using S3 multipart uploads.
+    """
+    def __init__(self, client, bucket, key, metadata=None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.metadata = metadata or {}
+
+    def start(self):
+        response = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            Metadata=self.metadata
+        )
+        return response['UploadId']
+
+    def resume(self, upload_id, parts):
+        try:
+            self.client.list_parts(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=upload_id,
+                MaxParts=1
+            )
+        except ClientError:
+            return False
+
+        return True
+
+    def upload_part(self, upload_id, number, offset, data):
+        response = self.client.upload_part(
+            Body=data,
+            Bucket=self.bucket,
+            Key=self.key,
+            PartNumber=number,
+            UploadId=upload_id
+        )
+        return {'ETag': response['ETag'], 'PartNumber': number}
+
+    def complete(self, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+
+    def abort(self, upload_id):
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=upload_id
+        )
+
+
 def get_vpc_id_from_subnet(ec2_client, subnet_id):
     response = ec2_client.describe_subnets(SubnetIds=[subnet_id])
     return response['Subnets'][0]['VpcId']
 
 
-def describe_images(client, image_ids=None):
+def describe_images(client, image_ids=None, filters=None):
     """
     Return a list of custom images using provided client.
 
-    If image_ids list is provided use it to filter the results.
+    If image_ids list or filters are provided use them to filter
+    the results.
     """
     kwargs = {'Owners': ['self']}
 
     if image_ids:
         kwargs['ImageIds'] = image_ids
 
+    if filters:
+        kwargs['Filters'] = filters
+
     images = client.describe_images(**kwargs)['Images']
     return images
 
@@ -113,6 +326,233 @@ def setup_ec2_networking(
             ec2_setup.clean_up()
 
 
+class EC2ReplicationTracker(object):
+    """
+    Wait on images copied to EC2 regions to become available.
+
+    All regions with pending images are polled concurrently, with one
+    describe_images call for the image ids of each region and one
+    client per region for the whole wait. The delay between polls
+    grows while no image changes state and the wait ends as soon as
+    the last image is available or failed.
+
+    A copied image may not be found right after the copy started, it
+    is only considered missing once not_found_timeout has passed.
+    Images that are not available within timeout seconds are failed.
+    """
+    def __init__(
+        self, initial_delay=15, max_delay=60, backoff=1.5,
+        not_found_timeout=300, max_workers=16, timeout=10800
+    ):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.not_found_timeout = not_found_timeout
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.regions = {}
+        self.errors = {}
+
+    def add_image(self, region, image_id, access_key_id, secret_access_key):
+        """
+        Track image_id copied to region.
+        """
+        if region not in self.regions:
+            self.regions[region] = {
+                'credentials': (access_key_id, secret_access_key),
+                'client': None,
+                'image_ids': []
+            }
+
+        self.regions[region]['image_ids'].append(image_id)
+
+    def _get_client(self, region):
+        info = self.regions[region]
+
+        if not info['client']:
+            access_key_id, secret_access_key = info['credentials']
+            info['client'] = get_client(
+                'ec2', access_key_id, secret_access_key, region
+            )
+
+        return info['client']
+
+    def _describe_images(self, client, image_ids):
+        """
+        Return the images of image_ids that are found.
+
+        If the batch fails because an image is not found the images
+        are described one by one.
+        """
+        try:
+            return describe_images(client, image_ids)
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'InvalidAMIID.NotFound':
+                raise
+
+        if len(image_ids) == 1:
+            return []
+
+        images = []
+        for image_id in image_ids:
+            images += self._describe_images(client, [image_id])
+
+        return images
+
+    def _poll_region(self, region):
+        """
+        Return the state of each pending image in region.
+
+        Images that are not found have a state of None.
+        """
+        image_ids = self.regions[region]['image_ids']
+        states = dict.fromkeys(image_ids)
+
+        images = self._describe_images(
+            self._get_client(region),
+            list(image_ids)
+        )
+
+        for image in images:
+            if image.get('ImageId') in states:
+                states[image['ImageId']] = image.get('State')
+
+        return states
+
+    def _update_region(self, region, states, elapsed):
+        """
+        Remove finished images of region, return True if any finished.
+        """
+        finished = False
+
+        for image_id, state in states.items():
+            if elapsed < self.timeout and (
+                state == 'pending' or (
+                    state is None and elapsed < self.not_found_timeout
+                )
+            ):
+                continue
+
+            if state == 'failed':
+                self.errors[region] = (
+                    'The image with ID: {0} reached a failed state.'.format(
+                        image_id
+                    )
+                )
+            elif state == 'pending':
+                self.errors[region] = (
+                    'The image with ID: {0} was not available within {1} '
+                    'seconds.'.format(image_id, self.timeout)
+                )
+            elif state is None:
+                self.errors[region] = \
+                    'The image with ID: {0} was not found.'.format(image_id)
+            elif state != 'available':
+                self.errors[region] = (
+                    'The image with ID: {0} reached an unexpected state: '
+                    '{1}.'.format(image_id, state)
+                )
+
+            self.regions[region]['image_ids'].remove(image_id)
+            finished = True
+
+        return finished
+
+    def wait(self):
+        """
+        Wait on all tracked images and return the errors by region.
+        """
+        start = time.monotonic()
+        delay = self.initial_delay
+        pending = [
+            region for region, info in self.regions.items()
+            if info['image_ids']
+        ]
+
+        while pending:
+            time.sleep(delay)
+
+            with ThreadPoolExecutor(
+                max_workers=min(len(pending), self.max_workers)
+            ) as executor:
+                futures = {
+                    region: executor.submit(self._poll_region, region)
+                    for region in pending
+                }
+
+            elapsed = time.monotonic() - start
+            progress = False
+
+            for region, future in futures.items():
+                try:
+                    states = future.result()
+                except Exception as error:
+                    self.errors[region] = \
+                        'Unable to get the image state: {0}'.format(error)
+                    self.regions[region]['image_ids'] = []
+                    progress = True
+                    continue
+
+                progress = self._update_region(region, states, elapsed) or \
+                    progress
+
+            pending = [
+                region for region in pending
+                if region not in self.errors and self.regions[region]['image_ids']
+            ]
+
+            if not progress:
+                delay = min(delay * self.backoff, self.max_delay)
+
+        return self.errors
+
+
+def fan_out_regions(func, regions, max_workers=8, continue_on_error=False):
+    """
+    Run func for each item in regions on a bounded thread pool.
+
+    Items are usually (region, credentials) tuples. Returns a list of
+    (item, status, result) tuples in the order of regions. The status
+    is SUCCESS with the return value of func as result, FAILED with
+    the error as result or PENDING if the item was never started.
+    Unless continue_on_error is set the items not started yet are
+    cancelled after the first error.
+    """
+    regions = list(regions)
+    results = {}
+
+    if not regions:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(regions))
+    ) as executor:
+        futures = {
+            executor.submit(func, item): index
+            for index, item in enumerate(regions)
+        }
+
+        for future in as_completed(futures):
+            index = futures[future]
+
+            if future.cancelled():
+                results[index] = (PENDING, None)
+                continue
+
+            try:
+                results[index] = (SUCCESS, future.result())
+            except Exception as error:
+                results[index] = (FAILED, error)
+
+                if not continue_on_error:
+                    for pending in futures:
+                        pending.cancel()
+
+    return [
+        (item,) + results[index] for index, item in enumerate(regions)
+    ]
+
+
 def wait_for_instance_termination(
     access_key_id,
     instance_id,
@@ -160,9 +600,13 @@ def cleanup_ec2_image(
             'to remove an image.'
         )
 
-    ec2_remove_img = EC2RemoveImage(**kwargs)
+    ec2_remove_img = CachedEC2RemoveImage(**kwargs)
     ec2_remove_img.set_region(region)
-    ec2_remove_img.remove_images()
+
+    try:
+        ec2_remove_img.remove_images()
+    finally:
+        image_name_cache.invalidate((access_key_id, region))
 
 
 def cleanup_all_ec2_images(
@@ -190,22 +634,41 @@ def cleanup_all_ec2_images(
             )
 
 
-def get_image(client, cloud_image_name):
+def get_image(client, cloud_image_name, cache_key=None):
     """
     Get image if it exists given image name.
-    """
-    images = describe_images(client)
 
-    for image in images:
-        if cloud_image_name == image.get('Name'):
+    The images are filtered by name and owner in EC2. If cache_key,
+    the (access key id, region) of the client, is given found images
+    are cached.
+    """
+    if cache_key:
+        image = image_name_cache.get(cache_key, cloud_image_name)
+        if image:
             return image
 
+    images = describe_images(
+        client,
+        filters=[{'Name': 'name', 'Values': [cloud_image_name]}]
+    )
+
+    image = None
+    for item in images:
+        if cloud_image_name == item.get('Name'):
+            image = item
+            break
+
+    if cache_key and image:
+        image_name_cache.set(cache_key, cloud_image_name, image)
+
+    return image
+
 
-def image_exists(client, cloud_image_name):
+def image_exists(client, cloud_image_name, cache_key=None):
     """
     Determine if image exists given image name.
     """
-    image = get_image(client, cloud_image_name)
+    image = get_image(client, cloud_image_name, cache_key)
     if image and cloud_image_name == image.get('Name'):
         return True
 
@@ -15,34 +15,295 @@
 # You should have received a copy of the GNU General Public License
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
+import collections
+import gzip
 import os
-import re
 import lzma
-import subprocess
+import struct
+import threading
+import zlib
+
+XZ = 'xz'
+GZIP = 'gzip'
+TAR_GZ = 'tar.gz'
+QCOW2 = 'qcow2'
+VHD = 'vhd'
+VHD_FIXED = 'vhdfixed'
+RAW = 'raw'
+
+XZ_MAGIC = b'\xfd7zXZ\x00'
+XZ_HEADER_SIZE = 12
+XZ_FOOTER_MAGIC = b'YZ'
+GZIP_MAGIC = b'\x1f\x8b'
+TAR_MAGIC = b'ustar'
+QCOW2_MAGIC = b'QFI\xfb'
+VHD_COOKIE = b'conectix'
+VHD_FOOTER_SIZE = 512
+VHD_FIXED_DISK = 2
+
+FileInfo = collections.namedtuple(
+    'FileInfo', ['image_format', 'size', 'uncompressed_size', 'virtual_size']
+)
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 128
+
+
+def _read_xz_multibyte(data, position):
+    """
+    Decode a xz variable length integer.
+
+    Returns the value and the position after the integer.
+    """
+    value = 0
+
+    for index in range(9):
+        byte = data[position + index]
+        value |= (byte & 0x7F) << (index * 7)
+
+        if not byte & 0x80:
+            return value, position + index + 1
+
+    raise ValueError('Invalid xz multibyte integer.')
+
+
+def get_xz_uncompressed_size(file_name):
+    """
+    Return the uncompressed size of a xz file from the stream indexes.
+
+    The index at the end of each stream records the uncompressed size
+    of every block so the size is known without decompressing. Stream
+    padding and concatenated streams are supported.
+    """
+    size = 0
+
+    with open(file_name, 'rb') as xz_file:
+        position = xz_file.seek(0, os.SEEK_END)
+
+        while position > 0:
+            xz_file.seek(position - 4)
+
+            if xz_file.read(4) == b'\0\0\0\0':
+                position -= 4  # Stream padding
+                continue
+
+            position -= XZ_HEADER_SIZE
+
+            if position < XZ_HEADER_SIZE:
+                raise ValueError('Invalid xz stream.')
+
+            xz_file.seek(position)
+            footer = xz_file.read(XZ_HEADER_SIZE)
+
+            if footer[10:] != XZ_FOOTER_MAGIC:
+                raise ValueError('Invalid xz stream footer.')
+
+            crc, backward_size = struct.unpack('<II', footer[:8])
+
+            if crc != zlib.crc32(footer[4:10]):
+                raise ValueError('Invalid xz stream footer checksum.')
+
+            index_size = (backward_size + 1) * 4
+            position -= index_size
+
+            if position < XZ_HEADER_SIZE:
+                raise ValueError('Invalid xz index size.')
+
+            xz_file.seek(position)
+            index = xz_file.read(index_size)
+
+            if index[0] != 0:
+                raise ValueError('Invalid xz index.')
+
+            records, offset = _read_xz_multibyte(index, 1)
+            blocks_size = 0
+
+            for _ in range(records):
+                unpadded_size, offset = _read_xz_multibyte(index, offset)
+                uncompressed_size, offset = _read_xz_multibyte(index, offset)
+                blocks_size += (unpadded_size + 3) & ~3
+                size += uncompressed_size
+
+            position -= blocks_size + XZ_HEADER_SIZE
+
+            if position < 0:
+                raise ValueError('Invalid xz stream.')
+
+    return size
+
+
+def _get_vhd_footer_info(footer):
+    """
+    Return the disk type and virtual size from a VHD footer.
+    """
+    disk_type, = struct.unpack('>I', footer[60:64])
+    virtual_size, = struct.unpack('>Q', footer[48:56])
+    return disk_type, virtual_size
+
+
+def _sniff_file(file_name, size):
+    """
+    Detect the image format of file_name from its magic bytes.
+    """
+    uncompressed_size = None
+    virtual_size = None
+
+    with open(file_name, 'rb') as image:
+        head = image.read(VHD_FOOTER_SIZE)
+
+        if size >= VHD_FOOTER_SIZE:
+            image.seek(size - VHD_FOOTER_SIZE)
+            footer = image.read(VHD_FOOTER_SIZE)
+        else:
+            footer = b''
+
+    if head.startswith(XZ_MAGIC):
+        image_format = XZ
+
+        try:
+            uncompressed_size = get_xz_uncompressed_size(file_name)
+        except (IndexError, ValueError):
+            pass  # Size is computed by decompressing if required
+    elif head.startswith(GZIP_MAGIC):
+        image_format = GZIP
+
+        try:
+            with gzip.open(file_name) as gzip_stream:
+                tar_header = gzip_stream.read(VHD_FOOTER_SIZE)
+        except (EOFError, OSError):
+            tar_header = b''
+
+        if tar_header[257:262] == TAR_MAGIC:
+            image_format = TAR_GZ
+    elif head.startswith(QCOW2_MAGIC) and len(head) >= 32:
+        image_format = QCOW2
+        virtual_size, = struct.unpack('>Q', head[24:32])
+    elif head.startswith(VHD_COOKIE) and len(head) == VHD_FOOTER_SIZE:
+        # Dynamic and differencing disks start with a footer copy
+        image_format = VHD
+        virtual_size = _get_vhd_footer_info(head)[1]
+    elif footer.startswith(VHD_COOKIE) and \
+            _get_vhd_footer_info(footer)[0] == VHD_FIXED_DISK:
+        image_format = VHD_FIXED
+        virtual_size = _get_vhd_footer_info(footer)[1]
+    else:
+        image_format = RAW
+        virtual_size = size
+
+    return FileInfo(image_format, size, uncompressed_size, virtual_size)
+
+
+def get_file_info(file_name):
+    """
+    Return the cached FileInfo for file_name.
+
+    Results are cached by path, modification time and size so
+    repeated checks of the same image do not read it again.
+    """
+    stat = os.stat(file_name)
+    key = (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        file_info = _cache.get(key)
+
+        if file_info:
+            _cache.move_to_end(key)
+            return file_info
+
+    file_info = _sniff_file(file_name, stat.st_size)
+
+    with _cache_lock:
+        _cache[key] = file_info
+
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return file_info
+
+
+def get_image_metadata(file_name, sha256, md5):
+    """
+    Return the image metadata of file_name with the given digests.
+
+    The metadata is sent with the obs result so later services do
+    not have to read the image again. The uncompressed size is only
+    set for xz images with a readable index.
+    """
+    file_info = get_file_info(file_name)
+
+    return {
+        'image_format': file_info.image_format,
+        'size': file_info.size,
+        'uncompressed_size': file_info.uncompressed_size,
+        'virtual_size': file_info.virtual_size,
+        'sha256': sha256,
+        'md5': md5
+    }
+
+
+def get_digest_metadata(image_metadata):
+    """
+    Return the image digests as object metadata for an upload.
+    """
+    return {
+        key: image_metadata[key]
+        for key in ('sha256', 'md5')
+        if image_metadata.get(key)
+    }
 
 
 class FileType(object):
     """
-    map file magic information to type methods
+    Map file magic bytes to image format and size information.
+
+    Supported formats are xz, gzip, tar.gz, qcow2, vhd, vhdfixed and
+    raw, any other file is treated as a raw image.
     """
     def __init__(self, file_name):
         self.file_name = file_name
-        file_info = subprocess.Popen(
-            ['file', file_name],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        self.filetype = file_info.communicate()[0].decode()
+        self.file_info = get_file_info(file_name)
+
+    def get_format(self):
+        return self.file_info.image_format
 
     def is_xz(self):
-        if re.match('.*: XZ compressed', self.filetype):
-            return True
-        return False
+        return self.file_info.image_format == XZ
+
+    def is_gzip(self):
+        return self.file_info.image_format in (GZIP, TAR_GZ)
 
     def get_size(self):
+        """
+        Return the uncompressed size for xz files else the file size.
+        """
         if self.is_xz():
+            return self.get_uncompressed_size()
+        else:
+            return self.file_info.size
+
+    def get_uncompressed_size(self):
+        """
+        Return the uncompressed size of a xz file.
+
+        If the xz index is unreadable the file is decompressed to get
+        the size. gzip only stores the size modulo 4 GiB so None is
+        returned for gzip files and for uncompressed files.
+        """
+        if not self.is_xz():
+            return None
+
+        if self.file_info.uncompressed_size is None:
             with lzma.open(self.file_name) as lzma_stream:
                 lzma_stream.seek(0, os.SEEK_END)
                 return lzma_stream.tell()
-        else:
-            return os.path.getsize(self.file_name)
+
+        return self.file_info.uncompressed_size
+
+    def get_virtual_size(self):
+        """
+        Return the disk size of qcow2, vhd, vhdfixed and raw images.
+
+        None is returned for compressed files.
+        """
+        return self.file_info.virtual_size
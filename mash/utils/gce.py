@@ -19,6 +19,7 @@
 import datetime
 import random
 import time
+import uuid
 
 from dateutil.relativedelta import relativedelta
 
@@ -28,15 +29,98 @@ from googleapiclient import discovery
 from googleapiclient.errors import HttpError
 
 from mash.mash_exceptions import MashException
+from mash.utils.resumable_upload import upload_file
 
 
-def upload_image_tarball(storage_driver, object_name, image_file, bucket):
+class GCSComposeUploadBackend(object):
+    """
+    Resumable upload backend using GCS parallel composite uploads.
+
+    Each part is uploaded as a temporary object which are composed
+    into the final object once all parts exist. Compose accepts at
+    most 32 sources so larger uploads are composed in steps.
+    """
+    max_compose_sources = 32
+
+    def __init__(self, storage_driver, object_name, bucket):
+        self.bucket = storage_driver.get_bucket(bucket)
+        self.object_name = object_name
+
+    def _get_part_name(self, upload_id, name):
+        return '{0}.{1}.{2}'.format(self.object_name, upload_id, name)
+
+    def start(self):
+        return uuid.uuid4().hex
+
+    def resume(self, upload_id, parts):
+        prefix = self._get_part_name(upload_id, '')
+        names = set(
+            blob.name for blob in self.bucket.list_blobs(prefix=prefix)
+        )
+        return all(part['name'] in names for part in parts)
+
+    def upload_part(self, upload_id, number, offset, data):
+        name = self._get_part_name(upload_id, '{0:05d}'.format(number))
+        self.bucket.blob(name).upload_from_string(
+            data,
+            content_type='application/octet-stream'
+        )
+        return {'name': name}
+
+    def complete(self, upload_id, parts):
+        sources = [self.bucket.blob(part['name']) for part in parts]
+        temp_blobs = list(sources)
+        step = 0
+
+        while len(sources) > self.max_compose_sources:
+            blob = self.bucket.blob(
+                self._get_part_name(upload_id, 'compose-{0}'.format(step))
+            )
+            blob.compose(sources[:self.max_compose_sources])
+            sources = [blob] + sources[self.max_compose_sources:]
+            temp_blobs.append(blob)
+            step += 1
+
+        self.bucket.blob(self.object_name).compose(sources)
+
+        for blob in temp_blobs:
+            try:
+                blob.delete()
+            except Exception:
+                pass  # Best effort cleanup of temporary parts
+
+    def abort(self, upload_id):
+        """
+        Delete the temporary part objects of the upload.
+        """
+        prefix = self._get_part_name(upload_id, '')
+
+        for blob in self.bucket.list_blobs(prefix=prefix):
+            blob.delete()
+
+
+def upload_image_tarball(
+    storage_driver, object_name, image_file, bucket, part_size,
+    checkpoint_file=None, max_workers=1, max_retry_attempts=3,
+    get_backend=None
+):
     """
     Upload image tarball to blob in the provided bucket.
+
+    The tarball is uploaded in parts which are composed into the blob.
+    Uploaded parts are recorded in checkpoint_file, if provided, and
+    an interrupted or failed upload resumes from it.
     """
-    bucket = storage_driver.get_bucket(bucket)
-    blob = bucket.blob(object_name)
-    blob.upload_from_filename(image_file)
+    upload_file(
+        GCSComposeUploadBackend(storage_driver, object_name, bucket),
+        image_file,
+        '/'.join([bucket, object_name]),
+        part_size,
+        checkpoint_file=checkpoint_file,
+        max_workers=max_workers,
+        max_retry_attempts=max_retry_attempts,
+        get_backend=get_backend
+    )
 
 
 def blob_exists(storage_driver, object_name, bucket):
@@ -0,0 +1,283 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import fcntl
+import hashlib
+import os
+import shutil
+import time
+
+from contextlib import contextmanager
+
+from mash.utils.mash_utils import load_json, persist_json, remove_file
+
+CACHE_DIRECTORY = 'image_cache'
+ENTRY_FILE = 'entry.json'
+
+
+def get_cache_key(image_name, checksum):
+    """
+    Return the content address of an image build.
+    """
+    key = '{0}:{1}'.format(image_name, checksum).encode()
+    return hashlib.sha256(key).hexdigest()
+
+
+class ImageCacheEntry(object):
+    """
+    A single image build in the cache.
+
+    The entry is complete once the entry file exists, it is written
+    after the image has been downloaded and validated.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entry_file = os.path.join(path, ENTRY_FILE)
+
+    def get_image_file(self):
+        """
+        Return the cached image file or None if the entry is incomplete.
+        """
+        try:
+            data = load_json(self.entry_file)
+        except (OSError, ValueError):
+            return None
+
+        image_file = os.path.join(self.path, data['image_file'])
+
+        if not os.path.isfile(image_file):
+            return None
+
+        return image_file
+
+    def commit(self, image_file, image_name, checksum, metadata=None):
+        """
+        Mark the entry complete for the downloaded image_file.
+
+        The image metadata is kept with the entry so jobs reusing the
+        cached image get it without reading the image.
+        """
+        temp_file = ''.join([self.entry_file, '.tmp'])
+        persist_json(temp_file, {
+            'image_name': image_name,
+            'checksum': checksum,
+            'image_file': os.path.basename(image_file),
+            'metadata': metadata
+        })
+        os.replace(temp_file, self.entry_file)
+
+    def get_metadata(self):
+        """
+        Return the image metadata of a complete entry.
+        """
+        try:
+            return load_json(self.entry_file).get('metadata')
+        except (OSError, ValueError):
+            return None
+
+    def touch(self):
+        """
+        Record the entry as used, entries are evicted least recently used.
+        """
+        os.utime(self.entry_file)
+
+    def get_last_used(self):
+        return os.stat(self.entry_file).st_mtime
+
+    def get_size(self):
+        size = 0
+
+        with os.scandir(self.path) as scanner:
+            for entry in scanner:
+                if entry.is_file(follow_symlinks=False):
+                    size += entry.stat().st_size
+
+        return size
+
+    def is_referenced(self):
+        """
+        Return True if a job directory still links the cached image.
+        """
+        image_file = self.get_image_file()
+        return bool(image_file) and os.stat(image_file).st_nlink > 1
+
+
+class ImageCache(object):
+    """
+    Content addressed store of downloaded OBS images.
+
+    Images are stored once per image name and build checksum in
+    download_directory/image_cache and hard linked into the job
+    download directories. The link count of a cached image is the
+    number of job directories still referencing it.
+
+    Access to an entry is serialized with a lock file so concurrent
+    jobs for the same build only download the image once.
+    """
+    def __init__(self, download_directory):
+        self.cache_directory = os.path.join(
+            download_directory,
+            CACHE_DIRECTORY
+        )
+
+    def _get_lock_file(self, key):
+        return os.path.join(self.cache_directory, ''.join([key, '.lock']))
+
+    @contextmanager
+    def _lock(self, key, blocking=True):
+        """
+        Lock the entry for key, yields False if not blocking and busy.
+
+        The lock file is removed when an entry is evicted, so after
+        acquiring the lock make sure it is still the current file.
+        """
+        lock_file = self._get_lock_file(key)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+
+        while True:
+            handle = open(lock_file, 'a')
+
+            try:
+                fcntl.flock(handle, flags)
+            except BlockingIOError:
+                handle.close()
+                yield False
+                return
+
+            try:
+                current = os.stat(lock_file).st_ino
+            except FileNotFoundError:
+                current = None
+
+            if current == os.fstat(handle.fileno()).st_ino:
+                break
+
+            handle.close()
+
+        try:
+            yield True
+        finally:
+            handle.close()
+
+    @contextmanager
+    def get_entry(self, image_name, checksum):
+        """
+        Lock and return the cache entry for the image build.
+        """
+        key = get_cache_key(image_name, checksum)
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+        with self._lock(key):
+            path = os.path.join(self.cache_directory, key)
+            os.makedirs(path, exist_ok=True)
+            yield ImageCacheEntry(path)
+
+    def link(self, entry, target_directory):
+        """
+        Link the cached image into target_directory and return the path.
+
+        The image is copied if the directories are on different file
+        systems.
+        """
+        image_file = entry.get_image_file()
+        target_file = os.path.join(
+            target_directory,
+            os.path.basename(image_file)
+        )
+
+        os.makedirs(target_directory, exist_ok=True)
+        remove_file(target_file)
+
+        try:
+            os.link(image_file, target_file)
+        except OSError:
+            shutil.copyfile(image_file, target_file)
+
+        entry.touch()
+        return target_file
+
+    def get_entries(self):
+        """
+        Return the complete cache entries keyed by cache key.
+        """
+        entries = {}
+
+        if not os.path.isdir(self.cache_directory):
+            return entries
+
+        with os.scandir(self.cache_directory) as scanner:
+            for item in scanner:
+                if item.is_dir(follow_symlinks=False):
+                    entry = ImageCacheEntry(item.path)
+
+                    if entry.get_image_file():
+                        entries[item.name] = entry
+
+        return entries
+
+    def _evict(self, key, entry):
+        """
+        Remove the entry unless a job currently holds it.
+        """
+        with self._lock(key, blocking=False) as locked:
+            if not locked:
+                return False
+
+            shutil.rmtree(entry.path, ignore_errors=True)
+            remove_file(self._get_lock_file(key))
+
+        return True
+
+    def purge(self, max_size=0, max_age=None, log_callback=None):
+        """
+        Evict entries least recently used first and return their keys.
+
+        Entries not used for max_age seconds are evicted. If max_size
+        is set unreferenced entries are evicted until the size of the
+        cache is below max_size bytes. Evicting an entry still linked
+        from a job directory frees no space until the job directory
+        is removed.
+        """
+        entries = sorted(
+            self.get_entries().items(),
+            key=lambda item: item[1].get_last_used()
+        )
+        size = sum(entry.get_size() for key, entry in entries)
+        cutoff = time.time() - max_age if max_age else None
+        evicted = []
+
+        for key, entry in entries:
+            expired = cutoff and entry.get_last_used() < cutoff
+            oversized = max_size and size > max_size and \
+                not entry.is_referenced()
+
+            if not (expired or oversized):
+                continue
+
+            entry_size = entry.get_size()
+
+            if self._evict(key, entry):
+                size -= entry_size
+                evicted.append(key)
+
+                if log_callback:
+                    log_callback.info(
+                        'Evicted cached image {0}'.format(key)
+                    )
+
+        return evicted
@@ -23,6 +23,7 @@ import os
 import random
 import requests
 import hashlib
+import threading
 
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric import rsa
@@ -32,11 +33,52 @@ from contextlib import contextmanager, suppress
 from string import ascii_lowercase
 from tempfile import NamedTemporaryFile
 
-from mash.log.handler import RabbitMQHandler
+from mash.log.handler import BufferedRabbitMQHandler, RabbitMQHandler
 from mash.mash_exceptions import MashException, MashLogSetupException
 from mash.utils.json_format import JsonFormat
 
 
+class ResizableSemaphore(object):
+    """
+    Semaphore limiting the number of holders to a count that can change.
+
+    Lowering the count does not interrupt current holders, new holders
+    wait until less than count slots are in use.
+    """
+    def __init__(self, count):
+        self.count = count
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def resize(self, count):
+        with self.condition:
+            self.count = count
+            self.condition.notify_all()
+
+    def acquire(self, blocking=True):
+        with self.condition:
+            while self.in_use >= self.count:
+                if not blocking:
+                    return False
+
+                self.condition.wait()
+
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
 @contextmanager
 def create_json_file(data):
     try:
@@ -169,18 +211,39 @@ def restart_job(job_file, callback):
 def restart_jobs(job_dir, callback):
     """
     Restart all jobs in job_dir using callback.
+
+    Only json job files are loaded, other files such as upload
+    checkpoints stored next to the job files are skipped.
     """
     for job_file in os.listdir(job_dir):
-        restart_job(os.path.join(job_dir, job_file), callback)
+        if job_file.endswith('.json'):
+            restart_job(os.path.join(job_dir, job_file), callback)
 
 
-def handle_request(url, endpoint, method, job_data=None):
+def get_job_owner(job_id, instance_count):
+    """
+    Return the index of the service instance that owns the job.
+
+    Uses rendezvous hashing so each job id maps to exactly one instance
+    and changing the instance count only moves the jobs of the added
+    or removed instances.
+    """
+    def weight(index):
+        key = '{0}:{1}'.format(job_id, index).encode()
+        return hashlib.md5(key).hexdigest()
+
+    return max(range(instance_count), key=weight)
+
+
+def handle_request(url, endpoint, method, job_data=None, session=None):
     """
     Post request based on endpoint and data.
 
+    A requests session can be provided to reuse its connections.
+
     If response is unsuccessful raise exception.
     """
-    request_method = getattr(requests, method)
+    request_method = getattr(session or requests, method)
     data = None if not job_data else JsonFormat.json_message(job_data)
     uri = ''.join([url, endpoint])
 
@@ -227,13 +290,35 @@ def get_logging_formatter():
     )
 
 
-def setup_rabbitmq_log_handler(host, username, password):
-    rabbit_handler = RabbitMQHandler(
-        host=host,
-        username=username,
-        password=password,
-        routing_key='mash.logger'
-    )
+def setup_rabbitmq_log_handler(
+    host, username, password, queue_capacity=0, batch_size=100,
+    flush_interval=1, block=False
+):
+    """
+    Return a RabbitMQ log handler.
+
+    If queue_capacity is set logs are buffered and shipped in batches
+    from a background thread.
+    """
+    if queue_capacity:
+        rabbit_handler = BufferedRabbitMQHandler(
+            host=host,
+            username=username,
+            password=password,
+            routing_key='mash.logger',
+            capacity=queue_capacity,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            block=block
+        )
+    else:
+        rabbit_handler = RabbitMQHandler(
+            host=host,
+            username=username,
+            password=password,
+            routing_key='mash.logger'
+        )
+
     rabbit_handler.setFormatter(get_logging_formatter())
 
     return rabbit_handler
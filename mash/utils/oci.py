@@ -0,0 +1,102 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+from oci.exceptions import ServiceError
+from oci.object_storage.models import (
+    CommitMultipartUploadDetails,
+    CommitMultipartUploadPartDetails,
+    CreateMultipartUploadDetails
+)
+
+
+class OCIMultipartUploadBackend(object):
+    """
+    Resumable upload backend using OCI object storage multipart uploads.
+
+    Object storage requires user metadata keys in the opc-meta-* format,
+    the keys of metadata are prefixed accordingly.
+    """
+    def __init__(
+        self, object_storage, namespace, bucket, object_name, metadata=None
+    ):
+        self.object_storage = object_storage
+        self.namespace = namespace
+        self.bucket = bucket
+        self.object_name = object_name
+        self.metadata = {
+            'opc-meta-{0}'.format(key): value
+            for key, value in (metadata or {}).items()
+        } or None
+
+    def start(self):
+        response = self.object_storage.create_multipart_upload(
+            self.namespace,
+            self.bucket,
+            CreateMultipartUploadDetails(
+                object=self.object_name,
+                metadata=self.metadata
+            )
+        )
+        return response.data.upload_id
+
+    def resume(self, upload_id, parts):
+        try:
+            self.object_storage.list_multipart_upload_parts(
+                self.namespace,
+                self.bucket,
+                self.object_name,
+                upload_id,
+                limit=1
+            )
+        except ServiceError:
+            return False
+
+        return True
+
+    def upload_part(self, upload_id, number, offset, data):
+        response = self.object_storage.upload_part(
+            self.namespace,
+            self.bucket,
+            self.object_name,
+            upload_id,
+            number,
+            data
+        )
+        return {'part_num': number, 'etag': response.headers['etag']}
+
+    def complete(self, upload_id, parts):
+        self.object_storage.commit_multipart_upload(
+            self.namespace,
+            self.bucket,
+            self.object_name,
+            upload_id,
+            CommitMultipartUploadDetails(
+                parts_to_commit=[
+                    CommitMultipartUploadPartDetails(**part)
+                    for part in parts
+                ]
+            )
+        )
+
+    def abort(self, upload_id):
+        self.object_storage.abort_multipart_upload(
+            self.namespace,
+            self.bucket,
+            self.object_name,
+            upload_id
+        )
@@ -0,0 +1,358 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import os
+import threading
+
+from contextlib import suppress
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from mash.mash_exceptions import MashUploadException
+from mash.utils.mash_utils import load_json, persist_json, remove_file
+
+
+def call_with_retries(max_retry_attempts, func, *args, **kwargs):
+    """
+    Call func until it succeeds or max_retry_attempts are used.
+
+    The error of the last attempt is raised.
+    """
+    max_retry_attempts = max(max_retry_attempts, 1)
+
+    for attempt in range(max_retry_attempts):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if attempt + 1 == max_retry_attempts:
+                raise
+
+
+def read_chunk(stream, size):
+    """
+    Read size bytes from stream, less only at the end of the stream.
+    """
+    chunks = []
+
+    while size:
+        chunk = stream.read(size)
+
+        if not chunk:
+            break
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def get_checkpoint_file(job_file):
+    """
+    Return the upload checkpoint file stored next to the job file.
+
+    Returns None if the job is not persisted.
+    """
+    if not job_file:
+        return None
+
+    if job_file.endswith('.json'):
+        job_file = job_file[:-len('.json')]
+
+    return ''.join([job_file, '.checkpoint'])
+
+
+def get_checkpoint_key(file_name, target, part_size):
+    """
+    Return the key identifying an upload of file_name to target.
+
+    A checkpoint is only resumed if the key matches, so a changed
+    source file, target or part size starts a new upload.
+    """
+    file_stat = os.stat(file_name)
+
+    return {
+        'target': target,
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime_ns,
+        'part_size': part_size
+    }
+
+
+class UploadCheckpoint(object):
+    """
+    Persisted record of the committed parts of a multi-part upload.
+
+    If checkpoint_file is None the checkpoint is kept in memory only,
+    which still allows retrying just the failed parts of an upload.
+    """
+    def __init__(self, checkpoint_file=None, key=None):
+        self.checkpoint_file = checkpoint_file
+        self.key = key
+        self.upload_id = None
+        self.parts = {}
+        self.lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        if not self.checkpoint_file:
+            return
+
+        try:
+            data = load_json(self.checkpoint_file)
+        except (OSError, ValueError):
+            return
+
+        if data.get('key') == self.key:
+            self.upload_id = data.get('upload_id')
+            self.parts = {
+                int(number): info
+                for number, info in data.get('parts', {}).items()
+            }
+
+    def _save(self):
+        """
+        Atomically write the checkpoint, called with the lock held.
+        """
+        if not self.checkpoint_file:
+            return
+
+        temp_file = ''.join([self.checkpoint_file, '.tmp'])
+        persist_json(temp_file, {
+            'key': self.key,
+            'upload_id': self.upload_id,
+            'parts': self.parts
+        })
+        os.replace(temp_file, self.checkpoint_file)
+
+    def start(self, upload_id):
+        """
+        Record a new upload and drop any previous parts.
+        """
+        with self.lock:
+            self.upload_id = upload_id
+            self.parts = {}
+            self._save()
+
+    def add_part(self, number, info):
+        """
+        Record a committed part.
+        """
+        with self.lock:
+            self.parts[number] = info
+            self._save()
+
+    def get_parts(self):
+        """
+        Return the committed part info ordered by part number.
+        """
+        with self.lock:
+            return [self.parts[number] for number in sorted(self.parts)]
+
+    def remove(self):
+        """
+        Forget the upload and delete the checkpoint file.
+        """
+        with self.lock:
+            self.upload_id = None
+            self.parts = {}
+
+            if self.checkpoint_file:
+                remove_file(self.checkpoint_file)
+
+
+class ResumableUpload(object):
+    """
+    Upload a stream in fixed size parts through a storage backend.
+
+    Parts are uploaded by up to max_workers threads and every committed
+    part is recorded in the checkpoint. A retry or restarted job with
+    the same checkpoint skips the committed parts and only uploads the
+    rest. Each part is retried on its own up to max_retry_attempts.
+
+    Backends implement:
+
+    * start() -> upload_id
+    * resume(upload_id, parts) -> True if the upload can be continued
+    * upload_part(upload_id, number, offset, data) -> part info
+    * complete(upload_id, parts)
+    * abort(upload_id)
+
+    If the upload fails the checkpoint and the uploaded parts are kept
+    so the next attempt of the job resumes the upload. They are aborted
+    by the cleanup of the job once it is deleted.
+    """
+    def __init__(
+        self, backend, checkpoint, part_size, max_workers=1,
+        max_retry_attempts=3, progress_callback=None
+    ):
+        self.backend = backend
+        self.checkpoint = checkpoint
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.max_retry_attempts = max_retry_attempts
+        self.progress_callback = progress_callback
+
+    def _upload_part(self, upload_id, number, offset, data):
+        info = call_with_retries(
+            self.max_retry_attempts,
+            self.backend.upload_part,
+            upload_id,
+            number,
+            offset,
+            data
+        )
+        self.checkpoint.add_part(number, info)
+        self._progress(len(data))
+
+    def _progress(self, size):
+        if self.progress_callback:
+            self.progress_callback(size)
+
+    def _start(self):
+        upload_id = self.checkpoint.upload_id
+
+        if upload_id and not self.backend.resume(
+            upload_id, self.checkpoint.get_parts()
+        ):
+            upload_id = None
+
+        if not upload_id:
+            upload_id = call_with_retries(
+                self.max_retry_attempts,
+                self.backend.start
+            )
+            self.checkpoint.start(upload_id)
+
+        return upload_id
+
+    def upload(self, stream, size):
+        """
+        Upload size bytes from stream and complete the upload.
+        """
+        upload_id = self._start()
+        self._upload(upload_id, stream, size)
+        self.checkpoint.remove()
+
+    def _upload(self, upload_id, stream, size):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            uploads = set()
+            offset = 0
+            number = 1
+
+            while True:
+                length = min(self.part_size, size - offset)
+
+                if number in self.checkpoint.parts:
+                    stream.seek(length, os.SEEK_CUR)
+                    self._progress(length)
+                else:
+                    data = read_chunk(stream, length)
+
+                    if len(data) != length:
+                        raise MashUploadException(
+                            'Stream ended at {0} bytes, expected {1}.'.format(
+                                offset + len(data),
+                                size
+                            )
+                        )
+
+                    uploads.add(executor.submit(
+                        self._upload_part, upload_id, number, offset, data
+                    ))
+
+                offset += length
+                number += 1
+
+                # Bound the number of parts held in memory
+                if len(uploads) >= self.max_workers * 2:
+                    done, uploads = wait(uploads, return_when=FIRST_COMPLETED)
+
+                    for upload in done:
+                        upload.result()
+
+                if offset >= size:
+                    break
+
+            for upload in wait(uploads).done:
+                upload.result()
+
+        call_with_retries(
+            self.max_retry_attempts,
+            self.backend.complete,
+            upload_id,
+            self.checkpoint.get_parts()
+        )
+
+
+def upload_file(
+    backend, file_name, target, part_size, checkpoint_file=None,
+    max_workers=1, max_retry_attempts=3, progress_callback=None,
+    get_backend=None
+):
+    """
+    Upload file_name through backend resuming from checkpoint_file.
+
+    target identifies the destination, for example bucket/object, so a
+    checkpoint for a different destination is not resumed. If
+    get_backend is provided an upload in checkpoint_file that cannot
+    be resumed is aborted, see :func:`abort_upload`.
+    """
+    checkpoint = UploadCheckpoint(
+        checkpoint_file,
+        get_checkpoint_key(file_name, target, part_size)
+    )
+
+    if not checkpoint.upload_id and get_backend:
+        # Parts kept by a failed upload of another file or target
+        with suppress(Exception):
+            abort_upload(checkpoint_file, get_backend)
+    upload = ResumableUpload(
+        backend,
+        checkpoint,
+        part_size,
+        max_workers=max_workers,
+        max_retry_attempts=max_retry_attempts,
+        progress_callback=progress_callback
+    )
+
+    with open(file_name, 'rb') as image_stream:
+        upload.upload(image_stream, os.path.getsize(file_name))
+
+
+def abort_upload(checkpoint_file, get_backend):
+    """
+    Abort the upload recorded in checkpoint_file and remove the file.
+
+    get_backend(target) returns the backend for the target of the
+    upload. Used to clean up after jobs deleted before finishing an
+    upload that was interrupted.
+    """
+    if not checkpoint_file:
+        return
+
+    try:
+        data = load_json(checkpoint_file)
+    except (OSError, ValueError):
+        return
+
+    try:
+        if data.get('upload_id'):
+            backend = get_backend(data['key']['target'])
+            backend.abort(data['upload_id'])
+    finally:
+        remove_file(checkpoint_file)
@@ -37,6 +37,7 @@ BuildRequires:  python3-cryptography >= 2.2.0
 BuildRequires:  python3-PyYAML
 BuildRequires:  python3-PyJWT
 BuildRequires:  python3-amqpstorm >= 2.4.0
+BuildRequires:  python3-pamqp >= 3.0
 BuildRequires:  python3-APScheduler >= 3.3.1
 BuildRequires:  python3-python-dateutil >= 2.6.0
 BuildRequires:  python3-python-dateutil < 2.8.1
@@ -50,7 +51,7 @@ BuildRequires:  python3-Flask-SQLAlchemy
 BuildRequires:  python3-Flask-Migrate
 BuildRequires:  python3-flask-jwt-extended
 BuildRequires:  python3-requests
-BuildRequires:  python3-obs-img-utils >= 0.3.0
+BuildRequires:  python3-obs-img-utils >= 1.0.0
 BuildRequires:  python3-oci-sdk
 BuildRequires:  python3-google-auth
 BuildRequires:  python3-google-cloud-storage
@@ -66,6 +67,7 @@ Requires:       python3-cryptography >= 2.2.0
 Requires:       python3-PyYAML
 Requires:       python3-PyJWT
 Requires:       python3-amqpstorm >= 2.4.0
+Requires:       python3-pamqp >= 3.0
 Requires:       python3-APScheduler >= 3.3.1
 Requires:       python3-python-dateutil >= 2.6.0
 Requires:       python3-python-dateutil < 2.8.1
@@ -79,7 +81,7 @@ Requires:       python3-Flask-SQLAlchemy
 Requires:       python3-Flask-Migrate
 Requires:       python3-flask-jwt-extended
 Requires:       python3-requests
-Requires:       python3-obs-img-utils >= 0.3.0
+Requires:       python3-obs-img-utils >= 1.0.0
 Requires:       python3-oci-sdk
 Requires:       python3-google-auth
 Requires:       python3-google-cloud-storage
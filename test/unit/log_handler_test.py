@@ -1,24 +1,30 @@
+import json
 import logging
 
 from unittest.mock import Mock, patch
 
 from mash.log.handler import (
+    BufferedRabbitMQHandler,
     RabbitMQHandler,
     RabbitMQSocket
 )
+from mash.utils.amqp import publishers
 
 
 class TestRabbitMQHandler(object):
     def setup(self):
         self.connection = Mock()
+        self.connection.is_closed = False
         self.channel = Mock()
+        self.channel.is_closed = False
         self.channel.exchange.declare.return_value = None
-        self.channel.basic.publish.return_value = None
+        self.channel.basic.publish.return_value = True
         self.connection.channel.return_value = self.channel
 
+        publishers.clear()
         self.handler = RabbitMQHandler()
 
-    @patch('mash.log.handler.Connection')
+    @patch('mash.utils.amqp.Connection')
     def test_rabbit_handler_messages(self, mock_connection):
         mock_connection.return_value = self.connection
 
@@ -26,16 +32,31 @@ class TestRabbitMQHandler(object):
         log.addHandler(self.handler)
         log.setLevel(logging.DEBUG)
 
-        log.info('Job finished!', extra={'job_id': '4711'})
+        log.info('Job finished!')
         self.channel.basic.publish.assert_called_once_with(
             exchange='logger',
             routing_key='mash.logger',
-            body='{"job_id": "4711", "msg": "Job finished!"}',
+            body='{"msg": "Job finished!"}',
             properties={
                 'content_type': 'application/json',
                 'delivery_mode': 2
-            }
+            },
+            mandatory=False
+        )
+        self.channel.basic.publish.reset_mock()
+
+        # Job logs include the structured record fields
+        self.handler.setFormatter(logging.Formatter('%(name)s %(message)s'))
+        log.info('Job finished!', extra={'job_id': '4711'})
+        body = json.loads(
+            self.channel.basic.publish.call_args[1]['body']
         )
+        assert body['job_id'] == '4711'
+        assert body['msg'] == 'log_handler_test Job finished!'
+        assert body['message'] == 'Job finished!'
+        assert body['levelname'] == 'INFO'
+        assert body['name'] == 'log_handler_test'
+        assert isinstance(body['created'], float)
         self.channel.basic.publish.reset_mock()
 
         try:
@@ -45,7 +66,7 @@ class TestRabbitMQHandler(object):
 
         assert self.channel.basic.publish.call_count == 1
 
-    @patch('mash.log.handler.Connection')
+    @patch('mash.utils.amqp.Connection')
     def test_rabbit_socket(self, mock_connection):
         mock_connection.return_value = self.connection
         self.connection.close.return_value = None
@@ -67,7 +88,9 @@ class TestRabbitMQHandler(object):
             kwargs={'heartbeat': 600}
         )
 
+        # Log messages are not confirmed by the broker
         self.connection.channel.assert_called_once_with()
+        assert self.channel.confirm_deliveries.call_count == 0
         self.channel.exchange.declare.assert_called_once_with(
             exchange='exchange',
             exchange_type='direct',
@@ -84,9 +107,135 @@ class TestRabbitMQHandler(object):
             properties={
                 'content_type': 'application/json',
                 'delivery_mode': 2
-            }
+            },
+            mandatory=False
         )
 
+        self.channel.basic.publish.reset_mock()
+        socket.send_batch(['one', 'two'])
+        assert self.channel.basic.publish.call_count == 2
+
+        # The pool is shared by the log handlers of the process
+        pool = socket.publisher
+        other = RabbitMQSocket(
+            'host', 1234, 'user', 'pass', 'exchange', 'mash.logger'
+        )
+        assert other.publisher is pool
+        assert not pool.confirm
+
+        self.connection.is_open = True
         socket.close()
+        assert socket.publisher is None
+        assert self.connection.close.call_count == 0
+
+        # Closed with the last socket
+        other.close()
+        other.close()
         self.connection.close.assert_called_once_with()
-        self.channel.close.assert_called_once_with()
+        assert publishers == {}
+
+
+class TestBufferedRabbitMQHandler(object):
+    def setup(self):
+        self.socket = Mock()
+        self.handler = BufferedRabbitMQHandler(
+            capacity=3, batch_size=2, flush_interval=0.05
+        )
+        self.handler.makeSocket = Mock(return_value=self.socket)
+
+        self.log = logging.getLogger('buffered_log_handler_test')
+        self.log.handlers = [self.handler]
+        self.log.setLevel(logging.DEBUG)
+        self.log.propagate = False
+
+    def teardown(self):
+        self.handler.close()
+
+    def test_buffered_handler_batches(self):
+        self.log.info('Job started!')
+        self.log.info('Job finished!')
+        self.handler.flush()
+
+        self.socket.send_batch.assert_called_once_with([
+            '{"msg": "Job started!"}',
+            '{"msg": "Job finished!"}'
+        ])
+        metrics = self.handler.get_metrics()
+        assert metrics['published'] == 2
+        assert metrics['buffered'] == 0
+
+    def test_buffered_handler_flush_interval(self):
+        self.log.info('Job started!')
+        self.handler.flush()
+
+        self.socket.send_batch.assert_called_once_with([
+            '{"msg": "Job started!"}'
+        ])
+
+    def test_buffered_handler_drops_oldest(self):
+        with self.handler.condition:
+            # Worker cannot take messages while the lock is held
+            for index in range(5):
+                self.log.info(str(index))
+
+            assert list(self.handler.buffer) == [
+                '{"msg": "2"}', '{"msg": "3"}', '{"msg": "4"}'
+            ]
+
+        assert self.handler.get_metrics()['dropped'] == 2
+
+    def test_buffered_handler_block(self):
+        self.handler.block = True
+        self.handler.capacity = 1
+        self.handler.buffer.append('{"msg": "queued"}')
+
+        self.log.info('Job started!')
+        self.handler.flush()
+
+        calls = self.socket.send_batch.mock_calls
+        messages = [msg for call in calls for msg in call[1][0]]
+        assert messages == ['{"msg": "queued"}', '{"msg": "Job started!"}']
+        assert self.handler.get_metrics()['dropped'] == 0
+
+    def test_buffered_handler_send_failed(self):
+        self.socket.send_batch.side_effect = Exception('Broker down!')
+
+        self.log.info('Job started!')
+        self.handler.flush()
+
+        self.socket.close.assert_called_once_with()
+        assert self.handler.sock is None
+        assert self.handler.get_metrics()['failed'] == 1
+
+    def test_buffered_handler_socket_failed(self):
+        self.handler.makeSocket.side_effect = Exception('Broker down!')
+
+        self.log.info('Job started!')
+        self.handler.flush()
+
+        assert self.handler.get_metrics()['failed'] == 1
+
+    def test_buffered_handler_format_error(self):
+        self.handler.handleError = Mock()
+        self.handler.makePickle = Mock(side_effect=Exception('Bad record'))
+
+        self.log.info('Job started!')
+        assert self.handler.handleError.call_count == 1
+        assert len(self.handler.buffer) == 0
+
+    def test_buffered_handler_close(self):
+        self.log.info('Job started!')
+        self.handler.close()
+
+        assert not self.handler.worker.is_alive()
+        self.socket.send_batch.assert_called_once_with([
+            '{"msg": "Job started!"}'
+        ])
+
+    def test_buffered_handler_flush_timeout(self):
+        with self.handler.condition:
+            # Worker cannot send while the lock is held
+            self.handler.buffer.append('{"msg": "queued"}')
+            self.handler.flush(timeout=0)
+
+            assert len(self.handler.buffer) == 1
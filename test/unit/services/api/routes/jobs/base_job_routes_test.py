@@ -131,3 +131,68 @@ def test_api_get_job_list(
     assert result.json[0]['profile'] == 'Server'
     assert result.json[0]['state'] == 'pending'
     assert result.json[0]['start_time'] == '2011-11-11 11:11:11'
+
+
+@patch('mash.services.api.routes.jobs.get_job_logs')
+@patch('mash.services.api.routes.jobs.get_jwt_identity')
+@patch('flask_jwt_extended.view_decorators.verify_jwt_in_request')
+def test_api_get_job_logs(
+        mock_jwt_required,
+        mock_jwt_identity,
+        mock_get_job_logs,
+        test_client
+):
+    logs = {
+        'logs': [{
+            'created': 1577880000.0,
+            'timestamp': '2020-01-01T12:00:00',
+            'level': 'ERROR',
+            'service': 'test',
+            'job_id': '12345678-1234-1234-1234-123456789012',
+            'message': 'Image tests failed.'
+        }],
+        'next': 12
+    }
+    mock_get_job_logs.return_value = logs
+    mock_jwt_identity.return_value = 'user1'
+
+    result = test_client.get(
+        '/jobs/12345678-1234-1234-1234-123456789012/logs'
+        '?level=ERROR&service=test&limit=10'
+    )
+
+    assert result.status_code == 200
+    assert result.json == logs
+    mock_get_job_logs.assert_called_once_with(
+        '12345678-1234-1234-1234-123456789012',
+        'user1',
+        start=0,
+        limit=10,
+        level='ERROR',
+        service='test',
+        tail=False
+    )
+
+    # Not found
+    mock_get_job_logs.return_value = None
+
+    result = test_client.get(
+        '/jobs/12345678-1234-1234-1234-123456789012/logs?tail=true'
+    )
+    assert result.status_code == 404
+    assert result.json['msg'] == 'Job not found'
+
+    # Exception
+    mock_get_job_logs.side_effect = Exception('Broken')
+
+    result = test_client.get(
+        '/jobs/12345678-1234-1234-1234-123456789012/logs'
+    )
+    assert result.status_code == 400
+    assert result.json['msg'] == 'Broken'
+
+    # Invalid limit
+    result = test_client.get(
+        '/jobs/12345678-1234-1234-1234-123456789012/logs?limit=0'
+    )
+    assert result.status_code == 400
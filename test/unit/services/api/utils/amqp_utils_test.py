@@ -6,32 +6,33 @@ from werkzeug.local import LocalProxy
 
 
 @patch.object(LocalProxy, '_get_current_object')
-@patch('mash.services.api.utils.amqp.Connection')
-def test_connect(mock_connection, mock_get_current_object):
-    connection = Mock()
-    channel = Mock()
-    connection.channel.return_value = channel
-    mock_connection.return_value = connection
-
-    connect()
-    channel.confirm_deliveries.assert_called_once_with()
+@patch('mash.services.api.utils.amqp.get_publisher')
+def test_connect(mock_get_publisher, mock_get_current_object):
+    app = Mock()
+    app.config = {
+        'AMQP_HOST': 'localhost',
+        'AMQP_USER': 'guest',
+        'AMQP_PASS': 'guest',
+        'AMQP_PUBLISHER_CHANNELS': 8
+    }
+    mock_get_current_object.return_value = app
+
+    assert connect() == mock_get_publisher.return_value
+    mock_get_publisher.assert_called_once_with(
+        'localhost',
+        'guest',
+        'guest',
+        channel_count=8
+    )
 
 
-@patch('mash.services.api.utils.amqp.connect')
 @patch.object(LocalProxy, '_get_current_object')
-@patch('mash.services.api.utils.amqp.channel')
-def test_publish(mock_channel, mock_get_current_object, mock_connect):
-    mock_channel.closed = True
+def test_publish(mock_get_current_object):
+    app = Mock()
+    publisher = Mock()
+    app.extensions = {'publisher': publisher}
+    mock_get_current_object.return_value = app
+
     publish('test', 'doc', 'msg')
 
-    mock_connect.assert_called_once_with()
-    mock_channel.basic.publish.assert_called_once_with(
-        body='msg',
-        routing_key='doc',
-        exchange='test',
-        properties={
-            'content_type': 'application/json',
-            'delivery_mode': 2
-        },
-        mandatory=True
-    )
+    publisher.publish.assert_called_once_with('test', 'doc', 'msg')
@@ -6,6 +6,7 @@ from unittest.mock import Mock, patch
 from mash.services.api.utils.jobs import (
     create_job,
     delete_job,
+    get_job_logs,
     validate_last_service,
     validate_create_args,
     validate_deprecate_args,
@@ -175,3 +176,30 @@ def test_validate_job():
 
     with raises(Exception):
         validate_job(job)
+
+
+@patch.object(LocalProxy, '_get_current_object')
+@patch('mash.services.api.utils.jobs.JobLogReader')
+@patch('mash.services.api.utils.jobs.get_job')
+def test_get_job_logs(mock_get_job, mock_reader, mock_get_current_obj):
+    app = Mock()
+    app.config = {'JOB_LOG_STORE_DIRECTORY': '/var/log/mash/job_store'}
+    mock_get_current_obj.return_value = app
+
+    reader = Mock()
+    reader.read.return_value = {'logs': [], 'next': 0}
+    mock_reader.return_value = reader
+    mock_get_job.return_value = {'job_id': '1'}
+
+    assert get_job_logs('1', 'user1', level='ERROR') == {
+        'logs': [], 'next': 0
+    }
+    mock_get_job.assert_called_once_with('1', 'user1')
+    mock_reader.assert_called_once_with('/var/log/mash/job_store')
+    reader.read.assert_called_once_with(
+        '1', start=0, limit=100, level='ERROR', service=None, tail=False
+    )
+
+    # Job not found for user
+    mock_get_job.return_value = {}
+    assert get_job_logs('1', 'user1') is None
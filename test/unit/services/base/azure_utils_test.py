@@ -1,12 +1,16 @@
+import io
 import json
 
 from datetime import date
 from pytest import raises
-from unittest.mock import MagicMock, patch
+from unittest.mock import call, MagicMock, patch
 from collections import namedtuple
 
 from azure.mgmt.storage import StorageManagementClient
-from mash.mash_exceptions import MashAzureUtilsException
+from mash.mash_exceptions import (
+    MashAzureUtilsException,
+    MashUploadException
+)
 from mash.utils.azure import (
     acquire_access_token,
     delete_image,
@@ -25,11 +29,14 @@ from mash.utils.azure import (
     update_cloud_partner_offer_doc,
     wait_on_cloud_partner_operation,
     upload_azure_file,
+    upload_page_blob_from_stream,
     get_blob_service_with_sas_token,
     list_blobs,
     blob_exists,
-    image_exists
+    image_exists,
+    PageBlobUploadBackend
 )
+from mash.utils.resumable_upload import UploadCheckpoint
 
 
 @patch('mash.utils.azure.adal')
@@ -623,6 +630,7 @@ def test_deprecate_image_in_offer_invalid():
     )
 
 
+@patch('mash.utils.azure.os')
 @patch('builtins.open')
 @patch('mash.utils.azure.create_json_file')
 @patch('mash.utils.azure.get_client_from_auth_file')
@@ -635,19 +643,21 @@ def test_upload_azure_file(
     mock_PageBlobService,
     mock_get_client_from_auth_file,
     mock_create_json_file,
-    mock_open
+    mock_open,
+    mock_os
 ):
     creds_handle = MagicMock()
     creds_handle.__enter__.return_value = 'tempfile'
     mock_create_json_file.return_value = creds_handle
 
     lzma_handle = MagicMock()
-    lzma_handle.__enter__.return_value = lzma_handle
+    lzma_handle.__enter__.return_value = io.BytesIO(b'\1' * 1024)
     mock_lzma.LZMAFile.return_value = lzma_handle
 
     open_handle = MagicMock()
     open_handle.__enter__.return_value = open_handle
     mock_open.return_value = open_handle
+    mock_os.path.getsize.return_value = 2048
 
     client = MagicMock()
     mock_get_client_from_auth_file.return_value = client
@@ -708,13 +718,19 @@ def test_upload_azure_file(
     )
     mock_FileType.assert_called_once_with('file.vhdfixed.xz')
     system_image_file_type.is_xz.assert_called_once_with()
-    page_blob_service.create_blob_from_stream.assert_called_once_with(
-        'container', 'name.vhd', lzma_handle, 1024,
-        max_connections=8
+    system_image_file_type.get_size.assert_called_once_with()
+    mock_lzma.LZMAFile.assert_called_once_with('file.vhdfixed.xz', 'rb')
+    page_blob_service.create_blob.assert_called_once_with(
+        'container', 'name.vhd', 1024
+    )
+    page_blob_service.update_page.assert_called_once_with(
+        'container', 'name.vhd', b'\1' * 1024, 0, 1023
     )
 
-    # Test sas token upload
+    # Test sas token upload with the uncompressed size from the obs result
     mock_PageBlobService.reset_mock()
+    page_blob_service.create_blob.reset_mock()
+    lzma_handle.__enter__.return_value = io.BytesIO(b'\1' * 1024)
     upload_azure_file(
         'name.vhd',
         'container',
@@ -723,16 +739,22 @@ def test_upload_azure_file(
         8,
         'storage',
         sas_token='sas_token',
-        is_page_blob=True
+        is_page_blob=True,
+        uncompressed_size=1024
     )
     mock_PageBlobService.assert_called_once_with(
         account_name='storage',
         sas_token='sas_token'
     )
+    assert system_image_file_type.get_size.call_count == 1
+    page_blob_service.create_blob.assert_called_once_with(
+        'container', 'name.vhd', 1024
+    )
 
     # Test image blob create exception
     system_image_file_type.is_xz.return_value = False
-    page_blob_service.create_blob_from_stream.side_effect = Exception
+    page_blob_service.create_blob.reset_mock()
+    page_blob_service.create_blob.side_effect = Exception
 
     # Assert raises exception if create blob fails
     with raises(MashAzureUtilsException):
@@ -748,6 +770,9 @@ def test_upload_azure_file(
             is_page_blob=True
         )
 
+    assert page_blob_service.create_blob.call_count == 5
+    mock_os.path.getsize.assert_called_once_with('file.vhdfixed.xz')
+
     # Assert raises exception if missing required args
     with raises(MashAzureUtilsException):
         upload_azure_file(
@@ -761,6 +786,146 @@ def test_upload_azure_file(
         )
 
 
+@patch('mash.utils.azure.os')
+@patch('builtins.open')
+@patch('mash.utils.azure.BlockBlobService')
+@patch('mash.utils.azure.FileType')
+def test_upload_azure_file_block_blob(
+    mock_FileType,
+    mock_BlockBlobService,
+    mock_open,
+    mock_os
+):
+    open_handle = MagicMock()
+    open_handle.__enter__.return_value = open_handle
+    mock_open.return_value = open_handle
+    mock_os.path.getsize.return_value = 2048
+
+    block_blob_service = MagicMock()
+    mock_BlockBlobService.return_value = block_blob_service
+
+    system_image_file_type = MagicMock()
+    system_image_file_type.is_xz.return_value = True
+    mock_FileType.return_value = system_image_file_type
+
+    upload_azure_file(
+        'name.tar.gz',
+        'container',
+        'file.tar.gz',
+        5,
+        8,
+        'storage',
+        sas_token='sas_token',
+        expand_image=False
+    )
+
+    block_blob_service.create_blob_from_stream.assert_called_once_with(
+        'container', 'name.tar.gz', open_handle, 2048,
+        max_connections=8
+    )
+    assert system_image_file_type.get_size.call_count == 0
+
+    # Whole file is retried for block blobs
+    block_blob_service.create_blob_from_stream.side_effect = Exception
+    with raises(MashAzureUtilsException):
+        upload_azure_file(
+            'name.tar.gz',
+            'container',
+            'file.tar.gz',
+            5,
+            8,
+            'storage',
+            sas_token='sas_token',
+            expand_image=False
+        )
+
+    assert block_blob_service.create_blob_from_stream.call_count == 6
+
+
+def test_upload_page_blob_from_stream():
+    blob_service = MagicMock()
+    page_range = 4 * 1024 * 1024
+    data = b''.join([
+        b'\1' * page_range,
+        b'\0' * page_range,
+        b'\2' * 1024
+    ])
+
+    # First attempt of a range fails and only that range is retried
+    blob_service.update_page.side_effect = [Exception('Timeout'), None, None]
+
+    upload_page_blob_from_stream(
+        blob_service, 'container', 'name.vhd', io.BytesIO(data),
+        len(data), 3, 1
+    )
+
+    blob_service.create_blob.assert_called_once_with(
+        'container', 'name.vhd', len(data)
+    )
+    assert blob_service.update_page.mock_calls == [
+        call('container', 'name.vhd', b'\1' * page_range, 0, page_range - 1),
+        call('container', 'name.vhd', b'\1' * page_range, 0, page_range - 1),
+        call(
+            'container', 'name.vhd', b'\2' * 1024,
+            2 * page_range, 2 * page_range + 1023
+        )
+    ]
+
+    # Range fails after all attempts
+    blob_service.update_page.side_effect = Exception('Timeout')
+    with raises(Exception):
+        upload_page_blob_from_stream(
+            blob_service, 'container', 'name.vhd', io.BytesIO(data),
+            len(data), 3, 1
+        )
+
+    # The partial blob is kept, also if the upload is aborted
+    PageBlobUploadBackend(
+        blob_service, 'container', 'name.vhd', len(data)
+    ).abort('name.vhd')
+    assert blob_service.delete_blob.call_count == 0
+
+    # Invalid size
+    with raises(MashAzureUtilsException):
+        upload_page_blob_from_stream(
+            blob_service, 'container', 'name.vhd', io.BytesIO(b'\1'),
+            1, 3, 1
+        )
+
+    # Stream shorter than image size
+    blob_service.update_page.side_effect = None
+    with raises(MashUploadException):
+        upload_page_blob_from_stream(
+            blob_service, 'container', 'name.vhd', io.BytesIO(b'\1' * 512),
+            1024, 3, 1
+        )
+
+    # In flight uploads are bounded
+    blob_service.update_page.reset_mock()
+    upload_page_blob_from_stream(
+        blob_service, 'container', 'name.vhd',
+        io.BytesIO(b'\1' * page_range * 3), page_range * 3, 3, 1
+    )
+    assert blob_service.update_page.call_count == 3
+
+    # Ranges committed in the checkpoint are skipped
+    blob_service.update_page.reset_mock()
+    blob_service.create_blob.reset_mock()
+    checkpoint = UploadCheckpoint()
+    checkpoint.start('name.vhd')
+    checkpoint.add_part(1, 0)
+    upload_page_blob_from_stream(
+        blob_service, 'container', 'name.vhd',
+        io.BytesIO(b'\1' * page_range * 2), page_range * 2, 3, 1,
+        checkpoint=checkpoint
+    )
+    assert blob_service.create_blob.call_count == 0
+    blob_service.update_page.assert_called_once_with(
+        'container', 'name.vhd', b'\1' * page_range,
+        page_range, 2 * page_range - 1
+    )
+
+
 @patch('mash.utils.azure.BlockBlobService')
 def test_get_blob_service_with_sas_token(mock_block_blob_service):
     blob_service = MagicMock()
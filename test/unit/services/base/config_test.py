@@ -78,6 +78,10 @@ class TestBaseConfig(object):
         password = self.empty_config.get_amqp_pass()
         assert password == 'guest'
 
+    def test_get_publisher_channel_count(self):
+        assert self.config.get_publisher_channel_count() == 2
+        assert self.empty_config.get_publisher_channel_count() == 4
+
     def test_get_smtp_host(self):
         host = self.empty_config.get_smtp_host()
         assert host == 'localhost'
@@ -121,12 +125,34 @@ class TestBaseConfig(object):
         assert self.config.get_log_directory() == '/tmp/log/'
         assert self.empty_config.get_log_directory() == '/var/log/mash/'
 
+    def test_get_log_queue_capacity(self):
+        assert self.config.get_log_queue_capacity() == 5000
+        assert self.empty_config.get_log_queue_capacity() == 0
+
+    def test_get_log_batch_size(self):
+        assert self.config.get_log_batch_size() == 50
+        assert self.empty_config.get_log_batch_size() == 100
+
+    def test_get_log_flush_interval(self):
+        assert self.config.get_log_flush_interval() == 2
+        assert self.empty_config.get_log_flush_interval() == 1
+
+    def test_get_log_queue_block(self):
+        assert self.config.get_log_queue_block()
+        assert not self.empty_config.get_log_queue_block()
+
     @patch.object(BaseConfig, 'get_log_directory')
     def test_get_job_log_file(self, mock_get_log_dir):
         mock_get_log_dir.return_value = '/var/log/mash/'
         assert self.empty_config.get_job_log_file('1234') == \
             '/var/log/mash/jobs/1234.log'
 
+    def test_get_job_log_store_directory(self):
+        assert self.config.get_job_log_store_directory() == \
+            '/tmp/log/job_store'
+        assert self.empty_config.get_job_log_store_directory() == \
+            '/var/log/mash/job_store'
+
     def test_get_credentials_url(self):
         assert self.config.get_credentials_url() == 'http://localhost:5006/'
         assert self.empty_config.get_credentials_url() == \
@@ -159,6 +185,40 @@ class TestBaseConfig(object):
         assert self.config.get_base_thread_pool_count() == 20
         assert self.empty_config.get_base_thread_pool_count() == 10
 
+    def test_get_service_prefetch_count(self):
+        assert self.config.get_service_prefetch_count() == 5
+        assert self.empty_config.get_service_prefetch_count() == 10
+
+    def test_get_listener_prefetch_count(self):
+        assert self.config.get_listener_prefetch_count() == 40
+        assert self.empty_config.get_listener_prefetch_count() is None
+
+    def test_get_service_instance_count(self):
+        assert self.config.get_service_instance_count('upload') == 3
+        assert self.config.get_service_instance_count('test') == 1
+        assert self.empty_config.get_service_instance_count('upload') == 1
+
+    def test_get_service_instance_index(self):
+        assert self.config.get_service_instance_index('upload') == 2
+        assert self.empty_config.get_service_instance_index('upload') == 0
+
+    def test_get_job_credentials_ttl(self):
+        assert self.config.get_job_credentials_ttl() == 30
+        assert self.empty_config.get_job_credentials_ttl() == 60
+
+    def test_get_region_max_workers(self):
+        assert self.config.get_region_max_workers('publish') == 4
+        assert self.empty_config.get_region_max_workers('publish') == 8
+        assert self.config.get_region_max_workers('create') == 2
+
+    def test_get_max_concurrent_regions(self):
+        assert self.config.get_max_concurrent_regions('create') == 4
+        assert self.empty_config.get_max_concurrent_regions('create') == 8
+
+    def test_get_continue_on_region_error(self):
+        assert self.config.get_continue_on_region_error('publish')
+        assert not self.empty_config.get_continue_on_region_error('publish')
+
     def test_get_publish_thread_pool_count(self):
         assert self.config.get_publish_thread_pool_count() == 60
         assert self.empty_config.get_publish_thread_pool_count() == 50
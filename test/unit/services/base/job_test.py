@@ -1,7 +1,10 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event
 from pytest import raises
 from unittest.mock import Mock, patch
 
-from mash.services.mash_job import MashJob
+from mash.services import mash_job
+from mash.services.mash_job import CredentialsClient, MashJob
 from mash.mash_exceptions import MashJobException
 
 
@@ -16,6 +19,8 @@ class TestMashJob(object):
         }
         self.config = Mock()
         self.config.get_credentials_url.return_value = 'http://localhost:5000'
+        self.config.get_job_credentials_ttl.return_value = 0
+        mash_job._credentials_clients.clear()
 
     def test_missing_key(self):
         del self.job_config['cloud']
@@ -52,7 +57,10 @@ class TestMashJob(object):
                 'cloud': 'ec2',
                 'cloud_accounts': ['acnt1'],
                 'requesting_user': 'user1'
-            }
+            },
+            session=mash_job._credentials_clients[
+                'http://localhost:5000'
+            ]._get_session()
         )
 
         # Test credentials already exist
@@ -65,12 +73,156 @@ class TestMashJob(object):
         with raises(MashJobException):
             job.request_credentials(['acnt1'])
 
+    @patch('mash.services.mash_job.handle_request')
+    def test_credentials_client_cache(self, mock_handle_request):
+        client = CredentialsClient('http://localhost:5000', ttl=30)
+
+        response = Mock()
+        response.json.return_value = {'acnt1': {'super': 'secret'}}
+        mock_handle_request.return_value = response
+
+        assert client.get_credentials(['acnt1'], 'ec2', 'user1') == {
+            'acnt1': {'super': 'secret'}
+        }
+        assert b'secret' not in client.cache[('user1', 'ec2', 'acnt1')][1]
+
+        # Only the account not cached yet is requested
+        response.json.return_value = {'acnt2': {'super': 'secret2'}}
+        credentials = client.get_credentials(
+            ['acnt1', 'acnt2'], 'ec2', 'user1'
+        )
+        assert credentials['acnt2']['super'] == 'secret2'
+        assert mock_handle_request.call_count == 2
+        assert mock_handle_request.call_args_list[1][1]['job_data'][
+            'cloud_accounts'
+        ] == ['acnt2']
+
+        # Missing account in response
+        response.json.return_value = {}
+        with raises(Exception):
+            client.get_credentials(['acnt3'], 'ec2', 'user1')
+
+        assert client.pending == {}
+
+    @patch('mash.services.mash_job.time')
+    @patch('mash.services.mash_job.handle_request')
+    def test_credentials_client_cache_expiry(
+        self, mock_handle_request, mock_time
+    ):
+        client = CredentialsClient('http://localhost:5000', max_size=2)
+        assert client.ttl == 60
+        mock_time.monotonic.return_value = 0
+
+        def handle_request(*args, **kwargs):
+            response = Mock()
+            response.json.return_value = {
+                account: {'super': account}
+                for account in kwargs['job_data']['cloud_accounts']
+            }
+            return response
+
+        mock_handle_request.side_effect = handle_request
+
+        client.get_credentials(['acnt1', 'acnt2'], 'ec2', 'user1')
+        client.get_credentials(['acnt1'], 'ec2', 'user1')
+        assert mock_handle_request.call_count == 1
+
+        # The least recently used account is dropped
+        client.get_credentials(['acnt3'], 'ec2', 'user1')
+        assert list(client.cache) == [
+            ('user1', 'ec2', 'acnt1'),
+            ('user1', 'ec2', 'acnt3')
+        ]
+
+        # Expired credentials are requested again
+        mock_time.monotonic.return_value = 60
+        assert client.get_credentials(['acnt1'], 'ec2', 'user1') == {
+            'acnt1': {'super': 'acnt1'}
+        }
+        assert mock_handle_request.call_count == 3
+
+    @patch('mash.services.mash_job.handle_request')
+    def test_credentials_client_cache_error(self, mock_handle_request):
+        client = CredentialsClient('http://localhost:5000')
+        response = Mock()
+        response.json.return_value = {
+            'acnt1': {'super': 'secret'},
+            'acnt2': {'super': 'secret'}
+        }
+        mock_handle_request.return_value = response
+
+        # A waiting job gets an error instead of waiting forever
+        waiting = Future()
+        client.pending[('user1', 'ec2', 'acnt2')] = waiting
+
+        with patch.object(
+            client, '_set_cached', side_effect=Exception('Broken cache')
+        ):
+            with raises(Exception):
+                client._request_credentials(
+                    ['acnt1', 'acnt2'], 'ec2', 'user1'
+                )
+
+        with raises(MashJobException):
+            waiting.result(0)
+
+        assert client.pending == {}
+
+    def test_credentials_client_session(self):
+        client = CredentialsClient('http://localhost:5000')
+        session = client._get_session()
+        assert client._get_session() is session
+
+        # Every thread uses its own session
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(client._get_session).result() is not \
+                session
+
+    @patch('mash.services.mash_job.handle_request')
+    def test_credentials_client_single_flight(self, mock_handle_request):
+        client = CredentialsClient('http://localhost:5000', ttl=0)
+
+        started = Event()
+        waiting = Event()
+        response = Mock()
+        response.json.return_value = {'acnt1': {'super': 'secret'}}
+
+        class WatchedFuture(Future):
+            def result(self, timeout=None):
+                waiting.set()
+                return super(WatchedFuture, self).result(timeout)
+
+        def handle_request(*args, **kwargs):
+            started.set()
+            # Second request waits on the pending account
+            waiting.wait(5)
+            return response
+
+        mock_handle_request.side_effect = handle_request
+
+        with patch('mash.services.mash_job.Future', WatchedFuture):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                first = executor.submit(
+                    client.get_credentials, ['acnt1'], 'ec2', 'user1'
+                )
+                started.wait(5)
+                second = executor.submit(
+                    client.get_credentials, ['acnt1'], 'ec2', 'user1'
+                )
+
+        assert first.result() == second.result()
+        assert mock_handle_request.call_count == 1
+
     def test_run_job(self):
         job = MashJob(self.job_config, self.config)
 
         with raises(NotImplementedError):
             job.run_job()
 
+    def test_cleanup(self):
+        job = MashJob(self.job_config, self.config)
+        assert job.cleanup() is None
+
     def test_job_get_job_id(self):
         job = MashJob(self.job_config, self.config)
         metadata = job.get_job_id()
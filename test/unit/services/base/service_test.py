@@ -2,6 +2,8 @@ from unittest.mock import patch
 from unittest.mock import Mock
 from pytest import raises
 
+from amqpstorm import AMQPConnectionError
+
 from mash.services.mash_service import MashService
 
 from mash.mash_exceptions import MashRabbitConnectionException
@@ -27,6 +29,7 @@ class TestBaseService(object):
         mock_connection.return_value = self.connection
 
         config = Mock()
+        config.get_log_queue_capacity.return_value = 0
         config.get_service_names.return_value = [
             'obs', 'upload', 'create', 'raw_image_upload', 'test',
             'replicate', 'publish', 'deprecate'
@@ -50,10 +53,93 @@ class TestBaseService(object):
             callback=callback, queue='obs.service'
         )
 
-    def test_close_connection(self):
+    def test_consume_queue_dedicated_channel(self):
+        callback = Mock()
+        channel = Mock()
+        self.service.consume_queue(callback, 'service', 'obs', channel=channel)
+        channel.basic.consume.assert_called_once_with(
+            callback=callback, queue='obs.service'
+        )
+        assert self.channel.basic.consume.call_count == 0
+
+    @patch('mash.services.mash_service.QueueConsumer')
+    def test_start_consumer(self, mock_queue_consumer):
+        callback = Mock()
+        channel = Mock()
+        consumer = Mock()
+        mock_queue_consumer.return_value = consumer
+        self.connection.channel.return_value = channel
+
+        result = self.service.start_consumer(
+            callback, 'listener', 'obs', prefetch_count=20
+        )
+
+        assert result == consumer
+        assert self.service.consumers == [consumer]
+        channel.basic.qos.assert_called_once_with(prefetch_count=20)
+        channel.basic.consume.assert_called_once_with(
+            callback=callback, queue='obs.listener'
+        )
+        mock_queue_consumer.assert_called_once_with(
+            channel, name='obs.listener'
+        )
+        consumer.start.assert_called_once_with()
+
+    @patch('mash.services.mash_service.QueueConsumer')
+    def test_start_consumer_no_prefetch(self, mock_queue_consumer):
+        channel = Mock()
+        self.connection.channel.return_value = channel
+
+        self.service.start_consumer(Mock(), 'service', 'obs')
+        assert channel.basic.qos.call_count == 0
+
+    def test_wait_for_consumers(self):
+        consumer1 = Mock(error=None)
+        consumer1.is_alive.side_effect = [True, False]
+        consumer2 = Mock(error=None)
+        consumer2.is_alive.return_value = True
+        self.service.consumers = [consumer1, consumer2]
+
+        self.service.wait_for_consumers(timeout=0.1)
+        consumer1.join.assert_called_once_with(0.1)
+
+    def test_wait_for_consumers_error(self):
+        consumer = Mock(error=AMQPConnectionError('Connection dropped!'))
+        consumer.is_alive.return_value = False
+        self.service.consumers = [consumer]
+
+        with raises(AMQPConnectionError):
+            self.service.wait_for_consumers()
+
+    def test_ack_message(self):
+        message = Mock()
+        self.service.ack_message(message)
+        message.ack.assert_called_once_with()
+
+    def test_nack_message(self):
+        message = Mock()
+        self.service.nack_message(message)
+        message.nack.assert_called_once_with(requeue=True)
+
+    def test_publish(self):
+        self.service.publisher = Mock()
+        self.service._publish('obs', 'listener_msg', 'message')
+        self.service.publisher.publish.assert_called_once_with(
+            'obs', 'listener_msg', 'message'
+        )
+
+    @patch('mash.services.mash_service.release_publisher')
+    def test_close_connection(self, mock_release_publisher):
+        consumer = Mock()
+        self.service.consumers = [consumer]
+        self.service.publisher = Mock()
         self.connection.close.return_value = None
         self.channel.close.return_value = None
         self.service.close_connection()
+        consumer.stop.assert_called_once_with()
+        mock_release_publisher.assert_called_once_with(
+            self.service.publisher
+        )
         self.connection.close.assert_called_once_with()
         self.channel.close.assert_called_once_with()
 
@@ -8,3 +8,7 @@ class TestTestConfig(object):
 
     def test_get_max_image_age(self):
         assert self.empty_config.get_max_image_age() == 90
+
+    def test_get_max_image_cache_size(self):
+        assert self.empty_config.get_max_image_cache_size() == 0
+        assert self.config.get_max_image_cache_size() == 1073741824
@@ -59,18 +59,23 @@ class TestCleanupService(object):
         )
         scheduler.start.assert_called_once()
 
+    @patch('mash.services.cleanup.service.ImageCache')
     @patch('shutil.rmtree')
     @patch('os.scandir')
     @patch('os.path.isdir')
     def test_cleanup_purge_images(
-        self, mock_isdir, mock_scandir, mock_rmtree
+        self, mock_isdir, mock_scandir, mock_rmtree, mock_image_cache
     ):
         entry = Mock()
         entry.is_dir.return_value = True
         entry.name = 'foo'
         entry.path = '/images/foo'
+        cache = Mock()
+        cache.name = 'image_cache'
         mock_isdir.return_value = True
-        mock_scandir.return_value.__enter__.return_value = [entry]
+        mock_scandir.return_value.__enter__.return_value = [entry, cache]
+        image_cache = Mock()
+        mock_image_cache.return_value = image_cache
         mtime = Mock()
         mtime.st_mtime = 1
         entry.stat.return_value = mtime
@@ -78,10 +83,17 @@ class TestCleanupService(object):
         self.cleanup.config = self.config
         self.config.get_download_directory.return_value = '/images'
         self.config.get_max_image_age.return_value = 42
+        self.config.get_max_image_cache_size.return_value = 1024
 
         self.cleanup._purge_images()
 
         mock_rmtree.assert_called_once_with('/images/foo')
+        mock_image_cache.assert_called_once_with('/images')
+        image_cache.purge.assert_called_once_with(
+            max_size=1024,
+            max_age=42 * 86400,
+            log_callback=self.cleanup.log
+        )
 
         mock_isdir.return_value = False
         self.cleanup._purge_images()
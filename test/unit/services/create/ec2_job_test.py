@@ -5,7 +5,8 @@ from test.unit.test_helper import (
     patch_open, context_manager
 )
 
-from mash.services.create.ec2_job import EC2CreateJob
+from mash.services.create import ec2_job
+from mash.services.create.ec2_job import EC2CreateJob, get_region_slots
 from mash.mash_exceptions import MashUploadException
 from mash.services.base_config import BaseConfig
 
@@ -70,6 +71,65 @@ class TestAmazonCreateJob(object):
         with raises(MashUploadException):
             EC2CreateJob(job_doc, self.config)
 
+    def test_get_region_slots(self):
+        with patch.object(ec2_job, '_region_slots', None):
+            slots = get_region_slots(2)
+            assert slots.acquire(blocking=False)
+            assert slots.acquire(blocking=False)
+            assert not slots.acquire(blocking=False)
+
+            # A changed count applies to the shared semaphore
+            assert get_region_slots(3) is slots
+            assert slots.acquire(blocking=False)
+            assert not slots.acquire(blocking=False)
+
+    @patch.object(EC2CreateJob, '_create_region_image')
+    def test_create_cancels_pending_regions(self, mock_create_region_image):
+        self.config.get_region_max_workers = Mock(return_value=1)
+        self.job.target_regions['us-east-2'] = dict(
+            self.job.target_regions['us-east-1']
+        )
+        mock_create_region_image.side_effect = Exception('Failed!')
+
+        self.job.run_job()
+
+        assert mock_create_region_image.call_count == 1
+        assert self.job.status == 'failed'
+        assert self.job.status_msg['errors'] == [
+            'Image creation in account test failed with: Failed!',
+            'Image creation in region us-east-2 cancelled after '
+            'failure in region us-east-1.'
+        ]
+
+    @patch('mash.services.create.ec2_job.image_exists')
+    @patch('mash.services.create.ec2_job.EC2Setup')
+    @patch('mash.services.create.ec2_job.get_client')
+    @patch('mash.services.create.ec2_job.generate_name')
+    @patch('mash.services.create.ec2_job.NamedTemporaryFile')
+    @patch_open
+    def test_clean_up_region_error(
+        self, mock_open, mock_NamedTemporaryFile, mock_generate_name,
+        mock_get_client, mock_ec2_setup, mock_image_exists
+    ):
+        mock_image_exists.return_value = False
+        mock_open.return_value = context_manager().context_manager_mock
+
+        ec2_client = Mock()
+        ec2_client.create_key_pair.return_value = {'KeyMaterial': 'pkey'}
+        ec2_client.delete_key_pair.side_effect = Exception('Gone!')
+        mock_get_client.return_value = ec2_client
+        mock_ec2_setup.side_effect = Exception('No setup!')
+
+        self.job.run_job()
+
+        self.job._log_callback.error.assert_called_once_with(
+            'Image creation in account test failed with: No setup!'
+        )
+        self.job._log_callback.warning.assert_called_once_with(
+            'Failed to cleanup temporary resources in region us-east-1.'
+            ' Gone!'
+        )
+
     def test_missing_date_format_exception(self):
         self.job.status_msg['build_time'] = 'unknown'
 
@@ -127,6 +187,11 @@ class TestAmazonCreateJob(object):
         mock_get_client.assert_called_once_with(
             'ec2', 'access-key', 'secret-access-key', 'us-east-1'
         )
+        mock_image_exists.assert_called_once_with(
+            ec2_client,
+            'name v20200925',
+            ('access-key', 'us-east-1')
+        )
         mock_EC2ImageUploader.assert_called_once_with(
             access_key='access-key',
             backing_store='gp3',
@@ -161,9 +226,16 @@ class TestAmazonCreateJob(object):
         ec2_upload.create_image.assert_called_once_with('file')
         ec2_setup.clean_up.assert_called_once_with()
 
-        # Image create error
-        ec2_upload.create_image.side_effect = ['ami_id', Exception('Failed!')]
+        # Image create error in one of the regions created in parallel
+        failed_client = Mock()
+        failed_client.create_key_pair.side_effect = Exception('Failed!')
+
+        def get_client(service, access_key, secret_key, region):
+            return failed_client if region == 'us-east-2' else ec2_client
+
+        mock_get_client.side_effect = get_client
         mock_cleanup_image.side_effect = Exception
+        ec2_setup.clean_up.reset_mock()
         self.job.target_regions['us-east-2'] = {
             'account': 'test',
             'helper_image': 'ami-bc5b48d0',
@@ -177,6 +249,11 @@ class TestAmazonCreateJob(object):
         self.job._log_callback.error.assert_called_once_with(
             'Image creation in account test failed with: Failed!'
         )
+        assert self.job.status_msg['source_regions'] == {
+            'us-east-1': 'ami_id',
+            'us-east-2': None
+        }
+        assert self.job.status == 'failed'
         mock_cleanup_image.assert_called_once_with(
             'access-key',
             'secret-access-key',
@@ -184,6 +261,10 @@ class TestAmazonCreateJob(object):
             'us-east-1',
             image_id='ami_id'
         )
+        # Only the region that got a setup cleans it up
+        ec2_setup.clean_up.assert_called_once_with()
+        assert failed_client.delete_key_pair.call_count == 0
+        mock_get_client.side_effect = None
 
         # Image exists and not force replace image
         mock_image_exists.return_value = True
@@ -0,0 +1,67 @@
+import os
+import pytest
+
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from mash.services.credentials.app import create_app
+from mash.services.credentials.commands import credentials_cli
+from mash.services.credentials.flask_config import Config
+from mash.services.credentials.stores import (
+    FileCredentialsStore,
+    SQLiteCredentialsStore
+)
+
+
+@pytest.fixture(scope='module')
+def test_app():
+    flask_config = Config(
+        config_file='test/data/mash_config.yaml',
+        test=True
+    )
+    app = create_app(flask_config)
+
+    ctx = app.app_context()
+    ctx.push()
+
+    yield app
+    ctx.pop()
+
+
+def test_credentials_migrate(test_app):
+    runner = test_app.test_cli_runner()
+
+    with TemporaryDirectory() as test_dir:
+        creds_dir = os.path.join(test_dir, 'creds')
+        database_file = os.path.join(test_dir, 'credentials.db')
+
+        source = FileCredentialsStore(creds_dir)
+        source.write('user1', 'ec2', 'acnt1', 'token1')
+        source.write('user2', 'gce', 'acnt2', 'token2')
+
+        config = {
+            'CREDS_DIR': creds_dir,
+            'CREDS_DATABASE_FILE': database_file
+        }
+
+        with patch.dict(test_app.config, config):
+            result = runner.invoke(credentials_cli, ['migrate'])
+
+        assert result.exit_code == 0
+        assert 'Migrated credentials of 2 account(s).' in result.output
+
+        target = SQLiteCredentialsStore(database_file)
+        assert sorted(target.read_records()) == [
+            ('user1', 'ec2', 'acnt1', 'token1'),
+            ('user2', 'gce', 'acnt2', 'token2')
+        ]
+        target.close()
+
+        # Failure
+        config['CREDS_DATABASE_FILE'] = test_dir
+
+        with patch.dict(test_app.config, config):
+            result = runner.invoke(credentials_cli, ['migrate'])
+
+        assert result.exit_code == 1
+        assert 'Error: Unable to migrate credentials:' in result.output
@@ -6,6 +6,9 @@ class TestCredentialsConfig(object):
         self.config = CredentialsConfig(
             'test/data/mash_config.yaml'
         )
+        self.empty_config = CredentialsConfig(
+            'test/data/empty_mash_config.yaml'
+        )
 
     def test_config_data(self):
         assert self.config.config_data
@@ -17,3 +20,16 @@ class TestCredentialsConfig(object):
     def test_get_credentials_dir(self):
         assert self.config.get_credentials_dir() == \
             '/var/lib/mash/credentials/'
+
+    def test_get_credentials_cache(self):
+        assert self.config.get_credentials_cache_ttl() == 30
+        assert self.config.get_credentials_cache_size() == 1024
+        assert self.empty_config.get_credentials_cache_ttl() == 0
+
+    def test_get_credentials_rotation_workers(self):
+        assert self.config.get_credentials_rotation_workers() == 8
+
+    def test_get_credentials_storage(self):
+        assert self.config.get_credentials_storage_backend() == 'file'
+        assert self.config.get_credentials_database_file() == \
+            '/var/lib/mash/credentials.db'
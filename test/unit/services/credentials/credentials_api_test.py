@@ -160,3 +160,17 @@ def test_delete_user(mock_app, test_client):
     assert response.status_code == 400
     assert response.data == \
         b'{"msg":"Unable to remove all credentials for user: Permission denied"}\n'
+
+
+@patch('mash.services.credentials.routes.credentials.current_app')
+def test_get_rotation_status(mock_app, test_client):
+    mock_app.credentials_datastore.get_rotation_status.return_value = {
+        'state': 'running', 'total': 10, 'rotated': 4, 'failed': 0
+    }
+
+    response = test_client.get('credentials/rotation')
+
+    assert response.status_code == 200
+    assert json.loads(response.data.decode()) == {
+        'state': 'running', 'total': 10, 'rotated': 4, 'failed': 0
+    }
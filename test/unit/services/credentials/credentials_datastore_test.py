@@ -1,13 +1,22 @@
 import io
 import os
 import pytest
+import threading
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from cryptography.fernet import Fernet
 from tempfile import TemporaryDirectory
 from unittest.mock import MagicMock, Mock, patch
 
 from mash.mash_exceptions import MashCredentialsDatastoreException
-from mash.services.credentials.datastore import CredentialsDatastore
+from mash.services.credentials.datastore import (
+    CredentialsCache,
+    CredentialsDatastore
+)
+from mash.services.credentials.stores import (
+    FileCredentialsStore,
+    SQLiteCredentialsStore
+)
 
 
 class TestCredentialsDatastore(object):
@@ -31,7 +40,7 @@ class TestCredentialsDatastore(object):
             file_handle = mock_open.return_value.__enter__.return_value
             assert file_handle.write.call_count == 1
 
-    @patch('mash.services.credentials.datastore.os')
+    @patch('mash.services.credentials.stores.os')
     def test_datastore_save_credentials(self, mock_os):
         mock_os.path.isdir.return_value = False
 
@@ -48,7 +57,7 @@ class TestCredentialsDatastore(object):
 
             assert file_handle.write.call_count == 1
 
-    @patch('mash.services.credentials.datastore.os')
+    @patch('mash.services.credentials.stores.os')
     def test_datastore_delete_credentials(self, mock_os):
         mock_os.path.join.return_value = 'creds_file.path'
 
@@ -70,12 +79,109 @@ class TestCredentialsDatastore(object):
     @patch.object(CredentialsDatastore, '_get_decrypted_credentials')
     def test_retrieve_credentials(self, mock_get_dec_creds):
         creds = {'super': 'secret'}
-        mock_get_dec_creds.return_value = creds
+        mock_get_dec_creds.return_value = {'test123': creds}
 
         value = self.datastore.retrieve_credentials(
             ['test123'], 'gce', 'user1'
         )
         assert creds == value['test123']
+        mock_get_dec_creds.assert_called_once_with(
+            ['test123'], 'gce', 'user1'
+        )
+
+    @patch.object(CredentialsDatastore, '_get_decrypted_credentials')
+    def test_retrieve_credentials_cached(self, mock_get_dec_creds):
+        self.datastore.credentials_cache = CredentialsCache(ttl=30)
+        mock_get_dec_creds.return_value = {'test123': {'super': 'secret'}}
+
+        value = self.datastore.retrieve_credentials(
+            ['test123'], 'gce', 'user1'
+        )
+        value['test123']['super'] = 'changed'
+
+        value = self.datastore.retrieve_credentials(
+            ['test123'], 'gce', 'user1'
+        )
+        assert value['test123'] == {'super': 'secret'}
+        assert mock_get_dec_creds.call_count == 1
+
+        with patch.object(self.datastore, '_remove_credentials'):
+            self.datastore.delete_credentials('user1', 'test123', 'gce')
+
+        self.datastore.retrieve_credentials(['test123'], 'gce', 'user1')
+        assert mock_get_dec_creds.call_count == 2
+
+    @patch.object(CredentialsDatastore, '_store_encrypted_credentials')
+    @patch.object(CredentialsDatastore, '_get_decrypted_credentials')
+    def test_retrieve_credentials_concurrent_save(
+        self, mock_get_dec_creds, mock_store_credentials
+    ):
+        self.datastore.credentials_cache = CredentialsCache(ttl=30)
+
+        def get_decrypted_credentials(accounts, cloud, user):
+            # The credentials are saved after the old ones were read
+            self.datastore.save_credentials(
+                'gce', 'test123', 'user1', {'super': 'new'}
+            )
+            return {'test123': {'super': 'old'}}
+
+        mock_get_dec_creds.side_effect = get_decrypted_credentials
+
+        self.datastore.retrieve_credentials(['test123'], 'gce', 'user1')
+
+        # The stale credentials are not cached
+        assert self.datastore.credentials_cache.get(
+            ('user1', 'gce', 'test123')
+        ) is None
+        assert mock_store_credentials.call_count == 1
+
+    @patch('mash.services.credentials.datastore.time')
+    def test_credentials_cache(self, mock_time):
+        mock_time.monotonic.return_value = 0
+        cache = CredentialsCache(ttl=30, max_size=2)
+
+        cache.set(('user1', 'ec2', 'acnt1'), {'super': 'secret'})
+        cache.set(('user1', 'ec2', 'acnt2'), {'super': 'secret'})
+        cache.set(('user2', 'ec2', 'acnt1'), {'super': 'secret'})
+        assert cache.get(('user1', 'ec2', 'acnt1')) is None
+        assert cache.get(('user1', 'ec2', 'acnt2')) == {'super': 'secret'}
+
+        cache.invalidate('user1')
+        assert cache.get(('user1', 'ec2', 'acnt2')) is None
+
+        mock_time.monotonic.return_value = 30
+        assert cache.get(('user2', 'ec2', 'acnt1')) is None
+        assert cache.entries == {}
+
+        # Invalidate one cloud account
+        cache.set(('user1', 'ec2', 'acnt2'), {'super': 'secret'})
+        cache.set(('user1', 'gce', 'acnt3'), {'super': 'secret'})
+        cache.invalidate('user1', 'ec2', 'acnt2')
+        assert cache.get(('user1', 'ec2', 'acnt2')) is None
+        assert cache.get(('user1', 'gce', 'acnt3')) == {'super': 'secret'}
+
+        cache.invalidate('user1')
+        assert cache.get(('user1', 'gce', 'acnt3')) is None
+
+        # Credentials read before an invalidation are not cached
+        generation = cache.get_generation()
+        cache.invalidate('user1')
+        cache.set(('user1', 'ec2', 'acnt1'), {'super': 'old'}, generation)
+        assert cache.get(('user1', 'ec2', 'acnt1')) is None
+        cache.set(
+            ('user1', 'ec2', 'acnt1'),
+            {'super': 'new'},
+            cache.get_generation()
+        )
+        assert cache.get(('user1', 'ec2', 'acnt1')) == {'super': 'new'}
+
+        cache.clear()
+        assert cache.entries == {}
+
+        # Disabled cache
+        cache = CredentialsCache()
+        cache.set(('user1', 'ec2', 'acnt1'), {'super': 'secret'})
+        assert cache.get(('user1', 'ec2', 'acnt1')) is None
 
     def test_encrypt_credentials(self):
         # Test creds as bytes encode error is caught and passed
@@ -104,6 +210,23 @@ class TestCredentialsDatastore(object):
         )
 
     def test_clean_old_keys(self):
+        with TemporaryDirectory() as test_dir:
+            keys_file = os.path.join(test_dir, 'encryption_keys')
+
+            with open(keys_file, 'w') as f:
+                f.write('new-key\nold-key\n')
+
+            self.datastore.encryption_keys_file = keys_file
+            self.datastore._fernet = Mock()
+            self.datastore._clean_old_keys()
+
+            with open(keys_file) as f:
+                assert f.read() == 'new-key\n'
+
+            assert self.datastore._fernet is None
+
+        self.datastore.encryption_keys_file = 'test/data/encryption_keys'
+
         with patch('builtins.open', create=True) as mock_open:
             mock_open.return_value = MagicMock(spec=io.IOBase)
             file_handle = mock_open.return_value.__enter__.return_value
@@ -124,6 +247,7 @@ class TestCredentialsDatastore(object):
 
             self.datastore.encryption_keys_file = keys_file
             self.datastore.credentials_directory = creds_dir
+            self.datastore.store = FileCredentialsStore(creds_dir)
 
             os.makedirs(creds_dir)
 
@@ -162,7 +286,204 @@ class TestCredentialsDatastore(object):
                 )
             )
 
-    @patch('mash.services.credentials.datastore.os')
+    def test_rotate_key_deleted_account(self):
+        with TemporaryDirectory() as test_dir:
+            creds_dir = os.path.join(test_dir, 'creds')
+            keys_file = os.path.join(test_dir, 'keys.file')
+
+            self.datastore.encryption_keys_file = keys_file
+            self.datastore.credentials_directory = creds_dir
+            self.datastore.store = FileCredentialsStore(creds_dir)
+
+            with open(keys_file, 'w') as f:
+                f.write(Fernet.generate_key().decode())
+
+            self.datastore.save_credentials(
+                'ec2', 'acnt1', 'user1', {'super': 'secret'}
+            )
+
+            # The account is deleted once the records are listed
+            list_records = self.datastore.store.list_records
+
+            def deleted_records():
+                records = list_records()
+                self.datastore.delete_credentials('user1', 'acnt1', 'ec2')
+                return records
+
+            self.datastore.store.list_records = deleted_records
+            self.datastore._rotate_key()
+
+            assert self.datastore.get_rotation_status()['state'] == \
+                'finished'
+            assert not os.path.exists(keys_file + '.rotation')
+            assert not self.datastore.store.exists('user1', 'ec2', 'acnt1')
+
+    def test_rotate_key_resume(self):
+        key = 'XxgkVrKyG9gZqdvbycZgaSZF1Ro0Vr8DBMXjBuc4uRo='
+        credentials = (
+            'gAAAAABbFapolPqpWrLf5rpEj2xyFLkXlwclSQH-_t3tuJnACyRvOxLdw9qR'
+            '3kKMBlz3XIrGH9GJdiA9IJl9y_iQLeCfIAM_4ckDMcYHMLe0WWNnsn4zj9E='
+        )
+
+        with TemporaryDirectory() as test_dir:
+            creds_dir = os.path.join(test_dir, 'creds')
+            keys_file = os.path.join(test_dir, 'keys.file')
+
+            self.datastore.encryption_keys_file = keys_file
+            self.datastore.credentials_directory = creds_dir
+            self.datastore.store = FileCredentialsStore(creds_dir)
+
+            os.makedirs(os.path.join(creds_dir, 'user1', 'ec2'))
+
+            with open(keys_file, 'w') as f:
+                f.write(key)
+
+            for account in ('acnt1', 'acnt2'):
+                path = os.path.join(creds_dir, 'user1', 'ec2', account)
+                with open(path, 'w') as cred_file:
+                    cred_file.write(credentials)
+
+            # acnt1 was rotated before the rotation was interrupted
+            with open(keys_file + '.rotation', 'w') as journal:
+                journal.write('user1/ec2/acnt1\n')
+
+            with patch.object(
+                self.datastore.store, '_rotate_file',
+                wraps=self.datastore.store._rotate_file
+            ) as mock_rotate_file:
+                self.datastore._rotate_key()
+
+            # No new key is added when resuming
+            with open(keys_file) as f:
+                assert f.read() == key
+
+            mock_rotate_file.assert_called_once()
+            assert mock_rotate_file.call_args[0][0] == (
+                'user1', 'ec2', 'acnt2'
+            )
+            assert not os.path.exists(keys_file + '.rotation')
+
+            status = self.datastore.get_rotation_status()
+            assert status['state'] == 'finished'
+            assert status['total'] == 2
+            assert status['rotated'] == 2
+            assert status['failed'] == 0
+
+            assert self.datastore._decrypt_credentials(
+                open(os.path.join(creds_dir, 'user1', 'ec2', 'acnt2')).read()
+            ) == 'some fake credentials'
+
+    @patch('mash.services.credentials.datastore.BackgroundScheduler')
+    def test_rotate_key_resume_on_startup(self, mock_scheduler):
+        scheduler = MagicMock(BackgroundScheduler)
+        mock_scheduler.return_value = scheduler
+
+        with TemporaryDirectory() as test_dir:
+            keys_file = os.path.join(test_dir, 'keys.file')
+
+            with open(keys_file, 'w') as f:
+                f.write(Fernet.generate_key().decode())
+
+            # The rotation was interrupted by a restart
+            open(keys_file + '.rotation', 'w').close()
+
+            datastore = CredentialsDatastore(
+                os.path.join(test_dir, 'creds'),
+                keys_file,
+                self.log_callback
+            )
+
+        assert scheduler.add_job.call_count == 2
+        scheduler.add_job.assert_called_with(datastore._rotate_key)
+
+    def test_rotate_key_new_key(self):
+        credentials = (
+            'gAAAAABbFapolPqpWrLf5rpEj2xyFLkXlwclSQH-_t3tuJnACyRvOxLdw9qR'
+            '3kKMBlz3XIrGH9GJdiA9IJl9y_iQLeCfIAM_4ckDMcYHMLe0WWNnsn4zj9E='
+        )
+
+        with TemporaryDirectory() as test_dir:
+            creds_dir = os.path.join(test_dir, 'creds')
+            keys_file = os.path.join(test_dir, 'keys.file')
+            path = os.path.join(creds_dir, 'acnt1')
+
+            self.datastore.encryption_keys_file = keys_file
+            self.datastore.credentials_directory = creds_dir
+            self.datastore.store = FileCredentialsStore(creds_dir)
+
+            os.makedirs(creds_dir)
+
+            with open(keys_file, 'w') as f:
+                f.write('XxgkVrKyG9gZqdvbycZgaSZF1Ro0Vr8DBMXjBuc4uRo=')
+
+            with open(path, 'w') as cred_file:
+                cred_file.write(credentials)
+
+            # Left over from an interrupted write
+            open(os.path.join(creds_dir, '.acnt1abc.tmp'), 'a').close()
+
+            self.datastore._rotate_key()
+
+            with open(keys_file) as f:
+                new_key = f.readline().strip()
+
+            with open(path) as cred_file:
+                rotated = cred_file.read()
+
+            assert rotated != credentials
+            assert Fernet(new_key).decrypt(rotated.encode()) == \
+                b'some fake credentials'
+            assert sorted(os.listdir(creds_dir)) == ['.acnt1abc.tmp', 'acnt1']
+
+    def test_rotate_key_save_while_rotating(self):
+        with TemporaryDirectory() as test_dir:
+            keys_file = os.path.join(test_dir, 'keys.file')
+
+            with open(keys_file, 'w') as f:
+                f.write(Fernet.generate_key().decode())
+
+            store = SQLiteCredentialsStore(
+                os.path.join(test_dir, 'credentials.db')
+            )
+            self.datastore.encryption_keys_file = keys_file
+            self.datastore.credentials_directory = test_dir
+            self.datastore.store = store
+
+            # The save is encrypted with the previous key and stored
+            # once the rotation started.
+            writing = threading.Event()
+            proceed = threading.Event()
+            write = store.write
+
+            def delayed_write(*args):
+                writing.set()
+                proceed.wait()
+                write(*args)
+
+            store.write = delayed_write
+
+            save = threading.Thread(
+                target=self.datastore.save_credentials,
+                args=('ec2', 'acnt1', 'user1', {'super': 'secret'})
+            )
+            save.start()
+            writing.wait()
+
+            rotation = threading.Thread(target=self.datastore._rotate_key)
+            rotation.start()
+            rotation.join(0.1)
+            proceed.set()
+            save.join()
+            rotation.join()
+
+            self.datastore._clean_old_keys()
+
+            assert self.datastore.retrieve_credentials(
+                ['acnt1'], 'ec2', 'user1'
+            ) == {'acnt1': {'super': 'secret'}}
+            store.close()
+
+    @patch('mash.services.credentials.stores.os')
     def test_store_encrypted_credentials(self, mock_os):
         mock_os.isdir.return_value = True
 
@@ -183,12 +504,12 @@ class TestCredentialsDatastore(object):
                 'Unable to store credentials: Cannot write file.'
             )
 
-    @patch('mash.services.credentials.datastore.os')
-    @patch.object(CredentialsDatastore, '_get_credentials_file_path')
-    def test_check_credentials_exist(self, mock_get_creds_path, mock_os):
-        mock_get_creds_path.return_value = 'creds.path'
+    @patch('mash.services.credentials.stores.os')
+    def test_check_credentials_exist(self, mock_os):
+        mock_os.path.join.return_value = 'creds.path'
         mock_os.path.exists.return_value = True
         assert self.datastore._check_credentials_exist('acnt1', 'aws', 'user1')
+        mock_os.path.exists.assert_called_once_with('creds.path')
 
     def test_decrypt_credentials(self):
         credentials = (
@@ -221,10 +542,32 @@ class TestCredentialsDatastore(object):
 
             self.datastore._decrypt_credentials(credentials)
 
+        # Key ring is read once while the keys file is unchanged
+        assert mock_open.call_count == 0
+
+    @patch('mash.services.credentials.datastore.os')
+    def test_get_fernet(self, mock_os):
+        mock_os.stat.return_value = Mock(
+            st_mtime_ns=1, st_size=44, st_ino=1
+        )
+
+        with patch.object(
+            self.datastore, '_get_encryption_keys_from_file'
+        ) as mock_get_keys:
+            mock_get_keys.return_value = [Mock()]
+
+            fernet = self.datastore._get_fernet()
+            assert self.datastore._get_fernet() is fernet
+            assert mock_get_keys.call_count == 1
+
+            mock_os.stat.return_value = Mock(
+                st_mtime_ns=2, st_size=88, st_ino=1
+            )
+            assert self.datastore._get_fernet() is not fernet
+            assert mock_get_keys.call_count == 2
+
     @patch.object(CredentialsDatastore, '_decrypt_credentials')
-    @patch.object(CredentialsDatastore, '_get_credentials_file_path')
-    def test_get_decrypted_credentials(self, mock_get_creds_path, mock_dec_creds):
-        mock_get_creds_path.return_value = 'creds.path'
+    def test_get_decrypted_credentials(self, mock_dec_creds):
         mock_dec_creds.return_value = '{"super": "secret"}'
 
         with patch('builtins.open', create=True) as mock_open:
@@ -233,12 +576,15 @@ class TestCredentialsDatastore(object):
             file_handle.read.return_value = 'encrypted_creds'
 
             result = self.datastore._get_decrypted_credentials(
-                'acnt1', 'ec2', 'user1'
+                ['acnt1'], 'ec2', 'user1'
             )
 
-            assert result['super'] == 'secret'
+            assert result['acnt1']['super'] == 'secret'
+            mock_open.assert_called_once_with(
+                '/var/lib/mash/credentials/user1/ec2/acnt1', 'r'
+            )
 
-    @patch('mash.services.credentials.datastore.shutil')
+    @patch('mash.services.credentials.stores.shutil')
     def test_remove_user(self, mock_shutil):
         self.datastore.remove_user('fakeuser101')
         mock_shutil.rmtree.assert_called_once_with(
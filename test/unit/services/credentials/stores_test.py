@@ -0,0 +1,254 @@
+import os
+import pytest
+
+from tempfile import TemporaryDirectory
+from unittest.mock import call, Mock
+
+from mash.mash_exceptions import MashCredentialsDatastoreException
+from mash.services.credentials.stores import (
+    FileCredentialsStore,
+    SQLiteCredentialsStore,
+    get_credentials_store,
+    write_file_atomic
+)
+
+
+class TestFileCredentialsStore(object):
+    def test_file_store(self):
+        with TemporaryDirectory() as test_dir:
+            store = FileCredentialsStore(test_dir)
+
+            store.write_many([
+                ('user1', 'ec2', 'acnt1', 'token1'),
+                ('user1', 'gce', 'acnt2', 'token2')
+            ])
+            open(os.path.join(test_dir, 'wsgi.py'), 'a').close()
+
+            assert store.exists('user1', 'ec2', 'acnt1')
+            assert store.read_many('user1', 'ec2', ['acnt1']) == {
+                'acnt1': 'token1'
+            }
+            assert sorted(store.read_records()) == [
+                ('user1', 'ec2', 'acnt1', 'token1'),
+                ('user1', 'gce', 'acnt2', 'token2')
+            ]
+
+            callback = Mock()
+            store.rotate(
+                [('user1', 'ec2', 'acnt1')],
+                lambda token: token.upper(),
+                callback
+            )
+            callback.assert_called_once_with(('user1', 'ec2', 'acnt1'), None)
+            assert store.read_many('user1', 'ec2', ['acnt1']) == {
+                'acnt1': 'TOKEN1'
+            }
+
+            store.delete('user1', 'ec2', 'acnt1')
+            assert not store.exists('user1', 'ec2', 'acnt1')
+
+            store.delete_user('user1')
+            assert store.list_records() == []
+
+    def test_read_records_skip_other_files(self):
+        with TemporaryDirectory() as test_dir:
+            store = FileCredentialsStore(test_dir)
+            store.write('user1', 'ec2', 'acnt1', 'token1')
+
+            os.makedirs(os.path.join(test_dir, 'user1', 'ec2', 'old'))
+            open(store.get_path('user1', 'ec2', 'old', 'acnt2'), 'a').close()
+            open(store.get_path('notes'), 'a').close()
+
+            assert list(store.read_records()) == [
+                ('user1', 'ec2', 'acnt1', 'token1')
+            ]
+
+    def test_rotate_saved_while_rotating(self):
+        with TemporaryDirectory() as test_dir:
+            store = FileCredentialsStore(test_dir)
+            store.write('user1', 'ec2', 'acnt1', 'token1')
+            tokens = []
+
+            def rotate(token):
+                tokens.append(token)
+
+                if len(tokens) == 1:
+                    # Credentials are saved during the rotation
+                    store.write('user1', 'ec2', 'acnt1', 'token2')
+
+                return token.upper()
+
+            callback = Mock()
+            store.rotate([('user1', 'ec2', 'acnt1')], rotate, callback)
+
+            assert tokens == [b'token1', b'token2']
+            callback.assert_called_once_with(('user1', 'ec2', 'acnt1'), None)
+            assert store.read_many('user1', 'ec2', ['acnt1']) == {
+                'acnt1': 'TOKEN2'
+            }
+
+    def test_rotate_deleted_while_rotating(self):
+        with TemporaryDirectory() as test_dir:
+            store = FileCredentialsStore(test_dir)
+            store.write('user1', 'ec2', 'acnt1', 'token1')
+
+            def rotate(token):
+                # The account is deleted during the rotation
+                store.delete('user1', 'ec2', 'acnt1')
+                return token.upper()
+
+            callback = Mock()
+            store.rotate(
+                [('user1', 'ec2', 'acnt1'), ('user1', 'ec2', 'acnt2')],
+                rotate,
+                callback
+            )
+
+            callback.assert_has_calls([
+                call(('user1', 'ec2', 'acnt1'), None),
+                call(('user1', 'ec2', 'acnt2'), None)
+            ], any_order=True)
+            assert not store.exists('user1', 'ec2', 'acnt1')
+            assert not store.exists('user1', 'ec2', 'acnt2')
+
+
+class TestSQLiteCredentialsStore(object):
+    def setup(self):
+        self.test_dir = TemporaryDirectory()
+        self.store = SQLiteCredentialsStore(
+            os.path.join(self.test_dir.name, 'db', 'credentials.db')
+        )
+
+    def teardown(self):
+        self.store.close()
+        self.test_dir.cleanup()
+
+    def test_read_write(self):
+        self.store.write_many([
+            ('user1', 'ec2', 'acnt1', 'token1'),
+            ('user1', 'ec2', 'acnt2', 'token2'),
+            ('user2', 'ec2', 'acnt1', 'token3')
+        ])
+
+        assert self.store.read_many(
+            'user1', 'ec2', ['acnt1', 'acnt2']
+        ) == {'acnt1': 'token1', 'acnt2': 'token2'}
+
+        self.store.write('user1', 'ec2', 'acnt1', 'token4')
+        assert self.store.read_many('user1', 'ec2', ['acnt1']) == {
+            'acnt1': 'token4'
+        }
+
+        with pytest.raises(MashCredentialsDatastoreException):
+            self.store.read_many('user1', 'gce', ['acnt1'])
+
+        assert self.store.exists('user1', 'ec2', 'acnt2')
+        self.store.delete('user1', 'ec2', 'acnt2')
+        assert not self.store.exists('user1', 'ec2', 'acnt2')
+
+        self.store.delete_user('user1')
+        assert self.store.list_records() == [('user2', 'ec2', 'acnt1')]
+        assert self.store.read_records() == [
+            ('user2', 'ec2', 'acnt1', 'token3')
+        ]
+
+    def test_rotate(self):
+        self.store.write_many([
+            ('user1', 'ec2', 'acnt1', 'token1'),
+            ('user1', 'ec2', 'acnt2', 'invalid'),
+            ('user1', 'ec2', 'acnt3', 'token3')
+        ])
+
+        def rotate(token):
+            if token == b'invalid':
+                raise Exception('Invalid token')
+            return token.upper()
+
+        callback = Mock()
+        self.store.rotate(
+            [('user1', 'ec2', 'acnt1'), ('user1', 'ec2', 'acnt2')],
+            rotate,
+            callback
+        )
+
+        assert self.store.read_many(
+            'user1', 'ec2', ['acnt1', 'acnt2', 'acnt3']
+        ) == {'acnt1': 'TOKEN1', 'acnt2': 'invalid', 'acnt3': 'token3'}
+
+        results = {
+            args[0]: args[1] for args, kwargs in callback.call_args_list
+        }
+        assert results[('user1', 'ec2', 'acnt1')] is None
+        assert str(results[('user1', 'ec2', 'acnt2')]) == 'Invalid token'
+
+        # A deleted record is done
+        callback.reset_mock()
+        self.store.rotate([('user1', 'ec2', 'acnt4')], rotate, callback)
+        callback.assert_called_once_with(('user1', 'ec2', 'acnt4'), None)
+        assert not self.store.exists('user1', 'ec2', 'acnt4')
+
+    def test_rotate_rollback(self):
+        self.store.write_many([
+            ('user1', 'ec2', 'acnt1', 'token1'),
+            ('user1', 'ec2', 'acnt2', 'token2')
+        ])
+
+        def rotate(token):
+            if token == b'token2':
+                # Not a token, the update fails
+                return None
+            return token.upper()
+
+        callback = Mock()
+
+        with pytest.raises(AttributeError):
+            self.store.rotate(
+                [('user1', 'ec2', 'acnt1'), ('user1', 'ec2', 'acnt2')],
+                rotate,
+                callback
+            )
+
+        assert not callback.called
+        assert self.store.read_many(
+            'user1', 'ec2', ['acnt1', 'acnt2']
+        ) == {'acnt1': 'token1', 'acnt2': 'token2'}
+
+        # The connection is usable after the rollback
+        self.store.write('user1', 'ec2', 'acnt1', 'token3')
+        assert self.store.read_many('user1', 'ec2', ['acnt1']) == {
+            'acnt1': 'token3'
+        }
+
+
+def test_get_credentials_store():
+    with TemporaryDirectory() as test_dir:
+        store = get_credentials_store('file', test_dir, None)
+        assert isinstance(store, FileCredentialsStore)
+
+        store = get_credentials_store(
+            'sqlite', None, os.path.join(test_dir, 'credentials.db')
+        )
+        assert isinstance(store, SQLiteCredentialsStore)
+        store.close()
+
+    with pytest.raises(MashCredentialsDatastoreException):
+        get_credentials_store('ldap', None, None)
+
+
+def test_write_file_atomic():
+    with TemporaryDirectory() as test_dir:
+        path = os.path.join(test_dir, 'keys.file')
+
+        write_file_atomic(path, b'key1')
+        with open(path) as f:
+            assert f.read() == 'key1'
+
+        # The replace fails, the temp file is removed
+        os.remove(path)
+        os.makedirs(os.path.join(path, 'dir'))
+
+        with pytest.raises(OSError):
+            write_file_atomic(path, b'key2')
+
+        assert os.listdir(test_dir) == ['keys.file']
+        assert os.listdir(path) == ['dir']
@@ -23,6 +23,8 @@ class TestEC2DeprecateJob(object):
         }
 
         self.config = Mock()
+        self.config.get_region_max_workers.return_value = 8
+        self.config.get_continue_on_region_error.return_value = False
         self.job = EC2DeprecateJob(self.job_config, self.config)
         self.job._log_callback = Mock()
         self.job.credentials = {
@@ -40,7 +42,7 @@ class TestEC2DeprecateJob(object):
         with raises(MashDeprecateException):
             EC2DeprecateJob(self.job_config, self.config)
 
-    @patch('mash.services.deprecate.ec2_job.EC2DeprecateImg')
+    @patch('mash.services.deprecate.ec2_job.CachedEC2DeprecateImg')
     def test_deprecate(self, mock_ec2_deprecate_image):
         deprecate = Mock()
         mock_ec2_deprecate_image.return_value = deprecate
@@ -57,6 +59,9 @@ class TestEC2DeprecateJob(object):
 
         assert deprecate.deprecate_images.call_count == 1
         assert self.job.status == 'success'
+        self.job._log_callback.info.assert_called_once_with(
+            'Deprecated image old_image_123 in us-east-2.'
+        )
 
     def test_deprecate_no_old_image(self):
         self.job.source_regions = {'us-east-2': 'ami-123456'}
@@ -64,7 +69,7 @@ class TestEC2DeprecateJob(object):
         self.job.run_job()
         assert self.job.status == 'success'
 
-    @patch('mash.services.deprecate.ec2_job.EC2DeprecateImg')
+    @patch('mash.services.deprecate.ec2_job.CachedEC2DeprecateImg')
     def test_deprecate_exception(self, mock_ec2_deprecate_image):
         deprecate = Mock()
         deprecate.deprecate_images.side_effect = Exception(
@@ -78,7 +83,7 @@ class TestEC2DeprecateJob(object):
             self.job.run_job()
         assert msg == str(e.value)
 
-    @patch('mash.services.deprecate.ec2_job.EC2DeprecateImg')
+    @patch('mash.services.deprecate.ec2_job.CachedEC2DeprecateImg')
     def test_deprecate_false(
         self, mock_ec2_deprecate_image
     ):
@@ -91,3 +96,24 @@ class TestEC2DeprecateJob(object):
         self.job._log_callback.warning.assert_called_once_with(
             'Unable to deprecate image in us-east-2, no image found.'
         )
+        assert self.job._log_callback.info.call_count == 0
+
+    @patch('mash.services.deprecate.ec2_job.CachedEC2DeprecateImg')
+    def test_deprecate_continue_on_error(self, mock_ec2_deprecate_image):
+        self.job.continue_on_error = True
+        self.job.deprecate_regions.append({
+            'account': 'test-aws',
+            'target_regions': ['us-west-1']
+        })
+        deprecate = Mock()
+        deprecate.deprecate_images.side_effect = Exception('Failed.')
+        mock_ec2_deprecate_image.return_value = deprecate
+
+        self.job.run_job()
+
+        assert deprecate.deprecate_images.call_count == 2
+        assert self.job.status == 'failed'
+        assert self.job.status_msg['errors'] == [
+            'Error deprecating image old_image_123 in us-east-2. Failed.',
+            'Error deprecating image old_image_123 in us-west-1. Failed.'
+        ]
@@ -1,5 +1,7 @@
 import pytest
+import threading
 
+from tempfile import TemporaryDirectory
 from unittest.mock import call, MagicMock, Mock, patch
 
 from amqpstorm import AMQPError
@@ -11,6 +13,7 @@ from mash.services.mash_service import MashService
 from mash.services.listener_service import ListenerService
 from mash.mash_exceptions import MashListenerServiceException
 from mash.utils.json_format import JsonFormat
+from mash.utils.mash_utils import restart_jobs
 
 
 class TestListenerService(object):
@@ -27,6 +30,10 @@ class TestListenerService(object):
         ]
         self.config.get_job_directory.return_value = '/var/lib/mash/replicate_jobs/'
         self.config.get_base_thread_pool_count.return_value = 10
+        self.config.get_service_prefetch_count.return_value = 5
+        self.config.get_listener_prefetch_count.return_value = None
+        self.config.get_service_instance_count.return_value = 1
+        self.config.get_service_instance_index.return_value = 0
 
         self.channel = Mock()
         self.channel.basic_ack.return_value = None
@@ -68,6 +75,8 @@ class TestListenerService(object):
         self.service.log = Mock()
 
         self.service.channel = self.channel
+        self.service.channel_lock = threading.Lock()
+        self.service.consumers = []
         self.service.config = self.config
 
         scheduler = Mock()
@@ -78,6 +87,11 @@ class TestListenerService(object):
         self.service.listener_queue = 'listener'
         self.service.job_document_key = 'job_document'
         self.service.listener_msg_key = 'listener_msg'
+        self.service.service_prefetch_count = 10
+        self.service.listener_prefetch_count = 10
+        self.service.instance_count = 1
+        self.service.instance_index = 0
+        self.service.job_directory = '/var/lib/mash/replicate_jobs/'
         self.service.prev_service = 'test'
         self.service.custom_args = None
         self.service.listener_msg_args = ['cloud_image_name']
@@ -119,6 +133,8 @@ class TestListenerService(object):
         mock_setup_logfile.assert_called_once_with(
             '/var/log/mash/service_service.log'
         )
+        assert self.service.service_prefetch_count == 5
+        assert self.service.listener_prefetch_count == 10
 
         mock_bind_queue.has_calls([
             call('replicate', 'job_document', 'service'),
@@ -126,7 +142,7 @@ class TestListenerService(object):
         ])
         mock_restart_jobs.assert_called_once_with(
             '/var/lib/mash/replicate_jobs/',
-            self.service._add_job
+            self.service._restart_job
         )
         mock_start.assert_called_once_with()
 
@@ -153,17 +169,48 @@ class TestListenerService(object):
 
         self.service.post_init()
 
-    @patch.object(ListenerService, '_delete_job')
-    @patch.object(ListenerService, '_publish_message')
-    def test_service_cleanup_job(
-        self, mock_publish_message, mock_delete_job
+    @patch('mash.services.listener_service.os.makedirs')
+    @patch.object(ListenerService, 'bind_queue')
+    @patch('mash.services.listener_service.restart_jobs')
+    @patch('mash.services.listener_service.setup_logfile')
+    @patch.object(ListenerService, 'start')
+    def test_service_post_init_instances(
+        self, mock_start,
+        mock_setup_logfile, mock_restart_jobs,
+        mock_bind_queue, mock_makedirs
     ):
+        self.service.custom_args = {'job_factory': Mock()}
+        self.config.get_service_instance_count.return_value = 3
+        self.config.get_service_instance_index.return_value = 1
+        self.service._register_instance = Mock()
+
+        self.service.post_init()
+
+        self.service._register_instance.assert_called_once_with()
+
+        mock_bind_queue.assert_has_calls([
+            call('replicate', 'job_document', 'service'),
+            call('test', 'listener_msg', 'listener'),
+            call('replicate', 'job_document.1', 'service.1'),
+            call('test', 'listener_msg.1', 'listener.1')
+        ])
+
+        mock_start.reset_mock()
+        self.config.get_service_instance_index.return_value = 3
+
+        with pytest.raises(MashListenerServiceException) as error:
+            self.service.post_init()
+
+        assert str(error.value) == \
+            'Instance index 3 is invalid for 3 instances.'
+        assert mock_start.call_count == 0
+
+    def test_service_cleanup_job(self):
         job = Mock()
         job.id = '1'
         job.status = 'failed'
         job.utctime = 'now'
         job.get_job_id.return_value = {'job_id': '1'}
-        job.get_status_message.return_value = {'id': '1', 'status': 'failed'}
 
         self.service.jobs['1'] = job
         self.service._cleanup_job('1')
@@ -172,12 +219,9 @@ class TestListenerService(object):
             'Failed upstream.',
             extra={'job_id': '1'}
         )
-        mock_delete_job.assert_called_once_with('1')
-        msg = {"replicate_result": {"id": "1", "status": "failed"}}
-        mock_publish_message.assert_called_once_with(
-            JsonFormat.json_message(msg),
-            '1'
-        )
+        # Job is deleted when the result is processed
+        assert self.service.jobs['1'] == job
+        assert job.process_job.call_count == 0
 
     def test_service_add_job_exists(self):
         job = Mock()
@@ -246,8 +290,20 @@ class TestListenerService(object):
         )
 
         assert '1' not in self.service.jobs
+        job.cleanup.assert_called_once_with()
         mock_remove_file.assert_called_once_with('job-test.json')
 
+        # Cleanup errors are logged
+        job.cleanup.side_effect = Exception('Access denied')
+        self.service.jobs['1'] = job
+        self.service._delete_job('1')
+
+        self.service.log.warning.assert_called_once_with(
+            'Job cleanup failed: Access denied.',
+            extra={'job_id': '1'}
+        )
+        assert mock_remove_file.call_count == 2
+
     def test_service_delete_invalid_job(self):
         self.service._delete_job('1')
 
@@ -274,7 +330,9 @@ class TestListenerService(object):
         self.service._handle_listener_message(self.message)
 
         assert self.service.jobs['1'].listener_msg == self.message
-        mock_schedule_job.assert_called_once_with('1')
+        mock_schedule_job.assert_called_once_with(
+            '1', self.service._start_job
+        )
 
     def test_service_handle_listener_message_no_job(self):
         self.message.body = JsonFormat.json_message({
@@ -288,14 +346,158 @@ class TestListenerService(object):
         self.service._handle_listener_message(self.message)
         self.message.ack.assert_called_once_with()
 
+    @patch.object(ListenerService, '_schedule_job')
+    @patch.object(ListenerService, '_publish')
+    def test_service_handle_listener_message_forward(
+        self, mock_publish, mock_schedule_job
+    ):
+        self.service.instance_count = 3
+        self.service.instance_index = 1
+
+        self.message.body = JsonFormat.json_message({
+            "test_result": {
+                "id": "1",
+                "status": "success",
+                "errors": []
+            }
+        })
+        self.service._handle_listener_message(self.message)
+
+        mock_publish.assert_called_once_with(
+            'test', 'listener_msg.2', self.message.body
+        )
+        assert mock_schedule_job.call_count == 0
+        self.message.ack.assert_called_once_with()
+
+    @patch('mash.services.listener_service.time')
+    def test_service_register_instance(self, mock_time):
+        mock_time.monotonic.side_effect = [0, 10, 300]
+        self.service.instance_count = 2
+        self.service.instance_index = 1
+
+        with TemporaryDirectory() as test_dir:
+            self.service.job_directory = test_dir + '/'
+
+            # Instance 0 does not share the job directory
+            with pytest.raises(MashListenerServiceException) as error:
+                self.service._register_instance()
+
+            assert str(error.value) == \
+                'Instances 0 not found in job directory {0}/, instances ' \
+                'must share the job directory.'.format(test_dir)
+            mock_time.sleep.assert_called_once_with(1)
+
+            # Instance 0 registers while waiting
+            mock_time.monotonic.side_effect = [0, 10]
+            mock_time.sleep.side_effect = lambda seconds: open(
+                test_dir + '/instance-0', 'w'
+            ).close()
+            self.service._register_instance()
+
+            # Instances registered before start right away
+            mock_time.sleep.reset_mock()
+            mock_time.monotonic.side_effect = [0]
+            self.service._register_instance()
+            assert mock_time.sleep.call_count == 0
+
+    @patch.object(ListenerService, '_add_job')
+    def test_service_restart_job(self, mock_add_job):
+        self.service.instance_count = 3
+        self.service.instance_index = 1
+
+        # Job 1 is owned by instance 2
+        self.service._restart_job({'id': '1'})
+        assert mock_add_job.call_count == 0
+
+        self.service.instance_index = 2
+        self.service._restart_job({'id': '1'})
+        mock_add_job.assert_called_once_with({'id': '1'})
+
+    @patch.object(ListenerService, '_schedule_job')
+    def test_service_handle_listener_message_instance_count_changed(
+        self, mock_schedule_job
+    ):
+        job_factory = Mock()
+        job_factory.create_job.side_effect = lambda job_config, config: \
+            Mock(id=job_config['id'], job_file=job_config.get('job_file'))
+        self.service.job_factory = job_factory
+
+        # Job 1 is owned by instance 1 of 2 and instance 2 of 3
+        with TemporaryDirectory() as test_dir:
+            self.service.job_directory = test_dir + '/'
+            self.service.instance_count = 2
+            self.service.instance_index = 1
+            self.service._add_job({'id': '1'})
+
+            self.service.jobs = {}
+            self.service.instance_count = 3
+            restart_jobs(test_dir, self.service._restart_job)
+            assert self.service.jobs == {}
+
+            self.service.instance_index = 2
+            restart_jobs(test_dir, self.service._restart_job)
+            assert list(self.service.jobs) == ['1']
+
+            # The listener message arrives before the job was restarted
+            self.service.jobs = {}
+            self.message.body = JsonFormat.json_message({
+                "test_result": {
+                    "id": "1",
+                    "status": "success",
+                    "errors": []
+                }
+            })
+            self.service._handle_listener_message(self.message)
+
+        assert self.service.jobs['1'].listener_msg == self.message
+        mock_schedule_job.assert_called_once_with(
+            '1', self.service._start_job
+        )
+        assert self.message.ack.call_count == 0
+
+    @patch('mash.services.listener_service.restart_job')
+    @patch('mash.services.listener_service.os.path.exists')
+    def test_service_load_job_error(self, mock_exists, mock_restart_job):
+        mock_exists.return_value = True
+        mock_restart_job.side_effect = Exception('Invalid json')
+
+        assert not self.service._load_job('1')
+        self.service.log.warning.assert_called_once_with(
+            'Unable to load job file: Invalid json.',
+            extra={'job_id': '1'}
+        )
+
+    @patch.object(ListenerService, '_publish')
+    def test_service_handle_listener_message_forward_error(
+        self, mock_publish
+    ):
+        self.service.instance_count = 3
+        self.service.instance_index = 1
+        mock_publish.side_effect = Exception('Channel closed')
+
+        self.message.body = JsonFormat.json_message({
+            "test_result": {
+                "id": "1",
+                "status": "success",
+                "errors": []
+            }
+        })
+        self.service._handle_listener_message(self.message)
+
+        self.service.log.error.assert_called_once_with(
+            'Error forwarding listener message: Channel closed.'
+        )
+        self.message.nack.assert_called_once_with(requeue=True)
+        assert self.message.ack.call_count == 0
+
     def test_service_handle_listener_msg_invalid(self):
         self.message.body = self.status_message
         self.service._handle_listener_message(self.message)
 
         self.message.ack.assert_called_once_with()
 
-    @patch.object(ListenerService, '_cleanup_job')
-    def test_service_handle_listener_message_failed(self, mock_cleanup_job):
+    @patch.object(ListenerService, '_schedule_job')
+    def test_service_handle_listener_message_failed(self, mock_schedule_job):
         job = Mock()
         job.id = '1'
         job.utctime = 'now'
@@ -310,7 +512,10 @@ class TestListenerService(object):
             }
         })
         self.service._handle_listener_message(self.message)
-        mock_cleanup_job.assert_called_once_with('1')
+        mock_schedule_job.assert_called_once_with(
+            '1', self.service._cleanup_job
+        )
+        assert self.message.ack.call_count == 0
 
     @patch.object(ListenerService, '_add_job')
     def test_service_handle_service_message(self, mock_add_job):
@@ -324,6 +529,38 @@ class TestListenerService(object):
         })
         self.message.ack.assert_called_once_with()
 
+    @patch.object(ListenerService, '_add_job')
+    @patch.object(ListenerService, '_publish')
+    def test_service_handle_service_message_forward(
+        self, mock_publish, mock_add_job
+    ):
+        self.service.instance_count = 3
+        self.message.body = '{"replicate_job": {"id": "1", ' \
+            '"cloud": "ec2", "utctime": "now"}}'
+        self.service._handle_service_message(self.message)
+
+        mock_publish.assert_called_once_with(
+            'replicate', 'job_document.2', self.message.body
+        )
+        assert mock_add_job.call_count == 0
+        self.message.ack.assert_called_once_with()
+
+    @patch.object(ListenerService, '_publish')
+    def test_service_handle_service_message_forward_error(
+        self, mock_publish
+    ):
+        self.service.instance_count = 3
+        mock_publish.side_effect = Exception('Message returned')
+        self.message.body = '{"replicate_job": {"id": "1", ' \
+            '"cloud": "ec2", "utctime": "now"}}'
+        self.service._handle_service_message(self.message)
+
+        self.service.log.error.assert_called_once_with(
+            'Error forwarding job: Message returned.'
+        )
+        self.message.nack.assert_called_once_with(requeue=True)
+        assert self.message.ack.call_count == 0
+
     def test_service_handle_service_message_invalid(self):
         self.message.body = 'Invalid format.'
         self.service._handle_service_message(self.message)
@@ -518,31 +755,63 @@ class TestListenerService(object):
             coalesce=True
         )
 
-    @patch.object(ListenerService, 'consume_queue')
+    @patch.object(ListenerService, 'wait_for_consumers')
+    @patch.object(ListenerService, 'start_consumer')
     def test_service_start(
-        self, mock_consume_queue
+        self, mock_start_consumer, mock_wait_for_consumers
     ):
-        self.service.channel = self.channel
         self.service.start()
 
-        self.channel.start_consuming.assert_called_once_with()
-        mock_consume_queue.assert_has_calls([
+        self.service.scheduler.start.assert_called_once_with()
+        mock_start_consumer.assert_has_calls([
             call(
                 self.service._handle_service_message,
                 'service',
-                'replicate'
+                'replicate',
+                prefetch_count=10
             ),
             call(
                 self.service._handle_listener_message,
                 'listener',
-                'test'
+                'test',
+                prefetch_count=10
+            )
+        ])
+        mock_wait_for_consumers.assert_called_once_with()
+
+    @patch.object(ListenerService, 'wait_for_consumers')
+    @patch.object(ListenerService, 'start_consumer')
+    def test_service_start_instances(
+        self, mock_start_consumer, mock_wait_for_consumers
+    ):
+        self.service.instance_count = 2
+        self.service.instance_index = 1
+        self.service.start()
+
+        assert mock_start_consumer.call_count == 4
+        mock_start_consumer.assert_has_calls([
+            call(
+                self.service._handle_service_message,
+                'service.1',
+                'replicate',
+                prefetch_count=10
+            ),
+            call(
+                self.service._handle_listener_message,
+                'listener.1',
+                'test',
+                prefetch_count=10
             )
         ])
 
+    @patch.object(ListenerService, 'wait_for_consumers')
+    @patch.object(ListenerService, 'start_consumer')
     @patch.object(ListenerService, 'close_connection')
-    def test_service_start_exception(self, mock_close_connection):
-        self.service.channel = self.channel
-        self.channel.start_consuming.side_effect = Exception(
+    def test_service_start_exception(
+        self, mock_close_connection, mock_start_consumer,
+        mock_wait_for_consumers
+    ):
+        mock_wait_for_consumers.side_effect = Exception(
             'Cannot start consuming.'
         )
 
@@ -568,13 +837,11 @@ class TestListenerService(object):
         prev_service = self.service._get_previous_service()
         assert prev_service is None
 
-    @patch('mash.services.mash_service.Connection')
-    def test_publish_job_result(self, mock_connection):
-        mock_connection.return_value = self.connection
+    def test_publish_job_result(self):
+        self.service.publisher = Mock()
         self.service.publish_job_result('exchange', 'message')
-        self.channel.basic.publish.assert_called_once_with(
-            body='message', exchange='exchange', mandatory=True,
-            properties=self.msg_properties, routing_key='listener_msg'
+        self.service.publisher.publish.assert_called_once_with(
+            'exchange', 'listener_msg', 'message'
         )
 
     def test_service_start_job(self):
@@ -0,0 +1,35 @@
+from mash.services.logger.config import LoggerConfig
+
+
+class TestLoggerConfig(object):
+    def setup(self):
+        self.empty_config = LoggerConfig('test/data/empty_mash_config.yaml')
+        self.config = LoggerConfig('test/data/mash_config.yaml')
+
+    def test_get_max_open_files(self):
+        assert self.empty_config.get_max_open_files() == 256
+        assert self.config.get_max_open_files() == 64
+
+    def test_get_file_idle_timeout(self):
+        assert self.empty_config.get_file_idle_timeout() == 300
+        assert self.config.get_file_idle_timeout() == 60
+
+    def test_get_file_flush_interval(self):
+        assert self.empty_config.get_file_flush_interval() == 1
+        assert self.config.get_file_flush_interval() == 5
+
+    def test_get_file_flush_size(self):
+        assert self.empty_config.get_file_flush_size() == 65536
+        assert self.config.get_file_flush_size() == 4096
+
+    def test_get_prefetch_count(self):
+        assert self.empty_config.get_prefetch_count() == 1000
+        assert self.config.get_prefetch_count() == 500
+
+    def test_get_job_log_store(self):
+        assert self.empty_config.get_job_log_store() is False
+        assert self.config.get_job_log_store() is True
+
+    def test_get_segment_size(self):
+        assert self.empty_config.get_segment_size() == 8388608
+        assert self.config.get_segment_size() == 1048576
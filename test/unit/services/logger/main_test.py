@@ -5,7 +5,7 @@ from mash.services.logger_service import main
 
 
 class TestLogger(object):
-    @patch('mash.services.logger_service.BaseConfig')
+    @patch('mash.services.logger_service.LoggerConfig')
     @patch('mash.services.logger_service.LoggerService')
     def test_main(self, mock_logger_service, mock_config):
         config = Mock()
@@ -17,7 +17,7 @@ class TestLogger(object):
             config=config
         )
 
-    @patch('mash.services.logger_service.BaseConfig')
+    @patch('mash.services.logger_service.LoggerConfig')
     @patch('mash.services.logger_service.LoggerService')
     @patch('sys.exit')
     def test_logger_main_mash_error(
@@ -36,7 +36,7 @@ class TestLogger(object):
         )
         mock_exit.assert_called_once_with(1)
 
-    @patch('mash.services.logger_service.BaseConfig')
+    @patch('mash.services.logger_service.LoggerConfig')
     @patch('mash.services.logger_service.LoggerService')
     @patch('sys.exit')
     def test_logger_main_keyboard_interrupt(
@@ -47,7 +47,7 @@ class TestLogger(object):
         main()
         mock_exit.assert_called_once_with(0)
 
-    @patch('mash.services.logger_service.BaseConfig')
+    @patch('mash.services.logger_service.LoggerConfig')
     @patch('mash.services.logger_service.LoggerService')
     @patch('sys.exit')
     def test_logger_main_system_exit(
@@ -58,7 +58,7 @@ class TestLogger(object):
         main()
         mock_exit.assert_called_once_with(0)
 
-    @patch('mash.services.logger_service.BaseConfig')
+    @patch('mash.services.logger_service.LoggerConfig')
     @patch('mash.services.logger_service.LoggerService')
     @patch('sys.exit')
     def test_logger_main_unexpected_error(
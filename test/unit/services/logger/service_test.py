@@ -1,6 +1,5 @@
-import io
 import json
-import sys
+import threading
 
 from unittest.mock import MagicMock, Mock, patch
 from pytest import raises
@@ -9,9 +8,6 @@ from mash.mash_exceptions import MashLoggerException
 from mash.services.mash_service import MashService
 from mash.services.logger.service import LoggerService
 
-open_name = "__builtin__.open" if sys.version_info.major < 3 \
-    else "builtins.open"
-
 
 class TestLoggerService(object):
 
@@ -44,16 +40,30 @@ class TestLoggerService(object):
         self.logger.log = MagicMock()
         self.logger.service_exchange = 'logger'
         self.logger.channel = self.channel
+        self.logger.writer = Mock()
+        self.logger.store = None
+        self.logger.channel_lock = threading.Lock()
+        self.logger.unacked = []
+        self.logger.unacked_lock = threading.Lock()
+        self.logger.prefetch_count = 1000
 
+    @patch('mash.services.logger.service.JobLogStore')
+    @patch('mash.services.logger.service.JobLogWriter')
     @patch('mash.services.logger.service.setup_logfile')
     @patch.object(LoggerService, 'start')
     @patch.object(LoggerService, 'bind_queue')
     @patch.object(LoggerService, '_process_log')
     def test_logger_post_init(
-        self, mock_process_log, mock_bind_queue, mock_start, mock_setup_logfile
+        self, mock_process_log, mock_bind_queue, mock_start,
+        mock_setup_logfile, mock_writer, mock_store
     ):
         config = Mock()
         config.get_log_file.return_value = '/var/log/mash/logger_service.log'
+        config.get_max_open_files.return_value = 256
+        config.get_file_idle_timeout.return_value = 300
+        config.get_file_flush_size.return_value = 65536
+        config.get_job_log_store.return_value = False
+        config.get_prefetch_count.return_value = 500
         self.logger.config = config
 
         # Test normal run
@@ -63,65 +73,207 @@ class TestLoggerService(object):
         mock_setup_logfile.assert_called_once_with(
             '/var/log/mash/logger_service.log'
         )
+        mock_writer.assert_called_once_with(
+            max_open_files=256,
+            idle_timeout=300,
+            flush_size=65536
+        )
+        assert self.logger.store is None
+        assert self.logger.unacked == []
+        assert self.logger.prefetch_count == 500
         mock_bind_queue.assert_called_once_with(
             'logger', 'mash.logger', 'logging'
         )
         mock_start.assert_called_once_with()
 
+        # Job log store enabled
+        config.get_job_log_store.return_value = True
+        config.get_job_log_store_directory.return_value = \
+            '/var/log/mash/job_store'
+        config.get_segment_size.return_value = 8388608
+
+        self.logger.post_init()
+
+        mock_store.assert_called_once_with(
+            '/var/log/mash/job_store',
+            segment_size=8388608,
+            max_open_files=256,
+            idle_timeout=300,
+            flush_size=65536
+        )
+        assert self.logger.store == mock_store.return_value
+
     def test_logger_process_invalid_log(self):
         self.message.body = ''
         with raises(MashLoggerException):
             self.logger._process_log(self.message)
 
-    @patch('os.path.exists')
-    def test_logger_process_append(
-        self, mock_path_exists
-    ):
-        mock_path_exists.return_value = True
+        self.message.ack.assert_called_once_with()
+
+    def test_logger_process_no_job(self):
+        self.message.body = json.dumps({'msg': 'Service started'})
+        self.logger._process_log(self.message)
+
+        self.message.ack.assert_called_once_with()
+        assert self.logger.writer.write.call_count == 0
+
+    def test_logger_process_append(self):
+        self.config.get_job_log_file.return_value = '/var/log/mash/4711.log'
         self.logger.config = self.config
 
-        with patch(open_name, create=True) as mock_open:
-            mock_open.return_value = MagicMock(spec=io.IOBase)
-            self.logger._process_log(self.message)
-            file_handle = mock_open.return_value.__enter__.return_value
-            file_handle.write.assert_called_with(
-                u'INFO 2017-11-01 11:36:36.782072 '
-                'LoggerService \n Test log message! \n'
-            )
-
-    @patch('os.path.exists')
-    def test_logger_process_write_exception(
-        self, mock_path_exists
-    ):
-        mock_path_exists.return_value = True
+        self.logger._process_log(self.message)
+
+        self.logger.writer.write.assert_called_once_with(
+            '/var/log/mash/4711.log',
+            u'INFO 2017-11-01 11:36:36.782072 '
+            'LoggerService \n Test log message! \n'
+        )
+
+        # The message is acked once the line is flushed
+        assert self.message.ack.call_count == 0
+        assert self.logger.unacked == [self.message]
+
+        self.logger._flush_logs()
+
+        self.message.ack.assert_called_once_with()
+        assert self.logger.unacked == []
+
+    def test_logger_process_prefetch_full(self):
+        self.logger.config = self.config
+        self.logger.prefetch_count = 2
+
+        self.logger._process_log(self.message)
+        assert self.logger.writer.flush.call_count == 0
+
+        self.logger._process_log(self.message)
+        self.logger.writer.flush.assert_called_once_with()
+        assert self.message.ack.call_count == 2
+
+    def test_logger_process_store(self):
+        body = {
+            'msg': 'INFO 2020-01-01 UploadService Job[4711]: Uploaded!',
+            'message': 'Uploaded!',
+            'levelname': 'INFO',
+            'name': 'UploadService',
+            'created': 1577880000.5,
+            'job_id': '4711'
+        }
+        self.message.body = json.dumps(body)
+        self.logger.config = self.config
+        self.logger.store = Mock()
+
+        self.logger._process_log(self.message)
+
+        self.logger.store.write.assert_called_once_with('4711', {
+            'created': 1577880000.5,
+            'timestamp': '2020-01-01T12:00:00.500000',
+            'level': 'INFO',
+            'service': 'upload',
+            'job_id': '4711',
+            'message': 'Uploaded!'
+        })
+
+    @patch('mash.services.logger.service.time')
+    def test_logger_get_record_defaults(self, mock_time):
+        mock_time.time.return_value = 1577880000.0
+
+        record = self.logger._get_record({'job_id': '4711', 'msg': 'Hi'})
+
+        assert record == {
+            'created': 1577880000.0,
+            'timestamp': '2020-01-01T12:00:00',
+            'level': 'NOTSET',
+            'service': '',
+            'job_id': '4711',
+            'message': 'Hi'
+        }
+
+    def test_logger_process_write_exception(self):
         self.logger.config = self.config
+        self.logger.writer.write.side_effect = Exception(
+            'Error writing file!'
+        )
+
+        with raises(MashLoggerException):
+            self.logger._process_log(self.message)
+
+        self.message.nack.assert_called_once_with(requeue=True)
+        assert self.message.ack.call_count == 0
+
+        # Messages are requeued if the store cannot be written
+        self.message.reset_mock()
+        self.logger.writer.write.side_effect = None
+        self.logger.store = Mock()
+        self.logger.store.write.side_effect = Exception('Store is full!')
+
+        with raises(MashLoggerException):
+            self.logger._process_log(self.message)
+
+        self.message.nack.assert_called_once_with(requeue=True)
+        assert self.message.ack.call_count == 0
+        assert self.logger.unacked == []
+
+    def test_logger_flush_logs(self):
+        self.logger._flush_logs()
 
-        with patch(open_name, create=True) as mock_open:
-            mock_open.return_value = MagicMock(spec=io.IOBase)
-            file_handle = mock_open.return_value.__enter__.return_value
-            file_handle.write.side_effect = Exception('Error writing file!')
+        self.logger.writer.flush.assert_called_once_with()
+        self.logger.writer.evict_idle.assert_called_once_with()
 
-            with raises(MashLoggerException):
-                self.logger._process_log(self.message)
+        self.logger.writer.flush.side_effect = Exception('Disk full!')
+        self.logger.unacked = [self.message]
+        self.logger._flush_logs()
 
+        self.logger.log.error.assert_called_once_with(
+            'Could not write to log file: Disk full!'
+        )
+
+        # Messages stay unacked until their lines are written
+        assert self.message.ack.call_count == 0
+        assert self.logger.unacked == [self.message]
+
+        # The store is flushed even if the text logs fail
+        self.logger.store = Mock()
+        self.logger._flush_logs()
+
+        self.logger.store.flush.assert_called_once_with()
+        self.logger.store.evict_idle.assert_called_once_with()
+
+    @patch('mash.services.logger.service.BackgroundScheduler')
     @patch.object(LoggerService, 'consume_queue')
     @patch.object(LoggerService, 'close_connection')
-    def test_logger_start(self, mock_close_connection, mock_consume_queue):
-        self.logger.channel = self.channel
+    def test_logger_start(
+        self, mock_close_connection, mock_consume_queue, mock_scheduler
+    ):
+        scheduler = Mock()
+        mock_scheduler.return_value = scheduler
+        self.config.get_file_flush_interval.return_value = 1
+        self.config.get_prefetch_count.return_value = 1000
+        self.logger.config = self.config
+        self.logger.store = Mock()
+
         self.logger.start()
+
+        scheduler.add_job.assert_called_once_with(
+            self.logger._flush_logs, 'interval', seconds=1
+        )
+        scheduler.start.assert_called_once_with()
+        self.channel.basic.qos.assert_called_once_with(prefetch_count=1000)
         self.channel.start_consuming.assert_called_once_with()
+        scheduler.shutdown.assert_called_once_with()
+        self.logger.writer.close.assert_called_once_with()
+        self.logger.store.close.assert_called_once_with()
         mock_consume_queue.assert_called_once_with(
             self.logger._process_log, 'logging', 'logger'
         )
         mock_close_connection.assert_called_once_with()
 
+    @patch('mash.services.logger.service.BackgroundScheduler')
     @patch.object(LoggerService, 'consume_queue')
     @patch.object(LoggerService, 'close_connection')
     def test_logger_start_exception(
-        self, mock_close_connection, mock_consume_queue
+        self, mock_close_connection, mock_consume_queue, mock_scheduler
     ):
-        scheduler = Mock()
-        self.logger.scheduler = scheduler
+        self.logger.config = self.config
         self.logger.channel = self.channel
 
         self.channel.start_consuming.side_effect = KeyboardInterrupt()
@@ -0,0 +1,151 @@
+import os
+
+from pytest import raises
+
+from mash.mash_exceptions import MashLoggerException
+from mash.services.logger.store import JobLogReader, JobLogStore
+
+
+def get_record(index, level='INFO', service='test'):
+    return {
+        'created': 1577880000.0 + index,
+        'timestamp': '2020-01-01T12:00:00',
+        'level': level,
+        'service': service,
+        'job_id': '4711',
+        'message': 'Message {0}'.format(index)
+    }
+
+
+class TestJobLogStore(object):
+    def setup(self):
+        self.records = [
+            get_record(0, service='obs'),
+            get_record(1, level='ERROR'),
+            get_record(2),
+            get_record(3, level='CRITICAL', service='upload'),
+            get_record(4, level='ERROR'),
+            get_record(5)
+        ]
+
+    def write(self, directory, segment_size=8388608):
+        store = JobLogStore(directory, segment_size=segment_size)
+
+        for record in self.records:
+            store.write('4711', record)
+
+        store.close()
+
+    def messages(self, result):
+        return [record['message'] for record in result['logs']]
+
+    def test_read_pages(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory)
+        reader = JobLogReader(directory)
+
+        result = reader.read('4711', limit=4)
+        assert self.messages(result) == [
+            'Message 0', 'Message 1', 'Message 2', 'Message 3'
+        ]
+        assert result['logs'][0] == self.records[0]
+        assert result['next'] == 4
+
+        result = reader.read('4711', start=result['next'], limit=4)
+        assert self.messages(result) == ['Message 4', 'Message 5']
+        assert result['next'] == 6
+
+        result = reader.read('4711', start=6)
+        assert result == {'logs': [], 'next': 6}
+
+    def test_read_filters(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory)
+        reader = JobLogReader(directory)
+
+        result = reader.read('4711', level='error')
+        assert self.messages(result) == ['Message 1', 'Message 3', 'Message 4']
+
+        result = reader.read('4711', level='ERROR', service='test', limit=1)
+        assert self.messages(result) == ['Message 1']
+        assert result['next'] == 2
+
+        result = reader.read('4711', service='upload')
+        assert self.messages(result) == ['Message 3']
+
+        with raises(MashLoggerException):
+            reader.read('4711', level='LOUD')
+
+    def test_read_tail(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory)
+        reader = JobLogReader(directory)
+
+        result = reader.read('4711', limit=2, tail=True)
+        assert self.messages(result) == ['Message 4', 'Message 5']
+        assert result['next'] == 6
+
+        result = reader.read('4711', limit=2, level='ERROR', tail=True)
+        assert self.messages(result) == ['Message 3', 'Message 4']
+
+        result = reader.read('4711', start=4, limit=5, tail=True)
+        assert self.messages(result) == ['Message 4', 'Message 5']
+
+    def test_segments(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory, segment_size=400)
+
+        job_directory = os.path.join(directory, '4711')
+        segments = sorted(
+            name for name in os.listdir(job_directory)
+            if name.endswith('.log')
+        )
+        assert len(segments) > 1
+
+        for segment in segments:
+            size = os.path.getsize(os.path.join(job_directory, segment))
+            assert size <= 400
+
+        # Appending to an existing job continues the last segment
+        self.records = [get_record(6)]
+        self.write(directory, segment_size=400)
+
+        result = JobLogReader(directory).read('4711', start=5)
+        assert self.messages(result) == ['Message 5', 'Message 6']
+
+    def test_read_partial_index(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory)
+
+        # A partially written index entry is ignored
+        with open(os.path.join(directory, '4711', 'index'), 'ab') as index:
+            index.write(b'\0\0\0')
+
+        result = JobLogReader(directory).read('4711', limit=10)
+        assert len(result['logs']) == 6
+        assert result['next'] == 6
+
+    def test_read_missing_job(self, tmpdir):
+        reader = JobLogReader(str(tmpdir))
+        assert reader.read('4712') == {'logs': [], 'next': 0}
+
+    def test_invalid_job_id(self, tmpdir):
+        reader = JobLogReader(str(tmpdir))
+
+        with raises(MashLoggerException):
+            reader.read('../4711')
+
+        with raises(MashLoggerException):
+            reader.read('')
+
+    def test_discard(self, tmpdir):
+        directory = str(tmpdir)
+        self.write(directory)
+
+        store = JobLogStore(directory)
+        store.write('4711', get_record(6))
+        store.files['4711'].discard()
+        store.files.clear()
+
+        result = JobLogReader(directory).read('4711', limit=10)
+        assert len(result['logs']) == 6
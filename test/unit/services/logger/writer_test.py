@@ -0,0 +1,176 @@
+import os
+
+from pytest import raises
+from unittest.mock import Mock, patch
+
+from mash.mash_exceptions import MashLoggerException
+from mash.services.logger.writer import JobLogWriter
+
+
+class TestJobLogWriter(object):
+    def setup(self):
+        self.writer = JobLogWriter(
+            max_open_files=2, idle_timeout=60, flush_size=20
+        )
+
+    def read(self, path):
+        with open(path) as log_file:
+            return log_file.read()
+
+    def test_write_buffered(self, tmpdir):
+        path = os.path.join(str(tmpdir), '1.log')
+
+        self.writer.write(path, 'line one\n')
+        assert self.read(path) == ''
+
+        self.writer.flush()
+        assert self.read(path) == 'line one\n'
+
+        # Handle is reused for the next line
+        handle = self.writer.files[path].handle
+        self.writer.write(path, 'line two\n')
+        assert self.writer.files[path].handle == handle
+
+        self.writer.close()
+        assert self.read(path) == 'line one\nline two\n'
+        assert self.writer.files == {}
+
+    def test_write_flush_size(self, tmpdir):
+        path = os.path.join(str(tmpdir), '1.log')
+
+        self.writer.write(path, 'a' * 10)
+        self.writer.write(path, 'b' * 10)
+
+        assert self.read(path) == 'a' * 10 + 'b' * 10
+        assert self.writer.files[path].pending == []
+
+    def test_write_evict_lru(self, tmpdir):
+        paths = [
+            os.path.join(str(tmpdir), '{0}.log'.format(index))
+            for index in range(3)
+        ]
+
+        self.writer.write(paths[0], 'zero\n')
+        self.writer.write(paths[1], 'one\n')
+        self.writer.write(paths[0], 'zero\n')
+        self.writer.write(paths[2], 'two\n')
+
+        assert list(self.writer.files) == [paths[0], paths[2]]
+        assert self.read(paths[1]) == 'one\n'
+
+    def test_write_evict_lru_error(self, tmpdir):
+        paths = [
+            os.path.join(str(tmpdir), '{0}.log'.format(index))
+            for index in range(3)
+        ]
+
+        self.writer.write(paths[0], 'zero\n')
+        self.writer.write(paths[1], 'one\n')
+
+        handle = self.writer.files[paths[0]].handle
+        self.writer.files[paths[0]].handle = Mock()
+        self.writer.files[paths[0]].handle.write.side_effect = OSError(
+            'No space left on device'
+        )
+
+        # The lines of the file that failed to close are kept and the
+        # next least recently used file is closed
+        self.writer.write(paths[2], 'two\n')
+
+        assert list(self.writer.files) == [paths[0], paths[2]]
+        assert self.writer.files[paths[0]].pending == ['zero\n']
+        assert self.read(paths[1]) == 'one\n'
+
+        # No file can be closed
+        two_handle = self.writer.files[paths[2]].handle
+        self.writer.files[paths[2]].handle = self.writer.files[
+            paths[0]
+        ].handle
+
+        with raises(MashLoggerException):
+            self.writer.write(paths[1], 'one\n')
+
+        assert list(self.writer.files) == [paths[0], paths[2]]
+
+        with raises(OSError):
+            self.writer.flush()
+
+        self.writer.files[paths[2]].handle = two_handle
+        self.writer.files[paths[0]].handle = handle
+        self.writer.flush()
+        assert self.read(paths[0]) == 'zero\n'
+        assert self.read(paths[2]) == 'two\n'
+        self.writer.close()
+
+    @patch('mash.services.logger.writer.time')
+    def test_evict_idle(self, mock_time, tmpdir):
+        path = os.path.join(str(tmpdir), '1.log')
+        mock_time.time.return_value = 100
+
+        self.writer.write(path, 'line\n')
+
+        mock_time.time.return_value = 150
+        self.writer.evict_idle()
+        assert path in self.writer.files
+
+        mock_time.time.return_value = 161
+        self.writer.evict_idle()
+        assert self.writer.files == {}
+        assert self.read(path) == 'line\n'
+
+    def test_flush_error(self, tmpdir):
+        paths = [
+            os.path.join(str(tmpdir), '{0}.log'.format(index))
+            for index in range(2)
+        ]
+
+        self.writer.write(paths[0], 'zero\n')
+        self.writer.write(paths[1], 'one\n')
+
+        handle = self.writer.files[paths[0]].handle
+        self.writer.files[paths[0]].handle = Mock()
+        self.writer.files[paths[0]].handle.write.side_effect = OSError(
+            'No space left on device'
+        )
+
+        with raises(OSError):
+            self.writer.flush()
+
+        # Other files are still written
+        assert self.read(paths[1]) == 'one\n'
+        handle.close()
+
+    def test_flush_error_max_pending(self, tmpdir):
+        path = os.path.join(str(tmpdir), '1.log')
+        self.writer.flush_size = 100
+        self.writer.max_pending_size = 10
+
+        self.writer.write(path, 'zero\n')
+
+        handle = self.writer.files[path].handle
+        self.writer.files[path].handle = Mock()
+        self.writer.files[path].handle.write.side_effect = OSError(
+            'No space left on device'
+        )
+
+        # Lines are kept while below the limit
+        with raises(OSError):
+            self.writer.flush()
+
+        assert self.writer.files[path].pending == ['zero\n']
+        assert self.writer.dropped == 0
+
+        self.writer.write(path, 'one\n')
+        self.writer.write(path, 'two\n')
+
+        with raises(OSError):
+            self.writer.flush()
+
+        assert self.writer.files == {}
+        assert self.writer.dropped == 3
+        handle.close()
+
+        # The next line opens the file again
+        self.writer.write(path, 'three\n')
+        self.writer.flush()
+        assert self.read(path) == 'three\n'
@@ -1,13 +1,19 @@
+import hashlib
+import os
+
 from unittest.mock import (
     patch, call, MagicMock, Mock
 )
-from pytz import utc
 from datetime import datetime
 import dateutil.parser
 
-from apscheduler.events import EVENT_JOB_SUBMITTED
+from obs_img_utils.api import OBSImageUtil
+from obs_img_utils.exceptions import OBSImageConditionsException
+from pytest import raises
 
+from mash.mash_exceptions import MashImageDownloadException
 from mash.services.obs.build_result import OBSImageBuildResult
+from mash.utils.image_cache import ImageCache
 
 
 class TestOBSImageBuildResult(object):
@@ -29,6 +35,17 @@ class TestOBSImageBuildResult(object):
             disallow_packages=["fake"]
         )
 
+    @patch('mash.services.obs.build_result.OBSImageUtil')
+    def test_poll_coordinator(self, mock_obs_img_util):
+        poll_coordinator = Mock()
+        obs_result = OBSImageBuildResult(
+            '815', 'job_file', 'obs_project', 'obs_package', 'publish',
+            self.logger, poll_coordinator=poll_coordinator
+        )
+        poll_coordinator.get_remote.assert_called_once_with('obs_project')
+        assert obs_result.downloader.remote == \
+            poll_coordinator.get_remote.return_value
+
     def test_set_result_handler(self):
         function = Mock()
         self.obs_result.set_result_handler(function)
@@ -42,16 +59,16 @@ class TestOBSImageBuildResult(object):
     def test_result_callback(self):
         self.obs_result.result_callback = Mock()
         self.obs_result.job_status = 'success'
-        self.downloader.image_status = {
-            'image_source': 'image',
-            'buildtime': '1601061355'
-        }
+        self.obs_result.image_file = 'image'
+        self.obs_result.image_metadata = {'size': 5}
+        self.downloader.build_time = '1601061355'
         self.obs_result._result_callback()
         self.obs_result.result_callback.assert_called_once_with(
             '815', {
                 'obs_result': {
                     'id': '815',
                     'image_file': 'image',
+                    'image_metadata': {'size': 5},
                     'status': 'success',
                     'errors': [],
                     'notification_email': 'test@fake.com',
@@ -61,76 +78,287 @@ class TestOBSImageBuildResult(object):
             }
         )
 
-    @patch('mash.services.obs.build_result.BackgroundScheduler')
-    @patch.object(OBSImageBuildResult, '_update_image_status')
-    @patch.object(OBSImageBuildResult, '_job_submit_event')
-    def test_start_watchdog_single_shot(
-        self, mock_job_submit_event, mock_update_image_status,
-        mock_BackgroundScheduler
-    ):
+    @patch.object(OBSImageBuildResult, '_get_image')
+    def test_update_image_status_obs_img_util(self, mock_get_image, tmpdir):
+        # Uses the attributes of the real downloader
+        obs_result = OBSImageBuildResult(
+            '815', 'job_file', 'obs_project', 'obs_package', 'publish',
+            self.logger, download_directory=str(tmpdir)
+        )
+        assert isinstance(obs_result.downloader, OBSImageUtil)
+
+        obs_result.result_callback = Mock()
+        mock_get_image.return_value = 'image'
+        obs_result._update_image_status()
+
+        result = obs_result.result_callback.call_args[0][1]['obs_result']
+        assert result['status'] == 'success'
+        assert result['image_file'] == 'image'
+        assert result['build_time'] == 'unknown'
+
+        remote = Mock()
+        remote.fetch_to_dir.return_value = '/images/815/image.sha256'
+        obs_result.downloader.remote = remote
+
+        with patch(
+            'mash.services.obs.build_result.get_checksum_from_file'
+        ) as mock_get_checksum_from_file:
+            mock_get_checksum_from_file.return_value = 'abc'
+            assert obs_result._get_image_checksum(
+                'obs_package.x86_64-1.0.0-Build1.1'
+            ) == 'abc'
+
+        assert remote.fetch_to_dir.mock_calls == [
+            call(
+                'obs_package.x86_64-1.0.0-Build1.1',
+                obs_result.downloader.base_regex,
+                obs_result.download_directory,
+                ['sha256']
+            ),
+            call(
+                'obs_package.x86_64-1.0.0-Build1.1',
+                obs_result.downloader.base_regex,
+                obs_result.download_directory,
+                ['asc']
+            )
+        ]
+
+    def test_start_watchdog_single_shot(self):
         scheduler = Mock()
-        mock_BackgroundScheduler.return_value = scheduler
         time = 'Tue Oct 10 14:40:42 UTC 2017'
         iso_time = dateutil.parser.parse(time).isoformat()
         run_time = datetime.strptime(iso_time[:19], '%Y-%m-%dT%H:%M:%S')
-        self.obs_result.start_watchdog(isotime=iso_time)
-        mock_BackgroundScheduler.assert_called_once_with(
-            timezone=utc
-        )
+        self.obs_result.start_watchdog(scheduler, isotime=iso_time)
         scheduler.add_job.assert_called_once_with(
-            mock_update_image_status, 'date', run_date=run_time,
-            timezone='utc'
+            '815', self.obs_result._update_image_status, run_date=run_time
         )
-        scheduler.add_listener.assert_called_once_with(
-            mock_job_submit_event, EVENT_JOB_SUBMITTED
-        )
-        scheduler.start.assert_called_once_with()
+        assert self.obs_result.job == scheduler.add_job.return_value
 
-    def test_stop_watchdog_no_exception(self):
-        self.obs_result.job = Mock()
+    def test_stop_watchdog(self):
         self.obs_result.stop_watchdog()
-        self.obs_result.job.remove.assert_called_once_with()
+        assert self.obs_result.job_deleted
 
-    def test_stop_watchdog_just_pass_with_exception(self):
-        self.obs_result.job = Mock()
-        self.obs_result.job.remove.side_effect = Exception
+        # A running job is not removed but must not be rescheduled
+        self.obs_result.job_deleted = False
+        self.obs_result.scheduler = Mock()
+        self.obs_result.scheduler.remove_job.return_value = False
         self.obs_result.stop_watchdog()
+        self.obs_result.scheduler.remove_job.assert_called_once_with('815')
+        assert self.obs_result.job_deleted
 
-    def test_job_submit_event(self):
-        self.obs_result._job_submit_event(Mock())
-        self.log_callback.info.assert_called_once_with('Oneshot Job submitted')
-
-    @patch.object(OBSImageBuildResult, '_result_callback')
-    def test_job_skipped_event(self, mock_result_callback):
-        self.obs_result._job_skipped_event(Mock())
-
-    @patch('mash.services.obs.build_result.threading.Thread')
-    @patch.object(OBSImageBuildResult, '_update_image_status')
-    def test_wait_for_new_image(self, mock_image_status, mock_Thread):
-        osc_result_thread = Mock()
-        mock_Thread.return_value = osc_result_thread
-        self.obs_result._wait_for_new_image()
-        mock_Thread.assert_called_once_with(
-            target=self.downloader.wait_for_new_image
-        )
-        osc_result_thread.start.assert_called_once_with()
-        osc_result_thread.join.assert_called_once_with()
-        mock_image_status.assert_called_once_with()
-
+    @patch.object(OBSImageBuildResult, '_get_image')
     @patch.object(OBSImageBuildResult, '_result_callback')
     def test_update_image_status(
         self,
-        mock_result_callback
+        mock_result_callback,
+        mock_get_image
     ):
-        self.downloader.get_image.return_value = 'new-image.xz'
+        mock_get_image.return_value = '/images/815/new-image.xz'
         self.obs_result._update_image_status()
         mock_result_callback.assert_called_once_with()
+        assert self.obs_result.image_file == '/images/815/new-image.xz'
+
+    @patch.object(OBSImageBuildResult, '_get_image')
+    @patch.object(OBSImageBuildResult, '_check_image_conditions')
+    @patch.object(OBSImageBuildResult, '_result_callback')
+    def test_update_image_status_conditions_not_met(
+        self, mock_result_callback, mock_check_image_conditions,
+        mock_get_image
+    ):
+        self.downloader.has_conditions = True
+        mock_check_image_conditions.return_value = False
+
+        self.obs_result._update_image_status()
+
+        assert mock_get_image.call_count == 0
+        assert mock_result_callback.call_count == 0
+        assert self.obs_result.job_status == 'prepared'
+
+    @patch.object(OBSImageBuildResult, '_download_image')
+    @patch.object(OBSImageBuildResult, '_get_image_checksum')
+    def test_get_image(
+        self, mock_get_image_checksum, mock_download_image, tmpdir
+    ):
+        download_dir = tmpdir.strpath
+        self.obs_result.download_directory = tmpdir.join('815').strpath
+        self.obs_result.image_cache = ImageCache(download_dir)
+        self.obs_result.scheduler = MagicMock()
+        self.downloader.has_conditions = True
+        self.downloader.base_file_name = 'image.x86_64-1.0.0-Build1.1'
+        mock_get_image_checksum.return_value = 'abc'
+
+        def download_image(target_directory, image_name, checksum):
+            image_file = os.path.join(
+                target_directory,
+                'image.x86_64-1.0.0-Build1.1.raw.xz'
+            )
+            with open(image_file, 'w') as image:
+                image.write('image')
+            return (
+                image_file,
+                hashlib.sha256(b'image').hexdigest(),
+                hashlib.md5(b'image').hexdigest()
+            )
+
+        mock_download_image.side_effect = download_image
+
+        image_file = self.obs_result._get_image()
+
+        assert image_file == tmpdir.join(
+            '815', 'image.x86_64-1.0.0-Build1.1.raw.xz'
+        ).strpath
+        mock_get_image_checksum.assert_called_once_with(
+            'image.x86_64-1.0.0-Build1.1'
+        )
+        self.obs_result.scheduler.download_slot.assert_called_once_with()
+        assert self.obs_result.image_metadata['size'] == 5
+        assert self.obs_result.image_metadata['sha256'] == \
+            hashlib.sha256(b'image').hexdigest()
+        assert self.obs_result.image_metadata['md5'] == \
+            hashlib.md5(b'image').hexdigest()
+
+        # Second job for the same build links the cached image
+        self.obs_result.download_directory = tmpdir.join('816').strpath
+        image_file = self.obs_result._get_image()
+
+        assert mock_download_image.call_count == 1
+        assert self.downloader.get_image.call_count == 0
+        assert os.stat(image_file).st_nlink == 3
+        assert self.obs_result.image_metadata['md5'] == \
+            hashlib.md5(b'image').hexdigest()
+        self.log_callback.info.assert_called_with(
+            'Using cached image: image.x86_64-1.0.0-Build1.1'
+        )
+
+    @patch('mash.services.obs.build_result.datetime')
+    @patch('mash.services.obs.build_result.time')
+    def test_check_image_conditions(self, mock_time, mock_datetime):
+        mock_datetime.utcnow.return_value = datetime(2020, 1, 1)
+        mock_time.time.side_effect = [0, 10, 160]
+        self.obs_result.scheduler = Mock()
+        self.downloader.check_all_conditions.side_effect = [
+            OBSImageConditionsException('Image conditions not met'),
+            None
+        ]
+
+        assert not self.obs_result._check_image_conditions()
+        self.downloader.reset_base_file_name.assert_called_once_with()
+        self.obs_result.scheduler.add_job.assert_called_once_with(
+            '815',
+            self.obs_result._update_image_status,
+            run_date=datetime(2020, 1, 1, 0, 2, 30)
+        )
+        assert self.obs_result.job == \
+            self.obs_result.scheduler.add_job.return_value
+        self.log_callback.warning.assert_called_once_with(
+            'Image conditions not met, retrying in 150 seconds...'
+        )
+        assert self.obs_result.conditions_deadline == 900
+
+        # The rescheduled job finds the conditions met
+        assert self.obs_result._check_image_conditions()
+        assert self.obs_result.conditions_deadline is None
+
+        # A deleted job is not rescheduled
+        mock_time.time.side_effect = [1000, 1010]
+        self.downloader.check_all_conditions.side_effect = \
+            OBSImageConditionsException('Image conditions not met')
+        self.obs_result.job_deleted = True
+
+        assert not self.obs_result._check_image_conditions()
+        assert self.obs_result.scheduler.add_job.call_count == 1
 
+        # Conditions not met within the wait time
+        mock_time.time.side_effect = [1910]
+
+        with raises(OBSImageConditionsException):
+            self.obs_result._check_image_conditions()
+
+        assert self.obs_result.conditions_deadline is None
+
+    @patch('mash.services.obs.build_result.datetime')
+    def test_check_image_conditions_obs_img_util(self, mock_datetime, tmpdir):
+        mock_datetime.utcnow.return_value = datetime(2020, 1, 1)
+        report = os.path.join(str(tmpdir), 'image.report')
+
+        with open(report, 'w') as report_file:
+            report_file.write(
+                '<report buildtime="1601061355">'
+                '<binary name="kernel" version="5.3" release="1"'
+                ' arch="x86_64" license="GPL-2.0"/>'
+                '<binary name="vim" version="8.2" release="2"'
+                ' arch="x86_64" license="Vim"/>'
+                '</report>'
+            )
+
+        # Uses the conditions of the real downloader
+        obs_result = OBSImageBuildResult(
+            '815', 'job_file', 'obs_project', 'obs_package', 'publish',
+            self.logger, conditions=[{'version': '1.0.1'}],
+            download_directory=str(tmpdir)
+        )
+        obs_result.scheduler = Mock()
+
+        remote = Mock()
+        remote.fetch_file_name.side_effect = [
+            ('obs_package.x86_64-1.0.0-Build1.1.', 'raw.xz'),
+            ('obs_package.x86_64-1.0.1-Build1.2.', 'raw.xz')
+        ]
+        remote.fetch_to_dir.return_value = report
+        obs_result.downloader.remote = remote
+
+        assert not obs_result._check_image_conditions()
+        assert obs_result.scheduler.add_job.call_count == 1
+
+        # The rescheduled job looks up the new build
+        assert obs_result._check_image_conditions()
+        assert obs_result.downloader.base_file_name == \
+            'obs_package.x86_64-1.0.1-Build1.2.'
+        assert obs_result.downloader.image_ext == 'raw.xz'
+        assert obs_result.downloader.build_time == '1601061355'
+
+    @patch('obs_img_utils.utils.time.sleep')
+    @patch('mash.services.obs.build_result.get_checksum_from_file')
+    def test_get_image_checksum(self, mock_get_checksum_from_file, mock_sleep):
+        mock_get_checksum_from_file.return_value = 'abc'
+        self.downloader.remote.fetch_to_dir.return_value = \
+            '/images/815/image.sha256'
+
+        assert self.obs_result._get_image_checksum('image') == 'abc'
+        assert self.downloader.remote.fetch_to_dir.mock_calls == [
+            call(
+                'image',
+                self.downloader.base_regex,
+                self.obs_result.download_directory,
+                self.downloader.checksum_extensions
+            ),
+            call(
+                'image',
+                self.downloader.base_regex,
+                self.obs_result.download_directory,
+                self.downloader.signature_extensions
+            )
+        ]
+        mock_get_checksum_from_file.assert_called_once_with(
+            '/images/815/image.sha256'
+        )
+
+        # A missing checksum is retried before the job fails
+        self.downloader.remote.fetch_to_dir.reset_mock()
+        self.downloader.remote.fetch_to_dir.return_value = None
+
+        with raises(MashImageDownloadException):
+            self.obs_result._get_image_checksum('image')
+
+        assert self.downloader.remote.fetch_to_dir.call_count == 8
+        assert mock_sleep.call_count == 3
+
+    @patch.object(OBSImageBuildResult, '_get_image')
     @patch.object(OBSImageBuildResult, '_result_callback')
     def test_update_image_status_raises(
-        self, mock_result_callback
+        self, mock_result_callback, mock_get_image
     ):
-        self.downloader.get_image.side_effect = Exception(
+        mock_get_image.side_effect = Exception(
             'request error'
         )
         self.obs_result._update_image_status()
@@ -142,6 +370,51 @@ class TestOBSImageBuildResult(object):
             call('Exception: request error')
         ]
 
+    @patch('mash.services.obs.build_result.ParallelDownload')
+    def test_download_image(self, mock_parallel_download):
+        download = Mock()
+        download.download.return_value = '/images/cache/image.raw.xz'
+        download.image_hash.hexdigest.return_value = 'sha'
+        download.image_md5.hexdigest.return_value = 'md5'
+        mock_parallel_download.return_value = download
+        self.downloader.image_ext = 'raw.xz'
+
+        assert self.obs_result._download_image(
+            '/images/cache', 'image.', 'abc'
+        ) == ('/images/cache/image.raw.xz', 'sha', 'md5')
+        mock_parallel_download.assert_called_once_with(
+            'obs_project/image.raw.xz',
+            '/images/cache/image.raw.xz',
+            'abc',
+            connections=1,
+            chunk_size=16777216,
+            progress_callback=self.obs_result.progress_callback
+        )
+        assert self.downloader.get_image.call_count == 0
+
+    @patch('obs_img_utils.utils.time.sleep')
+    @patch('mash.services.obs.build_result.ParallelDownload')
+    def test_download_image_retry(self, mock_parallel_download, mock_sleep):
+        failed = Mock()
+        failed.download.side_effect = MashImageDownloadException(
+            'Image checksum of obs_project/image.raw.xz does not match '
+            'expected value.'
+        )
+        download = Mock()
+        download.download.return_value = '/images/cache/image.raw.xz'
+        download.image_hash.hexdigest.return_value = 'sha'
+        download.image_md5.hexdigest.return_value = 'md5'
+        mock_parallel_download.side_effect = [failed, download]
+        self.downloader.image_ext = 'raw.xz'
+
+        assert self.obs_result._download_image(
+            '/images/cache', 'image.', 'abc'
+        ) == ('/images/cache/image.raw.xz', 'sha', 'md5')
+
+        # Every attempt starts with new digests
+        assert mock_parallel_download.call_count == 2
+        mock_sleep.assert_called_once_with(3)
+
     def test_progress_callback(self):
         self.obs_result.progress_callback(0, 0, 0, done=True)
         self.log_callback.info.assert_called_once_with(
@@ -0,0 +1,25 @@
+from mash.services.obs.config import OBSConfig
+
+
+class TestOBSConfig(object):
+    def setup(self):
+        self.empty_config = OBSConfig('test/data/empty_mash_config.yaml')
+        self.config = OBSConfig('test/data/mash_config.yaml')
+
+    def test_get_max_downloads(self):
+        assert self.config.get_max_downloads() == 2
+        assert self.empty_config.get_max_downloads() == 4
+
+    def test_get_metrics_interval(self):
+        assert self.config.get_metrics_interval() == 0
+        assert self.empty_config.get_metrics_interval() == 300
+
+    def test_get_poll_ttl(self):
+        assert self.empty_config.get_poll_ttl() == 60
+
+    def test_get_download_connections(self):
+        assert self.config.get_download_connections() == 4
+        assert self.empty_config.get_download_connections() == 1
+
+    def test_get_download_chunk_size(self):
+        assert self.empty_config.get_download_chunk_size() == 16777216
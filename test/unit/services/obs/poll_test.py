@@ -0,0 +1,165 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import Mock
+
+from obs_img_utils.api import OBSImageUtil
+from pytest import fixture
+
+from mash.services.obs.poll import CachedWebContent, OBSPollCoordinator
+
+IMAGE = 'image.x86_64-1.0.0-Build1.1.raw.xz'
+CHECKSUM = ''.join([IMAGE, '.sha256'])
+
+
+class BuildServiceHandler(BaseHTTPRequestHandler):
+    """
+    Serves a build service image listing and checksum.
+    """
+    def do_GET(self):
+        self.server.requests.append(self.path)
+
+        if self.path == '/images':
+            body = ''.join([
+                '<html><body>',
+                '<a href="{0}">{0}</a>'.format(IMAGE),
+                '<a href="{0}">{0}</a>'.format(CHECKSUM),
+                '</body></html>'
+            ]).encode()
+        elif self.path == '/images/' + CHECKSUM:
+            body = 'abc123  {0}\n'.format(IMAGE).encode()
+        else:
+            body = b'<html></html>'
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@fixture
+def build_service():
+    server = HTTPServer(('127.0.0.1', 0), BuildServiceHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def poll_jobs(download_url, target_dir, jobs, poll_coordinator=None):
+    """
+    Resolve the image build and checksum like each OBS job does.
+    """
+    checksums = []
+
+    for job in range(jobs):
+        downloader = OBSImageUtil(
+            download_url,
+            'image',
+            target_directory=target_dir,
+            log_callback=Mock()
+        )
+
+        if poll_coordinator:
+            downloader.remote = poll_coordinator.get_remote(download_url)
+
+        checksums.append(
+            downloader._get_image_checksum(downloader.base_file_name)
+        )
+
+    return checksums
+
+
+def test_poll_coordinator_coalesces_requests(build_service, tmpdir):
+    download_url = 'http://127.0.0.1:{0}/images'.format(
+        build_service.server_port
+    )
+
+    checksums = poll_jobs(download_url, tmpdir.strpath, 5)
+    uncoalesced = len(build_service.requests)
+    assert checksums == ['abc123'] * 5
+
+    build_service.requests = []
+    poll_coordinator = OBSPollCoordinator(60)
+    checksums = poll_jobs(
+        download_url, tmpdir.strpath, 5, poll_coordinator
+    )
+    assert checksums == ['abc123'] * 5
+
+    # Listings and checksum are fetched once instead of once per job
+    assert uncoalesced == 25
+    assert len(build_service.requests) == 4
+    assert poll_coordinator.get_metrics()['hits'] > 0
+    assert poll_coordinator.get_remote(download_url) is \
+        poll_coordinator.get_remote(download_url)
+
+
+def test_poll_coordinator_release_remote(build_service, tmpdir):
+    download_url = 'http://127.0.0.1:{0}/images'.format(
+        build_service.server_port
+    )
+    poll_coordinator = OBSPollCoordinator(60)
+    remote = poll_coordinator.get_remote(download_url)
+    assert poll_coordinator.get_remote(download_url) is remote
+    remote.fetch_index_list('image')
+
+    # The remote is kept until the last job releases it
+    poll_coordinator.release_remote(download_url)
+    assert poll_coordinator.remotes == {download_url: remote}
+    assert list(remote.locks) == [('index', 'image')]
+
+    poll_coordinator.release_remote(download_url)
+    assert poll_coordinator.remotes == {}
+    assert poll_coordinator.references == {}
+    assert remote.cache == {}
+    assert remote.locks == {}
+    assert poll_coordinator.get_metrics() == {'fetches': 1, 'hits': 0}
+
+    # Releasing an unknown download url is ignored
+    poll_coordinator.release_remote(download_url)
+    assert poll_coordinator.get_remote(download_url) is not remote
+
+
+def test_cached_web_content_ttl(build_service, tmpdir):
+    download_url = 'http://127.0.0.1:{0}/images'.format(
+        build_service.server_port
+    )
+    remote = CachedWebContent(download_url, 0)
+
+    assert remote.fetch_index_list('image') == [IMAGE, CHECKSUM]
+    assert remote.fetch_index_list('image') == [IMAGE, CHECKSUM]
+    assert build_service.requests == ['/images', '/images']
+
+    # Missing files are cached as None
+    remote.ttl = 60
+    assert remote.fetch_to_dir(
+        'image', r'^image', tmpdir.strpath, ['asc']
+    ) is None
+    assert remote.fetch_to_dir(
+        'image', r'^image', tmpdir.strpath, ['asc']
+    ) is None
+    assert remote.get_metrics()['hits'] == 1
+
+
+def test_cached_web_content_image_download(build_service, tmpdir):
+    download_url = 'http://127.0.0.1:{0}/images'.format(
+        build_service.server_port
+    )
+    remote = CachedWebContent(download_url, 60)
+    callback = Mock()
+
+    for attempt in range(2):
+        image_file = remote.fetch_to_dir(
+            'image', r'^image', tmpdir.strpath, ['raw.xz'], callback
+        )
+
+    assert image_file == tmpdir.join(IMAGE).strpath
+    assert build_service.requests.count('/images/' + IMAGE) == 2
+    assert build_service.requests.count('/images') == 1
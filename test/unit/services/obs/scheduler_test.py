@@ -0,0 +1,76 @@
+import threading
+
+from unittest.mock import Mock
+
+from mash.services.obs.scheduler import OBSJobScheduler
+
+
+class TestOBSJobScheduler(object):
+    def setup(self):
+        self.scheduler = OBSJobScheduler(2, 1)
+
+    def teardown(self):
+        if self.scheduler.scheduler.running:
+            self.scheduler.shutdown()
+
+    def test_run_job(self):
+        done = threading.Event()
+        metrics = {}
+
+        def job():
+            metrics.update(self.scheduler.get_metrics())
+            done.set()
+
+        self.scheduler.start()
+        self.scheduler.add_job('1', job)
+
+        assert done.wait(5)
+        assert metrics['running'] == 1
+        assert metrics['queued'] == 0
+
+    def test_remove_job(self):
+        func = Mock()
+        self.scheduler.add_job('1', func, run_date='2100-01-01')
+        self.scheduler.add_job('1', func, run_date='2100-01-01')
+        assert self.scheduler.get_metrics()['queued'] == 1
+
+        assert self.scheduler.remove_job('1')
+        assert not self.scheduler.remove_job('1')
+        assert self.scheduler.get_metrics()['queued'] == 0
+
+    def test_download_slot(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def download():
+            with self.scheduler.download_slot():
+                started.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=download)
+        thread.start()
+        started.wait(5)
+
+        waiting = threading.Thread(target=download)
+        waiting.start()
+
+        while self.scheduler.get_metrics()['waiting'] != 1:
+            waiting.join(0.01)
+
+        assert self.scheduler.get_metrics()['downloading'] == 1
+
+        release.set()
+        thread.join(5)
+        waiting.join(5)
+
+        assert self.scheduler.get_metrics() == {
+            'queued': 0,
+            'running': 0,
+            'waiting': 0,
+            'downloading': 0
+        }
+
+    def test_add_interval_job(self):
+        func = Mock()
+        job = self.scheduler.add_interval_job(func, 60)
+        assert job.trigger.interval.total_seconds() == 60
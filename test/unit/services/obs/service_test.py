@@ -13,6 +13,8 @@ from mash.services.mash_service import MashService
 
 class TestOBSImageBuildResultService(object):
 
+    @patch('mash.services.obs.service.OBSPollCoordinator')
+    @patch('mash.services.obs.service.OBSJobScheduler')
     @patch('mash.services.obs.service.os.makedirs')
     @patch('mash.services.obs.service.setup_logfile')
     @patch.object(OBSImageBuildResultService, '_process_message')
@@ -26,10 +28,25 @@ class TestOBSImageBuildResultService(object):
         self, mock_register, mock_log, mock_listdir, mock_MashService,
         mock_restart_jobs, mock_send_job_result_for_upload,
         mock_process_message,
-        mock_setup_logfile, mock_makedirs
+        mock_setup_logfile, mock_makedirs, mock_scheduler,
+        mock_poll_coordinator
     ):
+        self.scheduler = Mock()
+        mock_scheduler.return_value = self.scheduler
+        self.poll_coordinator = Mock()
+        self.poll_coordinator.get_metrics.return_value = {
+            'fetches': 4, 'hits': 20
+        }
+        mock_poll_coordinator.return_value = self.poll_coordinator
+
         config = Mock()
         config.get_log_file.return_value = 'logfile'
+        config.get_base_thread_pool_count.return_value = 10
+        config.get_max_downloads.return_value = 2
+        config.get_metrics_interval.return_value = 300
+        config.get_poll_ttl.return_value = 30
+        config.get_download_connections.return_value = 4
+        config.get_download_chunk_size.return_value = 1048576
         config.get_job_directory.return_value = '/var/lib/mash/obs_jobs/'
         self.log = Mock()
         mock_listdir.return_value = ['job']
@@ -53,6 +70,12 @@ class TestOBSImageBuildResultService(object):
         self.obs_result.post_init()
 
         config.get_job_directory.assert_called_once_with('obs')
+        mock_scheduler.assert_called_once_with(10, 2)
+        self.scheduler.add_interval_job.assert_called_once_with(
+            self.obs_result._log_metrics, 300
+        )
+        self.scheduler.start.assert_called_once_with()
+        mock_poll_coordinator.assert_called_once_with(30)
         mock_makedirs.assert_called_once_with(
             '/var/lib/mash/obs_jobs/', exist_ok=True
         )
@@ -75,6 +98,31 @@ class TestOBSImageBuildResultService(object):
 
         self.obs_result.channel.start_consuming.side_effect = KeyboardInterrupt()
         self.obs_result.post_init()
+        self.scheduler.shutdown.assert_called_with()
+
+        # Metrics logging is disabled
+        self.scheduler.add_interval_job.reset_mock()
+        config.get_metrics_interval.return_value = 0
+        self.obs_result.post_init()
+        assert self.scheduler.add_interval_job.call_count == 0
+
+    def test_log_metrics(self):
+        self.obs_result.scheduler = self.scheduler
+        self.obs_result.poll_coordinator = self.poll_coordinator
+        self.scheduler.get_metrics.return_value = {
+            'queued': 0, 'running': 0, 'waiting': 0, 'downloading': 0
+        }
+        self.obs_result._log_metrics()
+        assert self.log.info.call_count == 0
+
+        self.scheduler.get_metrics.return_value = {
+            'queued': 3, 'running': 2, 'waiting': 1, 'downloading': 1
+        }
+        self.obs_result._log_metrics()
+        self.log.info.assert_called_once_with(
+            'Jobs queued: 3, running: 2, waiting for download: 1, '
+            'downloading: 1, build service fetches: 4, cached: 20'
+        )
 
     @patch.object(MashService, '_publish')
     @patch.object(OBSImageBuildResultService, '_delete_job')
@@ -203,18 +251,27 @@ class TestOBSImageBuildResultService(object):
         }
         job_worker = Mock()
         job_worker.job_file = 'job_file'
+        job_worker.download_url = 'obs_project'
         self.obs_result.jobs = {'815': job_worker}
         assert self.obs_result._delete_job('815') == {
             'message': 'Job Deleted', 'ok': True
         }
         mock_os_remove.assert_called_once_with('job_file')
         job_worker.stop_watchdog.assert_called_once_with()
+        self.poll_coordinator.release_remote.assert_called_once_with(
+            'obs_project'
+        )
         assert '815' not in self.obs_result.jobs
+        # The job is stopped and its remote released if the job
+        # file can not be removed
         self.obs_result.jobs = {'815': job_worker}
         mock_os_remove.side_effect = Exception('remove_error')
         assert self.obs_result._delete_job('815') == {
             'message': 'Job deletion failed: remove_error', 'ok': False
         }
+        assert job_worker.stop_watchdog.call_count == 2
+        assert self.poll_coordinator.release_remote.call_count == 2
+        assert '815' not in self.obs_result.jobs
 
     @patch('mash.services.obs.service.OBSImageBuildResult')
     def test_start_job_with_conditions(self, mock_OBSImageBuildResult):
@@ -253,7 +310,7 @@ class TestOBSImageBuildResultService(object):
             self.obs_result._send_job_result_for_upload
         )
         job_worker.start_watchdog.assert_called_once_with(
-            isotime=None
+            self.scheduler, isotime=None
         )
 
     @patch('mash.services.obs.service.OBSImageBuildResult')
@@ -271,8 +328,12 @@ class TestOBSImageBuildResultService(object):
         }
         self.obs_result._start_job(data)
         job_worker.start_watchdog.assert_called_once_with(
-            isotime=None
+            self.scheduler, isotime=None
         )
+        kwargs = mock_OBSImageBuildResult.call_args[1]
+        assert kwargs['poll_coordinator'] == self.poll_coordinator
+        assert kwargs['download_connections'] == 4
+        assert kwargs['download_chunk_size'] == 1048576
 
     @patch('mash.services.obs.service.OBSImageBuildResult')
     def test_start_job_at_utctime(self, mock_OBSImageBuildResult):
@@ -289,5 +350,5 @@ class TestOBSImageBuildResultService(object):
         }
         self.obs_result._start_job(data)
         job_worker.start_watchdog.assert_called_once_with(
-            isotime='2017-10-11T17:50:26+00:00'
+            self.scheduler, isotime='2017-10-11T17:50:26+00:00'
         )
@@ -24,6 +24,8 @@ class TestEC2PublishJob(object):
         }
 
         self.config = Mock()
+        self.config.get_region_max_workers.return_value = 8
+        self.config.get_continue_on_region_error.return_value = False
         self.job = EC2PublishJob(self.job_config, self.config)
         self.job._log_callback = Mock()
         self.job.credentials = {
@@ -44,7 +46,7 @@ class TestEC2PublishJob(object):
         with raises(MashPublishException):
             EC2PublishJob(self.job_config, self.config)
 
-    @patch('mash.services.publish.ec2_job.EC2PublishImage')
+    @patch('mash.services.publish.ec2_job.CachedEC2PublishImage')
     def test_publish(self, mock_ec2_publish_image):
         publish = Mock()
         mock_ec2_publish_image.return_value = publish
@@ -59,8 +61,11 @@ class TestEC2PublishJob(object):
 
         assert publish.publish_images.call_count == 1
         assert self.job.status == 'success'
+        self.job._log_callback.info.assert_called_once_with(
+            'Published image image_name_123 in us-east-2.'
+        )
 
-    @patch('mash.services.publish.ec2_job.EC2PublishImage')
+    @patch('mash.services.publish.ec2_job.CachedEC2PublishImage')
     def test_publish_exception(
         self, mock_ec2_publish_image
     ):
@@ -73,3 +78,39 @@ class TestEC2PublishJob(object):
         with raises(MashPublishException) as e:
             self.job.run_job()
         assert msg == str(e.value)
+
+    @patch('mash.services.publish.ec2_job.CachedEC2PublishImage')
+    def test_publish_continue_on_error(self, mock_ec2_publish_image):
+        self.job.continue_on_error = True
+        self.job.publish_regions[0]['target_regions'] = [
+            'us-east-1', 'us-east-2', 'us-west-1'
+        ]
+        publishers = {}
+
+        def get_publisher(**kwargs):
+            publish = Mock()
+
+            def set_region(region):
+                publishers[region] = publish
+                if region != 'us-east-2':
+                    publish.publish_images.side_effect = Exception('Failed.')
+
+            publish.set_region.side_effect = set_region
+            return publish
+
+        mock_ec2_publish_image.side_effect = get_publisher
+
+        self.job.run_job()
+
+        assert sorted(publishers) == ['us-east-1', 'us-east-2', 'us-west-1']
+        for publish in publishers.values():
+            assert publish.publish_images.call_count == 1
+
+        assert self.job.status == 'failed'
+        assert self.job.status_msg['errors'] == [
+            'An error publishing image image_name_123 in us-east-1. Failed.',
+            'An error publishing image image_name_123 in us-west-1. Failed.'
+        ]
+        self.job._log_callback.info.assert_called_once_with(
+            'Published image image_name_123 in us-east-2.'
+        )
@@ -43,15 +43,15 @@ class TestEC2ReplicateJob(object):
         with raises(MashReplicateException):
             EC2ReplicateJob(self.job_config, self.config)
 
-    @patch('mash.services.replicate.ec2_job.time')
-    @patch.object(EC2ReplicateJob, '_wait_on_image')
+    @patch('mash.services.replicate.ec2_job.EC2ReplicationTracker')
     @patch.object(EC2ReplicateJob, '_replicate_to_region')
     def test_replicate(
-        self, mock_replicate_to_region,
-        mock_wait_on_image, mock_time
+        self, mock_replicate_to_region, mock_tracker
     ):
+        tracker = Mock()
+        tracker.wait.return_value = {'us-east-2': 'Broken!'}
+        mock_tracker.return_value = tracker
         mock_replicate_to_region.return_value = 'ami-54321'
-        mock_wait_on_image.side_effect = Exception('Broken!')
 
         self.job.run_job()
 
@@ -67,14 +67,24 @@ class TestEC2ReplicateJob(object):
             self.job.credentials['test-aws'], 'ami-12345',
             'us-east-1', 'us-east-2'
         )
-        mock_wait_on_image.assert_called_once_with(
-            self.job.credentials['test-aws']['access_key_id'],
-            self.job.credentials['test-aws']['secret_access_key'],
+        tracker.add_image.assert_called_once_with(
+            'us-east-2',
             'ami-54321',
-            'us-east-2'
+            self.job.credentials['test-aws']['access_key_id'],
+            self.job.credentials['test-aws']['secret_access_key']
         )
         assert self.job.status == FAILED
 
+        # Image already exists in the target region
+        tracker.reset_mock()
+        tracker.wait.return_value = {}
+        mock_replicate_to_region.return_value = None
+
+        self.job.run_job()
+
+        assert tracker.add_image.call_count == 0
+        assert self.job.status == 'success'
+
     @patch.object(EC2ReplicateJob, 'image_exists')
     @patch('mash.services.replicate.ec2_job.get_client')
     def test_replicate_to_region(
@@ -97,7 +107,8 @@ class TestEC2ReplicateJob(object):
         )
         mock_image_exists.assert_called_once_with(
             client,
-            'My image'
+            'My image',
+            ('123456', 'us-east-2')
         )
         client.copy_image.assert_called_once_with(
             Description=self.job.image_description,
@@ -142,58 +153,6 @@ class TestEC2ReplicateJob(object):
 
         assert msg == str(e.value)
 
-    @patch('mash.services.replicate.ec2_job.get_client')
-    def test_replicate_wait_on_image(self, mock_get_client):
-        client = Mock()
-        client.describe_images.return_value = {
-            'Images': [{'State': 'available'}]
-        }
-        mock_get_client.return_value = client
-
-        self.job._wait_on_image(
-            self.job.credentials['test-aws']['access_key_id'],
-            self.job.credentials['test-aws']['secret_access_key'],
-            'ami-54321',
-            'us-east-2'
-        )
-
-        mock_get_client.assert_called_once_with(
-            'ec2', '123456', '654321', 'us-east-2'
-        )
-        client.describe_images.assert_called_once_with(
-            Owners=['self'],
-            ImageIds=['ami-54321']
-        )
-
-    @patch('mash.services.replicate.ec2_job.time')
-    @patch('mash.services.replicate.ec2_job.get_client')
-    def test_replicate_wait_on_image_exception(
-        self, mock_get_client, mock_sleep
-    ):
-        client = Mock()
-        client.describe_images.side_effect = [
-            KeyError('Images'),
-            {'Images': [{'State': 'pending'}]},
-            {'Images': [{'State': 'failed'}]}
-        ]
-        mock_get_client.return_value = client
-
-        with raises(MashReplicateException):
-            self.job._wait_on_image(
-                self.job.credentials['test-aws']['access_key_id'],
-                self.job.credentials['test-aws']['secret_access_key'],
-                'ami-54321',
-                'us-east-2'
-            )
-
-        with raises(MashReplicateException):
-            self.job._wait_on_image(
-                self.job.credentials['test-aws']['access_key_id'],
-                self.job.credentials['test-aws']['secret_access_key'],
-                'ami-54321',
-                'us-east-2'
-            )
-
     def test_replicate_image_exists(self):
         images = {'Images': []}
         client = Mock()
@@ -12,3 +12,11 @@ class TestTestConfig(object):
 
     def test_get_img_proof_timeout(self):
         assert self.empty_config.get_img_proof_timeout() == 600
+
+    def test_get_ec2_max_instances_per_account(self):
+        assert self.config.get_ec2_max_instances_per_account() == 5
+        assert self.empty_config.get_ec2_max_instances_per_account() == 20
+
+    def test_get_gce_zone_probes(self):
+        assert self.config.get_gce_zone_probes() == 2
+        assert self.empty_config.get_gce_zone_probes() == 1
@@ -1,8 +1,11 @@
+import json
 import pytest
 
+from concurrent.futures import wait
 from unittest.mock import call, Mock, patch
 
-from mash.services.test.ec2_job import EC2TestJob
+from mash.services.test import ec2_job
+from mash.services.test.ec2_job import EC2TestJob, get_instance_slots
 from mash.mash_exceptions import MashTestException
 
 
@@ -25,6 +28,8 @@ class TestEC2TestJob(object):
         self.config.get_ssh_private_key_file.return_value = \
             'private_ssh_key.file'
         self.config.get_img_proof_timeout.return_value = None
+        self.config.get_region_max_workers.return_value = 8
+        self.config.get_ec2_max_instances_per_account.return_value = 20
 
     def test_test_ec2_missing_key(self):
         del self.job_config['test_regions']
@@ -94,7 +99,14 @@ class TestEC2TestJob(object):
             }
         }
         job.status_msg['source_regions'] = {'us-east-1': 'ami-123'}
+
+        def cleanup_image(*args, **kwargs):
+            # The test instance is terminated first
+            assert all(future.done() for future in job.cleanup_futures)
+
+        mock_cleanup_image.side_effect = cleanup_image
         job.run_job()
+        wait(job.cleanup_futures)
 
         client.import_key_pair.assert_called_once_with(
             KeyName='random_name', PublicKeyMaterial='fakekey'
@@ -131,6 +143,9 @@ class TestEC2TestJob(object):
             sev_capable=None
         )
         client.delete_key_pair.assert_called_once_with(KeyName='random_name')
+        client.get_waiter.return_value.wait.assert_called_once_with(
+            InstanceIds=['i-123456789']
+        )
         mock_cleanup_image.assert_called_once_with(
             '123',
             '321',
@@ -143,12 +158,18 @@ class TestEC2TestJob(object):
         # Failed job test
         mock_test_image.side_effect = Exception('Tests broken!')
         job.run_job()
+        assert job.status == 'failed'
         job._log_callback.warning.assert_has_calls([
             call('Image tests failed in region: us-east-1.')
         ])
         assert 'Tests broken!' in job._log_callback.error.mock_calls[0][1][0]
+        assert job._log_callback.error.call_count == 1
+        assert job.status_msg['errors'] == ['Tests broken!']
         assert ec2_setup.clean_up.call_count == 2
 
+        # Cleanup futures are reset for each run
+        assert job.cleanup_futures == []
+
         # Failed key cleanup
         client.delete_key_pair.side_effect = Exception('Cannot delete key!')
         job.run_job()
@@ -186,3 +207,168 @@ class TestEC2TestJob(object):
         }
         job.status_msg['source_regions'] = {'cn-east-1': 'ami-123'}
         job.run_job()
+
+    @patch('mash.services.test.ec2_job.setup_ec2_networking')
+    @patch('mash.services.test.ec2_job.img_proof_test')
+    @patch('mash.services.test.ec2_job.os')
+    def test_run_test_partitions(
+        self, mock_os, mock_img_proof_test, mock_setup_ec2_networking
+    ):
+        mock_os.path.exists.return_value = True
+        self.job_config['cleanup_images'] = False
+        self.job_config['test_regions']['cn-north-1'] = {
+            'account': 'test-aws-cn', 'partition': 'aws-cn'
+        }
+
+        def img_proof_test(region, **kwargs):
+            return {
+                'status': 'success',
+                'tests': [region],
+                'summary': {'passed': 1}
+            }
+
+        mock_img_proof_test.side_effect = img_proof_test
+
+        job = EC2TestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        job.credentials = {
+            'test-aws': {'access_key_id': '123', 'secret_access_key': '321'},
+            'test-aws-cn': {'access_key_id': '456', 'secret_access_key': '654'}
+        }
+        job.status_msg['source_regions'] = {
+            'us-east-1': 'ami-123',
+            'cn-north-1': 'ami-456'
+        }
+        job.run_job()
+
+        assert job.status == 'success'
+        assert mock_img_proof_test.call_count == 2
+        assert mock_setup_ec2_networking.return_value.__exit__.call_count == 2
+        assert job.cleanup_futures == []
+
+        # Results are applied in region order
+        assert json.loads(job.status_msg['test_results']) == {
+            'tests': ['cn-north-1'],
+            'summary': {'passed': 1}
+        }
+        assert set(job.region_results) == {'us-east-1', 'cn-north-1'}
+
+        # A failed partition does not add a second error message
+        def img_proof_test_failed(region, **kwargs):
+            status = 'failed' if region == 'us-east-1' else 'success'
+            return {
+                'status': status,
+                'tests': [region],
+                'summary': {status: 1}
+            }
+
+        mock_img_proof_test.side_effect = img_proof_test_failed
+        job.run_job()
+
+        assert job.status == 'failed'
+        assert mock_img_proof_test.call_count == 4
+        assert job.status_msg['errors'] == []
+
+        # The results of the failed partition are kept
+        assert json.loads(job.status_msg['test_results']) == {
+            'tests': ['us-east-1'],
+            'summary': {'failed': 1}
+        }
+        job._log_callback.warning.assert_called_once_with(
+            'Image tests failed in region: us-east-1.'
+        )
+
+    @patch('mash.services.test.ec2_job.cleanup_ec2_image')
+    @patch('mash.services.test.ec2_job.setup_ec2_networking')
+    @patch('mash.services.test.ec2_job.img_proof_test')
+    @patch('mash.services.test.ec2_job.os')
+    def test_run_test_networking_error(
+        self, mock_os, mock_img_proof_test, mock_setup_ec2_networking,
+        mock_cleanup_image
+    ):
+        mock_os.path.exists.return_value = True
+        mock_setup_ec2_networking.side_effect = Exception('No VPC quota')
+
+        job = EC2TestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        job.credentials = {
+            'test-aws': {'access_key_id': '123', 'secret_access_key': '321'}
+        }
+        job.status_msg['source_regions'] = {'us-east-1': 'ami-123'}
+        job.run_job()
+
+        assert job.status == 'failed'
+        assert mock_img_proof_test.call_count == 0
+        job._log_callback.error.assert_called_once_with(
+            'Error testing image in us-east-1. No VPC quota'
+        )
+        assert job.status_msg['errors'] == [
+            'Error testing image in us-east-1. No VPC quota'
+        ]
+        assert mock_cleanup_image.call_count == 1
+
+    @patch('mash.services.test.ec2_job.fan_out_regions')
+    @patch('mash.services.test.ec2_job.os')
+    def test_run_test_cancelled_partitions(
+        self, mock_os, mock_fan_out_regions
+    ):
+        mock_os.path.exists.return_value = True
+        self.job_config['cleanup_images'] = False
+        self.job_config['test_regions']['cn-north-1'] = {
+            'account': 'test-aws-cn', 'partition': 'aws-cn'
+        }
+        mock_fan_out_regions.return_value = [
+            (
+                ('us-east-1', self.job_config['test_regions']['us-east-1']),
+                'failed',
+                Exception('No VPC quota')
+            ),
+            (
+                ('cn-north-1', self.job_config['test_regions']['cn-north-1']),
+                'pending',
+                None
+            )
+        ]
+
+        job = EC2TestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        job.credentials = {
+            'test-aws': {'access_key_id': '123', 'secret_access_key': '321'},
+            'test-aws-cn': {'access_key_id': '456', 'secret_access_key': '654'}
+        }
+        job.run_job()
+
+        # Only the failed partition is reported
+        assert job.status == 'failed'
+        assert job.status_msg['errors'] == [
+            'Error testing image in us-east-1. No VPC quota'
+        ]
+        assert 'test_results' not in job.status_msg
+
+    def test_get_instance_slots(self):
+        with patch.object(ec2_job, '_instance_slots', {}):
+            slots = get_instance_slots('test-aws', 1)
+            assert slots.acquire(blocking=False)
+            assert not slots.acquire(blocking=False)
+
+            # A changed budget applies to the shared semaphore
+            assert get_instance_slots('test-aws', 2) is slots
+            assert slots.acquire(blocking=False)
+            assert get_instance_slots('test-aws-cn', 2) is not slots
+
+    @patch('mash.services.test.ec2_job.os')
+    def test_log_cleanup_error(self, mock_os):
+        mock_os.path.exists.return_value = True
+        job = EC2TestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        future = Mock()
+        future.exception.return_value = None
+
+        job._log_cleanup_error(future)
+        assert job._log_callback.warning.call_count == 0
+
+        future.exception.return_value = Exception('Subnet in use')
+        job._log_cleanup_error(future)
+        job._log_callback.warning.assert_called_once_with(
+            'Failed to cleanup test networking: Subnet in use'
+        )
@@ -3,6 +3,7 @@ import pytest
 from unittest.mock import call, Mock, patch
 
 from mash.services.test.gce_job import GCETestJob
+from mash.services.test.zone_health import zone_health
 from mash.mash_exceptions import MashTestException
 from img_proof.ipa_exceptions import IpaRetryableError
 
@@ -28,6 +29,8 @@ class TestGCETestJob(object):
         self.config.get_ssh_private_key_file.return_value = \
             'private_ssh_key.file'
         self.config.get_img_proof_timeout.return_value = None
+        self.config.get_gce_zone_probes.return_value = 1
+        zone_health.clear()
 
     def test_test_gce_missing_key(self):
         del self.job_config['account']
@@ -147,6 +150,7 @@ class TestGCETestJob(object):
             call('Failed to cleanup image: Unable to cleanup image!')
         ])
         assert 'Tests broken!' in job._log_callback.error.mock_calls[0][1][0]
+        assert job.status_msg['errors'][0] == 'Tests broken!'
 
     @patch('mash.services.test.gce_job.get_gce_compute_driver')
     @patch('mash.services.test.gce_job.get_gce_storage_driver')
@@ -167,7 +171,7 @@ class TestGCETestJob(object):
         tmp_file = Mock()
         tmp_file.name = '/tmp/acnt.file'
         mock_temp_file.return_value = tmp_file
-        mock_random.choice.side_effect = ['n1-standard-1', 'us-east1-c']
+        mock_random.choice.return_value = 'n1-standard-1'
         mock_os.path.exists.return_value = False
         mock_get_region_list.return_value = set(['us-west1-c', 'us-east1-c'])
         mock_test_image.side_effect = IpaRetryableError('quota exceeded')
@@ -254,6 +258,12 @@ class TestGCETestJob(object):
             )
         ])
 
+        # Both zones failed, a zone without failures goes first
+        assert zone_health.order(
+            None, ['us-west1-c', 'us-east1-c', 'us-central1-a'],
+            'n1-standard-1'
+        )[0] == 'us-central1-a'
+
     def test_test_run_gce_test_no_fallback_region(self):
         self.job_config['test_fallback_regions'] = []
         self.test_test_run_gce_test()
@@ -276,3 +286,130 @@ class TestGCETestJob(object):
         assert 'us-west1-b' in job.test_fallback_regions
 
         self.job_config['guest_os_features'] = None
+
+    @patch('mash.services.test.gce_job.get_gce_compute_driver')
+    @patch('mash.services.test.gce_job.os')
+    @patch('mash.services.test.gce_job.img_proof_test')
+    @patch('mash.utils.mash_utils.NamedTemporaryFile')
+    def test_test_run_zone_probes(
+        self, mock_temp_file, mock_img_proof_test, mock_os,
+        mock_get_compute_driver
+    ):
+        tmp_file = Mock()
+        tmp_file.name = '/tmp/acnt.file'
+        mock_temp_file.return_value = tmp_file
+        mock_os.path.exists.return_value = True
+        self.config.get_gce_zone_probes.return_value = 2
+        self.job_config['cleanup_images'] = False
+        self.job_config['instance_type'] = 'n1-standard-1'
+        self.job_config['test_fallback_regions'] = [
+            'us-east1-c', 'us-central1-a'
+        ]
+
+        def img_proof_test(region=None, **kwargs):
+            if region == 'us-east1-c':
+                raise IpaRetryableError('quota exceeded')
+
+            return {'status': 'success', 'instance_id': 'instance-abc'}
+
+        mock_img_proof_test.side_effect = img_proof_test
+
+        # The default zone recently failed, healthy zones go first
+        zone_health.record_failure(None, 'us-west1-c', 'n1-standard-1')
+
+        job = GCETestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        job.credentials = {
+            'test-gce': {'fake': '123', 'credentials': '321'},
+            'testacnt': {'fake': '123', 'credentials': '321'}
+        }
+        job.status_msg['cloud_image_name'] = 'ami-123'
+        job.run_job()
+
+        assert job.status == 'success'
+        regions = [
+            kwargs['region'] for args, kwargs in
+            mock_img_proof_test.call_args_list
+        ]
+        assert 'us-central1-a' in regions
+        assert 'us-west1-c' not in regions
+
+    @patch('mash.services.test.gce_job.os')
+    def test_probe_zones(self, mock_os):
+        mock_os.path.exists.return_value = True
+        job = GCETestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        probes = {}
+
+        def test_zone(zone, project, auth_file, firmware):
+            return probes[zone]
+
+        with patch.object(job, '_test_zone', side_effect=test_zone):
+            probes = {
+                'us-east1-c': ({'status': 'success'}, False, None),
+                'us-central1-a': ({'status': 'exception'}, True, None)
+            }
+            result = job._probe_zones(
+                ['us-east1-c', 'us-central1-a'], 'project', 'auth', None
+            )
+            assert result == ({'status': 'success'}, False, None)
+
+            # A failed probe takes precedence over a passing one
+            probes['us-central1-a'] = (
+                {'status': 'exception'}, False, 'Instance unreachable!'
+            )
+            result = job._probe_zones(
+                ['us-east1-c', 'us-central1-a'], 'project', 'auth', None
+            )
+            assert result == (
+                {'status': 'exception'}, False, 'Instance unreachable!'
+            )
+
+            # All zones rejected for capacity reasons
+            probes = {
+                'us-central1-a': ({'status': 'exception'}, True, None),
+                'us-west1-b': ({'status': 'exception'}, True, None)
+            }
+            result = job._probe_zones(
+                ['us-central1-a', 'us-west1-b'], 'project', 'auth', None
+            )
+            assert result == ({'status': 'exception'}, True, None)
+
+    @patch('mash.services.test.gce_job.get_gce_compute_driver')
+    @patch('mash.services.test.gce_job.os')
+    @patch('mash.services.test.gce_job.img_proof_test')
+    @patch('mash.utils.mash_utils.NamedTemporaryFile')
+    def test_test_run_zone_probes_failed(
+        self, mock_temp_file, mock_img_proof_test, mock_os,
+        mock_get_compute_driver
+    ):
+        tmp_file = Mock()
+        tmp_file.name = '/tmp/acnt.file'
+        mock_temp_file.return_value = tmp_file
+        mock_os.path.exists.return_value = True
+        self.config.get_gce_zone_probes.return_value = 2
+        self.job_config['cleanup_images'] = False
+        self.job_config['instance_type'] = 'n1-standard-2'
+        self.job_config['test_fallback_regions'] = ['us-east1-c']
+
+        def img_proof_test(region=None, **kwargs):
+            if region == 'us-east1-c':
+                return {'status': 'success', 'instance_id': 'instance-abc'}
+
+            raise Exception('Instance unreachable!')
+
+        mock_img_proof_test.side_effect = img_proof_test
+
+        job = GCETestJob(self.job_config, self.config)
+        job._log_callback = Mock()
+        job.credentials = {
+            'test-gce': {'fake': '123', 'credentials': '321'},
+            'testacnt': {'fake': '123', 'credentials': '321'}
+        }
+        job.status_msg['cloud_image_name'] = 'ami-123'
+        job.run_job()
+
+        # The image failed in one of the probed zones
+        assert mock_img_proof_test.call_count == 2
+        assert job.status == 'failed'
+        assert job.status_msg['errors'] == ['Instance unreachable!']
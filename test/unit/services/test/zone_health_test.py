@@ -0,0 +1,82 @@
+from unittest.mock import Mock, patch
+
+from mash.services.test.zone_health import ZoneHealthCache
+
+
+class TestZoneHealthCache(object):
+    def setup(self):
+        self.cache = ZoneHealthCache(half_life=10, zones_ttl=60)
+
+    @patch('mash.services.test.zone_health.time')
+    def test_score_decay(self, mock_time):
+        mock_time.monotonic.return_value = 0
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+        assert self.cache.score(
+            'project', 'us-west1-c', 'n1-standard-1'
+        ) == 2
+
+        mock_time.monotonic.return_value = 10
+        assert self.cache.score(
+            'project', 'us-west1-c', 'n1-standard-1'
+        ) == 1
+
+        mock_time.monotonic.return_value = 1000
+        assert self.cache.score(
+            'project', 'us-west1-c', 'n1-standard-1'
+        ) == 0
+        assert self.cache.scores == {}
+
+    @patch('mash.services.test.zone_health.time')
+    def test_success_clears_failures(self, mock_time):
+        mock_time.monotonic.return_value = 0
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+        self.cache.record_success('project', 'us-west1-c', 'n1-standard-1')
+        assert self.cache.score(
+            'project', 'us-west1-c', 'n1-standard-1'
+        ) == -1
+
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+        assert self.cache.score(
+            'project', 'us-west1-c', 'n1-standard-1'
+        ) == 1
+
+    def test_order(self):
+        zones = ['us-west1-c', 'us-east1-c', 'us-central1-a']
+        self.cache.record_failure('project', 'us-west1-c', 'n1-standard-1')
+
+        zones = self.cache.order(
+            'project', zones, 'n1-standard-1', preferred='us-central1-a'
+        )
+        assert zones[0] == 'us-central1-a'
+        assert zones[-1] == 'us-west1-c'
+
+        self.cache.record_success('project', 'us-west1-c', 'n1-standard-1')
+        assert self.cache.order(
+            'project', zones, 'n1-standard-1', preferred='us-west1-c'
+        )[0] == 'us-west1-c'
+
+        # A recently healthy zone ranks above zones without results
+        assert self.cache.order(
+            'project', zones, 'n1-standard-1'
+        )[0] == 'us-west1-c'
+        assert self.cache.order(
+            'project', zones, 'n1-standard-1', preferred='us-east1-c'
+        ) == ['us-east1-c', 'us-west1-c', 'us-central1-a']
+
+    @patch('mash.services.test.zone_health.time')
+    def test_get_zones(self, mock_time):
+        mock_time.monotonic.return_value = 0
+        loader = Mock(return_value={'us-west1-c'})
+
+        assert self.cache.get_zones('project', loader) == {'us-west1-c'}
+        assert self.cache.get_zones('project', loader) == {'us-west1-c'}
+        assert loader.call_count == 1
+
+        mock_time.monotonic.return_value = 60
+        self.cache.get_zones('project', loader)
+        assert loader.call_count == 2
+
+        self.cache.clear()
+        assert self.cache.zones == {}
@@ -102,7 +102,9 @@ class TestAzureUploadJob(object):
             'storage',
             credentials=self.credentials['test'],
             resource_group='group_name',
-            is_page_blob=True
+            is_page_blob=True,
+            checkpoint_file=None,
+            uncompressed_size=None
         )
 
         # Blob exists no force replace
@@ -115,3 +117,60 @@ class TestAzureUploadJob(object):
         self.job.run_job()
 
         assert mock_delete_blob.call_count == 1
+
+    @patch('mash.services.upload.azure_job.get_page_blob_checkpoint')
+    @patch('mash.services.upload.azure_job.delete_blob')
+    @patch('mash.services.upload.azure_job.blob_exists')
+    @patch('mash.services.upload.azure_job.upload_azure_file')
+    @patch('builtins.open')
+    def test_upload_resume(
+        self,
+        mock_open,
+        mock_upload_azure_file,
+        mock_blob_exists,
+        mock_delete_blob,
+        mock_get_checkpoint
+    ):
+        open_handle = MagicMock()
+        open_handle.__enter__.return_value = open_handle
+        mock_open.return_value = open_handle
+        mock_blob_exists.return_value = True
+        mock_get_checkpoint.return_value.upload_id = 'name v20200925.vhd'
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+
+        self.job.run_job()
+
+        mock_get_checkpoint.assert_called_once_with(
+            '/var/lib/mash/upload_jobs/job-1.checkpoint',
+            'file.vhdfixed.xz',
+            'storage',
+            'container',
+            'name v20200925.vhd'
+        )
+        assert mock_delete_blob.call_count == 0
+        self.job._log_callback.info.assert_any_call(
+            'Resuming upload of blob: name v20200925.vhd.'
+        )
+        assert mock_upload_azure_file.call_args[1]['checkpoint_file'] == \
+            '/var/lib/mash/upload_jobs/job-1.checkpoint'
+
+        # Checkpoint of a different upload does not replace the blob
+        mock_get_checkpoint.return_value.upload_id = None
+        mock_upload_azure_file.reset_mock()
+
+        with raises(MashUploadException):
+            self.job.run_job()
+
+        assert mock_upload_azure_file.call_count == 0
+        assert mock_delete_blob.call_count == 0
+
+    @patch('mash.services.upload.azure_job.remove_file')
+    def test_cleanup(self, mock_remove_file):
+        self.job.cleanup()
+        assert mock_remove_file.call_count == 0
+
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+        self.job.cleanup()
+        mock_remove_file.assert_called_once_with(
+            '/var/lib/mash/upload_jobs/job-1.checkpoint'
+        )
@@ -59,7 +59,9 @@ class TestAzureSASUploadJob(object):
             8,
             'storage',
             sas_token='sas_token',
-            is_page_blob=True
+            is_page_blob=True,
+            checkpoint_file=None,
+            uncompressed_size=None
         )
 
     @patch('mash.services.upload.azure_sas_job.upload_azure_file')
@@ -84,5 +86,18 @@ class TestAzureSASUploadJob(object):
             8,
             'storage',
             sas_token='sas_token',
-            is_page_blob=True
+            is_page_blob=True,
+            checkpoint_file=None,
+            uncompressed_size=None
+        )
+
+    @patch('mash.services.upload.azure_sas_job.remove_file')
+    def test_cleanup(self, mock_remove_file):
+        self.job.cleanup()
+        assert mock_remove_file.call_count == 0
+
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+        self.job.cleanup()
+        mock_remove_file.assert_called_once_with(
+            '/var/lib/mash/upload_jobs/job-1.checkpoint'
         )
@@ -23,3 +23,14 @@ class TestUploadConfig(object):
     def test_get_azure_max_workers(self):
         max_workers = self.config.get_azure_max_workers()
         assert 8 == max_workers
+
+    def test_get_part_size(self):
+        assert self.config.get_part_size() == 8388608
+        assert self.config_defaults.get_part_size() == 67108864
+
+    def test_get_max_workers(self):
+        assert self.config.get_max_workers() == 2
+        assert self.config_defaults.get_max_workers() == 4
+
+    def test_get_max_retry_attempts(self):
+        assert self.config_defaults.get_max_retry_attempts() == 3
@@ -114,6 +114,8 @@ class TestGCEUploadJob(object):
 
         self.job.run_job()
         assert mock_upload_image.call_count == 1
+        assert mock_upload_image.call_args[1]['get_backend'] == \
+            self.job._get_upload_backend
 
         # Tarball exists and no force replace
         mock_blob_exists.return_value = True
@@ -125,3 +127,22 @@ class TestGCEUploadJob(object):
         self.job.run_job()
 
         assert mock_delete_tarball.call_count == 1
+
+    @patch('mash.services.upload.gce_job.abort_upload')
+    @patch('mash.services.upload.gce_job.get_gce_storage_driver')
+    def test_cleanup(self, mock_get_storage_driver, mock_abort_upload):
+        driver = Mock()
+        mock_get_storage_driver.return_value = driver
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+        self.job.cleanup()
+
+        checkpoint_file, get_backend = mock_abort_upload.call_args[0]
+        assert checkpoint_file == '/var/lib/mash/upload_jobs/job-1.checkpoint'
+
+        backend = get_backend('images/sles-12-sp4-v20180909.tar.gz')
+        assert backend.object_name == 'sles-12-sp4-v20180909.tar.gz'
+        assert backend.bucket == driver.get_bucket.return_value
+        driver.get_bucket.assert_called_once_with('images')
+        mock_get_storage_driver.assert_called_once_with(
+            self.credentials['test']
+        )
@@ -1,6 +1,6 @@
 from pytest import raises
 from unittest.mock import (
-    MagicMock, Mock, patch
+    Mock, patch
 )
 
 from mash.services.upload.oci_job import OCIUploadJob
@@ -63,17 +63,13 @@ class TestOCIUploadJob(object):
         with raises(MashUploadException):
             self.job.run_job()
 
+    @patch('mash.services.upload.oci_job.upload_file')
+    @patch('mash.services.upload.oci_job.OCIMultipartUploadBackend')
     @patch('mash.services.upload.oci_job.stat')
-    @patch('mash.services.upload.oci_job.UploadManager')
     @patch('mash.services.upload.oci_job.ObjectStorageClient')
-    @patch('builtins.open')
     def test_upload(
-        self, mock_open, mock_storage_client, mock_upload_manager, mock_stat
+        self, mock_storage_client, mock_stat, mock_backend, mock_upload_file
     ):
-        open_handle = MagicMock()
-        open_handle.__enter__.return_value = open_handle
-        mock_open.return_value = open_handle
-
         image_info = Mock()
         image_info.st_size = 112358
         mock_stat.return_value = image_info
@@ -86,17 +82,28 @@ class TestOCIUploadJob(object):
 
         mock_storage_client.return_value = storage_driver
 
-        upload_manager = Mock()
-        mock_upload_manager.return_value = upload_manager
+        backend = Mock()
+        mock_backend.return_value = backend
 
         self.job.run_job()
 
-        upload_manager.upload_stream.assert_called_once_with(
+        mock_backend.assert_called_once_with(
+            storage_driver,
             'namespace name',
             'images',
             'sles-12-sp4-v20200925.qcow2',
-            open_handle,
-            progress_callback=self.job._progress_callback
+            metadata={}
+        )
+        mock_upload_file.assert_called_once_with(
+            backend,
+            'sles-12-sp4-v20200925.qcow2',
+            'namespace name/images/sles-12-sp4-v20200925.qcow2',
+            8388608,
+            checkpoint_file=None,
+            max_workers=self.job.upload_process_count,
+            max_retry_attempts=3,
+            progress_callback=self.job._progress_callback,
+            get_backend=self.job._get_upload_backend
         )
 
     def test_progress_callback(self):
@@ -105,3 +112,18 @@ class TestOCIUploadJob(object):
 
         self.job._log_callback.info.assert_called_once_with('Image 0% uploaded.')
         assert self.job._total_bytes_transferred == 400
+
+    @patch('mash.services.upload.oci_job.abort_upload')
+    @patch('mash.services.upload.oci_job.ObjectStorageClient')
+    def test_cleanup(self, mock_storage_client, mock_abort_upload):
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+        self.job.cleanup()
+
+        checkpoint_file, get_backend = mock_abort_upload.call_args[0]
+        assert checkpoint_file == '/var/lib/mash/upload_jobs/job-1.checkpoint'
+
+        backend = get_backend('namespace/images/sles-12-sp4-v20200925.qcow2')
+        assert backend.namespace == 'namespace'
+        assert backend.bucket == 'images'
+        assert backend.object_name == 'sles-12-sp4-v20200925.qcow2'
+        assert backend.object_storage == mock_storage_client.return_value
@@ -7,12 +7,12 @@ from test.unit.test_helper import (
 
 from mash.services.upload.s3bucket_job import S3BucketUploadJob
 from mash.mash_exceptions import MashUploadException
-from mash.services.base_config import BaseConfig
+from mash.services.upload.config import UploadConfig
 
 
 class TestS3BucketUploadJob(object):
     def setup(self):
-        self.config = BaseConfig(
+        self.config = UploadConfig(
             config_file='test/data/mash_config.yaml'
         )
 
@@ -68,56 +68,83 @@ class TestS3BucketUploadJob(object):
         with raises(MashUploadException):
             S3BucketUploadJob(job_doc, self.config)
 
+    @patch('mash.services.upload.s3bucket_job.upload_file')
+    @patch('mash.services.upload.s3bucket_job.S3MultipartUploadBackend')
     @patch('mash.services.upload.s3bucket_job.stat')
     @patch('mash.services.upload.s3bucket_job.get_client')
     @patch_open
     def test_upload(
-        self, mock_request_credentials, mock_get_client, mock_stat
+        self, mock_request_credentials, mock_get_client, mock_stat,
+        mock_backend, mock_upload_file
     ):
         mock_client = Mock()
         mock_get_client.return_value = mock_client
+        backend = Mock()
+        mock_backend.return_value = backend
 
         stat_info = Mock()
         stat_info.st_size = 100
         mock_stat.return_value = stat_info
 
+        self.job.job_file = 'upload_jobs/job-1.json'
         self.job.run_job()
         mock_get_client.assert_called_once_with(
             's3', 'access-key', 'secret-access-key', None,
         )
-        mock_client.upload_file.assert_called_once_with(
+        mock_backend.assert_called_once_with(
+            mock_client, 'my-bucket', 'some-prefix/name.raw.gz', metadata={}
+        )
+        mock_upload_file.assert_called_once_with(
+            backend,
             'file.raw.gz',
-            'my-bucket',
-            'some-prefix/name.raw.gz',
-            Callback=self.job._log_progress
+            'my-bucket/some-prefix/name.raw.gz',
+            8388608,
+            checkpoint_file='upload_jobs/job-1.checkpoint',
+            max_workers=2,
+            max_retry_attempts=3,
+            progress_callback=self.job._log_progress,
+            get_backend=self.job._get_upload_backend
         )
 
         # Test bucket only location
-        mock_client.upload_file.reset_mock()
+        mock_backend.reset_mock()
         self.job.location = 'my-bucket'
         self.job.run_job()
 
-        mock_client.upload_file.assert_called_once_with(
-            'file.raw.gz',
-            'my-bucket',
-            'name.raw.gz',
-            Callback=self.job._log_progress
+        mock_backend.assert_called_once_with(
+            mock_client, 'my-bucket', 'name.raw.gz', metadata={}
         )
 
         # Test bucket and full name
-        mock_client.upload_file.reset_mock()
+        mock_backend.reset_mock()
         self.job.location = 'my-bucket/some-prefix/image.raw.gz'
         self.job.status_msg['cloud_image_name'] = None
         self.job.run_job()
 
-        mock_client.upload_file.assert_called_once_with(
-            'file.raw.gz',
+        mock_backend.assert_called_once_with(
+            mock_client, 'my-bucket', 'some-prefix/image.raw.gz', metadata={}
+        )
+
+        # Test image metadata from the obs result
+        mock_backend.reset_mock()
+        mock_stat.reset_mock()
+        self.job.status_msg['image_metadata'] = {
+            'size': 200,
+            'sha256': 'sha',
+            'md5': 'md5'
+        }
+        self.job.run_job()
+
+        assert self.job._image_size == 200
+        assert mock_stat.call_count == 0
+        mock_backend.assert_called_once_with(
+            mock_client,
             'my-bucket',
             'some-prefix/image.raw.gz',
-            Callback=self.job._log_progress
+            metadata={'sha256': 'sha', 'md5': 'md5'}
         )
 
-        mock_client.upload_file.side_effect = Exception
+        mock_upload_file.side_effect = Exception
 
         with raises(MashUploadException):
             self.job.run_job()
@@ -128,3 +155,20 @@ class TestS3BucketUploadJob(object):
         self.job._log_callback.info.assert_called_once_with(
             'Raw image 100% uploaded.'
         )
+
+    @patch('mash.services.upload.s3bucket_job.abort_upload')
+    @patch('mash.services.upload.s3bucket_job.get_client')
+    def test_cleanup(self, mock_get_client, mock_abort_upload):
+        self.job.job_file = '/var/lib/mash/upload_jobs/job-1.json'
+        self.job.cleanup()
+
+        checkpoint_file, get_backend = mock_abort_upload.call_args[0]
+        assert checkpoint_file == '/var/lib/mash/upload_jobs/job-1.checkpoint'
+
+        backend = get_backend('my-bucket/some-prefix/name.raw.gz')
+        assert backend.bucket == 'my-bucket'
+        assert backend.key == 'some-prefix/name.raw.gz'
+        assert backend.client == mock_get_client.return_value
+        mock_get_client.assert_called_once_with(
+            's3', 'access-key', 'secret-access-key', None
+        )
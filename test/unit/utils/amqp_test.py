@@ -0,0 +1,412 @@
+import threading
+import time
+
+from pytest import raises
+from unittest.mock import call, MagicMock, Mock, patch
+
+from amqpstorm import (
+    AMQPChannelError,
+    AMQPConnectionError,
+    AMQPMessageError
+)
+from pamqp import commands
+
+from mash.utils.amqp import (
+    PublisherPool,
+    QueueConsumer,
+    get_publisher,
+    publishers,
+    release_publisher
+)
+
+
+class TestQueueConsumer(object):
+    def setup(self):
+        self.channel = Mock()
+        self.consumer = QueueConsumer(self.channel, name='obs.listener')
+
+    def test_consumer_run(self):
+        self.consumer.run()
+
+        self.channel.start_consuming.assert_called_once_with()
+        assert self.consumer.error is None
+        assert self.consumer.daemon
+        assert self.consumer.name == 'obs.listener'
+
+    def test_consumer_run_error(self):
+        error = AMQPConnectionError('Connection dropped!')
+        self.channel.start_consuming.side_effect = error
+
+        self.consumer.run()
+        assert self.consumer.error == error
+
+    def test_consumer_stop(self):
+        self.channel.is_open = True
+        self.consumer.stop()
+
+        self.channel.stop_consuming.assert_called_once_with()
+        self.channel.close.assert_called_once_with()
+
+        # Errors raised after stop are not recorded
+        self.channel.start_consuming.side_effect = Exception('Closed')
+        self.consumer.run()
+        assert self.consumer.error is None
+
+    def test_consumer_stop_closed(self):
+        self.channel.is_open = False
+        self.consumer.stop()
+        assert self.channel.close.call_count == 0
+
+
+def get_channel(*confirms):
+    """
+    Return a mock channel answering get_request with the confirms.
+    """
+    channel = MagicMock()
+    channel.is_closed = False
+    channel.check_for_exceptions.return_value = None
+    channel.rpc.get_request.side_effect = confirms
+    return channel
+
+
+def get_published(channel):
+    """
+    Return the (routing_key, body) tuples written to the channel.
+    """
+    published = []
+
+    for args, kwargs in channel.write_frames.call_args_list:
+        publish, header, *bodies = args[0]
+        published.append((
+            publish.routing_key,
+            b''.join(body.value for body in bodies).decode()
+        ))
+
+    return published
+
+
+class TestPublisherPool(object):
+    def setup(self):
+        self.connection = Mock()
+        self.connection.is_closed = False
+        self.connection.is_open = True
+        self.connection.max_frame_size = 131072
+        self.channel = get_channel(
+            commands.Basic.Ack(delivery_tag=1),
+            commands.Basic.Ack(delivery_tag=2)
+        )
+        self.connection.channel.return_value = self.channel
+
+        self.pool = PublisherPool(
+            'localhost', 'guest', 'guest', channel_count=2
+        )
+        self.properties = {
+            'content_type': 'application/json',
+            'delivery_mode': 2
+        }
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish(self, mock_connection):
+        mock_connection.return_value = self.connection
+
+        self.pool.publish('obs', 'listener_msg', 'message')
+        self.pool.publish('obs', 'listener_msg', 'message')
+
+        mock_connection.assert_called_once_with(
+            'localhost', 'guest', 'guest', port=5672,
+            kwargs={'heartbeat': 600}
+        )
+        # The idle channel is reused
+        self.connection.channel.assert_called_once_with()
+        self.channel.confirm_deliveries.assert_called_once_with()
+
+        publish, header, body = self.channel.write_frames.call_args[0][0]
+        assert publish.exchange == 'obs'
+        assert publish.routing_key == 'listener_msg'
+        assert publish.mandatory
+        assert header.body_size == 7
+        assert header.properties.content_type == 'application/json'
+        assert header.properties.delivery_mode == 2
+        assert body.value == b'message'
+
+        self.channel.rpc.register_request.assert_called_with(
+            ['Basic.Ack', 'Basic.Nack']
+        )
+        assert self.channel.rpc.remove.call_count == 2
+        assert self.pool.delivery_tags[self.channel] == 2
+
+        metrics = self.pool.get_metrics()
+        assert metrics['published'] == 2
+        assert metrics['batches'] == 2
+        assert metrics['in_use'] == 0
+        assert metrics['reconnects'] == 0
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_batch(self, mock_connection):
+        mock_connection.return_value = self.connection
+        self.connection.max_frame_size = 12
+        self.channel.rpc.get_request.side_effect = [
+            commands.Basic.Ack(delivery_tag=2, multiple=True),
+            commands.Basic.Ack(delivery_tag=3)
+        ]
+
+        self.pool.publish_batch(
+            'logger', [
+                ('mash.logger', 'one'),
+                ('mash.logger', 'two'),
+                ('mash.logger', 'a longer message')
+            ]
+        )
+
+        # The batch is written before the confirms are read
+        assert get_published(self.channel) == [
+            ('mash.logger', 'one'),
+            ('mash.logger', 'two'),
+            ('mash.logger', 'a longer message')
+        ]
+        assert len(self.channel.write_frames.call_args[0][0]) == 6
+        assert self.channel.rpc.get_request.call_count == 2
+        assert self.pool.get_metrics()['published'] == 3
+        assert self.pool.get_metrics()['batches'] == 1
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_no_confirm(self, mock_connection):
+        mock_connection.return_value = self.connection
+        self.pool.confirm = False
+
+        self.channel.basic.publish.return_value = None
+
+        self.pool.publish('logger', 'mash.logger', 'log', mandatory=False)
+
+        assert self.channel.confirm_deliveries.call_count == 0
+        self.channel.basic.publish.assert_called_once_with(
+            body='log',
+            routing_key='mash.logger',
+            exchange='logger',
+            properties=self.properties,
+            mandatory=False
+        )
+        assert self.pool.get_metrics()['published'] == 1
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_reconnect(self, mock_connection):
+        connection = Mock()
+        connection.is_closed = False
+        connection.max_frame_size = 131072
+        channel = get_channel(commands.Basic.Ack(delivery_tag=1))
+        connection.channel.return_value = channel
+        mock_connection.side_effect = [self.connection, connection]
+
+        def write_frames(frames):
+            self.connection.is_closed = True
+            self.connection.is_open = False
+            self.channel.is_closed = True
+            self.channel.is_open = False
+            raise AMQPConnectionError('Connection dropped!')
+
+        self.channel.write_frames.side_effect = write_frames
+
+        self.pool.publish('obs', 'listener_msg', 'message')
+
+        assert self.connection.close.call_count == 0
+        assert self.channel.close.call_count == 0
+
+        assert get_published(channel) == [('listener_msg', 'message')]
+        metrics = self.pool.get_metrics()
+        assert metrics['errors'] == 1
+        assert metrics['reconnects'] == 1
+        assert metrics['published'] == 1
+        assert self.pool.open_channels == 1
+        assert self.pool.delivery_tags == {channel: 1}
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_channel_error(self, mock_connection):
+        mock_connection.return_value = self.connection
+        channel = get_channel(commands.Basic.Ack(delivery_tag=1))
+        in_use = get_channel()
+        self.connection.channel.side_effect = [in_use, self.channel, channel]
+        self.channel.rpc.get_request.side_effect = AMQPChannelError(
+            'Channel closed!'
+        )
+
+        # Another thread holds a channel on the same connection
+        with self.pool.channel() as other:
+            self.pool.publish('obs', 'listener_msg', 'message')
+            assert other.close.call_count == 0
+
+        self.channel.close.assert_called_once_with()
+        self.channel.rpc.remove.assert_called_once_with(
+            self.channel.rpc.register_request.return_value
+        )
+        assert get_published(channel) == [('listener_msg', 'message')]
+        assert mock_connection.call_count == 1
+        assert self.connection.close.call_count == 0
+
+        metrics = self.pool.get_metrics()
+        assert metrics['errors'] == 1
+        assert metrics['reconnects'] == 0
+        assert self.pool.open_channels == 2
+        assert self.pool.idle_channels == [channel, in_use]
+        assert self.channel not in self.pool.delivery_tags
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_batch_resume(self, mock_connection):
+        mock_connection.return_value = self.connection
+        channel = get_channel(
+            commands.Basic.Ack(delivery_tag=1),
+            commands.Basic.Ack(delivery_tag=2)
+        )
+        self.connection.channel.side_effect = [self.channel, channel]
+        self.channel.rpc.get_request.side_effect = [
+            commands.Basic.Ack(delivery_tag=2),
+            AMQPChannelError('Channel closed!')
+        ]
+
+        self.pool.publish_batch(
+            'obs', [('one', 'message'), ('two', 'message'), ('three', 'message')]
+        )
+
+        # Only the messages that were not confirmed are published again
+        assert get_published(channel) == [
+            ('one', 'message'),
+            ('three', 'message')
+        ]
+
+        metrics = self.pool.get_metrics()
+        assert metrics['published'] == 3
+        assert metrics['batches'] == 1
+        assert metrics['errors'] == 1
+
+    def test_checkin_closed_channel(self):
+        self.pool.open_channels = 1
+        self.channel.is_closed = True
+
+        self.pool._checkin(self.channel)
+
+        assert self.pool.open_channels == 0
+        assert self.pool.idle_channels == []
+
+    @patch('mash.utils.amqp.Connection')
+    def test_publish_returned(self, mock_connection):
+        mock_connection.return_value = self.connection
+        self.channel.rpc.get_request.side_effect = [
+            commands.Basic.Nack(delivery_tag=3),
+            commands.Basic.Ack(delivery_tag=2, multiple=True)
+        ]
+        self.channel.check_for_exceptions.side_effect = [
+            AMQPMessageError('Message not delivered!'),
+            None
+        ]
+
+        with raises(AMQPMessageError) as error:
+            self.pool.publish_batch(
+                'obs', [('one', 'message'), ('two', 'message'), ('three', 'message')]
+            )
+
+        # The whole batch is published before the failures are raised
+        assert self.channel.write_frames.call_count == 3
+        assert str(error.value) == (
+            'Failed to publish 2 message(s): Message not confirmed: three; '
+            'Message not delivered!'
+        )
+
+        metrics = self.pool.get_metrics()
+        assert metrics['published'] == 1
+        assert metrics['errors'] == 1
+        assert mock_connection.call_count == 1
+
+        # The channel is kept for the next publish
+        assert self.pool.idle_channels == [self.channel]
+
+    @patch('mash.utils.amqp.Connection')
+    def test_checkout_wait(self, mock_connection):
+        mock_connection.return_value = self.connection
+        self.connection.channel.side_effect = [
+            Mock(is_closed=False), Mock(is_closed=False)
+        ]
+
+        first = self.pool._checkout()
+        second = self.pool._checkout()
+        assert self.pool.get_metrics()['in_use'] == 2
+
+        result = {}
+
+        def checkout():
+            result['channel'] = self.pool._checkout()
+
+        waiter = threading.Thread(target=checkout)
+        waiter.start()
+
+        while not self.pool.condition._waiters:
+            time.sleep(0.01)
+
+        self.pool._checkin(second)
+        waiter.join()
+
+        assert result['channel'] == second
+        assert self.pool.get_metrics()['waits'] == 1
+        self.pool._checkin(first)
+
+    @patch('mash.utils.amqp.Connection')
+    def test_checkout_closed_channel(self, mock_connection):
+        mock_connection.return_value = self.connection
+        closed = Mock()
+        closed.is_closed = True
+        self.pool.idle_channels = [closed]
+        self.pool.open_channels = 1
+
+        channel = self.pool._checkout()
+
+        assert channel == self.channel
+        assert self.pool.open_channels == 1
+
+    @patch('mash.utils.amqp.Connection')
+    def test_channel_context(self, mock_connection):
+        mock_connection.return_value = self.connection
+
+        with self.pool.channel() as channel:
+            channel.exchange.declare(exchange='logger')
+
+        assert self.pool.idle_channels == [self.channel]
+        self.channel.exchange.declare.assert_has_calls([
+            call(exchange='logger')
+        ])
+
+    def test_close(self):
+        self.pool.connection = self.connection
+        self.pool.idle_channels = [self.channel]
+        self.pool.open_channels = 1
+
+        self.pool.close()
+
+        self.connection.close.assert_called_once_with()
+        assert self.pool.idle_channels == []
+        assert self.pool.open_channels == 0
+
+
+def test_get_publisher():
+    publishers.clear()
+
+    pool = get_publisher('localhost', 'guest', 'guest', channel_count=8)
+
+    assert pool.channel_count == 8
+    assert pool.confirm
+    assert get_publisher('localhost', 'guest', 'guest') is pool
+    assert get_publisher('localhost', 'guest', 'guest', port=5673) is not pool
+    assert get_publisher(
+        'localhost', 'guest', 'guest', confirm=False
+    ) is not pool
+    assert pool.references == 2
+
+    # The pool is closed with the last reference
+    pool.close = Mock()
+    release_publisher(pool)
+    assert pool.close.call_count == 0
+    assert get_publisher('localhost', 'guest', 'guest') is pool
+
+    release_publisher(pool)
+    release_publisher(pool)
+    pool.close.assert_called_once_with()
+    assert get_publisher('localhost', 'guest', 'guest') is not pool
+
+    publishers.clear()
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+from pytest import fixture, raises
+
+from mash.mash_exceptions import MashImageDownloadException
+from mash.utils.download import ParallelDownload
+
+DATA = os.urandom(100000)
+CHECKSUM = hashlib.sha256(DATA).hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves DATA with optional range support and failing ranges.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _send_headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+
+        if content_range:
+            self.send_header('Content-Range', content_range)
+
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers(200, len(DATA))
+
+    def do_GET(self):
+        requested = self.headers.get('Range')
+        self.server.requests.append(requested)
+
+        if requested and self.server.ranges:
+            start, end = requested[len('bytes='):].split('-')
+            start, end = int(start), int(end)
+
+            if start in self.server.fail_ranges:
+                self.server.fail_ranges.remove(start)
+                self._send_headers(503, 0)
+                return
+
+            body = DATA[start:end + 1]
+
+            if start in self.server.short_ranges:
+                self.server.short_ranges.remove(start)
+                body = body[:100]
+
+            self._send_headers(
+                206,
+                len(body),
+                'bytes {0}-{1}/{2}'.format(start, end, len(DATA))
+            )
+        else:
+            body = DATA
+            self._send_headers(200, len(body))
+
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@fixture
+def image_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.fail_ranges = []
+    server.short_ranges = []
+    server.ranges = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    server.url = 'http://127.0.0.1:{0}/image.raw.xz'.format(
+        server.server_port
+    )
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def get_download(
+    server, tmpdir, checksum=CHECKSUM, connections=4, **kwargs
+):
+    return ParallelDownload(
+        server.url,
+        tmpdir.join('image.raw.xz').strpath,
+        checksum,
+        connections=connections,
+        chunk_size=16384,
+        **kwargs
+    )
+
+
+@patch('mash.utils.download.os.fdatasync', wraps=os.fdatasync)
+def test_download(mock_fdatasync, image_server, tmpdir):
+    progress = Mock()
+    image_server.fail_ranges = [16384]
+    download = get_download(image_server, tmpdir, progress_callback=progress)
+
+    image_file = download.download()
+
+    # Every range is synced before it is added to the checkpoint
+    assert mock_fdatasync.call_count == 7
+
+    with open(image_file, 'rb') as image:
+        assert image.read() == DATA
+
+    # 7 ranges and one retry
+    assert len(image_server.requests) == 8
+    assert progress.call_args_list[-1][0] == (0, 0, 0, True)
+    assert progress.call_args_list[-2][0] == (100000, 1, 100000)
+    assert not os.path.exists(download.part_file)
+    assert not os.path.exists(download.checkpoint_file)
+    assert download.image_md5.hexdigest() == hashlib.md5(DATA).hexdigest()
+
+
+@patch('mash.utils.download.os.pread', wraps=os.pread)
+def test_download_single_connection(mock_pread, image_server, tmpdir):
+    image_server.fail_ranges = [16384]
+    download = get_download(image_server, tmpdir, connections=1)
+
+    image_file = download.download()
+
+    # Ranges are hashed as they are received
+    assert mock_pread.call_count == 0
+    assert download.image_md5.hexdigest() == hashlib.md5(DATA).hexdigest()
+
+    with open(image_file, 'rb') as image:
+        assert image.read() == DATA
+
+
+def test_download_resume(image_server, tmpdir):
+    image_server.fail_ranges = [32768] * 3
+    download = get_download(image_server, tmpdir)
+
+    with raises(MashImageDownloadException):
+        download.download()
+
+    assert os.path.exists(download.part_file)
+    assert os.path.exists(download.checkpoint_file)
+
+    image_server.requests = []
+    download = get_download(image_server, tmpdir)
+    image_file = download.download()
+
+    assert image_server.requests == ['bytes=32768-49151']
+    assert download.image_md5.hexdigest() == hashlib.md5(DATA).hexdigest()
+
+    with open(image_file, 'rb') as image:
+        assert image.read() == DATA
+
+
+def test_download_short_range(image_server, tmpdir):
+    image_server.short_ranges = [16384]
+    download = get_download(image_server, tmpdir)
+
+    image_file = download.download()
+
+    # The short range is requested again
+    assert image_server.requests.count('bytes=16384-32767') == 2
+
+    with open(image_file, 'rb') as image:
+        assert image.read() == DATA
+
+
+def test_download_checksum_mismatch(image_server, tmpdir):
+    download = get_download(image_server, tmpdir, checksum='abc')
+
+    with raises(MashImageDownloadException):
+        download.download()
+
+    assert not os.path.exists(download.part_file)
+    assert not os.path.exists(download.checkpoint_file)
+    assert not os.path.exists(download.target_file)
+
+
+def test_download_without_ranges(image_server, tmpdir):
+    image_server.ranges = False
+
+    download = get_download(image_server, tmpdir)
+    image_file = download.download()
+
+    assert image_server.requests == [None]
+    assert download.image_md5.hexdigest() == hashlib.md5(DATA).hexdigest()
+
+    with open(image_file, 'rb') as image:
+        assert image.read() == DATA
@@ -16,19 +16,29 @@
 # along with mash.  If not, see <http://www.gnu.org/licenses/>
 #
 
+from botocore.exceptions import ClientError
+from ec2imgutils.ec2imgutilsExceptions import EC2ConnectionException
 from pytest import raises
-from unittest.mock import Mock, patch
+from unittest.mock import call, Mock, patch
 from mash.utils.ec2 import (
+    CachedEC2PublishImage,
+    ClientCache,
     get_client,
     get_vpc_id_from_subnet,
     cleanup_ec2_image,
     cleanup_all_ec2_images,
+    fan_out_regions,
     get_image,
-    image_exists
+    image_exists,
+    image_name_cache,
+    ImageNameCache,
+    S3MultipartUploadBackend,
+    EC2ReplicationTracker
 )
 from mash.mash_exceptions import MashGCEUtilsException
 
 
+@patch('mash.utils.ec2.client_cache', ClientCache())
 @patch('mash.utils.ec2.boto3')
 def test_get_client(mock_boto3):
     client = Mock()
@@ -46,6 +56,68 @@ def test_get_client(mock_boto3):
         region_name='us-east-1',
     )
 
+    # The client is reused
+    assert get_client('ec2', '123456', 'abc123', 'us-east-1') == client
+    assert session.client.call_count == 1
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.boto3')
+def test_client_cache(mock_boto3, mock_time):
+    session = Mock()
+    session.client.side_effect = lambda **kwargs: Mock()
+    mock_boto3.session.Session.return_value = session
+    mock_time.monotonic.return_value = 0
+    cache = ClientCache(ttl=60)
+
+    client = cache.get_client('ec2', '123456', 'abc123', 'us-east-1')
+    assert cache.get_client('ec2', '123456', 'abc123', 'us-east-1') == client
+
+    # Clients by service, access key and region
+    assert cache.get_client('s3', '123456', 'abc123', 'us-east-1') != client
+    assert cache.get_client('ec2', '654321', 'abc123', 'us-east-1') != client
+    assert cache.get_client('ec2', '123456', 'abc123', 'us-east-2') != client
+    assert mock_boto3.session.Session.call_count == 1
+
+    # Rotated secret of the access key
+    rotated = cache.get_client('ec2', '123456', 'def456', 'us-east-1')
+    assert rotated != client
+    assert cache.get_client('ec2', '123456', 'def456', 'us-east-1') == \
+        rotated
+
+    # Idle clients are evicted
+    mock_time.monotonic.return_value = 59
+    assert cache.get_client('ec2', '123456', 'def456', 'us-east-1') == \
+        rotated
+    mock_time.monotonic.return_value = 119
+    assert len(cache.clients) == 4
+    assert cache.get_client('ec2', '123456', 'def456', 'us-east-1') != \
+        rotated
+    assert len(cache.clients) == 1
+
+    cache.clear()
+    assert cache.clients == {}
+
+
+@patch('mash.utils.ec2.get_client')
+def test_cached_client_connect(mock_get_client):
+    publish = CachedEC2PublishImage(
+        access_key='123456',
+        secret_key='654321',
+        image_name='image_name_123',
+        visibility='all',
+        log_callback=Mock()
+    )
+
+    with raises(EC2ConnectionException):
+        publish._connect()
+
+    publish.set_region('us-east-2')
+    assert publish._connect() == mock_get_client.return_value
+    mock_get_client.assert_called_once_with(
+        'ec2', '123456', '654321', 'us-east-2'
+    )
+
 
 def test_get_vpc_id_from_subnet():
     client = Mock()
@@ -54,7 +126,7 @@ def test_get_vpc_id_from_subnet():
     client.describe_subnets.assert_called_once_with(SubnetIds=['subnet-123456789'])
 
 
-@patch('mash.utils.ec2.EC2RemoveImage')
+@patch('mash.utils.ec2.CachedEC2RemoveImage')
 def test_cleanup_images(mock_rm_img):
     log_callback = Mock()
     rm_img = Mock()
@@ -65,6 +137,14 @@ def test_cleanup_images(mock_rm_img):
     rm_img.set_region.assert_called_once_with('us-east-1')
     rm_img.remove_images.assert_called_once_with()
 
+    # Cached image lookups of the account and region are dropped
+    image_name_cache.set(('123', 'us-east-1'), 'image name', {})
+    rm_img.remove_images.side_effect = Exception('Failed')
+    with raises(Exception):
+        cleanup_ec2_image('123', '321', log_callback, 'us-east-1', 'ami-1')
+    assert image_name_cache.get(('123', 'us-east-1'), 'image name') is None
+    rm_img.remove_images.side_effect = None
+
     # Cleanup by name
     cleanup_ec2_image(
         '123',
@@ -104,6 +184,53 @@ def test_get_image(mock_describe_images):
     mock_describe_images.return_value = [image]
     result = get_image(client, 'image name 123')
     assert result == image
+    mock_describe_images.assert_called_once_with(
+        client,
+        filters=[{'Name': 'name', 'Values': ['image name 123']}]
+    )
+
+
+@patch('mash.utils.ec2.image_name_cache', ImageNameCache())
+@patch('mash.utils.ec2.describe_images')
+def test_get_image_cached(mock_describe_images):
+    client = Mock()
+    key = ('123456', 'us-east-1')
+    image = {'Name': 'image name 123'}
+
+    # Missing images are not cached
+    mock_describe_images.return_value = []
+    assert get_image(client, 'image name 123', key) is None
+    assert get_image(client, 'image name 123', key) is None
+    assert mock_describe_images.call_count == 2
+
+    mock_describe_images.return_value = [image]
+    assert get_image(client, 'image name 123', key) == image
+    assert get_image(client, 'image name 123', key) == image
+    assert mock_describe_images.call_count == 3
+
+    # Lookups without a cache key always describe the images
+    assert get_image(client, 'image name 123') == image
+    assert mock_describe_images.call_count == 4
+
+
+@patch('mash.utils.ec2.time')
+def test_image_name_cache(mock_time):
+    cache = ImageNameCache(ttl=60)
+    key = ('123456', 'us-east-1')
+    mock_time.monotonic.return_value = 0
+
+    assert cache.get(key, 'image') is None
+    cache.set(key, 'image', {'Name': 'image'})
+    assert cache.get(key, 'image') == {'Name': 'image'}
+
+    mock_time.monotonic.return_value = 60
+    assert cache.get(key, 'image') is None
+
+    cache.set(key, 'image', {'Name': 'image'})
+    cache.set(('123456', 'us-east-2'), 'image', {'Name': 'image'})
+    cache.invalidate(key)
+    assert cache.get(key, 'image') is None
+    assert cache.get(('123456', 'us-east-2'), 'image') == {'Name': 'image'}
 
 
 @patch('mash.utils.ec2.get_image')
@@ -114,3 +241,236 @@ def test_image_exists(mock_get_image):
 
     assert image_exists(client, 'image name 123')
     assert not image_exists(client, 'image name 321')
+
+
+def test_s3_multipart_upload_backend():
+    client = Mock()
+    client.create_multipart_upload.return_value = {'UploadId': '123'}
+    client.upload_part.return_value = {'ETag': '"abc"'}
+
+    backend = S3MultipartUploadBackend(
+        client, 'bucket', 'image.raw.gz', metadata={'md5': 'abc'}
+    )
+
+    assert backend.start() == '123'
+    client.create_multipart_upload.assert_called_once_with(
+        Bucket='bucket',
+        Key='image.raw.gz',
+        Metadata={'md5': 'abc'}
+    )
+
+    part = backend.upload_part('123', 1, 0, b'data')
+    assert part == {'ETag': '"abc"', 'PartNumber': 1}
+    client.upload_part.assert_called_once_with(
+        Body=b'data',
+        Bucket='bucket',
+        Key='image.raw.gz',
+        PartNumber=1,
+        UploadId='123'
+    )
+
+    assert backend.resume('123', [part])
+    client.list_parts.side_effect = ClientError(
+        {'Error': {'Code': 'NoSuchUpload'}}, 'ListParts'
+    )
+    assert not backend.resume('123', [part])
+
+    backend.complete('123', [part])
+    client.complete_multipart_upload.assert_called_once_with(
+        Bucket='bucket',
+        Key='image.raw.gz',
+        UploadId='123',
+        MultipartUpload={'Parts': [part]}
+    )
+
+    backend.abort('123')
+    client.abort_multipart_upload.assert_called_once_with(
+        Bucket='bucket',
+        Key='image.raw.gz',
+        UploadId='123'
+    )
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.get_client')
+def test_replication_tracker(mock_get_client, mock_time):
+    not_found = ClientError(
+        {'Error': {'Code': 'InvalidAMIID.NotFound', 'Message': 'gone'}},
+        'DescribeImages'
+    )
+    east_client = Mock()
+    east_client.describe_images.side_effect = [
+        not_found,
+        {'Images': [{'ImageId': 'ami-1', 'State': 'pending'}]},
+        {'Images': [{'ImageId': 'ami-1', 'State': 'available'}]}
+    ]
+    west_client = Mock()
+    west_client.describe_images.side_effect = [
+        {'Images': [{'ImageId': 'ami-2', 'State': 'pending'}]},
+        {'Images': [{'ImageId': 'ami-2', 'State': 'failed'}]}
+    ]
+    clients = {'us-east-2': east_client, 'us-west-1': west_client}
+    mock_get_client.side_effect = lambda service, key, secret, region: \
+        clients[region]
+    mock_time.monotonic.return_value = 0
+
+    tracker = EC2ReplicationTracker(initial_delay=10, max_delay=20)
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+    tracker.add_image('us-west-1', 'ami-2', 'key', 'secret')
+
+    errors = tracker.wait()
+
+    assert errors == {
+        'us-west-1': 'The image with ID: ami-2 reached a failed state.'
+    }
+    # One client per region for the whole wait
+    assert mock_get_client.call_count == 2
+    east_client.describe_images.assert_called_with(
+        Owners=['self'], ImageIds=['ami-1']
+    )
+    # Backoff while no image changes state, capped at max_delay
+    assert [args[0][0] for args in mock_time.sleep.call_args_list] == [
+        10, 15, 15
+    ]
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.get_client')
+def test_replication_tracker_not_found_batch(mock_get_client, mock_time):
+    not_found = ClientError(
+        {'Error': {'Code': 'InvalidAMIID.NotFound', 'Message': 'gone'}},
+        'DescribeImages'
+    )
+    client = Mock()
+    client.describe_images.side_effect = [
+        not_found,
+        {'Images': [{'ImageId': 'ami-1', 'State': 'available'}]},
+        not_found,
+        not_found
+    ]
+    mock_get_client.return_value = client
+    mock_time.monotonic.side_effect = [0, 10, 400]
+
+    tracker = EC2ReplicationTracker(not_found_timeout=300)
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+    tracker.add_image('us-east-2', 'ami-2', 'key', 'secret')
+
+    # Only the image that is not found is reported
+    assert tracker.wait() == {
+        'us-east-2': 'The image with ID: ami-2 was not found.'
+    }
+    assert client.describe_images.call_args_list == [
+        call(Owners=['self'], ImageIds=['ami-1', 'ami-2']),
+        call(Owners=['self'], ImageIds=['ami-1']),
+        call(Owners=['self'], ImageIds=['ami-2']),
+        call(Owners=['self'], ImageIds=['ami-2'])
+    ]
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.get_client')
+def test_replication_tracker_timeout(mock_get_client, mock_time):
+    client = Mock()
+    client.describe_images.return_value = {
+        'Images': [{'ImageId': 'ami-1', 'State': 'pending'}]
+    }
+    mock_get_client.return_value = client
+    mock_time.monotonic.side_effect = [0, 600, 3600]
+
+    tracker = EC2ReplicationTracker(timeout=3600)
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+
+    assert tracker.wait() == {
+        'us-east-2': 'The image with ID: ami-1 was not available within '
+        '3600 seconds.'
+    }
+    assert client.describe_images.call_count == 2
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.get_client')
+def test_replication_tracker_unexpected_state(mock_get_client, mock_time):
+    client = Mock()
+    client.describe_images.return_value = {
+        'Images': [{'ImageId': 'ami-1', 'State': 'deregistered'}]
+    }
+    mock_get_client.return_value = client
+    mock_time.monotonic.side_effect = [0, 10]
+
+    tracker = EC2ReplicationTracker()
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+
+    assert tracker.wait() == {
+        'us-east-2': 'The image with ID: ami-1 reached an unexpected '
+        'state: deregistered.'
+    }
+    assert client.describe_images.call_count == 1
+
+
+@patch('mash.utils.ec2.time')
+@patch('mash.utils.ec2.get_client')
+def test_replication_tracker_errors(mock_get_client, mock_time):
+    client = Mock()
+    client.describe_images.side_effect = [
+        {'Images': []},
+        {'Images': []},
+        ClientError(
+            {'Error': {'Code': 'RequestLimitExceeded', 'Message': 'Slow'}},
+            'DescribeImages'
+        )
+    ]
+    mock_get_client.return_value = client
+    mock_time.monotonic.side_effect = [0, 10, 400, 400, 400, 400]
+
+    tracker = EC2ReplicationTracker(not_found_timeout=300)
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+
+    assert tracker.wait() == {
+        'us-east-2': 'The image with ID: ami-1 was not found.'
+    }
+
+    tracker = EC2ReplicationTracker()
+    tracker.add_image('us-east-2', 'ami-1', 'key', 'secret')
+    assert tracker.wait() == {
+        'us-east-2': 'Unable to get the image state: An error occurred '
+        '(RequestLimitExceeded) when calling the DescribeImages '
+        'operation: Slow'
+    }
+
+    # Nothing to wait on
+    mock_time.sleep.reset_mock()
+    assert EC2ReplicationTracker().wait() == {}
+    assert mock_time.sleep.call_count == 0
+
+
+def test_fan_out_regions():
+    def func(region):
+        if region.startswith('us-'):
+            raise Exception(region)
+
+        return region.upper()
+
+    regions = ['eu-west-1', 'us-east-1', 'ap-south-1', 'us-west-1']
+
+    results = fan_out_regions(func, regions, continue_on_error=True)
+    assert [
+        (region, status, str(result)) for region, status, result in results
+    ] == [
+        ('eu-west-1', 'success', 'EU-WEST-1'),
+        ('us-east-1', 'failed', 'us-east-1'),
+        ('ap-south-1', 'success', 'AP-SOUTH-1'),
+        ('us-west-1', 'failed', 'us-west-1')
+    ]
+
+    # Pending regions are cancelled after the first error
+    func = Mock(side_effect=Exception('Failed'))
+    results = fan_out_regions(func, regions, max_workers=1)
+    assert func.call_count == 1
+    assert [(region, status) for region, status, result in results] == [
+        ('eu-west-1', 'failed'),
+        ('us-east-1', 'pending'),
+        ('ap-south-1', 'pending'),
+        ('us-west-1', 'pending')
+    ]
+
+    assert fan_out_regions(func, []) == []
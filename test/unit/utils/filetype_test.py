@@ -1,13 +1,42 @@
-from mash.utils.filetype import FileType
+import gzip
+import io
+import lzma
+import os
+import struct
+import tarfile
+import zlib
+
+from pytest import raises
+from unittest.mock import patch
+
+from mash.utils import filetype
+from mash.utils.filetype import (
+    FileType,
+    _read_xz_multibyte,
+    get_digest_metadata,
+    get_file_info,
+    get_image_metadata,
+    get_xz_uncompressed_size
+)
+
+
+def get_vhd_footer(disk_type, virtual_size):
+    footer = bytearray(512)
+    footer[:8] = b'conectix'
+    footer[48:56] = struct.pack('>Q', virtual_size)
+    footer[60:64] = struct.pack('>I', disk_type)
+    return bytes(footer)
 
 
 class TestFileType:
     def setup(self):
+        filetype._cache.clear()
         self.filetype_xz = FileType('test/data/blob.xz')
         self.filetype_not_xz = FileType('test/data/id_test')
 
     def test_is_xz(self):
         assert self.filetype_xz.is_xz() is True
+        assert self.filetype_xz.is_gzip() is False
 
     def test_not_xz(self):
         assert self.filetype_not_xz.is_xz() is False
@@ -15,3 +44,203 @@ class TestFileType:
     def test_get_size(self):
         assert self.filetype_xz.get_size() == 4
         assert self.filetype_not_xz.get_size() == 1679
+
+    @patch('mash.utils.filetype.get_xz_uncompressed_size')
+    def test_get_size_invalid_index(self, mock_get_xz_size):
+        filetype._cache.clear()
+        mock_get_xz_size.side_effect = ValueError('Invalid xz index.')
+        assert FileType('test/data/blob.xz').get_size() == 4
+
+    def test_get_format(self, tmpdir):
+        directory = str(tmpdir)
+
+        def write(name, data):
+            file_name = os.path.join(directory, name)
+            with open(file_name, 'wb') as image:
+                image.write(data)
+            return FileType(file_name)
+
+        image = write('image.gz', gzip.compress(b'data'))
+        assert image.get_format() == 'gzip'
+        assert image.is_gzip() is True
+        assert image.get_uncompressed_size() is None
+        assert image.get_virtual_size() is None
+        assert image.get_size() == os.path.getsize(image.file_name)
+
+        tar_data = io.BytesIO()
+        with tarfile.open(fileobj=tar_data, mode='w:gz') as tar:
+            info = tarfile.TarInfo('disk.raw')
+            info.size = 4
+            tar.addfile(info, io.BytesIO(b'disk'))
+
+        image = write('image.tar.gz', tar_data.getvalue())
+        assert image.get_format() == 'tar.gz'
+        assert image.is_gzip() is True
+
+        image = write('truncated.gz', gzip.compress(b'data' * 100)[:20])
+        assert image.get_format() == 'gzip'
+
+        qcow2 = bytearray(512)
+        qcow2[:4] = b'QFI\xfb'
+        qcow2[24:32] = struct.pack('>Q', 10737418240)
+        image = write('image.qcow2', bytes(qcow2))
+        assert image.get_format() == 'qcow2'
+        assert image.get_virtual_size() == 10737418240
+
+        footer = get_vhd_footer(3, 1073741824)
+        image = write('image.vhd', footer + bytes(1024) + footer)
+        assert image.get_format() == 'vhd'
+        assert image.get_virtual_size() == 1073741824
+
+        image = write(
+            'image.vhdfixed', bytes(1024) + get_vhd_footer(2, 1024)
+        )
+        assert image.get_format() == 'vhdfixed'
+        assert image.get_virtual_size() == 1024
+        assert image.get_size() == 1536
+
+        image = write('image.raw', bytes(2048))
+        assert image.get_format() == 'raw'
+        assert image.get_virtual_size() == 2048
+
+        image = write('empty.raw', b'')
+        assert image.get_format() == 'raw'
+        assert image.get_virtual_size() == 0
+
+    def test_get_file_info_cache(self, tmpdir):
+        file_name = os.path.join(str(tmpdir), 'image.raw')
+
+        with open(file_name, 'wb') as image:
+            image.write(bytes(512))
+
+        with patch('mash.utils.filetype._sniff_file') as mock_sniff:
+            mock_sniff.return_value = 'info'
+            assert get_file_info(file_name) == 'info'
+            assert get_file_info(file_name) == 'info'
+            assert mock_sniff.call_count == 1
+
+            # Modified files are sniffed again
+            with open(file_name, 'ab') as image:
+                image.write(bytes(512))
+
+            get_file_info(file_name)
+            assert mock_sniff.call_count == 2
+
+        with patch.object(filetype, 'CACHE_SIZE', 1):
+            get_file_info('test/data/blob.more.xz')
+            assert list(filetype._cache.values())[0].image_format == 'xz'
+            assert len(filetype._cache) == 1
+
+
+def test_get_image_metadata():
+    filetype._cache.clear()
+    metadata = get_image_metadata('test/data/blob.xz', 'sha', 'md5')
+
+    assert metadata == {
+        'image_format': 'xz',
+        'size': os.path.getsize('test/data/blob.xz'),
+        'uncompressed_size': FileType('test/data/blob.xz').get_size(),
+        'virtual_size': metadata['virtual_size'],
+        'sha256': 'sha',
+        'md5': 'md5'
+    }
+    assert get_digest_metadata(metadata) == {'sha256': 'sha', 'md5': 'md5'}
+    assert get_digest_metadata({'size': 1}) == {}
+
+
+def test_get_xz_uncompressed_size(tmpdir):
+    file_name = os.path.join(str(tmpdir), 'image.xz')
+
+    # Concatenated streams with stream padding
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(lzma.compress(b'a' * 1000))
+        xz_file.write(b'\0' * 8)
+        xz_file.write(lzma.compress(b'b' * 2000))
+
+    assert get_xz_uncompressed_size(file_name) == 3000
+
+    # Multiple blocks in one stream
+    with open(file_name, 'wb') as xz_file:
+        compressor = lzma.LZMACompressor(
+            filters=[{'id': lzma.FILTER_LZMA2, 'preset': 0}]
+        )
+        xz_file.write(compressor.compress(os.urandom(1000)))
+        xz_file.write(compressor.flush())
+
+    assert get_xz_uncompressed_size(file_name) == 1000
+
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(b'not an xz file')
+
+    with raises(ValueError):
+        get_xz_uncompressed_size(file_name)
+
+
+def test_get_xz_uncompressed_size_invalid(tmpdir):
+    file_name = os.path.join(str(tmpdir), 'image.xz')
+    data = bytearray(lzma.compress(b'a' * 1000))
+
+    # Corrupt footer checksum
+    data[-12] ^= 0xFF
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(data)
+
+    with raises(ValueError):
+        get_xz_uncompressed_size(file_name)
+
+    # Corrupt footer magic
+    data = bytearray(lzma.compress(b'a' * 1000))
+    data[-1] = 0
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(data)
+
+    with raises(ValueError) as error:
+        get_xz_uncompressed_size(file_name)
+
+    assert str(error.value) == 'Invalid xz stream footer.'
+
+    # Index larger than the file
+    data = bytearray(lzma.compress(b'a' * 1000))
+    data[-8:-4] = struct.pack('<I', 0xFFFF)
+    data[-12:-8] = struct.pack('<I', zlib.crc32(data[-8:-2]))
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(data)
+
+    with raises(ValueError) as error:
+        get_xz_uncompressed_size(file_name)
+
+    assert str(error.value) == 'Invalid xz index size.'
+
+    # Corrupt index indicator
+    data = bytearray(lzma.compress(b'a' * 1000))
+    backward_size = (int.from_bytes(data[-8:-4], 'little') + 1) * 4
+    data[-12 - backward_size] = 1
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(data)
+
+    with raises(ValueError):
+        get_xz_uncompressed_size(file_name)
+
+    # Index records more data than the file holds
+    data = bytearray(lzma.compress(b'a' * 1000))
+    data[-12 - backward_size + 2] = 0xFF
+    data[-12 - backward_size + 3] = 0x7F
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(data)
+
+    with raises(ValueError):
+        get_xz_uncompressed_size(file_name)
+
+    # Trailing bytes before the first stream
+    with open(file_name, 'wb') as xz_file:
+        xz_file.write(b'1234' + lzma.compress(b'a' * 1000))
+
+    with raises(ValueError):
+        get_xz_uncompressed_size(file_name)
+
+
+def test_read_xz_multibyte():
+    assert _read_xz_multibyte(b'\x00\xe8\x07', 1) == (1000, 3)
+
+    with raises(ValueError):
+        _read_xz_multibyte(b'\x80' * 9, 0)
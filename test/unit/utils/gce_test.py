@@ -29,6 +29,7 @@ from mash.utils.gce import (
     get_gce_image,
     delete_image_tarball,
     upload_image_tarball,
+    GCSComposeUploadBackend,
     wait_on_image_ready,
     get_gce_compute_driver,
     get_gce_storage_driver,
@@ -87,23 +88,93 @@ def test_delete_image_tarball():
     blob.delete.assert_called_once_with()
 
 
-def test_upload_image_tarball():
+@patch('mash.utils.gce.upload_file')
+def test_upload_image_tarball(mock_upload_file):
     driver = Mock()
+    get_backend = Mock()
     bucket = Mock()
-    blob = Mock()
-
-    bucket.blob.return_value = blob
     driver.get_bucket.return_value = bucket
 
     upload_image_tarball(
         driver,
         'image_123.tar.gz',
         '/path/to/file.tar.gz',
-        'bucket'
+        'bucket',
+        8388608,
+        checkpoint_file='job-1.checkpoint',
+        max_workers=2,
+        get_backend=get_backend
     )
 
     driver.get_bucket.assert_called_once_with('bucket')
-    blob.upload_from_filename.assert_called_once_with('/path/to/file.tar.gz')
+    backend = mock_upload_file.call_args[0][0]
+    assert backend.object_name == 'image_123.tar.gz'
+    assert mock_upload_file.call_args[0][1:] == (
+        '/path/to/file.tar.gz',
+        'bucket/image_123.tar.gz',
+        8388608
+    )
+    assert mock_upload_file.call_args[1] == {
+        'checkpoint_file': 'job-1.checkpoint',
+        'max_workers': 2,
+        'max_retry_attempts': 3,
+        'get_backend': get_backend
+    }
+
+
+def test_gcs_compose_upload_backend():
+    driver = Mock()
+    bucket = Mock()
+    blobs = {}
+
+    def get_blob(name):
+        return blobs.setdefault(name, Mock(name=name))
+
+    bucket.blob.side_effect = get_blob
+    driver.get_bucket.return_value = bucket
+
+    backend = GCSComposeUploadBackend(driver, 'image.tar.gz', 'bucket')
+    backend.max_compose_sources = 2
+    upload_id = backend.start()
+
+    parts = [
+        backend.upload_part(upload_id, number, 0, b'data')
+        for number in (1, 2, 3)
+    ]
+    assert parts[0] == {
+        'name': 'image.tar.gz.{0}.00001'.format(upload_id)
+    }
+    blobs[parts[0]['name']].upload_from_string.assert_called_once_with(
+        b'data',
+        content_type='application/octet-stream'
+    )
+
+    # Resume only if all parts still exist
+    listed = Mock()
+    listed.name = parts[0]['name']
+    bucket.list_blobs.return_value = [listed]
+    assert backend.resume(upload_id, parts[:1])
+    assert not backend.resume(upload_id, parts)
+
+    blobs[parts[0]['name']].delete.side_effect = Exception('gone')
+    backend.complete(upload_id, parts)
+
+    step = blobs['image.tar.gz.{0}.compose-0'.format(upload_id)]
+    step.compose.assert_called_once_with(
+        [blobs[parts[0]['name']], blobs[parts[1]['name']]]
+    )
+    blobs['image.tar.gz'].compose.assert_called_once_with(
+        [step, blobs[parts[2]['name']]]
+    )
+    step.delete.assert_called_once_with()
+    blobs[parts[2]['name']].delete.assert_called_once_with()
+
+    # Abort deletes the remaining parts
+    backend.abort(upload_id)
+    bucket.list_blobs.assert_called_with(
+        prefix='image.tar.gz.{0}.'.format(upload_id)
+    )
+    listed.delete.assert_called_once_with()
 
 
 def test_get_region_list():
@@ -0,0 +1,161 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import os
+import time
+
+from unittest.mock import Mock, patch
+
+from mash.utils.image_cache import (
+    get_cache_key,
+    ImageCache
+)
+
+
+class TestImageCache(object):
+    def setup(self):
+        self.log_callback = Mock()
+
+    def add_image(self, cache, name, checksum, data=b'image'):
+        with cache.get_entry(name, checksum) as entry:
+            image_file = os.path.join(entry.path, name + '.raw.xz')
+
+            with open(image_file, 'wb') as image:
+                image.write(data)
+
+            entry.commit(image_file, name, checksum, {'size': len(data)})
+
+        return entry
+
+    def test_get_cache_key(self):
+        assert get_cache_key('image', 'abc') != get_cache_key('image', 'abd')
+        assert get_cache_key('image', 'abc') == get_cache_key('image', 'abc')
+
+    def test_get_entry(self, tmpdir):
+        cache = ImageCache(tmpdir.strpath)
+
+        with cache.get_entry('image', 'abc') as entry:
+            assert entry.get_image_file() is None
+
+        entry = self.add_image(cache, 'image', 'abc')
+
+        with cache.get_entry('image', 'abc') as cached:
+            assert cached.path == entry.path
+            assert cached.get_image_file() == os.path.join(
+                entry.path, 'image.raw.xz'
+            )
+            assert cached.get_metadata() == {'size': 5}
+
+        # Entry is not complete if the image is gone
+        os.remove(entry.get_image_file())
+        assert entry.get_image_file() is None
+
+        os.remove(entry.entry_file)
+        assert entry.get_metadata() is None
+
+    def test_get_entry_evicted_lock(self, tmpdir):
+        cache = ImageCache(tmpdir.strpath)
+        key = get_cache_key('image', 'abc')
+        os.makedirs(cache.cache_directory)
+        results = [FileNotFoundError]
+
+        def stat(path):
+            if results:
+                raise results.pop()
+            return os.lstat(path)
+
+        # The lock file is evicted while waiting for the lock
+        with patch('mash.utils.image_cache.os.stat', side_effect=stat) \
+                as mock_stat:
+            with cache._lock(key) as locked:
+                assert locked
+
+        assert mock_stat.call_count == 2
+
+    def test_link(self, tmpdir):
+        cache = ImageCache(tmpdir.strpath)
+        entry = self.add_image(cache, 'image', 'abc')
+        job_dir = tmpdir.join('1').strpath
+
+        assert not entry.is_referenced()
+
+        image_file = cache.link(entry, job_dir)
+        assert image_file == os.path.join(job_dir, 'image.raw.xz')
+        assert entry.is_referenced()
+
+        # Linking again replaces the existing view
+        assert cache.link(entry, job_dir) == image_file
+        assert os.stat(image_file).st_nlink == 2
+
+        os.remove(image_file)
+        assert not entry.is_referenced()
+
+    @patch('mash.utils.image_cache.os.link')
+    def test_link_copy(self, mock_link, tmpdir):
+        mock_link.side_effect = OSError('Invalid cross-device link')
+        cache = ImageCache(tmpdir.strpath)
+        entry = self.add_image(cache, 'image', 'abc')
+
+        image_file = cache.link(entry, tmpdir.join('1').strpath)
+
+        with open(image_file, 'rb') as image:
+            assert image.read() == b'image'
+
+        assert os.stat(image_file).st_nlink == 1
+
+    def test_get_entries_no_cache(self, tmpdir):
+        assert ImageCache(tmpdir.join('missing').strpath).get_entries() == {}
+
+    def test_purge(self, tmpdir):
+        cache = ImageCache(tmpdir.strpath)
+        entries = {}
+
+        for index, name in enumerate(['old', 'used', 'new']):
+            entries[name] = self.add_image(cache, name, 'abc', b'1' * 1000)
+            last_used = time.time() - (3 - index) * 60
+            os.utime(entries[name].entry_file, (last_used, last_used))
+
+        os.link(
+            entries['used'].get_image_file(),
+            tmpdir.join('used.raw.xz').strpath
+        )
+
+        # Nothing to evict
+        assert cache.purge() == []
+
+        # Referenced entries are kept to reduce the cache size
+        evicted = cache.purge(max_size=2500, log_callback=self.log_callback)
+        assert evicted == [get_cache_key('old', 'abc')]
+        assert not os.path.exists(entries['old'].path)
+        self.log_callback.info.assert_called_once_with(
+            'Evicted cached image {0}'.format(get_cache_key('old', 'abc'))
+        )
+
+        # Expired entries are evicted even if referenced
+        evicted = cache.purge(max_age=90)
+        assert evicted == [get_cache_key('used', 'abc')]
+        assert set(cache.get_entries()) == {get_cache_key('new', 'abc')}
+
+    def test_purge_skips_locked_entries(self, tmpdir):
+        cache = ImageCache(tmpdir.strpath)
+        self.add_image(cache, 'image', 'abc')
+
+        with cache.get_entry('image', 'abc'):
+            assert cache.purge(max_age=-1) == []
+
+        assert cache.purge(max_age=-1) == [get_cache_key('image', 'abc')]
@@ -17,6 +17,8 @@
 #
 
 import io
+import threading
+import time
 
 from pytest import raises
 from unittest.mock import call, MagicMock, patch
@@ -35,11 +37,13 @@ from mash.utils.mash_utils import (
     load_json,
     restart_job,
     restart_jobs,
+    get_job_owner,
     handle_request,
     setup_logfile,
     setup_rabbitmq_log_handler,
     get_fingerprint_from_private_key,
-    normalize_dictionary
+    normalize_dictionary,
+    ResizableSemaphore
 )
 
 
@@ -167,7 +171,7 @@ def test_restart_job(mock_json_load):
 @patch('mash.utils.mash_utils.restart_job')
 @patch('mash.utils.mash_utils.os.listdir')
 def test_restart_jobs(mock_os_listdir, mock_restart_job):
-    mock_os_listdir.return_value = ['job-123.json']
+    mock_os_listdir.return_value = ['job-123.json', 'job-123.checkpoint']
     callback = MagicMock()
 
     restart_jobs('tmp/', callback)
@@ -177,6 +181,22 @@ def test_restart_jobs(mock_os_listdir, mock_restart_job):
     )
 
 
+def test_get_job_owner():
+    assert get_job_owner('1', 1) == 0
+    assert get_job_owner('1', 3) == 2
+    assert get_job_owner('4', 3) == 1
+
+    # Owners are stable and spread across all instances
+    owners = [get_job_owner(str(job_id), 4) for job_id in range(200)]
+    assert owners == [get_job_owner(str(job_id), 4) for job_id in range(200)]
+    assert set(owners) == {0, 1, 2, 3}
+
+    # Adding an instance only moves jobs to the new instance
+    for job_id in range(200):
+        owner = get_job_owner(str(job_id), 5)
+        assert owner in (owners[job_id], 4)
+
+
 @patch('mash.utils.mash_utils.requests')
 def test_handle_request(mock_requests):
     response = MagicMock()
@@ -186,6 +206,13 @@ def test_handle_request(mock_requests):
     result = handle_request('localhost', '/jobs', 'get')
     assert result == response
 
+    session = MagicMock()
+    session.get.return_value = response
+
+    result = handle_request('localhost', '/jobs', 'get', session=session)
+    assert result == response
+    session.get.assert_called_once_with('localhost/jobs', data=None)
+
 
 @patch('mash.utils.mash_utils.requests')
 def test_handle_request_failed(mock_requests):
@@ -235,6 +262,30 @@ def test_setup_rabbitmq_log_handler(mock_rabbit, mock_logging):
     handler.setFormatter.assert_called_once_with(formatter)
 
 
+@patch('mash.utils.mash_utils.logging')
+@patch('mash.utils.mash_utils.BufferedRabbitMQHandler')
+def test_setup_rabbitmq_log_handler_buffered(mock_rabbit, mock_logging):
+    handler = MagicMock()
+    mock_rabbit.return_value = handler
+
+    result = setup_rabbitmq_log_handler(
+        'localhost', 'user1', 'pass', queue_capacity=500, batch_size=10,
+        flush_interval=2, block=True
+    )
+
+    assert result == handler
+    mock_rabbit.assert_called_once_with(
+        host='localhost',
+        username='user1',
+        password='pass',
+        routing_key='mash.logger',
+        capacity=500,
+        batch_size=10,
+        flush_interval=2,
+        block=True
+    )
+
+
 def test_get_fingerprint_from_private_key():
     fingerprint = get_fingerprint_from_private_key(private_key)
     assert fingerprint == '95:3c:b5:5e:a5:ca:c7:2d:6b:0a:e1:41:93:0e:89:32'
@@ -280,3 +331,49 @@ def test_normalize_dict():
     assert data['dict']['test'] == 'data'
     assert data['list'][0] == 'test'
     assert data['list_dict'][0]['test'] == 'data'
+
+
+def test_resizable_semaphore():
+    slots = ResizableSemaphore(1)
+
+    with slots:
+        assert not slots.acquire(blocking=False)
+
+        slots.resize(2)
+        assert slots.acquire(blocking=False)
+
+        # Lowering the count keeps the current holders
+        slots.resize(1)
+        assert slots.in_use == 2
+        slots.release()
+        assert not slots.acquire(blocking=False)
+
+    assert slots.in_use == 0
+    assert slots.acquire(blocking=False)
+
+
+def test_resizable_semaphore_wait():
+    slots = ResizableSemaphore(1)
+    slots.acquire()
+
+    waiter = threading.Thread(target=slots.acquire)
+    waiter.start()
+
+    while not slots.condition._waiters:
+        time.sleep(0.01)
+
+    # A waiting holder gets the slot once it is released
+    slots.release()
+    waiter.join()
+    assert slots.in_use == 1
+
+    waiter = threading.Thread(target=slots.acquire)
+    waiter.start()
+
+    while not slots.condition._waiters:
+        time.sleep(0.01)
+
+    # or the count is raised
+    slots.resize(2)
+    waiter.join()
+    assert slots.in_use == 2
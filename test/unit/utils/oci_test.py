@@ -0,0 +1,76 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+from unittest.mock import Mock
+
+from oci.exceptions import ServiceError
+
+from mash.utils.oci import OCIMultipartUploadBackend
+
+
+def test_oci_multipart_upload_backend():
+    object_storage = Mock()
+    response = Mock()
+    response.data.upload_id = '123'
+    object_storage.create_multipart_upload.return_value = response
+
+    part_response = Mock()
+    part_response.headers = {'etag': 'abc'}
+    object_storage.upload_part.return_value = part_response
+
+    backend = OCIMultipartUploadBackend(
+        object_storage, 'namespace', 'images', 'image.qcow2'
+    )
+
+    assert backend.start() == '123'
+    details = object_storage.create_multipart_upload.call_args[0][2]
+    assert details.object == 'image.qcow2'
+    assert details.metadata is None
+
+    backend = OCIMultipartUploadBackend(
+        object_storage, 'namespace', 'images', 'image.qcow2',
+        metadata={'sha256': 'def', 'md5': 'abc'}
+    )
+    backend.start()
+    details = object_storage.create_multipart_upload.call_args[0][2]
+    assert details.metadata == {
+        'opc-meta-sha256': 'def',
+        'opc-meta-md5': 'abc'
+    }
+
+    part = backend.upload_part('123', 1, 0, b'data')
+    assert part == {'part_num': 1, 'etag': 'abc'}
+    object_storage.upload_part.assert_called_once_with(
+        'namespace', 'images', 'image.qcow2', '123', 1, b'data'
+    )
+
+    assert backend.resume('123', [part])
+    object_storage.list_multipart_upload_parts.side_effect = ServiceError(
+        404, 'NoSuchUpload', {}, 'Upload not found'
+    )
+    assert not backend.resume('123', [part])
+
+    backend.complete('123', [part])
+    details = object_storage.commit_multipart_upload.call_args[0][4]
+    assert details.parts_to_commit[0].part_num == 1
+    assert details.parts_to_commit[0].etag == 'abc'
+
+    backend.abort('123')
+    object_storage.abort_multipart_upload.assert_called_once_with(
+        'namespace', 'images', 'image.qcow2', '123'
+    )
@@ -0,0 +1,314 @@
+# Copyright (c) 2020 SUSE LLC.  All rights reserved.
+#
+# This file is part of mash.
+#
+# mash is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# mash is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with mash.  If not, see <http://www.gnu.org/licenses/>
+#
+
+import io
+import json
+import os
+
+from pytest import raises
+from unittest.mock import Mock
+
+from mash.mash_exceptions import MashUploadException
+from mash.utils.mash_utils import load_json
+from mash.utils.resumable_upload import (
+    abort_upload,
+    call_with_retries,
+    get_checkpoint_file,
+    get_checkpoint_key,
+    ResumableUpload,
+    UploadCheckpoint,
+    upload_file
+)
+
+
+class Crash(BaseException):
+    """
+    Stands in for the service process being stopped.
+    """
+
+
+class LocalBackend(object):
+    """
+    Stand-in storage backend that keeps uploaded parts in memory.
+    """
+    def __init__(self, fail_parts=None, error=Exception):
+        self.uploads = {}
+        self.completed = None
+        self.fail_parts = set(fail_parts or [])
+        self.uploaded_parts = []
+        self.aborted = []
+        self.error = error
+
+    def start(self):
+        upload_id = 'upload-{0}'.format(len(self.uploads))
+        self.uploads[upload_id] = {}
+        return upload_id
+
+    def resume(self, upload_id, parts):
+        return upload_id in self.uploads
+
+    def upload_part(self, upload_id, number, offset, data):
+        if number in self.fail_parts:
+            self.fail_parts.remove(number)
+            raise self.error('Connection reset')
+
+        self.uploads[upload_id][offset] = data
+        self.uploaded_parts.append(number)
+        return {'number': number, 'offset': offset}
+
+    def complete(self, upload_id, parts):
+        data = self.uploads[upload_id]
+        self.completed = b''.join(
+            data[part['offset']] for part in parts
+        )
+
+    def abort(self, upload_id):
+        self.aborted.append(upload_id)
+        del self.uploads[upload_id]
+
+
+def test_call_with_retries():
+    func = Mock(side_effect=[Exception('Broken'), 'result'])
+    assert call_with_retries(2, func, 'arg', key='value') == 'result'
+    func.assert_called_with('arg', key='value')
+
+    func = Mock(side_effect=Exception('Broken'))
+    with raises(Exception):
+        call_with_retries(0, func)
+    assert func.call_count == 1
+
+
+def test_get_checkpoint_file():
+    assert get_checkpoint_file(None) is None
+    assert get_checkpoint_file('/var/lib/mash/upload_jobs/job-1.json') == \
+        '/var/lib/mash/upload_jobs/job-1.checkpoint'
+
+
+class TestResumableUpload(object):
+    def setup(self):
+        self.data = os.urandom(1000)
+
+    def test_upload(self):
+        backend = LocalBackend(fail_parts=[3])
+        progress = Mock()
+        upload = ResumableUpload(
+            backend,
+            UploadCheckpoint(),
+            100,
+            max_workers=4,
+            progress_callback=progress
+        )
+
+        upload.upload(io.BytesIO(self.data), len(self.data))
+
+        assert backend.completed == self.data
+        assert sorted(backend.uploaded_parts) == list(range(1, 11))
+        assert sum(call[0][0] for call in progress.call_args_list) == 1000
+
+    def test_upload_empty(self):
+        backend = LocalBackend()
+        upload = ResumableUpload(backend, UploadCheckpoint(), 100)
+
+        upload.upload(io.BytesIO(b''), 0)
+
+        assert backend.completed == b''
+
+    def test_upload_short_stream(self):
+        upload = ResumableUpload(LocalBackend(), UploadCheckpoint(), 100)
+
+        with raises(MashUploadException):
+            upload.upload(io.BytesIO(self.data[:250]), len(self.data))
+
+    def test_upload_resume(self, tmpdir):
+        image_file = tmpdir.join('image.raw').strpath
+        checkpoint_file = tmpdir.join('job-1.checkpoint').strpath
+
+        with open(image_file, 'wb') as image:
+            image.write(self.data)
+
+        # Crash after part 6 is committed
+        backend = LocalBackend(fail_parts=[7], error=Crash)
+        with raises(Crash):
+            upload_file(
+                backend,
+                image_file,
+                'bucket/image.raw',
+                100,
+                checkpoint_file=checkpoint_file,
+                max_retry_attempts=1
+            )
+
+        with open(checkpoint_file) as checkpoint:
+            assert len(json.load(checkpoint)['parts']) == 6
+
+        backend.uploaded_parts = []
+        upload_file(
+            backend,
+            image_file,
+            'bucket/image.raw',
+            100,
+            checkpoint_file=checkpoint_file
+        )
+
+        assert backend.uploaded_parts == [7, 8, 9, 10]
+        assert backend.completed == self.data
+        assert not os.path.exists(checkpoint_file)
+
+    def test_upload_failed(self, tmpdir):
+        image_file = tmpdir.join('image.raw').strpath
+        checkpoint_file = tmpdir.join('job-1.checkpoint').strpath
+
+        with open(image_file, 'wb') as image:
+            image.write(self.data)
+
+        backend = LocalBackend(fail_parts=[7])
+        with raises(Exception) as error:
+            upload_file(
+                backend,
+                image_file,
+                'bucket/image.raw',
+                100,
+                checkpoint_file=checkpoint_file,
+                max_retry_attempts=1
+            )
+
+        # The upload and checkpoint are kept for the next attempt
+        assert str(error.value) == 'Connection reset'
+        assert backend.aborted == []
+        committed = backend.uploaded_parts
+        assert sorted(
+            int(number) for number in load_json(checkpoint_file)['parts']
+        ) == committed
+
+        backend.uploaded_parts = []
+        upload_file(
+            backend,
+            image_file,
+            'bucket/image.raw',
+            100,
+            checkpoint_file=checkpoint_file,
+            max_retry_attempts=1
+        )
+
+        assert backend.uploaded_parts[0] == 7
+        assert not set(backend.uploaded_parts) & set(committed)
+        assert backend.completed == self.data
+        assert not os.path.exists(checkpoint_file)
+
+    def test_upload_stale_checkpoint(self, tmpdir):
+        image_file = tmpdir.join('image.raw').strpath
+        checkpoint_file = tmpdir.join('job-1.checkpoint').strpath
+
+        with open(image_file, 'wb') as image:
+            image.write(self.data)
+
+        backend = LocalBackend(fail_parts=[7])
+        with raises(Exception):
+            upload_file(
+                backend,
+                image_file,
+                'bucket/old.raw',
+                100,
+                checkpoint_file=checkpoint_file,
+                max_retry_attempts=1
+            )
+
+        # The failed upload to another target is aborted
+        old_backend = LocalBackend()
+        old_backend.uploads['upload-0'] = {}
+        get_backend = Mock(return_value=old_backend)
+
+        upload_file(
+            backend,
+            image_file,
+            'bucket/image.raw',
+            100,
+            checkpoint_file=checkpoint_file,
+            max_retry_attempts=1,
+            get_backend=get_backend
+        )
+
+        get_backend.assert_called_once_with('bucket/old.raw')
+        assert old_backend.aborted == ['upload-0']
+        assert backend.completed == self.data
+        assert not os.path.exists(checkpoint_file)
+
+    def test_upload_restart(self, tmpdir):
+        image_file = tmpdir.join('image.raw').strpath
+        checkpoint_file = tmpdir.join('job-1.checkpoint').strpath
+
+        with open(image_file, 'wb') as image:
+            image.write(self.data)
+
+        key = get_checkpoint_key(image_file, 'bucket/image.raw', 100)
+
+        # Upload no longer exists in the backend
+        checkpoint = UploadCheckpoint(checkpoint_file, key)
+        checkpoint.start('expired')
+        checkpoint.add_part(1, {'number': 1, 'offset': 0})
+
+        backend = LocalBackend()
+        upload_file(
+            backend,
+            image_file,
+            'bucket/image.raw',
+            100,
+            checkpoint_file=checkpoint_file
+        )
+        assert len(backend.uploaded_parts) == 10
+        assert backend.completed == self.data
+
+        # Checkpoint for a different target is ignored
+        checkpoint = UploadCheckpoint(checkpoint_file, key)
+        checkpoint.start('upload-0')
+        checkpoint.add_part(1, {'number': 1, 'offset': 0})
+
+        checkpoint = UploadCheckpoint(
+            checkpoint_file,
+            get_checkpoint_key(image_file, 'bucket/other.raw', 100)
+        )
+        assert checkpoint.upload_id is None
+        assert checkpoint.parts == {}
+
+
+def test_abort_upload(tmpdir):
+    checkpoint_file = tmpdir.join('job-1.checkpoint').strpath
+    get_backend = Mock()
+
+    abort_upload(None, get_backend)
+    abort_upload(checkpoint_file, get_backend)
+    assert get_backend.call_count == 0
+
+    key = {'target': 'bucket/image.raw'}
+    checkpoint = UploadCheckpoint(checkpoint_file, key)
+    checkpoint.start('upload-0')
+
+    abort_upload(checkpoint_file, get_backend)
+
+    get_backend.assert_called_once_with('bucket/image.raw')
+    get_backend.return_value.abort.assert_called_once_with('upload-0')
+    assert not os.path.exists(checkpoint_file)
+
+    # The checkpoint is removed even if the abort fails
+    checkpoint.start('upload-1')
+    get_backend.return_value.abort.side_effect = Exception('Forbidden')
+
+    with raises(Exception):
+        abort_upload(checkpoint_file, get_backend)
+
+    assert not os.path.exists(checkpoint_file)